@@ -0,0 +1,181 @@
+"""
+Managed ACP client pool.
+
+One `acp_sdk` Client per ACP server, each over an httpx connection pool with
+per-host limits and keep-alive. The client's keep-alive expiry
+(ACP_KEEPALIVE_SECONDS) is shorter than the servers' idle timeout
+(ACP_SERVER_KEEPALIVE_SECONDS), so the client always closes an idle connection
+first and never sends on one the server is tearing down. `open()` warms a few
+connections per host with concurrent pings, so the first agent calls skip
+TCP setup.
+
+Agent runs lease the pool they call through (`with pool.lease(): ...`) from the
+start, so routing and the admission wait are covered as well as the calls.
+On re-initialization the new pool is opened and swapped in first; the old one
+is then drained: it stops counting as current, waits for its leased calls to
+finish (up to `drain_timeout`) and closes its clients.
+
+Connection reuse is measured from httpcore trace events: every request counts,
+every `connect_tcp` is a new connection, the difference is reuse.
+"""
+
+import asyncio
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Sequence
+
+logger = logging.getLogger("acp_clients")
+
+_generations = itertools.count(1)
+
+
+class ACPClientPool:
+    """ACP clients for a fixed set of servers, with warm-up, leasing, draining and reuse stats"""
+
+    def __init__(self, base_urls: Sequence[str], max_connections: int = 20, max_keepalive: int = 10,
+                 keepalive_expiry: float = 60.0, connect_timeout: float = 5.0, warm_connections: int = 2):
+        self.base_urls = list(base_urls)
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.keepalive_expiry = keepalive_expiry
+        self.connect_timeout = connect_timeout
+        self.warm_connections = warm_connections
+        self.generation = next(_generations)
+        self.clients: List[Any] = []
+        self.state = "new"
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._leases = 0
+        self._hosts = {url: {"requests": 0, "connections_opened": 0, "connect_seconds": 0.0,
+                             "connect_failures": 0, "warmed": 0} for url in self.base_urls}
+
+    async def open(self) -> List[Any]:
+        """Create and enter one client per server, then warm their connections"""
+        import httpx
+        from acp_sdk.client import Client
+
+        limits = httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_keepalive,
+                              keepalive_expiry=self.keepalive_expiry)
+        # Agent runs are bounded by the caller (asyncio.wait_for); only connecting has its own timeout
+        timeout = httpx.Timeout(None, connect=self.connect_timeout)
+        try:
+            for url in self.base_urls:
+                client = Client(base_url=url, limits=limits, timeout=timeout,
+                                event_hooks={"request": [self._request_hook(url)]})
+                await client.__aenter__()
+                self.clients.append(client)
+        except BaseException:
+            await self.close()
+            raise
+        self.state = "open"
+        await self.warm_up()
+        return self.clients
+
+    async def warm_up(self):
+        """Open `warm_connections` keep-alive connections per server with concurrent pings"""
+        if self.warm_connections <= 0:
+            return
+        started = time.perf_counter()
+        calls = [(url, client) for url, client in zip(self.base_urls, self.clients) for _ in range(self.warm_connections)]
+        results = await asyncio.gather(*(client.ping() for _, client in calls), return_exceptions=True)
+        for (url, _), result in zip(calls, results):
+            if not isinstance(result, BaseException):
+                self._hosts[url]["warmed"] += 1
+        failures = sum(isinstance(result, BaseException) for result in results)
+        logger.info("ACP connections warmed", extra={
+            "generation": self.generation, "connections": len(calls) - failures, "failures": failures,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+        })
+
+    @contextmanager
+    def lease(self):
+        """Mark one call in flight on this pool (draining waits for it)"""
+        with self._lock:
+            self._in_flight += 1
+            self._leases += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    @property
+    def in_flight(self) -> int:
+        with self._lock:
+            return self._in_flight
+
+    async def drain(self, timeout: float = 30.0):
+        """Wait for leased calls to finish (at most `timeout` seconds), then close"""
+        if self.state == "closed":
+            return
+        self.state = "draining"
+        started = time.monotonic()
+        while self.in_flight and time.monotonic() - started < timeout:
+            await asyncio.sleep(0.05)
+        abandoned = self.in_flight
+        await self.close()
+        log = logger.warning if abandoned else logger.info
+        log("ACP client pool drained", extra={
+            "generation": self.generation, "waited_s": round(time.monotonic() - started, 3),
+            "abandoned_calls": abandoned, "hosts": self.stats()["hosts"]
+        })
+
+    async def close(self):
+        clients, self.clients = self.clients, []
+        for client in clients:
+            try:
+                await client.__aexit__(None, None, None)
+            except Exception as e:
+                logger.warning("Error closing ACP client", extra={"generation": self.generation, "error": str(e)})
+        self.state = "closed"
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hosts = {}
+            for url, host in self._hosts.items():
+                opened = host["connections_opened"]
+                hosts[url] = {
+                    "requests": host["requests"],
+                    "connections_opened": opened,
+                    "reused_requests": max(host["requests"] - opened, 0),
+                    "reuse_ratio": round(1 - opened / host["requests"], 3) if host["requests"] else None,
+                    "avg_connect_ms": round(host["connect_seconds"] / opened * 1000, 2) if opened else None,
+                    "connect_failures": host["connect_failures"],
+                    "warmed": host["warmed"],
+                }
+            return {
+                "generation": self.generation,
+                "state": self.state,
+                "in_flight": self._in_flight,
+                "leases": self._leases,
+                "limits": {"max_connections": self.max_connections, "max_keepalive": self.max_keepalive,
+                           "keepalive_expiry_s": self.keepalive_expiry},
+                "hosts": hosts,
+            }
+
+    def _request_hook(self, url: str):
+        host = self._hosts[url]
+
+        async def on_request(request):
+            with self._lock:
+                host["requests"] += 1
+            connect_started: Optional[float] = None
+
+            async def trace(event: str, info: Dict[str, Any]):
+                nonlocal connect_started
+                if event == "connection.connect_tcp.started":
+                    connect_started = time.perf_counter()
+                elif event == "connection.connect_tcp.complete":
+                    with self._lock:
+                        host["connections_opened"] += 1
+                        host["connect_seconds"] += time.perf_counter() - (connect_started or time.perf_counter())
+                elif event == "connection.connect_tcp.failed":
+                    with self._lock:
+                        host["connect_failures"] += 1
+
+            request.extensions["trace"] = trace
+
+        return on_request
@@ -0,0 +1,63 @@
+"""
+Request metadata carried alongside the query in ACP messages.
+
+The query stays in the first message part, which is all the agents used to
+read; metadata (namespace, correlation id, ...) travels as an extra
+`application/json` part so agents that ignore it keep working. Replies use the
+same layout for data such as prompt token accounting.
+
+Caller and agents also share one time budget: the caller gives up on an agent
+call after AGENT_CALL_TIMEOUT seconds, and agents bound their own runs
+AGENT_RUN_MARGIN_SECONDS below that, so their timeout reply still reaches it.
+"""
+
+import json
+import os
+from typing import Any, Dict, Optional
+
+METADATA_CONTENT_TYPE = "application/json"
+
+AGENT_CALL_TIMEOUT = float(os.getenv("AGENT_CALL_TIMEOUT", "90"))
+AGENT_RUN_MARGIN = float(os.getenv("AGENT_RUN_MARGIN_SECONDS", "10"))
+
+
+def agent_run_timeout(requested: Optional[float] = None) -> float:
+    """Agent-side run timeout: `requested` (default: all it can have) capped below AGENT_CALL_TIMEOUT"""
+    limit = max(AGENT_CALL_TIMEOUT - AGENT_RUN_MARGIN, 1.0)
+    return min(float(requested), limit) if requested else limit
+
+
+def build_agent_input(query: str, metadata: Optional[Dict[str, Any]] = None):
+    """ACP run input for a query plus optional metadata"""
+    if not metadata:
+        return query
+    from acp_sdk.models import Message, MessagePart
+    return [Message(parts=[
+        MessagePart(content=query, content_type="text/plain"),
+        MessagePart(content=json.dumps(metadata), content_type=METADATA_CONTENT_TYPE),
+    ])]
+
+
+def build_agent_output(content: str, metadata: Optional[Dict[str, Any]] = None):
+    """ACP reply message: the text first, optional metadata (usage, ...) as a JSON part"""
+    from acp_sdk.models import Message, MessagePart
+    parts = [MessagePart(content=content, content_type="text/plain")]
+    if metadata:
+        parts.append(MessagePart(content=json.dumps(metadata), content_type=METADATA_CONTENT_TYPE))
+    return Message(parts=parts)
+
+
+def read_agent_metadata(messages) -> Dict[str, Any]:
+    """Metadata sent with an ACP run or reply (empty when none was attached)"""
+    metadata: Dict[str, Any] = {}
+    for message in messages or []:
+        for part in (message.parts or [])[1:]:
+            if getattr(part, "content_type", None) != METADATA_CONTENT_TYPE:
+                continue
+            try:
+                value = json.loads(part.content)
+            except (TypeError, ValueError):
+                continue
+            if isinstance(value, dict):
+                metadata.update(value)
+    return metadata
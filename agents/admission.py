@@ -0,0 +1,221 @@
+"""
+Admission control for agent calls.
+
+Each ACP agent gets a concurrency limit. Calls beyond the limit wait in a
+priority queue ordered by lane (interactive chat, then batch jobs, then
+background refreshes) and then by the routing `priority` from
+`_determine_agents`. Interactive calls are shed with AdmissionRejected when
+the agent's queue is full or the wait would exceed the configured maximum;
+batch and background calls always wait, their volume being bounded by their
+own worker pools. Per-client request rates are limited separately with token
+buckets. Time spent waiting for a slot is recorded per agent.
+"""
+
+import asyncio
+import contextlib
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Optional
+
+logger = logging.getLogger("admission")
+
+LANES = {"interactive": 0, "batch": 1, "background": 2}
+SHEDDABLE_LANES = ("interactive",)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a call is shed because the agent is saturated"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RateLimited(Exception):
+    """Raised when a client exceeds its request rate"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_limits(spec: Optional[str]) -> Dict[str, int]:
+    """'investment_agent=2,market_researcher=4' -> {'investment_agent': 2, 'market_researcher': 4}"""
+    limits = {}
+    for item in (spec or "").split(","):
+        if "=" in item:
+            name, value = item.split("=", 1)
+            limits[name.strip()] = int(value)
+    return limits
+
+
+def _percentile_ms(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return round(sorted_values[index] * 1000, 1)
+
+
+class _AgentGate:
+    """Concurrency slots for one agent with a priority-ordered wait queue"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self.waiters = []
+        self.waits = deque(maxlen=1000)
+        self.stats = {"admitted": 0, "waited": 0, "shed_queue_full": 0, "shed_timeout": 0}
+
+    def queued(self, lane_rank: Optional[int] = None) -> int:
+        return sum(1 for entry in self.waiters
+                   if not entry[-1].done() and (lane_rank is None or entry[0] == lane_rank))
+
+    def release(self):
+        while self.waiters:
+            future = heapq.heappop(self.waiters)[-1]
+            if not future.done():
+                # Hand the slot straight to the next waiter; `active` is unchanged
+                future.set_result(None)
+                return
+        self.active -= 1
+
+
+class AdmissionController:
+    """Per-agent concurrency limits with priority queueing and load shedding.
+
+    Slots are taken and released on one event loop; `stats()` may be called from
+    any thread, so gate state is only changed and read under `_lock`.
+    """
+
+    def __init__(self, limits: Optional[Dict[str, int]] = None, default_limit: int = 2,
+                 max_queue: int = 20, max_wait: float = 30.0):
+        self.limits = dict(limits or {})
+        self.default_limit = default_limit
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._gates: Dict[str, _AgentGate] = {}
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    @contextlib.asynccontextmanager
+    async def slot(self, agent_name: str, priority: int = 1, lane: str = "interactive"):
+        """Hold one of the agent's concurrency slots for the duration of the block"""
+        start = time.monotonic()
+        with self._lock:
+            gate = self._gate(agent_name)
+            admitted = gate.active < gate.limit and not gate.queued()
+            if admitted:
+                gate.active += 1
+        if not admitted:
+            await self._wait(gate, agent_name, priority, lane)
+        waited = time.monotonic() - start
+        with self._lock:
+            gate.waits.append(waited)
+            gate.stats["admitted"] += 1
+        if waited > 0.001:
+            logger.info("Agent call admitted after queueing", extra={
+                "agent": agent_name, "lane": lane, "queue_wait_ms": round(waited * 1000, 1)
+            })
+        try:
+            yield waited
+        finally:
+            with self._lock:
+                gate.release()
+
+    def stats(self) -> Dict[str, Dict[str, object]]:
+        """Per-agent counters and queue-wait percentiles (from any thread)"""
+        with self._lock:
+            snapshot = [(name, dict(gate.stats), gate.limit, gate.active, gate.queued(), sorted(gate.waits))
+                        for name, gate in self._gates.items()]
+        report = {}
+        for name, counters, limit, active, queued, waits in snapshot:
+            report[name] = {
+                **counters,
+                "limit": limit,
+                "active": active,
+                "queued": queued,
+                "queue_wait_ms": {
+                    "samples": len(waits),
+                    "avg": round(sum(waits) / len(waits) * 1000, 1) if waits else 0.0,
+                    "p50": _percentile_ms(waits, 0.50),
+                    "p95": _percentile_ms(waits, 0.95),
+                    "max": _percentile_ms(waits, 1.0),
+                },
+            }
+        return report
+
+    async def _wait(self, gate: _AgentGate, agent_name: str, priority: int, lane: str):
+        sheddable = lane in SHEDDABLE_LANES
+        lane_rank = LANES.get(lane, len(LANES))
+        future = asyncio.get_running_loop().create_future()
+        with self._lock:
+            queued = gate.queued(lane_rank)
+            shed = sheddable and queued >= self.max_queue
+            if shed:
+                gate.stats["shed_queue_full"] += 1
+            else:
+                heapq.heappush(gate.waiters, (lane_rank, priority, next(self._sequence), future))
+                gate.stats["waited"] += 1
+        if shed:
+            logger.warning("Agent call shed: queue full", extra={"agent": agent_name, "queued": queued})
+            raise AdmissionRejected(f"{agent_name} is at capacity; please retry shortly", self.max_wait)
+
+        try:
+            await asyncio.wait_for(future, self.max_wait if sheddable else None)
+        except asyncio.TimeoutError:
+            with self._lock:
+                gate.stats["shed_timeout"] += 1
+            logger.warning("Agent call shed: queue wait exceeded", extra={"agent": agent_name, "max_wait_s": self.max_wait})
+            raise AdmissionRejected(f"{agent_name} is busy; waited {self.max_wait:.0f}s for a slot", self.max_wait)
+        except asyncio.CancelledError:
+            # Cancelled just after being handed a slot: pass it on
+            if future.done() and not future.cancelled():
+                with self._lock:
+                    gate.release()
+            raise
+
+    def _gate(self, agent_name: str) -> _AgentGate:
+        """The agent's gate, created on first use (call with `_lock` held)"""
+        gate = self._gates.get(agent_name)
+        if gate is None:
+            gate = self._gates[agent_name] = _AgentGate(self.limits.get(agent_name, self.default_limit))
+        return gate
+
+
+class ClientRateLimiter:
+    """Token bucket per client id (thread-safe; least recently seen clients are dropped beyond max_clients)"""
+
+    def __init__(self, rate_per_minute: float = 30.0, burst: int = 10, max_clients: int = 10000):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"allowed": 0, "limited": 0}
+
+    def check(self, client_id: str, cost: float = 1.0):
+        """Take `cost` tokens from the client's bucket or raise RateLimited"""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.pop(client_id, None) or [float(self.burst), now]
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            self._buckets[client_id] = bucket
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                self._stats["allowed"] += 1
+                return
+            self._stats["limited"] += 1
+            retry_after = (cost - bucket[0]) / self.rate if self.rate > 0 else 60.0
+        raise RateLimited("Too many requests; slow down", retry_after)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {**self._stats, "clients": len(self._buckets),
+                    "rate_per_minute": self.rate * 60, "burst": self.burst}
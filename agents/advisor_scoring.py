@@ -0,0 +1,385 @@
+"""
+Vectorized advisor match scoring.
+
+Advisors are held column-wise in NumPy arrays (credential and specialization
+indicator matrices, fees, minimums, coordinates) so ranking every advisor
+against a client profile is a handful of array operations instead of an LLM
+judging candidates one by one:
+
+    credentials     weighted credential coverage (stated credentials count double)
+    specialization  share of the client's needs the advisor covers
+    fees            lower % of AUM is better, fee-only advisors get a bonus
+    minimum         1 when the client's amount meets the account minimum
+    distance        exp(-km / DISTANCE_DECAY_KM), floored for remote advisors
+
+The total (0-100) is the weighted sum; the top k come from `np.argpartition`
+and each carries its per-component points, so the LLM only has to write the
+narrative around a ranking it did not invent. Without NumPy, `AdvisorList`
+computes the same scores one advisor at a time.
+
+    python advisor_scoring.py --benchmark 100000
+"""
+
+import argparse
+import heapq
+import json
+import logging
+import math
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+try:
+    import numpy as np
+except ImportError:  # scored by the pure-Python AdvisorList instead
+    np = None
+
+from investor_profile import extract_location, extract_profile
+
+logger = logging.getLogger("advisor_scoring")
+
+CREDENTIALS = ("CFP", "CFA", "ChFC", "CPA", "CIMA", "RICP")
+CREDENTIAL_WEIGHTS = (1.0, 1.0, 0.7, 0.6, 0.5, 0.5)
+
+SPECIALIZATIONS = ("retirement", "tax", "estate", "investment", "college", "small_business", "esg", "insurance")
+NEED_KEYWORDS = {
+    "retirement": ("retire", "401k", "401(k)", "ira", "pension", "social security"),
+    "tax": ("tax",),
+    "estate": ("estate", "inheritance", "trust", "legacy", "heirs"),
+    "investment": ("invest", "portfolio", "stock", "etf", "growth", "allocation"),
+    "college": ("college", "529", "education", "tuition"),
+    "small_business": ("business", "entrepreneur", "self-employed", "startup"),
+    "esg": ("esg", "sustainable", "ethical", "socially responsible", "green"),
+    "insurance": ("insurance", "annuit"),
+}
+
+WEIGHTS = {"credentials": 0.20, "specialization": 0.30, "fees": 0.15, "minimum": 0.15, "distance": 0.20}
+DISTANCE_DECAY_KM = 80.0
+REMOTE_FLOOR = 0.6
+FEE_RANGE = (0.25, 2.0)
+FEE_ONLY_BONUS = 0.15
+
+CITY_COORDS = {
+    "Charlotte, NC": (35.2271, -80.8431),
+    "Raleigh, NC": (35.7796, -78.6382),
+    "New York, NY": (40.7128, -74.0060),
+    "Miami, FL": (25.7617, -80.1918),
+    "Atlanta, GA": (33.7490, -84.3880),
+    "Boston, MA": (42.3601, -71.0589),
+    "Washington, DC": (38.9072, -77.0369),
+    "Chicago, IL": (41.8781, -87.6298),
+    "Dallas, TX": (32.7767, -96.7970),
+    "Denver, CO": (39.7392, -104.9903),
+    "Los Angeles, CA": (34.0522, -118.2437),
+    "San Francisco, CA": (37.7749, -122.4194),
+    "Seattle, WA": (47.6062, -122.3321),
+}
+
+# The pre-made directory (searched and ranked by pre_made_advisor_server), with the attributes scoring needs
+ADVISORS: List[Dict[str, Any]] = [
+    {"name": "John Smith, CFP", "firm": "Smith Financial", "crd": "123456", "location": "Charlotte, NC",
+     "credentials": ["CFP"], "specializations": ["retirement", "investment"],
+     "fee_pct": 1.0, "fee_only": True, "minimum": 100_000, "remote": True},
+    {"name": "Sarah Johnson, CFA", "firm": "Johnson Wealth", "crd": "234567", "location": "Charlotte, NC",
+     "credentials": ["CFA"], "specializations": ["investment", "esg"],
+     "fee_pct": 0.85, "fee_only": True, "minimum": 250_000, "remote": False},
+    {"name": "Amanda Williams, ChFC", "firm": "Williams Advisory Group", "crd": "345789", "location": "Charlotte, NC",
+     "credentials": ["ChFC", "RICP"], "specializations": ["retirement", "insurance", "estate"],
+     "fee_pct": 1.2, "fee_only": False, "minimum": 25_000, "remote": True},
+    {"name": "Michael Brown, ChFC", "firm": "Brown Associates", "crd": "345678", "location": "New York, NY",
+     "credentials": ["ChFC"], "specializations": ["small_business", "tax", "insurance"],
+     "fee_pct": 1.1, "fee_only": False, "minimum": 50_000, "remote": True},
+    {"name": "Lisa Davis, CFP", "firm": "Davis Capital", "crd": "456789", "location": "New York, NY",
+     "credentials": ["CFP", "CPA"], "specializations": ["tax", "retirement", "estate"],
+     "fee_pct": 0.9, "fee_only": True, "minimum": 500_000, "remote": False},
+    {"name": "Robert Wilson, CFA", "firm": "Wilson Group", "crd": "567890", "location": "Miami, FL",
+     "credentials": ["CFA", "CIMA"], "specializations": ["investment", "estate"],
+     "fee_pct": 0.75, "fee_only": True, "minimum": 1_000_000, "remote": False},
+    {"name": "Jennifer Lee, CFP", "firm": "Lee Financial", "crd": "678901", "location": "Miami, FL",
+     "credentials": ["CFP"], "specializations": ["college", "retirement", "investment"],
+     "fee_pct": 1.0, "fee_only": True, "minimum": 0, "remote": True},
+]
+
+
+def _mask(values: Sequence[str], vocabulary: Sequence[str]) -> List[int]:
+    return [1 if item in values else 0 for item in vocabulary]
+
+
+def extract_needs(query: str) -> List[str]:
+    """Specializations the query asks for, in SPECIALIZATIONS order"""
+    query_lower = query.lower()
+    return [need for need in SPECIALIZATIONS if any(word in query_lower for word in NEED_KEYWORDS[need])]
+
+
+def extract_credentials(query: str) -> List[str]:
+    """Credentials named in the query ("a CFA", "CFP please")"""
+    words = set(query.replace(",", " ").replace(".", " ").split())
+    return [credential for credential in CREDENTIALS if credential in words]
+
+
+def resolve_coordinates(location: Optional[str]) -> Optional[tuple]:
+    if not location:
+        return None
+    if location in CITY_COORDS:
+        return CITY_COORDS[location]
+    resolved = extract_location(location)
+    return CITY_COORDS.get(resolved) if resolved else None
+
+
+def _haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points given in radians"""
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 6371.0 * 2 * math.asin(math.sqrt(a))
+
+
+def _ranked_advisor(position: int, advisor: Dict[str, Any], total: float, scores: Dict[str, float],
+                    distance: float) -> Dict[str, Any]:
+    return {
+        "rank": position,
+        **{key: advisor.get(key) for key in ("name", "firm", "crd", "location", "credentials",
+                                              "specializations", "fee_pct", "fee_only", "minimum", "remote")},
+        "distance_km": None if math.isnan(distance) else round(float(distance), 1),
+        "match_score": round(float(total), 1),
+        "breakdown": {name: round(float(WEIGHTS[name] * scores[name] * 100), 1) for name in WEIGHTS},
+    }
+
+
+class AdvisorMatrix:
+    """Column-wise advisor attributes; `rank` scores every advisor in one vectorized pass (needs NumPy)"""
+
+    def __init__(self, advisors: List[Dict[str, Any]]):
+        self.advisors = advisors
+        self.credentials = np.array([_mask(a.get("credentials", ()), CREDENTIALS) for a in advisors],
+                                    dtype=np.float32).reshape(len(advisors), len(CREDENTIALS))
+        self.specializations = np.array([_mask(a.get("specializations", ()), SPECIALIZATIONS) for a in advisors],
+                                        dtype=np.float32).reshape(len(advisors), len(SPECIALIZATIONS))
+        self.fee_pct = np.array([a.get("fee_pct", 1.0) for a in advisors], dtype=np.float64)
+        self.fee_only = np.array([bool(a.get("fee_only")) for a in advisors])
+        self.minimum = np.array([a.get("minimum", 0) for a in advisors], dtype=np.float64)
+        self.remote = np.array([bool(a.get("remote")) for a in advisors])
+        coords = [resolve_coordinates(a.get("location")) or (np.nan, np.nan) for a in advisors]
+        self.lat, self.lon = np.radians(np.array(coords, dtype=np.float64).reshape(len(advisors), 2)).T
+
+    def __len__(self):
+        return len(self.advisors)
+
+    def components(self, needs: Sequence[str] = (), credentials: Sequence[str] = (),
+                   amount: Optional[float] = None, coords: Optional[tuple] = None) -> Dict[str, "np.ndarray"]:
+        """Per-advisor component scores in [0, 1]"""
+        n = len(self)
+        weights = np.array(CREDENTIAL_WEIGHTS) * (1 + np.array(_mask(credentials, CREDENTIALS)))
+        credential_score = np.minimum(self.credentials @ weights / weights[:2].sum(), 1.0)
+
+        if needs:
+            wanted = np.array(_mask(needs, SPECIALIZATIONS), dtype=np.float32)
+            specialization_score = self.specializations @ wanted / wanted.sum()
+        else:
+            specialization_score = np.full(n, 0.5)
+
+        low, high = FEE_RANGE
+        fee_score = 1.0 - np.clip((self.fee_pct - low) / (high - low), 0.0, 1.0)
+        fee_score = np.minimum(fee_score + FEE_ONLY_BONUS * self.fee_only, 1.0)
+
+        if amount:
+            minimum_score = np.where(self.minimum <= amount, 1.0, amount / np.maximum(self.minimum, 1.0))
+        else:
+            minimum_score = np.where(self.minimum <= 100_000, 1.0, 0.5)
+
+        distance_km = np.full(n, np.nan)
+        if coords is not None:
+            lat, lon = np.radians(coords)
+            a = (np.sin((self.lat - lat) / 2) ** 2
+                 + np.cos(lat) * np.cos(self.lat) * np.sin((self.lon - lon) / 2) ** 2)
+            distance_km = 6371.0 * 2 * np.arcsin(np.sqrt(a))
+            distance_score = np.exp(-np.nan_to_num(distance_km, nan=np.inf) / DISTANCE_DECAY_KM)
+            distance_score = np.where(self.remote, np.maximum(distance_score, REMOTE_FLOOR), distance_score)
+        else:
+            distance_score = np.ones(n)
+
+        return {
+            "credentials": credential_score, "specialization": specialization_score, "fees": fee_score,
+            "minimum": minimum_score, "distance": distance_score, "distance_km": distance_km,
+        }
+
+    def rank(self, top_k: int = 5, **criteria) -> List[Dict[str, Any]]:
+        """Top-k advisors, best first, each with its score breakdown in points"""
+        if not len(self):
+            return []
+        parts = self.components(**criteria)
+        total = sum(WEIGHTS[name] * parts[name] for name in WEIGHTS) * 100
+        k = min(top_k, len(self))
+        top = np.argpartition(-total, k - 1)[:k]
+        top = top[np.argsort(-total[top], kind="stable")]
+
+        return [_ranked_advisor(position, self.advisors[index], total[index],
+                                {name: parts[name][index] for name in WEIGHTS}, parts["distance_km"][index])
+                for position, index in enumerate(top, 1)]
+
+
+class AdvisorList:
+    """Pure-Python AdvisorMatrix for installs without NumPy: the same scores, one advisor at a time"""
+
+    def __init__(self, advisors: List[Dict[str, Any]]):
+        self.advisors = advisors
+        self._rows = []
+        for advisor in advisors:
+            coords = resolve_coordinates(advisor.get("location"))
+            self._rows.append((
+                _mask(advisor.get("credentials", ()), CREDENTIALS),
+                _mask(advisor.get("specializations", ()), SPECIALIZATIONS),
+                advisor.get("fee_pct", 1.0), bool(advisor.get("fee_only")), advisor.get("minimum", 0),
+                bool(advisor.get("remote")), tuple(map(math.radians, coords)) if coords else None,
+            ))
+
+    def __len__(self):
+        return len(self.advisors)
+
+    def components(self, needs: Sequence[str] = (), credentials: Sequence[str] = (),
+                   amount: Optional[float] = None, coords: Optional[tuple] = None) -> Dict[str, List[float]]:
+        """Per-advisor component scores in [0, 1]"""
+        weights = [weight * (1 + asked) for weight, asked in zip(CREDENTIAL_WEIGHTS, _mask(credentials, CREDENTIALS))]
+        wanted = _mask(needs, SPECIALIZATIONS)
+        low, high = FEE_RANGE
+        origin = tuple(map(math.radians, coords)) if coords is not None else None
+        parts: Dict[str, List[float]] = {name: [] for name in (*WEIGHTS, "distance_km")}
+        for held, covered, fee_pct, fee_only, minimum, remote, location in self._rows:
+            parts["credentials"].append(min(sum(w * h for w, h in zip(weights, held)) / (weights[0] + weights[1]), 1.0))
+            parts["specialization"].append(sum(c * w for c, w in zip(covered, wanted)) / sum(wanted) if needs else 0.5)
+            fee_score = 1.0 - min(max((fee_pct - low) / (high - low), 0.0), 1.0)
+            parts["fees"].append(min(fee_score + FEE_ONLY_BONUS * fee_only, 1.0))
+            if amount:
+                parts["minimum"].append(1.0 if minimum <= amount else amount / max(minimum, 1.0))
+            else:
+                parts["minimum"].append(1.0 if minimum <= 100_000 else 0.5)
+            distance_km = math.nan
+            if origin is not None:
+                distance_score = 0.0
+                if location is not None:
+                    distance_km = _haversine_km(*origin, *location)
+                    distance_score = math.exp(-distance_km / DISTANCE_DECAY_KM)
+                parts["distance"].append(max(distance_score, REMOTE_FLOOR) if remote else distance_score)
+            else:
+                parts["distance"].append(1.0)
+            parts["distance_km"].append(distance_km)
+        return parts
+
+    def rank(self, top_k: int = 5, **criteria) -> List[Dict[str, Any]]:
+        """Top-k advisors, best first, each with its score breakdown in points"""
+        if not len(self):
+            return []
+        parts = self.components(**criteria)
+        total = [sum(WEIGHTS[name] * parts[name][index] for name in WEIGHTS) * 100 for index in range(len(self))]
+        top = heapq.nsmallest(min(top_k, len(self)), range(len(self)), key=lambda index: (-total[index], index))
+        return [_ranked_advisor(position, self.advisors[index], total[index],
+                                {name: parts[name][index] for name in WEIGHTS}, parts["distance_km"][index])
+                for position, index in enumerate(top, 1)]
+
+
+def build_ranker(advisors: List[Dict[str, Any]]) -> Union[AdvisorMatrix, AdvisorList]:
+    """AdvisorMatrix when NumPy is installed, else AdvisorList"""
+    return AdvisorMatrix(advisors) if np is not None else AdvisorList(advisors)
+
+
+def load_advisors(path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Advisor directory from a JSON list file (ADVISOR_DIRECTORY_PATH), else the pre-made one"""
+    path = path or os.getenv("ADVISOR_DIRECTORY_PATH")
+    if not path:
+        return ADVISORS
+    with open(path, encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+_matrix: Optional[Union[AdvisorMatrix, AdvisorList]] = None
+_matrix_lock = threading.Lock()
+
+
+def get_matrix() -> Union[AdvisorMatrix, AdvisorList]:
+    """Process-wide ranker, built on first use"""
+    global _matrix
+    if _matrix is None:
+        with _matrix_lock:
+            if _matrix is None:
+                _matrix = build_ranker(load_advisors())
+    return _matrix
+
+
+def rank_advisors(query: str, location: Optional[str] = None, top_k: int = 5,
+                  matrix: Optional[Union[AdvisorMatrix, AdvisorList]] = None) -> Dict[str, Any]:
+    """Rank advisors for a free-text client request; `location` overrides the one in the query"""
+    matrix = matrix or get_matrix()
+    profile = extract_profile(query)
+    location = location or profile.get("location")
+    criteria = {
+        "needs": extract_needs(query),
+        "credentials": extract_credentials(query),
+        "amount": profile.get("amount"),
+        "coords": resolve_coordinates(location),
+    }
+    started = time.perf_counter()
+    advisors = matrix.rank(top_k=top_k, **criteria)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    logger.debug("Ranked advisors", extra={"candidates": len(matrix), "top_k": top_k, "elapsed_ms": round(elapsed_ms, 2)})
+    return {
+        "profile": {**profile, "location": location} if location else profile,
+        "needs": criteria["needs"],
+        "credentials": criteria["credentials"],
+        "location_known": criteria["coords"] is not None,
+        "candidates": len(matrix),
+        "elapsed_ms": round(elapsed_ms, 3),
+        "weights": WEIGHTS,
+        "advisors": advisors,
+    }
+
+
+def generate_synthetic_advisors(n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Random advisor directory spread around CITY_COORDS, for benchmarks"""
+    rng = random.Random(seed)
+    cities = list(CITY_COORDS)
+    minimums = [0, 25_000, 50_000, 100_000, 250_000, 500_000, 1_000_000]
+    return [
+        {"name": f"Advisor {i:06d}", "firm": f"Firm {i % 997:03d}", "crd": str(700000 + i),
+         "location": rng.choice(cities),
+         "credentials": [c for c in CREDENTIALS if rng.random() < 0.3],
+         "specializations": [s for s in SPECIALIZATIONS if rng.random() < 0.35],
+         "fee_pct": round(rng.uniform(0.3, 1.8), 2), "fee_only": rng.random() < 0.5,
+         "minimum": rng.choice(minimums), "remote": rng.random() < 0.4}
+        for i in range(n)
+    ]
+
+
+def benchmark(n: int, repeats: int = 50, top_k: int = 5) -> Dict[str, Any]:
+    build_started = time.perf_counter()
+    matrix = build_ranker(generate_synthetic_advisors(n))
+    build_ms = (time.perf_counter() - build_started) * 1000
+    query = "I'm 45 in Charlotte, NC with $300,000 to invest for retirement and want help with taxes, ideally a CFP"
+    timings = []
+    for _ in range(repeats):
+        timings.append(rank_advisors(query, top_k=top_k, matrix=matrix)["elapsed_ms"])
+    timings.sort()
+    return {
+        "advisors": n, "repeats": repeats, "build_ms": round(build_ms, 1),
+        "rank_ms_p50": timings[len(timings) // 2], "rank_ms_max": timings[-1],
+        "top": rank_advisors(query, top_k=top_k, matrix=matrix)["advisors"][:3],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("query", nargs="?", help="client request to rank advisors for")
+    parser.add_argument("--location", help="override the location found in the query")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--benchmark", type=int, metavar="N", help="rank N synthetic advisors instead")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        print(json.dumps(benchmark(args.benchmark, top_k=args.top_k), indent=2))
+    elif args.query:
+        print(json.dumps(rank_advisors(args.query, args.location, args.top_k), indent=2))
+    else:
+        parser.error("give a query or --benchmark N")
+
+
+if __name__ == "__main__":
+    main()
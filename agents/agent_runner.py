@@ -0,0 +1,130 @@
+"""
+Bounded execution of blocking agent runs (smolagents CodeAgent).
+
+Runs go to a dedicated, fixed-size thread pool instead of the default
+executor. Admission is limited to `max_workers + max_queue` runs: beyond that
+new runs are rejected immediately rather than piling up. On timeout a queued
+run is cancelled outright and a running one is interrupted cooperatively
+(CodeAgent checks its interrupt switch before every step); a run still
+finishing its current step is counted as orphaned until its thread is free,
+and keeps occupying its admission slot so overload cannot leak threads.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from acp_metadata import agent_run_timeout
+
+logger = logging.getLogger("agent_runner")
+
+
+class RunnerOverloaded(Exception):
+    """Raised when the run queue is full"""
+
+
+class RunTimedOut(asyncio.TimeoutError):
+    """Raised when a run exceeds its timeout (it has been cancelled or interrupted)"""
+
+
+class BoundedAgentRunner:
+    """Fixed-size worker pool with queue-depth limits and timeout cancellation"""
+
+    def __init__(self, max_workers: int = 4, max_queue: int = 8, timeout: Optional[float] = None,
+                 name: str = "agent-run"):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        # Below the caller's timeout, so a timed-out run still answers before the caller gives up
+        self.timeout = agent_run_timeout(timeout)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self._running = 0
+        self._orphaned = 0
+        self._stats = {
+            "submitted": 0, "completed": 0, "failed": 0, "rejected": 0,
+            "timed_out": 0, "cancelled_queued": 0, "interrupted": 0, "orphaned_total": 0,
+        }
+
+    async def run(self, agent, prompt: str, timeout: Optional[float] = None) -> Any:
+        """Run `agent.run(prompt)` on the pool; raises RunnerOverloaded or RunTimedOut"""
+        with self._lock:
+            if self._admitted >= self.max_workers + self.max_queue:
+                self._stats["rejected"] += 1
+                raise RunnerOverloaded(
+                    f"{self._admitted} runs in progress or queued (limit {self.max_workers + self.max_queue})"
+                )
+            self._admitted += 1
+            self._stats["submitted"] += 1
+
+        timeout = agent_run_timeout(timeout or self.timeout)
+        state = {"started": None, "timed_out": False}
+        future = self._executor.submit(self._invoke, agent, prompt, state)
+        future.add_done_callback(lambda f: self._on_done(f, state))
+        result = asyncio.wrap_future(future)
+        try:
+            return await asyncio.wait_for(asyncio.shield(result), timeout)
+        except asyncio.TimeoutError:
+            # The abandoned run's outcome (usually an interrupt error) is intentionally dropped
+            result.add_done_callback(lambda f: f.cancelled() or f.exception())
+            self._on_timeout(agent, future, state)
+            raise RunTimedOut(f"Agent run exceeded {timeout:.0f}s")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                **self._stats,
+                "running": self._running,
+                "queued": max(self._admitted - self._running, 0),
+                "orphaned": self._orphaned,
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _invoke(self, agent, prompt: str, state: Dict[str, Any]):
+        with self._lock:
+            self._running += 1
+            state["started"] = time.monotonic()
+        return agent.run(prompt)
+
+    def _on_timeout(self, agent, future, state: Dict[str, Any]):
+        with self._lock:
+            state["timed_out"] = True
+            self._stats["timed_out"] += 1
+            started = state["started"] is not None
+        if not started and future.cancel():
+            with self._lock:
+                self._stats["cancelled_queued"] += 1
+            logger.warning("Queued agent run cancelled on timeout")
+            return
+
+        interrupt = getattr(agent, "interrupt", None)
+        if callable(interrupt):
+            interrupt()
+        with self._lock:
+            self._stats["interrupted"] += 1
+            if not future.done():
+                self._orphaned += 1
+                self._stats["orphaned_total"] += 1
+                state["orphaned"] = True
+        logger.warning("Agent run interrupted on timeout", extra={"orphaned_runs": self._orphaned})
+
+    def _on_done(self, future, state: Dict[str, Any]):
+        with self._lock:
+            self._admitted -= 1
+            if state["started"] is not None:
+                self._running -= 1
+            if state.get("orphaned"):
+                self._orphaned -= 1
+            if future.cancelled() or state["timed_out"]:
+                return
+            if future.exception() is not None:
+                self._stats["failed"] += 1
+            else:
+                self._stats["completed"] += 1
@@ -1,17 +1,35 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Request, request, jsonify, g
 from flask_cors import CORS
 import asyncio
 import nest_asyncio
-from acp_sdk.client import Client
 from fastacp import AgentCollection, ACPCallingAgent
-from smolagents import LiteLLMModel
 import os
 from dotenv import load_dotenv
 import threading
+import time
 from concurrent.futures import ThreadPoolExecutor
 from werkzeug.utils import secure_filename
+from werkzeug.exceptions import RequestEntityTooLarge
 import os
+import logging
 from pathlib import Path
+from structured_logging import setup_logging, set_request_id, get_request_id
+from document_catalog import DocumentCatalog, build_document_context
+from chunk_store import forget_document, ingest_document
+from namespaces import (InvalidNamespace, MissingNamespace, NamespaceRegistry, migrate_legacy_uploads,
+                        namespace_directory, normalize_namespace)
+from upload_manager import UploadManager, UploadTooLarge, UploadNotFound, UploadConflict
+from conversation_store import ConversationStore
+from market_briefs import BriefStore, MarketBriefService, load_topics
+from semantic_cache import SemanticAnswerCache, build_embedder
+from response_schema import ReportStore, parse_report, summary_view
+from http_compression import ResponseCompressor
+from job_queue import InvalidCallbackURL, JobNotFound, JobQueue, JobStore, job_view
+from admission import AdmissionController, AdmissionRejected, ClientRateLimiter, RateLimited, parse_limits
+from worker_pool import WorkerRegistry, start_publishing
+from acp_clients import ACPClientPool
+from debug_tools import DebugEndpoints
+from loop_monitor import loop_stats, monitor_loop
 
 # Add this after your existing imports
 UPLOAD_FOLDER = './uploads'
@@ -19,140 +37,586 @@ ALLOWED_EXTENSIONS = {'txt', 'pdf', 'doc', 'docx'}
 
 # Create uploads directory if it doesn't exist
 Path(UPLOAD_FOLDER).mkdir(exist_ok=True)
+# Files uploaded before namespaces lived in the uploads root; they belong to the default namespace
+migrate_legacy_uploads(UPLOAD_FOLDER)
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 load_dotenv()
 nest_asyncio.apply()
+setup_logging()
+logger = logging.getLogger("api_server")
+
+# Token budget for the uploaded-documents note appended to chat queries
+DOCUMENT_CONTEXT_TOKEN_BUDGET = int(os.getenv('DOCUMENT_CONTEXT_TOKEN_BUDGET', '200'))
+DOCUMENT_CONTEXT_MAX_DOCS = int(os.getenv('DOCUMENT_CONTEXT_MAX_DOCS', '5'))
+FILES_PAGE_LIMIT = 200
+NAMESPACE_IDLE_SECONDS = float(os.getenv('NAMESPACE_IDLE_SECONDS', '900'))
+
+# Set by worker_pool.py for each worker process; unset for a single process
+WORKER_INDEX = int(os.environ['API_WORKER_INDEX']) if os.getenv('API_WORKER_INDEX') else None
+WORKER_COUNT = max(int(os.getenv('API_WORKERS', '1')), 1)
+# Only the leader runs periodic background work (market brief refresh)
+IS_LEADER = WORKER_INDEX in (None, 0)
+
+def per_worker(limit, minimum=1):
+    """Share of a pool-wide limit for one worker process"""
+    return max(-(-limit // WORKER_COUNT), minimum)
+
+# Upload limits and processing pool
+MAX_UPLOAD_BYTES = int(os.getenv('MAX_UPLOAD_MB', '50')) * 1024 * 1024
+MAX_REQUEST_BYTES = int(os.getenv('MAX_UPLOAD_REQUEST_MB', '200')) * 1024 * 1024
+UPLOAD_CHUNK_BYTES = int(os.getenv('UPLOAD_CHUNK_KB', '1024')) * 1024
+UPLOAD_WORKERS = int(os.getenv('UPLOAD_WORKERS', '4'))
+
+upload_manager = UploadManager(
+    UPLOAD_FOLDER,
+    max_file_bytes=MAX_UPLOAD_BYTES,
+    chunk_size=UPLOAD_CHUNK_BYTES,
+    workers=UPLOAD_WORKERS
+)
+
+# One catalog per user/session namespace, kept current by upload/delete events,
+# loaded on first use and evicted when idle
+document_catalogs = NamespaceRegistry(
+    lambda namespace: DocumentCatalog(namespace_directory(UPLOAD_FOLDER, namespace)),
+    idle_seconds=NAMESPACE_IDLE_SECONDS
+)
+
+# Requests without a session id are rejected unless this names a namespace for them
+# (e.g. ANONYMOUS_NAMESPACE=default for a single-user deployment)
+ANONYMOUS_NAMESPACE = os.getenv('ANONYMOUS_NAMESPACE') or None
+
+def get_request_namespace():
+    """Namespace for the current request: X-Session-ID header, then session_id field/param"""
+    namespace = request.headers.get('X-Session-ID') or request.values.get('session_id')
+    if not namespace and request.is_json:
+        namespace = (request.get_json(silent=True) or {}).get('session_id')
+    if not namespace:
+        if ANONYMOUS_NAMESPACE is None:
+            raise MissingNamespace("A session id is required (X-Session-ID header or session_id field)")
+        namespace = ANONYMOUS_NAMESPACE
+    return normalize_namespace(namespace)
+
+# Conversation memory: bounded LRU of sessions, optionally spilled to SQLite
+# (with several workers the SQLite file is required and shared by all of them)
+CONVERSATION_CONTEXT_CHARS = int(os.getenv('CONVERSATION_CONTEXT_CHARS', '1500'))
+conversation_store = ConversationStore(
+    max_sessions=int(os.getenv('CONVERSATION_MAX_SESSIONS', '10000')),
+    max_turns=int(os.getenv('CONVERSATION_MAX_TURNS', '6')),
+    spill_path=os.getenv('CONVERSATION_SPILL_PATH') or ('./conversations.sqlite3' if WORKER_COUNT > 1 else None),
+    shared=WORKER_COUNT > 1
+)
+
+# Market briefs precomputed in the background and served stale-while-revalidate
+market_brief_service = None
+if os.getenv('MARKET_BRIEFS_ENABLED', '1').lower() in ('1', 'true', 'yes'):
+    market_brief_service = MarketBriefService(
+        BriefStore(os.getenv('MARKET_BRIEF_DB', './market_briefs.sqlite3')),
+        load_topics(os.getenv('MARKET_BRIEF_TOPICS_FILE') or None),
+        refresh_seconds=float(os.getenv('MARKET_BRIEF_REFRESH_SECONDS', '3600')),
+        max_stale_seconds=float(os.getenv('MARKET_BRIEF_MAX_STALE_SECONDS', '21600'))
+    )
+
+# Semantic answer cache: paraphrased first-turn questions with the same parameters
+# (amount, location, risk, horizon, ...) reuse a stored answer
+answer_cache = None
+if os.getenv('SEMANTIC_CACHE_ENABLED', '1').lower() in ('1', 'true', 'yes'):
+    answer_cache = SemanticAnswerCache(
+        threshold=float(os.getenv('SEMANTIC_CACHE_THRESHOLD', '0.8')),
+        ttl_seconds=float(os.getenv('SEMANTIC_CACHE_TTL_SECONDS', '86400')),
+        agent_ttls={'market_researcher': float(os.getenv('SEMANTIC_CACHE_MARKET_TTL_SECONDS', '3600'))},
+        max_entries=int(os.getenv('SEMANTIC_CACHE_MAX_ENTRIES', '5000')),
+        embedder=build_embedder(os.getenv('SEMANTIC_CACHE_MODEL') or None),
+        path=os.getenv('SEMANTIC_CACHE_DB') or ('./answer_cache.sqlite3' if WORKER_COUNT > 1 else None),
+        documents_version=lambda namespace: document_catalogs.get(namespace).fingerprint()
+    )
+
+# Asynchronous chat jobs, persisted so results survive a restart
+JOB_DB = os.getenv('JOB_DB', './jobs.sqlite3')
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+JOB_RETENTION_SECONDS = float(os.getenv('JOB_RETENTION_HOURS', '168')) * 3600
+JOB_LEASE_SECONDS = float(os.getenv('JOB_LEASE_SECONDS', '30'))
+# Comma-separated hosts allowed to receive job callbacks; empty = any public host
+JOB_CALLBACK_ALLOWED_HOSTS = [host.strip() for host in os.getenv('JOB_CALLBACK_ALLOWED_HOSTS', '').split(',') if host.strip()]
+
+# Admission control: per-agent concurrency, priority queueing, per-client rate limits.
+# Limits are pool-wide; each worker enforces its share
+admission_controller = AdmissionController(
+    limits={agent: per_worker(limit) for agent, limit in parse_limits(
+        os.getenv('AGENT_CONCURRENCY', 'investment_agent=2,advisor_finder=2,market_researcher=4')).items()},
+    default_limit=per_worker(int(os.getenv('AGENT_DEFAULT_CONCURRENCY', '2'))),
+    max_queue=per_worker(int(os.getenv('AGENT_MAX_QUEUE', '20'))),
+    max_wait=float(os.getenv('AGENT_MAX_QUEUE_WAIT_SECONDS', '30'))
+)
+client_rate_limiter = ClientRateLimiter(
+    rate_per_minute=float(os.getenv('CLIENT_RATE_PER_MINUTE', '30')) / WORKER_COUNT,
+    burst=per_worker(int(os.getenv('CLIENT_RATE_BURST', '10')))
+)
+# Caps everything one remote address sends, whatever client ids it claims;
+# a multiple of the client limit so clients sharing a NAT or proxy still get their own share
+CLIENT_ADDRESS_RATE_FACTOR = float(os.getenv('CLIENT_ADDRESS_RATE_FACTOR', '4'))
+address_rate_limiter = ClientRateLimiter(
+    rate_per_minute=client_rate_limiter.rate * 60 * CLIENT_ADDRESS_RATE_FACTOR,
+    burst=max(int(client_rate_limiter.burst * CLIENT_ADDRESS_RATE_FACTOR), 1)
+)
+
+def check_client_rate():
+    """
+    Spend one token from the remote address's bucket, then from the client's bucket
+    within that address (X-Client-ID only subdivides an address, so rotating ids gains nothing)
+    """
+    address = request.remote_addr or 'unknown'
+    address_rate_limiter.check(address)
+    client_rate_limiter.check(f"{address}/{request.headers.get('X-Client-ID', '')[:64]}")
+
+def overloaded_response(error, status):
+    response = jsonify({'error': str(error), 'retry_after': round(error.retry_after, 1)})
+    response.headers['Retry-After'] = str(max(int(error.retry_after + 0.999), 1))
+    return response, status
+
+class StreamingUploadRequest(Request):
+    """Write multipart file parts straight to hashed staging files instead of spooling them"""
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return upload_manager.open_staging_file()
 
 app = Flask(__name__)
+app.request_class = StreamingUploadRequest
+app.config['MAX_CONTENT_LENGTH'] = MAX_REQUEST_BYTES
 CORS(app)
 
-# Initialize the model
-model = LiteLLMModel(
-    model_id="anthropic/claude-sonnet-4-20250514",
-    api_key=os.getenv("ANTHROPIC_API_KEY")
+# gzip/brotli for JSON responses, negotiated from Accept-Encoding
+response_compressor = ResponseCompressor(min_bytes=int(os.getenv('COMPRESS_MIN_BYTES', '1024')))
+if os.getenv('COMPRESSION_ENABLED', '1').lower() in ('1', 'true', 'yes'):
+    response_compressor.init_app(app)
+
+# Parsed chat reports, so clients can fetch the summary first and sections on demand
+CHAT_FORMATS = ('text', 'structured', 'summary')
+report_store = ReportStore(
+    max_reports=int(os.getenv('REPORT_STORE_MAX', '2000')),
+    path=os.getenv('REPORT_STORE_DB') or ('./reports.sqlite3' if WORKER_COUNT > 1 else None)
 )
 
+@app.before_request
+def bind_request_id():
+    """Attach a correlation id to every request (honours an incoming X-Request-ID)"""
+    g.request_id = set_request_id(request.headers.get('X-Request-ID'))
+    # Covers WSGI servers that import `app` without running __main__
+    start_agent_initialization()
+
+@app.after_request
+def expose_request_id(response):
+    response.headers['X-Request-ID'] = g.get('request_id', get_request_id())
+    return response
+
 # Global variables
 acp_agent = None
+client_pool = None
+_agent_init_lock = None
 main_loop = None
+model = None
 executor = ThreadPoolExecutor(max_workers=1)
+_loop_lock = threading.Lock()
+
+# ACP servers and the keep-alive pool of clients to them (rebuilt and swapped on re-initialization)
+ACP_ENDPOINTS = [url.strip() for url in os.getenv('ACP_ENDPOINTS', 'http://localhost:8000,http://localhost:8001').split(',') if url.strip()]
+ACP_MAX_CONNECTIONS = int(os.getenv('ACP_MAX_CONNECTIONS', '20'))
+ACP_MAX_KEEPALIVE = int(os.getenv('ACP_MAX_KEEPALIVE', '10'))
+ACP_KEEPALIVE_SECONDS = float(os.getenv('ACP_KEEPALIVE_SECONDS', '60'))
+ACP_WARM_CONNECTIONS = int(os.getenv('ACP_WARM_CONNECTIONS', '2'))
+ACP_DRAIN_SECONDS = float(os.getenv('ACP_DRAIN_SECONDS', '120'))
+
+# Agents are initialized in the background at startup (and retried until they are up)
+AUTO_INITIALIZE_AGENTS = os.getenv('AUTO_INITIALIZE_AGENTS', '1').lower() in ('1', 'true', 'yes')
+AGENT_INIT_RETRY_SECONDS = float(os.getenv('AGENT_INIT_RETRY_SECONDS', '5'))
+AGENT_INIT_WAIT_SECONDS = float(os.getenv('AGENT_INIT_WAIT_SECONDS', '10'))
+agents_ready = threading.Event()
+startup_state = {'auto_initialize': AUTO_INITIALIZE_AGENTS, 'init_attempts': 0, 'initialized_in_s': None}
+_init_started = False
+
+def get_model():
+    """LiteLLM model for the orchestrator, built (and smolagents imported) on first use"""
+    global model
+    if model is None:
+        from smolagents import LiteLLMModel
+        model = LiteLLMModel(
+            model_id="anthropic/claude-sonnet-4-20250514",
+            api_key=os.getenv("ANTHROPIC_API_KEY")
+        )
+    return model
 
-def start_event_loop():
+def start_event_loop(ready):
     """Start the main event loop in a separate thread"""
     global main_loop
     main_loop = asyncio.new_event_loop()
     asyncio.set_event_loop(main_loop)
+    monitor_loop(main_loop, 'agent-loop')
+    main_loop.call_soon(ready.set)
     main_loop.run_forever()
 
-# Start the event loop thread
-loop_thread = threading.Thread(target=start_event_loop, daemon=True)
-loop_thread.start()
+def ensure_event_loop():
+    """Start the event loop thread on first use"""
+    if main_loop is not None:
+        return main_loop
+    with _loop_lock:
+        if main_loop is None:
+            ready = threading.Event()
+            threading.Thread(target=start_event_loop, args=(ready,), name="agent-loop", daemon=True).start()
+            ready.wait()
+    return main_loop
 
 async def initialize_agents_async():
-    """Initialize the ACP agents"""
-    global acp_agent
-    
-    try:
-        # Create persistent clients
-        financial_client = Client(base_url="http://localhost:8000")
-        market_client = Client(base_url="http://localhost:8001")
-        
-        # Start the clients
-        await financial_client.__aenter__()
-        await market_client.__aenter__()
-        
-        # Create agent collection
-        agent_collection = await AgentCollection.from_acp(financial_client, market_client)
-        acp_agents = {agent.name: {'agent': agent, 'client': client} for client, agent in agent_collection.agents}
-        
-        acp_agent = ACPCallingAgent(acp_agents=acp_agents, model=model)
-        print("✅ ACP agents initialized successfully")
-        return True
-    except Exception as e:
-        print(f"❌ Failed to initialize agents: {e}")
-        return False
+    """Initialize (or re-initialize) the ACP agents over a fresh client pool; the previous pool is drained"""
+    global acp_agent, client_pool, _agent_init_lock
+    _agent_init_lock = _agent_init_lock or asyncio.Lock()
+    async with _agent_init_lock:
+        pool = ACPClientPool(ACP_ENDPOINTS, max_connections=ACP_MAX_CONNECTIONS, max_keepalive=ACP_MAX_KEEPALIVE,
+                             keepalive_expiry=ACP_KEEPALIVE_SECONDS, warm_connections=ACP_WARM_CONNECTIONS)
+        try:
+            # Create agent collection
+            agent_collection = await AgentCollection.from_acp(*await pool.open())
+            acp_agents = {agent.name: {'agent': agent, 'client': client} for client, agent in agent_collection.agents}
+
+            previous_agent, previous_pool = acp_agent, client_pool
+            if previous_agent is not None:
+                previous_agent.stop_background_tasks()
+            acp_agent = ACPCallingAgent(acp_agents=acp_agents, model=get_model(), brief_service=market_brief_service,
+                                        admission=admission_controller, answer_cache=answer_cache, client_pool=pool)
+            client_pool = pool
+            if IS_LEADER:
+                acp_agent.start_background_tasks()
+            # Calls already running on the previous clients finish before those clients close
+            if previous_pool is not None:
+                asyncio.ensure_future(previous_pool.drain(ACP_DRAIN_SECONDS))
+            # Workers start once agents exist, so jobs recovered from the store can run
+            job_queue.start()
+            agents_ready.set()
+            logger.info("ACP agents initialized", extra={"agents": list(acp_agents.keys()), "generation": pool.generation})
+            return True
+        except Exception as e:
+            await pool.close()
+            logger.error("Failed to initialize agents", extra={"error": str(e)})
+            return False
+
+async def _with_request_id(coro, request_id):
+    """Carry the caller's correlation id into the event loop thread"""
+    set_request_id(request_id)
+    return await coro
 
 def run_async_in_loop(coro):
     """Run async function in the main event loop"""
-    future = asyncio.run_coroutine_threadsafe(coro, main_loop)
+    future = asyncio.run_coroutine_threadsafe(_with_request_id(coro, get_request_id()), ensure_event_loop())
     return future.result()
 
+async def _initialize_with_retry():
+    started = time.perf_counter()
+    delay = AGENT_INIT_RETRY_SECONDS
+    while True:
+        startup_state['init_attempts'] += 1
+        if await initialize_agents_async():
+            startup_state['initialized_in_s'] = round(time.perf_counter() - started, 3)
+            return
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 60.0)
+
+def start_agent_initialization():
+    """Initialize agents in the background once per process (no separate /api/initialize call needed)"""
+    global _init_started
+    if _init_started or not AUTO_INITIALIZE_AGENTS:
+        return
+    with _loop_lock:
+        if _init_started:
+            return
+        _init_started = True
+    asyncio.run_coroutine_threadsafe(_initialize_with_retry(), ensure_event_loop())
+
+def wait_for_agents():
+    """Give a request arriving during startup a short wait for agent initialization"""
+    if acp_agent is None and _init_started:
+        agents_ready.wait(AGENT_INIT_WAIT_SECONDS)
+    return acp_agent is not None
+
+def answer_query(query, namespace, progress=None, lane='interactive', raise_errors=False):
+    """Run one chat turn: document enhancement, conversation context, agents, memory update"""
+    # Check if we have uploaded files and enhance the query
+    enhanced_query = enhance_query_with_documents(query, namespace)
+    
+    # Bounded, summarized conversation window for this session
+    context = conversation_store.build_context(namespace, max_chars=CONVERSATION_CONTEXT_CHARS)
+    
+    # Run the agent call in the main event loop
+    response = run_async_in_loop(acp_agent.run(
+        enhanced_query, namespace=namespace, context=context, progress=progress, lane=lane, question=query,
+        raise_errors=raise_errors
+    ))
+    conversation_store.record_turn(namespace, query, response)
+    return response
+
+def run_chat_job(job, report):
+    """Job worker entry point: same pipeline as /api/chat, but a failed run fails the job"""
+    if acp_agent is None:
+        raise RuntimeError('Agents not initialized')
+    return answer_query(job['payload']['message'], job['namespace'], progress=report, lane='batch',
+                        raise_errors=True)
+
+# Running jobs are taken over only when the process that claimed them is gone (or its lease lapsed)
+job_queue = JobQueue(JobStore(JOB_DB), run_chat_job, workers=JOB_WORKERS, retention_seconds=JOB_RETENTION_SECONDS,
+                     lease_seconds=JOB_LEASE_SECONDS, callback_hosts=JOB_CALLBACK_ALLOWED_HOSTS)
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
-    """Handle chat requests from frontend with document enhancement"""
+    """
+    Handle chat requests from frontend with document enhancement.
+    `format`: "text" (markdown, default), "structured" (typed report) or
+    "summary" (report without section bodies; fetch them from /api/chat/responses/<id>)
+    """
     try:
         data = request.get_json()
         query = data.get('message', '')
         service = data.get('service', 'all')
+        response_format = data.get('format') or request.args.get('format', 'text')
         
         if not query.strip():
             return jsonify({'error': 'Empty message'}), 400
+        if response_format not in CHAT_FORMATS:
+            return jsonify({'error': f"format must be one of {', '.join(CHAT_FORMATS)}"}), 400
         
-        if acp_agent is None:
+        if not wait_for_agents():
             return jsonify({'error': 'Agents not initialized. Please initialize agents first.'}), 500
         
-        # Check if we have uploaded files and enhance the query
-        enhanced_query = enhance_query_with_documents(query)
+        check_client_rate()
+        namespace = get_request_namespace()
+        response = answer_query(query, namespace)
         
-        # Run the agent call in the main event loop
-        response = run_async_in_loop(acp_agent.run(enhanced_query))
+        if response_format == 'text':
+            return jsonify({
+                'response': response,
+                'service': service,
+                'session_id': namespace,
+                'timestamp': '12:00 PM'
+            })
         
+        report = parse_report(response)
+        response_id = report_store.put(report, namespace)
         return jsonify({
-            'response': response,
+            'report': report if response_format == 'structured' else summary_view(report),
+            'response_id': response_id,
+            'sections_url': f"/api/chat/responses/{response_id}/sections/",
+            'format': response_format,
             'service': service,
-            'timestamp': '12:00 PM'
+            'session_id': namespace
         })
-            
+    
+    except RateLimited as e:
+        return overloaded_response(e, 429)
+    except AdmissionRejected as e:
+        return overloaded_response(e, 503)
+    except InvalidNamespace as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        print(f"Error in chat endpoint: {e}")
+        logger.exception("Error in chat endpoint")
         return jsonify({'error': f'Internal server error: {str(e)}'}), 500
 
-def enhance_query_with_documents(query):
-    """Enhance query with context from uploaded documents"""
-    upload_dir = Path(UPLOAD_FOLDER)
-    
-    # Check if uploads directory exists and has files
-    if upload_dir.exists() and any(upload_dir.iterdir()):
-        file_list = [f.name for f in upload_dir.iterdir() if f.is_file()]
+@app.route('/api/chat/responses/<response_id>', methods=['GET'])
+def chat_report(response_id):
+    """Full typed report of an earlier chat response of this session"""
+    try:
+        report = report_store.get(response_id, get_request_namespace())
+    except InvalidNamespace as e:
+        return jsonify({'error': str(e)}), 400
+    if report is None:
+        return jsonify({'error': 'Response not found or expired'}), 404
+    return jsonify({'response_id': response_id, 'report': report})
+
+@app.route('/api/chat/responses/<response_id>/sections/<section_id>', methods=['GET'])
+def chat_report_section(response_id, section_id):
+    """One detail section of an earlier chat response of this session"""
+    try:
+        section = report_store.section(response_id, section_id, get_request_namespace())
+    except InvalidNamespace as e:
+        return jsonify({'error': str(e)}), 400
+    if section is None:
+        return jsonify({'error': 'Section not found or expired'}), 404
+    return jsonify({'response_id': response_id, 'section': section})
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """Queue a chat query and return its job id at once: {"message", "service"?, "callback_url"?}"""
+    try:
+        data = request.get_json() or {}
+        query = data.get('message', '')
+        callback_url = data.get('callback_url') or None
         
-        if file_list:
-            # Add context about available documents to the query
-            file_context = f"\\n\\nAvailable uploaded documents: {', '.join(file_list)}. Please analyze these documents if they're relevant to the user's question about: {query}"
-            enhanced_query = query + file_context
-            return enhanced_query
-    
-    return query
+        if not query.strip():
+            return jsonify({'error': 'Empty message'}), 400
+        if not wait_for_agents():
+            return jsonify({'error': 'Agents not initialized. Please initialize agents first.'}), 500
+        
+        check_client_rate()
+        namespace = get_request_namespace()
+        job = job_queue.submit(
+            namespace,
+            {'message': query, 'service': data.get('service', 'all')},
+            callback_url=callback_url,
+            request_id=get_request_id()
+        )
+        response = jsonify({**job_view(job), 'status_url': f"/api/jobs/{job['id']}"})
+        response.headers['Location'] = f"/api/jobs/{job['id']}"
+        return response, 202
+    except RateLimited as e:
+        return overloaded_response(e, 429)
+    except (InvalidNamespace, InvalidCallbackURL) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.exception("Error submitting job")
+        return jsonify({'error': f'Internal server error: {str(e)}'}), 500
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    """Most recent jobs of the session"""
+    try:
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+        jobs = job_queue.store.list(get_request_namespace(), limit)
+        return jsonify({'jobs': [job_view(job) for job in jobs], 'count': len(jobs)})
+    except InvalidNamespace as e:
+        return jsonify({'error': str(e)}), 400
+
+def get_session_job(job_id):
+    """Job of the requesting session; another session's job is reported as not found"""
+    job = job_queue.store.get(job_id)
+    if job['namespace'] != get_request_namespace():
+        raise JobNotFound(job_id)
+    return job
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Status, stage and progress of a job; the response once it has succeeded"""
+    try:
+        return jsonify(job_view(get_session_job(job_id)))
+    except JobNotFound:
+        return jsonify({'error': 'Job not found'}), 404
+    except InvalidNamespace as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancel a job of this session that has not started yet"""
+    try:
+        get_session_job(job_id)
+        if not job_queue.cancel(job_id):
+            return jsonify({'error': 'Job already started or finished', **job_view(job_queue.store.get(job_id))}), 409
+        return jsonify(job_view(job_queue.store.get(job_id)))
+    except JobNotFound:
+        return jsonify({'error': 'Job not found'}), 404
+    except InvalidNamespace as e:
+        return jsonify({'error': str(e)}), 400
 
-def get_uploaded_files_list():
+def enhance_query_with_documents(query, namespace=None):
+    """Enhance query with the namespace's most relevant uploaded documents, within the token budget"""
+    file_context = build_document_context(
+        document_catalogs.get(namespace),
+        query,
+        token_budget=DOCUMENT_CONTEXT_TOKEN_BUDGET,
+        max_documents=DOCUMENT_CONTEXT_MAX_DOCS
+    )
+    return query + file_context if file_context else query
+
+def get_uploaded_files_list(namespace=None):
     """Get list of uploaded files for reference"""
-    upload_dir = Path(UPLOAD_FOLDER)
-    if upload_dir.exists():
-        return [f.name for f in upload_dir.iterdir() if f.is_file()]
-    return []
+    return document_catalogs.get(namespace).names()
 
 @app.route('/api/files', methods=['GET'])
 def list_uploaded_files():
-    """Get list of uploaded files"""
+    """Get a page of uploaded files (newest first)"""
     try:
-        files = get_uploaded_files_list()
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        limit = min(max(request.args.get('limit', 50, type=int), 1), FILES_PAGE_LIMIT)
+        namespace = get_request_namespace()
+        upload_dir = namespace_directory(UPLOAD_FOLDER, namespace)
+        records, total = document_catalogs.get(namespace).list_page(offset, limit)
         return jsonify({
-            'files': files,
-            'count': len(files)
+            'session_id': namespace,
+            'files': [record.name for record in records],
+            'details': [
+                {**record.to_dict(), 'processing': upload_manager.processing_status(upload_dir / record.name)}
+                for record in records
+            ],
+            'count': len(records),
+            'total': total,
+            'offset': offset,
+            'limit': limit
         })
+    except InvalidNamespace as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+@app.route('/api/files/<filename>', methods=['DELETE'])
+def delete_uploaded_file(filename):
+    """Delete an uploaded file and drop it from the catalog"""
+    try:
+        namespace = get_request_namespace()
+        filename = secure_filename(filename)
+        filepath = namespace_directory(UPLOAD_FOLDER, namespace) / filename
+        if not filename or not filepath.is_file():
+            return jsonify({'error': 'File not found'}), 404
+        filepath.unlink()
+        document_catalogs.get(namespace).remove(filename)
+        upload_manager.forget(filepath.parent, filename)
+        forget_document(filepath)
+        return jsonify({'status': 'success', 'deleted': filename})
+    except InvalidNamespace as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.exception("Error deleting file")
+        return jsonify({'error': f'Delete failed: {str(e)}'}), 500
     
+def worker_stats():
+    """This process's stats (also published to the worker registry)"""
+    return {
+        'agents_initialized': acp_agent is not None,
+        'startup': startup_state,
+        'agent_calls': acp_agent.get_stats() if acp_agent is not None else None,
+        'namespaces': document_catalogs.stats(),
+        'conversations': conversation_store.stats(),
+        'jobs': job_queue.stats(),
+        'admission': admission_controller.stats(),
+        'rate_limits': {**client_rate_limiter.stats(), 'addresses': address_rate_limiter.stats()},
+        'event_loop': loop_stats()
+    }
+
+# Every worker of a pool publishes its stats so any of them can report the whole pool
+worker_registry = None
+if WORKER_COUNT > 1:
+    worker_registry = WorkerRegistry(os.getenv('WORKER_REGISTRY_DB', './workers.sqlite3'))
+    start_publishing(worker_registry, WORKER_INDEX or 0, worker_stats,
+                     interval=float(os.getenv('WORKER_STATS_INTERVAL_SECONDS', '5')))
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
+    """Health check endpoint (`pool` aggregates all API workers)"""
     return jsonify({
         'status': 'healthy',
-        'agents_initialized': acp_agent is not None
+        **worker_stats(),
+        'compression': response_compressor.stats(),
+        'worker': {'index': WORKER_INDEX, 'pid': os.getpid(), 'workers': WORKER_COUNT, 'leader': IS_LEADER},
+        'pool': worker_registry.summary() if worker_registry is not None else None
     })
 
+# Profiler, asyncio task dump and thread-pool occupancy; disabled unless DEBUG_TOKEN is set
+debug_endpoints = DebugEndpoints(os.getenv('DEBUG_TOKEN'),
+                                 loops=lambda: [main_loop] if main_loop is not None else [],
+                                 executors=lambda: {'orchestrator': executor})
+
+@app.route('/api/debug/<path:action>', methods=['GET', 'POST'])
+def debug_action(action):
+    """Token-guarded diagnostics (see debug_tools)"""
+    status, content_type, body, filename = debug_endpoints.handle(
+        request.method, action, request.args.to_dict(), request.headers.get('X-Debug-Token'))
+    headers = {'Content-Disposition': f'attachment; filename="{filename}"'} if filename else {}
+    return app.response_class(body, status=status, content_type=content_type, headers=headers)
+
 @app.route('/api/initialize', methods=['POST'])
 def initialize():
     """Initialize agents endpoint"""
@@ -163,7 +627,7 @@ def initialize():
         else:
             return jsonify({'status': 'error', 'message': 'Failed to initialize agents'}), 500
     except Exception as e:
-        print(f"Error initializing agents: {e}")
+        logger.exception("Error initializing agents")
         return jsonify({'status': 'error', 'message': f'Initialization failed: {str(e)}'}), 500
 
 @app.route('/api/upload', methods=['POST'])
@@ -173,45 +637,119 @@ def upload_files():
         if 'file0' not in request.files:
             return jsonify({'error': 'No files provided'}), 400
         
+        namespace = get_request_namespace()
+        catalog = document_catalogs.get(namespace)
+        upload_dir = namespace_directory(UPLOAD_FOLDER, namespace)
+        upload_dir.mkdir(parents=True, exist_ok=True)
+        
         uploaded_files = []
+        details = []
         file_index = 0
         
         while f'file{file_index}' in request.files:
             file = request.files[f'file{file_index}']
             
             if file and file.filename and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                filepath = os.path.join(UPLOAD_FOLDER, filename)
-                file.save(filepath)
-                uploaded_files.append(filename)
+                # The part was already streamed to a hashed staging file while parsing
+                stored = upload_manager.commit(file.stream, upload_dir, secure_filename(file.filename))
+                uploaded_files.append(stored.name)
+                details.append(stored.to_dict())
                 
-                # Process file for knowledge base
-                try:
-                    process_uploaded_file(filepath)
-                    print(f"✅ Processed {filename} for knowledge base")
-                except Exception as e:
-                    print(f"⚠️ Failed to process {filename}: {e}")
+                if not stored.duplicate_of:
+                    catalog.add(stored.path, stored.sha256)
+                    # Process file for knowledge base on the worker pool
+                    upload_manager.submit_processing(stored.path, process_uploaded_file)
                 
             file_index += 1
         
         if uploaded_files:
             return jsonify({
                 'status': 'success',
+                'session_id': namespace,
                 'uploaded_files': uploaded_files,
-                'message': f'Successfully uploaded and processed {len(uploaded_files)} files'
+                'details': details,
+                'message': f'Successfully uploaded {len(uploaded_files)} files; processing continues in the background'
             })
         else:
             return jsonify({'error': 'No valid files uploaded'}), 400
-            
+    
+    except UploadTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+    except RequestEntityTooLarge:
+        return jsonify({'error': f'Upload request exceeds {MAX_REQUEST_BYTES // (1024 * 1024)} MB'}), 413
+    except InvalidNamespace as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        print(f"Error in file upload: {e}")
+        logger.exception("Error in file upload")
         return jsonify({'error': f'Upload failed: {str(e)}'}), 500
 
+@app.route('/api/uploads/resumable', methods=['POST'])
+def create_resumable_upload():
+    """Start a resumable upload: {"filename": ..., "size": bytes}"""
+    try:
+        data = request.get_json() or {}
+        filename = secure_filename(data.get('filename', ''))
+        if not filename or not allowed_file(filename):
+            return jsonify({'error': 'Unsupported or missing filename'}), 400
+        namespace = get_request_namespace()
+        session = upload_manager.create_session(
+            namespace_directory(UPLOAD_FOLDER, namespace), filename, int(data.get('size', 0)), owner=namespace
+        )
+        return jsonify({**session, 'session_id': namespace}), 201
+    except UploadTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+    except (InvalidNamespace, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/uploads/resumable/<upload_id>', methods=['GET'])
+def resumable_upload_status(upload_id):
+    """Bytes received so far, to resume after a dropped connection"""
+    try:
+        return jsonify(upload_manager.session_status(upload_id, get_request_namespace()))
+    except UploadNotFound:
+        return jsonify({'error': 'Upload not found'}), 404
+    except InvalidNamespace as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/uploads/resumable/<upload_id>', methods=['PUT'])
+def upload_resumable_chunk(upload_id):
+    """Append a raw chunk starting at ?offset=N"""
+    try:
+        offset = request.args.get('offset', type=int)
+        if offset is None:
+            return jsonify({'error': 'Missing offset'}), 400
+        namespace = get_request_namespace()
+        return jsonify(upload_manager.append_chunk(upload_id, offset, request.stream, owner=namespace))
+    except UploadNotFound:
+        return jsonify({'error': 'Upload not found'}), 404
+    except UploadConflict as e:
+        return jsonify({'error': str(e), **upload_manager.session_status(upload_id, namespace)}), 409
+    except UploadTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+    except InvalidNamespace as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/uploads/resumable/<upload_id>/complete', methods=['POST'])
+def complete_resumable_upload(upload_id):
+    """Finish a resumable upload and queue it for processing"""
+    try:
+        stored = upload_manager.complete_session(upload_id, owner=get_request_namespace())
+        namespace = stored.path.parent.name
+        if not stored.duplicate_of:
+            document_catalogs.get(namespace).add(stored.path, stored.sha256)
+            upload_manager.submit_processing(stored.path, process_uploaded_file)
+        return jsonify({'status': 'success', 'session_id': namespace, **stored.to_dict()})
+    except UploadNotFound:
+        return jsonify({'error': 'Upload not found'}), 404
+    except UploadConflict as e:
+        return jsonify({'error': str(e)}), 409
+    except InvalidNamespace as e:
+        return jsonify({'error': str(e)}), 400
+
 def process_uploaded_file(filepath):
-    """Process uploaded file and add to knowledge base"""
-    # This function will extract text and add to your vector database
-    # Implementation depends on your specific vector_database.py setup
-    pass
+    """Chunk the upload's text into its namespace's chunk store for knowledge search"""
+    chunks = ingest_document(filepath)
+    logger.debug("Upload chunked", extra={"upload": Path(filepath).name, "chunks": chunks})
 
 if __name__ == '__main__':
     print("🚀 Starting Financial Advisory API Server...")
@@ -219,5 +757,10 @@ if __name__ == '__main__':
     print("   - Terminal 1: python crewai_agent.py (port 8000)")
     print("   - Terminal 2: python smolagent_agent.py (port 8001)")
     print("\n🌐 API Server starting on http://localhost:5001")
+    print("   (single process; use `python worker_pool.py --workers N` for multiple workers)")
     
-    app.run(debug=True, host='0.0.0.0', port=5001, threaded=True)
\ No newline at end of file
+    # The debug reloader is opt-in; with it only the serving child process initializes agents
+    debug = os.getenv('API_DEBUG', '0').lower() in ('1', 'true', 'yes')
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_agent_initialization()
+    app.run(debug=debug, host='0.0.0.0', port=5001, threaded=True)
\ No newline at end of file
@@ -0,0 +1,304 @@
+"""
+End-to-end benchmark: api_server -> ACPCallingAgent -> ACP servers -> tools.
+
+The real services are started as subprocesses in a scratch directory, with
+every LLM call going to the deterministic fake LLM (fake_llm.py), so the run
+is offline and repeatable on one machine. Each endpoint is driven at each
+concurrency level. Throughput and p50/p95/p99 latency are reported, and can be
+compared against a stored baseline.
+
+    python benchmark_e2e.py --concurrency 1,4,16 --requests 32 --llm-latency-ms 200
+    python benchmark_e2e.py --save-baseline bench_baseline.json
+    python benchmark_e2e.py --baseline bench_baseline.json --tolerance 0.2 --fail-on-regression
+
+The ACP servers use their fixed ports (8000 and 8001), so those must be free.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fake_llm import FakeLLM, serve_fake_llm
+
+AGENTS_DIR = Path(__file__).resolve().parent
+ACP_PORTS = (8000, 8001)
+
+CHAT_QUERIES = {
+    "chat_investment": "I want to invest $50,000 in a balanced portfolio for retirement",
+    "chat_advisor": "Find me a financial advisor in Charlotte, NC who specializes in retirement planning",
+    "chat_market": "Research current renewable energy investment trends",
+}
+ENDPOINTS = ("health", "files", "chat_investment", "chat_advisor", "chat_market", "job_investment")
+
+
+def _request(base: str, method: str, path: str, body: Optional[dict] = None, session: str = "bench",
+             timeout: float = 300.0) -> Tuple[int, dict]:
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(base + path, data=data, method=method, headers={
+        "Content-Type": "application/json", "X-Session-ID": session, "X-Client-ID": session,
+    })
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, json.loads(response.read() or b"{}")
+    except urllib.error.HTTPError as e:
+        return e.code, {}
+
+
+def make_call(endpoint: str, base: str) -> Callable[[str], int]:
+    """Function performing one request of the endpoint; returns the final HTTP status"""
+    if endpoint == "health":
+        return lambda session: _request(base, "GET", "/api/health", session=session)[0]
+    if endpoint == "files":
+        return lambda session: _request(base, "GET", "/api/files?limit=50", session=session)[0]
+    if endpoint in CHAT_QUERIES:
+        body = {"message": CHAT_QUERIES[endpoint], "service": "all"}
+        return lambda session: _request(base, "POST", "/api/chat", body, session=session)[0]
+    if endpoint == "job_investment":
+        def submit_and_wait(session: str) -> int:
+            status, job = _request(base, "POST", "/api/jobs", {"message": CHAT_QUERIES["chat_investment"]}, session)
+            if status != 202:
+                return status
+            while True:
+                status, job = _request(base, "GET", f"/api/jobs/{job['job_id']}", session=session)
+                if status != 200 or job.get("status") in ("succeeded", "failed", "cancelled"):
+                    return status if job.get("status") != "failed" else 500
+                time.sleep(0.05)
+        return submit_and_wait
+    raise ValueError(f"unknown endpoint {endpoint}")
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def drive(call: Callable[[str], int], requests: int, concurrency: int, run_id: str) -> Dict[str, object]:
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+
+    def one(index: int):
+        # A session per request keeps conversation memory from growing across the run
+        session = f"bench-{run_id}-{index}"
+        started = time.perf_counter()
+        try:
+            status = call(session)
+        except Exception:
+            status = 0
+        elapsed = time.perf_counter() - started
+        with lock:
+            statuses[status] = statuses.get(status, 0) + 1
+            if 200 <= status < 300:
+                latencies.append(elapsed)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "ok": len(latencies),
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 1) if latencies else 0.0,
+    }
+
+
+class Stack:
+    """The three services running against the fake LLM in a scratch directory"""
+
+    def __init__(self, api_base_llm: str, api_port: int, keep_dir: bool = False, api_workers: int = 1):
+        self.workdir = Path(tempfile.mkdtemp(prefix="finova-bench-"))
+        self.api_url = f"http://127.0.0.1:{api_port}"
+        self.api_port = api_port
+        self.api_workers = api_workers
+        self.keep_dir = keep_dir
+        self.processes: List[Tuple[str, subprocess.Popen]] = []
+        self.env = {
+            **os.environ,
+            "PYTHONPATH": os.pathsep.join(filter(None, [str(AGENTS_DIR), os.environ.get("PYTHONPATH")])),
+            "ANTHROPIC_API_BASE": api_base_llm,
+            "ANTHROPIC_API_KEY": "fake-key",
+            # No network: bundled model cost map, no telemetry
+            "LITELLM_LOCAL_MODEL_COST_MAP": "True",
+            "CREWAI_DISABLE_TELEMETRY": "true",
+            "OTEL_SDK_DISABLED": "true",
+            "HF_HUB_OFFLINE": "1",
+            "LOG_LEVEL": "WARNING",
+            "MARKET_BRIEFS_ENABLED": "0",
+            "CLIENT_RATE_PER_MINUTE": "1000000",
+            "CLIENT_RATE_BURST": "1000000",
+            "WEB_CACHE_DIR": str(self.workdir / "web_cache"),
+            "JOB_DB": str(self.workdir / "jobs.sqlite3"),
+            "WORKER_REGISTRY_DB": str(self.workdir / "workers.sqlite3"),
+            "CONVERSATION_SPILL_PATH": str(self.workdir / "conversations.sqlite3"),
+        }
+
+    def start(self, timeout: float = 180.0):
+        for port in ACP_PORTS + (self.api_port,):
+            if _port_open(port):
+                raise RuntimeError(f"port {port} is already in use")
+        self._spawn("crewai_agent", [str(AGENTS_DIR / "crewai_agent.py")])
+        self._spawn("smolagent_agent", [str(AGENTS_DIR / "smolagent_agent.py")])
+        deadline = time.time() + timeout
+        for port in ACP_PORTS:
+            self._wait(lambda: _port_open(port), deadline, f"ACP server on port {port}")
+        if self.api_workers > 1:
+            self._spawn("api_server", [str(AGENTS_DIR / "worker_pool.py"), "--workers", str(self.api_workers),
+                                       "--host", "127.0.0.1", "--port", str(self.api_port)])
+        else:
+            self._spawn("api_server", ["-c", (
+                "import api_server; "
+                f"api_server.app.run(host='127.0.0.1', port={self.api_port}, threaded=True, use_reloader=False)"
+            )])
+        self._wait(self._agents_ready, deadline, "api_server agent initialization")
+
+    def stop(self):
+        for _, process in reversed(self.processes):
+            process.terminate()
+        for _, process in reversed(self.processes):
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if not self.keep_dir:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def _spawn(self, name: str, args: List[str]):
+        log = open(self.workdir / f"{name}.log", "w")
+        process = subprocess.Popen([sys.executable] + args, cwd=self.workdir, env=self.env,
+                                   stdout=log, stderr=subprocess.STDOUT)
+        self.processes.append((name, process))
+
+    def _agents_ready(self) -> bool:
+        try:
+            status, health = _request(self.api_url, "GET", "/api/health", timeout=5)
+        except OSError:
+            return False
+        return status == 200 and health.get("agents_initialized", False)
+
+    def _wait(self, ready: Callable[[], bool], deadline: float, what: str):
+        while time.time() < deadline:
+            for name, process in self.processes:
+                if process.poll() is not None:
+                    raise RuntimeError(f"{name} exited with {process.returncode}; see {self.workdir / (name + '.log')}")
+            if ready():
+                return
+            time.sleep(0.25)
+        raise RuntimeError(f"timed out waiting for {what}; logs in {self.workdir}")
+
+
+def _port_open(port: int) -> bool:
+    with socket.socket() as sock:
+        sock.settimeout(0.2)
+        return sock.connect_ex(("127.0.0.1", port)) == 0
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Regressions of p95 latency or throughput beyond `tolerance` (fraction) versus the baseline"""
+    regressions = []
+    for key, current in results["runs"].items():
+        previous = baseline.get("runs", {}).get(key)
+        if not previous or not previous.get("ok"):
+            continue
+        if previous["p95_ms"] and current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{key}: p95 {previous['p95_ms']} -> {current['p95_ms']} ms")
+        if previous["throughput_rps"] and current["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{key}: throughput {previous['throughput_rps']} -> {current['throughput_rps']} req/s")
+    return regressions
+
+
+def _delta(current: float, previous: Optional[float]) -> str:
+    if not previous:
+        return ""
+    return f" ({(current - previous) / previous * 100:+.0f}%)"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help="comma-separated subset of " + ", ".join(ENDPOINTS))
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=32, help="requests per endpoint and level")
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0, help="fake LLM latency per completion")
+    parser.add_argument("--llm-ms-per-token", type=float, default=0.0)
+    parser.add_argument("--llm-output-tokens", type=int, default=120)
+    parser.add_argument("--tool-calls", action="store_true", help="CrewAI agents call their first tool once")
+    parser.add_argument("--api-port", type=int, default=5055)
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--save-baseline", help="write results JSON as the new baseline")
+    parser.add_argument("--baseline", help="compare against this baseline JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression (fraction) vs baseline")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--api-workers", type=int, default=1, help="API worker processes (worker_pool.py when > 1)")
+    parser.add_argument("--keep-workdir", action="store_true", help="keep the scratch directory and service logs")
+    args = parser.parse_args()
+
+    endpoints = [name.strip() for name in args.endpoints.split(",") if name.strip()]
+    levels = [int(level) for level in args.concurrency.split(",")]
+    baseline = json.loads(Path(args.baseline).read_text()) if args.baseline else None
+    llm = FakeLLM(args.llm_latency_ms, args.llm_ms_per_token, args.llm_output_tokens, args.tool_calls)
+
+    results = {
+        "config": {
+            "llm_latency_ms": args.llm_latency_ms, "llm_ms_per_token": args.llm_ms_per_token,
+            "llm_output_tokens": args.llm_output_tokens, "tool_calls": args.tool_calls,
+            "requests": args.requests, "concurrency": levels, "api_workers": args.api_workers,
+        },
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "runs": {},
+    }
+
+    with serve_fake_llm(llm) as (llm_base, _):
+        stack = Stack(llm_base, args.api_port, keep_dir=args.keep_workdir, api_workers=args.api_workers)
+        try:
+            stack.start()
+            # Warm-up: first requests pay for lazy imports and client setup
+            for endpoint in endpoints:
+                make_call(endpoint, stack.api_url)("bench-warmup")
+            for level in levels:
+                for endpoint in endpoints:
+                    key = f"{endpoint}@{level}"
+                    run = drive(make_call(endpoint, stack.api_url), max(args.requests, level), level, f"{endpoint}-c{level}")
+                    results["runs"][key] = run
+                    previous = (baseline or {}).get("runs", {}).get(key, {})
+                    print(f"{key:>24}: {run['throughput_rps']:>7} req/s{_delta(run['throughput_rps'], previous.get('throughput_rps'))}  "
+                          f"p50 {run['p50_ms']:>8} ms  p95 {run['p95_ms']:>8} ms{_delta(run['p95_ms'], previous.get('p95_ms'))}  "
+                          f"p99 {run['p99_ms']:>8} ms  statuses {run['statuses']}")
+        finally:
+            stack.stop()
+        results["llm"] = dict(llm.stats)
+
+    for path in filter(None, (args.output, args.save_baseline)):
+        Path(path).write_text(json.dumps(results, indent=2))
+
+    if baseline:
+        regressions = compare(results, baseline, args.tolerance)
+        print("\nRegressions vs baseline:" if regressions else "\nNo regressions vs baseline.")
+        for line in regressions:
+            print("  " + line)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
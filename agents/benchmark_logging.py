@@ -0,0 +1,145 @@
+"""
+Throughput benchmark for ACPCallingAgent with verbose logging enabled.
+
+Compares the old print-based hot path (synchronous prints plus a
+logging.basicConfig stream handler) against the queue-based structured
+logging, both writing to a deliberately slow stdout to mimic a busy terminal
+or a congested log pipe. ACP clients are stubbed, so no servers are needed.
+
+    python benchmark_logging.py --requests 500 --concurrency 50 --write-delay-ms 0.2
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from types import SimpleNamespace
+
+from fastacp import ACPCallingAgent
+from structured_logging import setup_logging, shutdown_logging
+
+
+class SlowStream:
+    """File-like sink whose writes block for a fixed time"""
+
+    def __init__(self, delay_s: float):
+        self.delay_s = delay_s
+        self.lines = 0
+
+    def write(self, text):
+        time.sleep(self.delay_s)
+        self.lines += text.count("\n")
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+class StubClient:
+    """Mimics acp_sdk Client.run_sync with a fixed latency"""
+
+    def __init__(self, latency_s: float):
+        self.latency_s = latency_s
+
+    async def run_sync(self, agent, input):
+        await asyncio.sleep(self.latency_s)
+        part = SimpleNamespace(content=f"{agent} answer ({len(str(input))} chars of input)")
+        return SimpleNamespace(output=[SimpleNamespace(parts=[part])])
+
+
+class LegacyACPCallingAgent(ACPCallingAgent):
+    """ACPCallingAgent with the pre-structured-logging print statements restored"""
+
+    async def _call_agent(self, agent_name: str, query: str, metadata=None) -> str:
+        client = self.acp_agents[agent_name]['client']
+        print(f"Calling {agent_name} with 90s timeout...")
+        start_time = time.time()
+        result = await asyncio.wait_for(client.run_sync(agent=agent_name, input=query), timeout=90.0)
+        print(f"{agent_name} completed in {time.time() - start_time:.2f}s")
+        response_content = result.output[0].parts[0].content
+        print(f"{agent_name} response length: {len(response_content)} characters")
+        return response_content
+
+
+QUERIES = [
+    "I want to invest $50,000 in a balanced portfolio for retirement",
+    "Find me a financial advisor in Charlotte, NC",
+    "Research current renewable energy investment trends",
+]
+
+
+async def _drive(agent: ACPCallingAgent, total: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            await agent.run(QUERIES[i % len(QUERIES)])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return time.perf_counter() - start
+
+
+def _agents(client):
+    return {name: {'agent': None, 'client': client}
+            for name in ("investment_agent", "advisor_finder", "market_researcher")}
+
+
+def run_mode(mode: str, args) -> dict:
+    sink = SlowStream(args.write_delay_ms / 1000.0)
+    client = StubClient(args.latency_ms / 1000.0)
+    real_stdout = sys.stdout
+    root = logging.getLogger()
+    saved_handlers = list(root.handlers)
+
+    try:
+        if mode == "legacy":
+            for handler in saved_handlers:
+                root.removeHandler(handler)
+            handler = logging.StreamHandler(sink)
+            root.addHandler(handler)
+            root.setLevel(logging.DEBUG)
+            sys.stdout = sink
+            agent = LegacyACPCallingAgent(_agents(client), model=None)
+        else:
+            setup_logging(level="DEBUG", debug_sample_rate=args.sample_rate, stream=sink)
+            agent = ACPCallingAgent(_agents(client), model=None)
+
+        elapsed = asyncio.run(_drive(agent, args.requests, args.concurrency))
+    finally:
+        sys.stdout = real_stdout
+        if mode != "legacy":
+            shutdown_logging()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        for handler in saved_handlers:
+            root.addHandler(handler)
+
+    return {
+        "mode": mode,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(args.requests / elapsed, 1),
+        "lines_written": sink.lines,
+        "failed_calls": agent.get_stats()["failed_calls"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="stubbed agent latency")
+    parser.add_argument("--write-delay-ms", type=float, default=0.2, help="cost of each stdout write")
+    parser.add_argument("--sample-rate", type=float, default=1.0, help="DEBUG sampling for the structured run")
+    args = parser.parse_args()
+
+    for mode in ("legacy", "structured"):
+        result = run_mode(mode, args)
+        print(f"{result['mode']:>10}: {result['throughput_rps']:>8} req/s "
+              f"({result['elapsed_s']}s, {result['lines_written']} log lines, "
+              f"{result['failed_calls']} failed calls)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Startup benchmark and import-time profile for the service entry points.
+
+Each entry point module is imported in a fresh interpreter (as a cold start or
+worker restart would) several times. The report gives the median import time,
+the heaviest imports from `python -X importtime`, and which heavy frameworks
+were loaded at import instead of on first request.
+
+    python benchmark_startup.py --runs 5 --top 10
+    python benchmark_startup.py --entry api_server --json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+ENTRY_POINTS = ("api_server", "crewai_agent", "smolagent_agent")
+HEAVY_MODULES = ("crewai", "smolagents", "litellm", "acp_sdk", "neo4j", "openai", "anthropic")
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps({{"import_s": elapsed, "heavy": sorted(m for m in {heavy!r} if m in sys.modules)}}))
+"""
+
+
+def _run(module: str, importtime: bool) -> subprocess.CompletedProcess:
+    command = [sys.executable]
+    if importtime:
+        command += ["-X", "importtime"]
+    command += ["-c", _PROBE.format(module=module, heavy=HEAVY_MODULES)]
+    # Keep background work (agent auto-initialization) out of the measurement
+    env = {**os.environ, "AUTO_INITIALIZE_AGENTS": "0", "LOG_LEVEL": "WARNING"}
+    return subprocess.run(command, cwd=Path(__file__).parent, env=env, capture_output=True, text=True, timeout=300)
+
+
+def parse_importtime(stderr: str) -> List[Dict[str, object]]:
+    """Rows of `-X importtime` output: module, self and cumulative microseconds, nesting depth"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        except ValueError:
+            continue
+        rows.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000,
+        })
+    return rows
+
+
+def direct_imports(rows: List[Dict[str, object]], module: str) -> List[Dict[str, object]]:
+    """Rows imported directly by top-level `module` (importtime lists children before their parent)"""
+    for index, row in enumerate(rows):
+        if row["module"] == module and row["depth"] == 0:
+            children = []
+            for child in reversed(rows[:index]):
+                if child["depth"] == 0:
+                    break
+                if child["depth"] == 1:
+                    children.append(child)
+            return children[::-1]
+    return []
+
+
+def profile_entry(module: str, runs: int, top: int) -> Dict[str, object]:
+    profiled = _run(module, importtime=True)
+    if profiled.returncode != 0:
+        error = profiled.stderr.strip().splitlines()[-1] if profiled.stderr.strip() else "exit %d" % profiled.returncode
+        return {"entry": module, "error": error}
+
+    rows = parse_importtime(profiled.stderr)
+    timings = []
+    heavy = []
+    for _ in range(runs):
+        result = _run(module, importtime=False)
+        if result.returncode != 0:
+            break
+        probe = json.loads(result.stdout.strip().splitlines()[-1])
+        timings.append(probe["import_s"])
+        heavy = probe["heavy"]
+
+    top_level = sorted(direct_imports(rows, module), key=lambda row: row["cumulative_ms"], reverse=True)
+    return {
+        "entry": module,
+        "runs": len(timings),
+        "import_ms_median": round(statistics.median(timings) * 1000, 1) if timings else None,
+        "import_ms_min": round(min(timings) * 1000, 1) if timings else None,
+        "modules_imported": len(rows),
+        "heavy_loaded_at_import": heavy,
+        "slowest_imports": [
+            {"module": row["module"], "cumulative_ms": round(row["cumulative_ms"], 1)} for row in top_level[:top]
+        ],
+        "slowest_self": [
+            {"module": row["module"], "self_ms": round(row["self_ms"], 1)}
+            for row in sorted(rows, key=lambda row: row["self_ms"], reverse=True)[:top]
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entry", action="append", choices=ENTRY_POINTS, help="entry point(s) to measure (default: all)")
+    parser.add_argument("--runs", type=int, default=5, help="cold imports per entry point")
+    parser.add_argument("--top", type=int, default=10, help="imports to list per entry point")
+    parser.add_argument("--json", action="store_true", help="print the full report as JSON")
+    args = parser.parse_args()
+
+    reports = [profile_entry(module, args.runs, args.top) for module in (args.entry or ENTRY_POINTS)]
+    if args.json:
+        print(json.dumps(reports, indent=2))
+        return
+
+    for report in reports:
+        if "error" in report:
+            print(f"{report['entry']}: import failed ({report['error']})\n")
+            continue
+        print(f"{report['entry']}: {report['import_ms_median']} ms median import "
+              f"(min {report['import_ms_min']} ms, {report['runs']} runs, {report['modules_imported']} modules)")
+        print(f"  heavy frameworks loaded at import: {', '.join(report['heavy_loaded_at_import']) or 'none'}")
+        for row in report["slowest_imports"]:
+            print(f"  {row['cumulative_ms']:>9.1f} ms  {row['module']}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Caching drop-ins for the smolagents web tools used by market_researcher.
+
+The tools share one PageCache/SearchCache per process, so repeated market
+questions reuse earlier searches and page fetches across CodeAgent runs.
+"""
+
+import os
+import re
+import threading
+from pathlib import Path
+from typing import List
+
+from smolagents import DuckDuckGoSearchTool, Tool, VisitWebpageTool
+from smolagents.utils import truncate_content
+
+from web_cache import PageCache, SearchCache
+from traffic_replay import recorded_tool
+
+WEB_CACHE_DIR = os.getenv("WEB_CACHE_DIR", "./.web_cache")
+WEB_CACHE_TTL_SECONDS = float(os.getenv("WEB_CACHE_TTL_SECONDS", "3600"))
+SEARCH_CACHE_TTL_SECONDS = float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "900"))
+WEB_CACHE_MAX_MB = int(os.getenv("WEB_CACHE_MAX_MB", "200"))
+WEB_FETCH_WORKERS = int(os.getenv("WEB_FETCH_WORKERS", "8"))
+
+_page_cache = None
+_search_cache = None
+# Tools run on several threads at once; each cache (and its SQLite connection) must be created once
+_caches_lock = threading.Lock()
+
+
+def get_page_cache() -> PageCache:
+    global _page_cache
+    if _page_cache is None:
+        with _caches_lock:
+            if _page_cache is None:
+                _page_cache = PageCache(
+                    Path(WEB_CACHE_DIR) / "pages",
+                    ttl_seconds=WEB_CACHE_TTL_SECONDS,
+                    max_bytes=WEB_CACHE_MAX_MB * 1024 * 1024,
+                    max_workers=WEB_FETCH_WORKERS
+                )
+    return _page_cache
+
+
+def get_search_cache() -> SearchCache:
+    global _search_cache
+    if _search_cache is None:
+        with _caches_lock:
+            if _search_cache is None:
+                _search_cache = SearchCache(Path(WEB_CACHE_DIR) / "searches.sqlite3",
+                                            ttl_seconds=SEARCH_CACHE_TTL_SECONDS)
+    return _search_cache
+
+
+def _page_to_markdown(html: str, max_length: int) -> str:
+    from markdownify import markdownify
+    markdown_content = markdownify(html).strip()
+    markdown_content = re.sub(r"\n{3,}", "\n\n", markdown_content)
+    return truncate_content(markdown_content, max_length)
+
+
+class CachedDuckDuckGoSearchTool(DuckDuckGoSearchTool):
+    """DuckDuckGo search with results cached by normalized query"""
+
+    @recorded_tool
+    def forward(self, query: str) -> str:
+        return get_search_cache().get_or_search(query, super().forward)
+
+
+class CachedVisitWebpageTool(VisitWebpageTool):
+    """Webpage visits served from the on-disk page cache"""
+
+    @recorded_tool
+    def forward(self, url: str) -> str:
+        try:
+            page = get_page_cache().fetch(url)
+            return _page_to_markdown(page.text, getattr(self, "max_output_length", 40000))
+        except TimeoutError:
+            return "The request timed out. Please try again later or check the URL."
+        except Exception as e:
+            return f"Error fetching the webpage: {str(e)}"
+
+
+class VisitWebpagesTool(Tool):
+    """Fetch several webpages concurrently through the page cache"""
+    name = "visit_webpages"
+    description = (
+        "Visits several webpages at once (fetched in parallel) and returns each one's content "
+        "as markdown. Prefer this over repeated visit_webpage calls when you have multiple URLs."
+    )
+    inputs = {"urls": {"type": "array", "description": "The URLs of the webpages to visit."}}
+    output_type = "string"
+
+    def __init__(self, max_output_length: int = 40000):
+        super().__init__()
+        self.max_output_length = max_output_length
+
+    @recorded_tool
+    def forward(self, urls: List[str]) -> str:
+        urls = list(urls)[:10]
+        per_page = max(self.max_output_length // max(len(urls), 1), 1000)
+        sections = []
+        for url, page in get_page_cache().fetch_many(urls).items():
+            if isinstance(page, Exception):
+                sections.append(f"## {url}\nError fetching the webpage: {str(page)}")
+            else:
+                sections.append(f"## {url}\n{_page_to_markdown(page.text, per_page)}")
+        return "\n\n".join(sections)
+
+
+def get_cached_web_tools() -> list:
+    """Web tools for the market researcher CodeAgent"""
+    return [CachedDuckDuckGoSearchTool(), CachedVisitWebpageTool(), VisitWebpagesTool()]
@@ -0,0 +1,496 @@
+"""
+Compact on-disk store for document chunks.
+
+Chunk text lives in one append-only UTF-8 blob that readers memory-map. The
+chunks themselves are three parallel array columns (byte offset, byte length,
+document id), so a million chunks cost about 16 MB of arrays plus whatever
+pages of the blob the OS keeps cached, instead of a dict and a str per chunk.
+Snippets are decoded from a memoryview slice of the map, copying only the
+bytes they show.
+
+    <uploads>/<namespace>/.chunks/
+        CURRENT                 name of the live generation directory
+        .lock                   writers' exclusive lock
+        <generation>/text.bin         chunk text, back to back
+        <generation>/offsets.u64      column: byte offset of chunk i
+        <generation>/lengths.u32      column: byte length of chunk i
+        <generation>/documents.u32    column: document id of chunk i
+        <generation>/documents.jsonl  document log (added / deleted)
+
+Writers append under the lock; readers in other processes pick up appended
+chunks on `refresh()`, which is a stat when nothing changed. Replacing or
+deleting a document only tombstones its chunks. Once dead bytes pass
+`compact_ratio` of the blob, the live chunks are rewritten into a new
+generation and CURRENT is swapped atomically; readers see the new CURRENT
+and reload.
+
+    python chunk_store.py --benchmark 1000000
+"""
+
+import argparse
+import array
+import codecs
+import hashlib
+import json
+import logging
+import mmap
+import os
+import re
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # no cross-process locking (Windows)
+    fcntl = None
+
+from document_catalog import TEXT_EXTENSIONS, tokenize
+from document_digest import build_digest, is_current
+
+logger = logging.getLogger("chunk_store")
+
+CHUNK_DIR = ".chunks"
+CHUNK_CHARS = 1000
+CHUNK_OVERLAP = 100
+
+_COLUMNS = (("offsets", "Q", "offsets.u64"), ("lengths", "I", "lengths.u32"), ("documents", "I", "documents.u32"))
+_PARAGRAPH = re.compile(r"\n\s*\n")
+
+
+def split_chunks(text: str, size: int = CHUNK_CHARS, overlap: int = CHUNK_OVERLAP) -> List[str]:
+    """Paragraph-aligned chunks of at most `size` characters; longer paragraphs are cut with `overlap`"""
+    chunks, current = [], ""
+    for paragraph in _PARAGRAPH.split(text):
+        paragraph = " ".join(paragraph.split())
+        while len(paragraph) > size:
+            if current:
+                chunks.append(current)
+                current = ""
+            cut = paragraph.rfind(" ", size // 2, size)
+            cut = cut if cut > 0 else size
+            chunks.append(paragraph[:cut])
+            paragraph = paragraph[cut - overlap:].lstrip()
+        if not paragraph:
+            continue
+        if current and len(current) + len(paragraph) + 1 > size:
+            chunks.append(current)
+            current = paragraph
+        else:
+            current = f"{current}\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def extract_text(path) -> Optional[str]:
+    """Plain text of an upload (PDF needs the optional `pypdf` package); None when unsupported"""
+    path = Path(path)
+    extension = path.suffix.lower().lstrip(".")
+    if extension in TEXT_EXTENSIONS:
+        return path.read_text(encoding="utf-8", errors="ignore")
+    if extension == "pdf":
+        try:
+            from pypdf import PdfReader
+        except ImportError:
+            return None
+        return "\n\n".join(page.extract_text() or "" for page in PdfReader(str(path)).pages)
+    return None
+
+
+class ChunkStore:
+    """Append-only chunk text blob (memory-mapped) with array columns; one per uploads directory"""
+
+    def __init__(self, directory, compact_ratio: float = 0.5, compact_min_bytes: int = 1024 * 1024):
+        self.directory = Path(directory)
+        self.compact_ratio = compact_ratio
+        self.compact_min_bytes = compact_min_bytes
+        self._lock = threading.RLock()
+        self._compactions = 0
+        self._reset()
+
+    def _reset(self):
+        self._generation: Optional[str] = None
+        self._current_inode = None
+        self._columns = {name: array.array(code) for name, code, _ in _COLUMNS}
+        self._documents: Dict[str, Dict[str, Any]] = {}
+        self._names: Dict[int, str] = {}
+        self._next_id = 0
+        self._dead_bytes = 0
+        self._log_position = 0
+        self._map: Optional[mmap.mmap] = None
+
+    # -- reading ---------------------------------------------------------
+
+    def refresh(self) -> "ChunkStore":
+        """Pick up chunks appended (or a compaction made) by another process"""
+        with self._lock:
+            for _ in range(2):
+                try:
+                    self._refresh()
+                    return self
+                except FileNotFoundError:
+                    # The generation was compacted away between the stat and the reads
+                    self._reset()
+            return self
+
+    def _refresh(self):
+        current = self.directory / "CURRENT"
+        try:
+            inode = current.stat().st_ino
+        except FileNotFoundError:
+            return
+        if inode != self._current_inode:
+            self._reset()
+            self._current_inode = inode
+            self._generation = current.read_text().strip()
+        # The log is written last, so every chunk it mentions is already in the columns
+        self._read_log()
+        self._read_columns()
+
+    def _path(self, name: str) -> Path:
+        return self.directory / self._generation / name
+
+    def _read_log(self):
+        with open(self._path("documents.jsonl"), "rb") as handle:
+            handle.seek(self._log_position)
+            data = handle.read()
+        complete = data.rfind(b"\n") + 1
+        self._log_position += complete
+        for line in data[:complete].splitlines():
+            self._apply(json.loads(line))
+
+    def _apply(self, entry: Dict[str, Any]):
+        self._next_id = max(self._next_id, entry["id"] + 1)
+        if entry.get("deleted"):
+            name = self._names.pop(entry["id"], None)
+            if name is not None:
+                self._dead_bytes += self._documents.pop(name)["bytes"]
+            return
+        self._documents[entry["name"]] = entry
+        self._names[entry["id"]] = entry["name"]
+
+    def _read_columns(self):
+        counts = [os.path.getsize(self._path(filename)) // array.array(code).itemsize for _, code, filename in _COLUMNS]
+        available = min(counts)
+        for name, _, filename in _COLUMNS:
+            column = self._columns[name]
+            if len(column) < available:
+                with open(self._path(filename), "rb") as handle:
+                    handle.seek(len(column) * column.itemsize)
+                    column.fromfile(handle, available - len(column))
+
+    def _mapped(self, end: int) -> mmap.mmap:
+        """Map of the blob covering at least `end` bytes (remapped as the blob grows)"""
+        if self._map is None or len(self._map) < end:
+            with open(self._path("text.bin"), "rb") as handle:
+                # Earlier maps are left to the GC: snippets may still hold views on them
+                self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def _decode(self, chunk: int, max_bytes: Optional[int] = None) -> Tuple[str, bool]:
+        offset, length = self._columns["offsets"][chunk], self._columns["lengths"][chunk]
+        size = length if max_bytes is None else min(length, max_bytes)
+        with memoryview(self._mapped(offset + length))[offset:offset + size] as view:
+            text = codecs.utf_8_decode(view, "replace", size == length)[0]
+        return text, size < length
+
+    def text(self, chunk: int) -> str:
+        with self._lock:
+            return self._decode(chunk)[0]
+
+    def snippet(self, chunk: int, chars: int = 300) -> str:
+        """At most `chars` characters of a chunk ("..." included); decodes only the bytes shown"""
+        with self._lock:
+            # UTF-8 needs at most 4 bytes per character
+            text, cut = self._decode(chunk, chars * 4)
+        if cut or len(text) > chars:
+            return text[:chars - 3].rstrip() + "..."
+        return text
+
+    def document(self, name: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._documents.get(name)
+
+    def digest(self, name: str) -> Optional[Dict[str, Any]]:
+        """Summary and key figures computed when the document was ingested (document_digest)"""
+        entry = self.document(name)
+        return entry.get("digest") if entry is not None else None
+
+    def chunks(self, name: str) -> range:
+        with self._lock:
+            entry = self._documents.get(name)
+            return range(entry["first"], entry["first"] + entry["count"]) if entry else range(0)
+
+    def best_chunk(self, name: str, query: str) -> Optional[int]:
+        """Chunk of a document sharing the most terms with the query (the first one on ties)"""
+        terms = set(tokenize(query))
+        best, best_score = None, -1
+        for chunk in self.chunks(name):
+            score = len(terms.intersection(tokenize(self.text(chunk))))
+            if score > best_score:
+                best, best_score = chunk, score
+        return best
+
+    # -- writing ---------------------------------------------------------
+
+    @contextmanager
+    def _writing(self):
+        """Thread lock plus the cross-process file lock; the store is refreshed on entry"""
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(self.directory / ".lock", "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    if not (self.directory / "CURRENT").exists():
+                        self._create_generation("1", [], [])
+                    self._refresh()
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def add_document(self, name: str, text: str, content_hash: Optional[str] = None, **metadata) -> int:
+        """Store a document's chunks, replacing an older version; returns the chunk count"""
+        content_hash = content_hash or hashlib.sha256(text.encode("utf-8")).hexdigest()
+        encoded = [chunk.encode("utf-8") for chunk in split_chunks(text)]
+        with self._writing():
+            existing = self._documents.get(name)
+            if existing is not None and existing["hash"] == content_hash:
+                if metadata and any(existing.get(key) != value for key, value in metadata.items()):
+                    self._append_log([{**existing, **metadata}])
+                return existing["count"]
+
+            blob = self._path("text.bin")
+            offset = os.path.getsize(blob)
+            with open(blob, "ab") as handle:
+                handle.write(b"".join(encoded))
+            first = min(os.path.getsize(self._path(filename)) // array.array(code).itemsize
+                        for _, code, filename in _COLUMNS)
+            offsets, lengths = array.array("Q"), array.array("I")
+            for chunk in encoded:
+                offsets.append(offset)
+                lengths.append(len(chunk))
+                offset += len(chunk)
+            self._append_columns(offsets, lengths, array.array("I", [self._next_id] * len(encoded)))
+
+            entries = [{"id": existing["id"], "deleted": True}] if existing is not None else []
+            entries.append({"id": self._next_id, "name": name, "first": first, "count": len(encoded),
+                            "bytes": sum(lengths), "hash": content_hash, **metadata})
+            self._append_log(entries)
+            self._maybe_compact()
+        logger.debug("Document chunked", extra={"document": name, "chunks": len(encoded)})
+        return len(encoded)
+
+    def remove_document(self, name: str) -> bool:
+        with self._writing():
+            existing = self._documents.get(name)
+            if existing is None:
+                return False
+            self._append_log([{"id": existing["id"], "deleted": True}])
+            self._maybe_compact()
+        return True
+
+    def _append_columns(self, offsets: array.array, lengths: array.array, documents: array.array):
+        for (_, _, filename), values in zip(_COLUMNS, (offsets, lengths, documents)):
+            with open(self._path(filename), "ab") as handle:
+                values.tofile(handle)
+
+    def _append_log(self, entries: List[Dict[str, Any]]):
+        with open(self._path("documents.jsonl"), "a", encoding="utf-8") as handle:
+            handle.write("".join(json.dumps(entry) + "\n" for entry in entries))
+        self._refresh()
+
+    def _maybe_compact(self):
+        blob_bytes = len(self._columns["offsets"]) and (
+            self._columns["offsets"][-1] + self._columns["lengths"][-1])
+        if self._dead_bytes >= self.compact_min_bytes and self._dead_bytes >= self.compact_ratio * blob_bytes:
+            self._compact()
+
+    def compact(self):
+        """Rewrite the live chunks into a new generation now"""
+        with self._writing():
+            self._compact()
+
+    def _compact(self):
+        started = time.perf_counter()
+        dead_bytes = self._dead_bytes
+        generation = str(int(self._generation) + 1)
+        entries, spans, offsets, lengths, documents = [], [], array.array("Q"), array.array("I"), array.array("I")
+        offset = 0
+        for entry in sorted(self._documents.values(), key=lambda e: e["first"]):
+            entries.append({**entry, "first": len(offsets)})
+            for chunk in range(entry["first"], entry["first"] + entry["count"]):
+                start, length = self._columns["offsets"][chunk], self._columns["lengths"][chunk]
+                spans.append((start, length))
+                offsets.append(offset)
+                lengths.append(length)
+                documents.append(entry["id"])
+                offset += length
+        blob = self._mapped(offset and max(start + length for start, length in spans))
+        pieces = (blob[start:start + length] for start, length in spans)
+        self._create_generation(generation, entries, pieces, offsets, lengths, documents)
+        previous = self._generation
+        self._refresh()
+        # Readers may still be on the previous generation; anything older can go
+        for path in self.directory.iterdir():
+            if path.is_dir() and path.name not in (generation, previous):
+                shutil.rmtree(path, ignore_errors=True)
+        self._compactions += 1
+        logger.info("Chunk store compacted", extra={
+            "directory": str(self.directory), "reclaimed_bytes": dead_bytes, "chunks": len(offsets),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+        })
+
+    def _create_generation(self, generation: str, entries: List[Dict[str, Any]], pieces: Iterable[bytes],
+                           offsets=None, lengths=None, documents=None):
+        target = self.directory / generation
+        target.mkdir(parents=True, exist_ok=True)
+        with open(target / "text.bin", "wb") as handle:
+            for piece in pieces:
+                handle.write(piece)
+        for (name, code, filename), values in zip(_COLUMNS, (offsets, lengths, documents)):
+            with open(target / filename, "wb") as handle:
+                (values if values is not None else array.array(code)).tofile(handle)
+        with open(target / "documents.jsonl", "w", encoding="utf-8") as handle:
+            handle.write("".join(json.dumps(entry) + "\n" for entry in entries))
+        pointer = self.directory / "CURRENT.tmp"
+        pointer.write_text(generation)
+        os.replace(pointer, self.directory / "CURRENT")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            chunks = len(self._columns["offsets"])
+            live = sum(entry["count"] for entry in self._documents.values())
+            return {
+                "generation": self._generation,
+                "documents": len(self._documents),
+                "chunks": chunks,
+                "live_chunks": live,
+                "blob_bytes": chunks and self._columns["offsets"][-1] + self._columns["lengths"][-1],
+                "dead_bytes": self._dead_bytes,
+                "column_bytes": sum(len(column) * column.itemsize for column in self._columns.values()),
+                "mapped_bytes": len(self._map) if self._map is not None else 0,
+                "compactions": self._compactions,
+            }
+
+
+_stores: Dict[str, ChunkStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_chunk_store(uploads_directory) -> ChunkStore:
+    """Process-wide store for one (namespace) uploads directory"""
+    directory = str((Path(uploads_directory) / CHUNK_DIR).resolve())
+    with _stores_lock:
+        store = _stores.get(directory)
+        if store is None:
+            store = _stores[directory] = ChunkStore(directory)
+    return store.refresh()
+
+
+def ingest_document(path) -> int:
+    """Chunk an uploaded file into its directory's store; returns the chunk count (0 when unsupported).
+
+    The document's digest is rebuilt only when its content hash changed.
+    """
+    path = Path(path)
+    text = extract_text(path)
+    if text is None:
+        return 0
+    stat = path.stat()
+    store = get_chunk_store(path.parent)
+    content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    entry = store.document(path.name)
+    digest = entry.get("digest") if entry is not None and entry["hash"] == content_hash else None
+    if not is_current(digest):
+        digest = build_digest(text)
+        logger.debug("Document digest built", extra={
+            "document": path.name, "figures": {kind: len(items) for kind, items in digest["figures"].items()}
+        })
+    return store.add_document(path.name, text, content_hash, size=stat.st_size, modified=stat.st_mtime, digest=digest)
+
+
+def ensure_document(path) -> ChunkStore:
+    """Store for the file's directory, with the file (re)ingested if it changed since it was chunked
+    or its digest predates DIGEST_VERSION"""
+    path = Path(path)
+    store = get_chunk_store(path.parent)
+    entry = store.document(path.name)
+    stat = path.stat()
+    if (entry is None or entry.get("size") != stat.st_size or entry.get("modified") != stat.st_mtime
+            or not is_current(entry.get("digest"))):
+        ingest_document(path)
+    return store
+
+
+def forget_document(path) -> bool:
+    path = Path(path)
+    return get_chunk_store(path.parent).remove_document(path.name)
+
+
+def benchmark(n: int, chunk_chars: int = 600) -> Dict[str, Any]:
+    """Python heap for n chunks held as dicts vs. in a ChunkStore (tracemalloc; mapped pages are page cache)"""
+    import random
+    import tempfile
+    import tracemalloc
+
+    words = ["portfolio", "balance", "contribution", "dividend", "allocation", "retirement", "expense",
+             "ratio", "account", "statement", "holding", "equity", "bond", "index", "fund", "rate"]
+    rng = random.Random(0)
+    sample = [" ".join(rng.choice(words) for _ in range(chunk_chars // 8)) for _ in range(64)]
+    per_document = 200
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    # Chunk text is built per chunk (as when read from files), not shared
+    held = [{"source": f"doc-{i // per_document}.txt", "text": sample[i % 64] + f" #{i}", "relevance_score": 0.0}
+            for i in range(n)]
+    dict_bytes = tracemalloc.get_traced_memory()[0] - baseline
+    del held
+    tracemalloc.stop()
+
+    with tempfile.TemporaryDirectory() as directory:
+        writer = ChunkStore(directory, compact_min_bytes=1 << 62)
+        started = time.perf_counter()
+        for document in range(-(-n // per_document)):
+            count = min(per_document, n - document * per_document)
+            text = "\n\n".join(sample[i % 64] + f" #{i}" for i in range(document * per_document,
+                                                                       document * per_document + count))
+            writer.add_document(f"doc-{document}.txt", text)
+        write_s = time.perf_counter() - started
+        del writer
+
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        reader = ChunkStore(directory).refresh()
+        load_s = time.perf_counter() - started
+        started = time.perf_counter()
+        for chunk in range(0, len(reader._columns["offsets"]), max(n // 1000, 1)):
+            reader.snippet(chunk)
+        snippet_us = (time.perf_counter() - started) / 1000 * 1e6
+        store_bytes = tracemalloc.get_traced_memory()[0] - baseline
+        stats = reader.stats()
+    tracemalloc.stop()
+    return {
+        "chunks": stats["chunks"], "dict_heap_mb": round(dict_bytes / 2**20, 1),
+        "store_heap_mb": round(store_bytes / 2**20, 1), "ratio": round(store_bytes / dict_bytes, 3),
+        "blob_mb": round(stats["blob_bytes"] / 2**20, 1), "write_s": round(write_s, 2),
+        "load_s": round(load_s, 3), "snippet_us": round(snippet_us, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--benchmark", type=int, metavar="N", default=100000, help="number of chunks")
+    args = parser.parse_args()
+    print(json.dumps(benchmark(args.benchmark), indent=2))
+
+
+if __name__ == "__main__":
+    main()
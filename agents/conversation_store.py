@@ -0,0 +1,207 @@
+"""
+Per-session conversation memory.
+
+Each session keeps a compact history (truncated turns, older turns folded into
+a short rolling summary) and the investor profile extracted from what the user
+has said so far. Agents get a bounded context window built from that state
+instead of the full transcript. Sessions live in an LRU; evicted sessions are
+optionally spilled to a local SQLite file and reloaded on their next request.
+In shared mode (several API worker processes) every turn is written through to
+the SQLite file and resident sessions are refreshed when another worker has
+updated them, so a session may hop between workers.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional
+
+from investor_profile import extract_profile, format_profile
+
+logger = logging.getLogger("conversation_store")
+
+# Replies the agent layer returns instead of an answer; they are not conversation turns
+ERROR_REPLY_PREFIXES = (
+    "System error occurred",
+    "All agents are currently unavailable",
+    "No suitable agents found",
+)
+
+
+class SessionState:
+    """Compact memory for one session"""
+
+    __slots__ = ("turns", "summary", "profile", "updated")
+
+    def __init__(self, turns=None, summary=None, profile=None, updated=None, max_turns: int = 6):
+        self.turns = deque(turns or [], maxlen=max_turns)
+        self.summary: List[str] = list(summary or [])
+        self.profile: Dict[str, Any] = dict(profile or {})
+        self.updated = updated or time.time()
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "turns": list(self.turns),
+            "summary": self.summary,
+            "profile": self.profile,
+            "updated": self.updated,
+        })
+
+    @classmethod
+    def from_json(cls, payload: str, max_turns: int) -> "SessionState":
+        data = json.loads(payload)
+        return cls(data["turns"], data["summary"], data["profile"], data["updated"], max_turns=max_turns)
+
+
+class ConversationStore:
+    """Memory-bounded store of session histories and investor profiles"""
+
+    def __init__(self, max_sessions: int = 10000, max_turns: int = 6, max_turn_chars: int = 400,
+                 max_summary_items: int = 8, spill_path: Optional[str] = None, shared: bool = False):
+        if shared and not spill_path:
+            raise ValueError("shared conversation memory needs a spill_path")
+        self.max_sessions = max_sessions
+        self.max_turns = max_turns
+        self.max_turn_chars = max_turn_chars
+        self.max_summary_items = max_summary_items
+        self.shared = shared
+        self._sessions: "OrderedDict[str, SessionState]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"evicted": 0, "spilled": 0, "restored": 0}
+        self._db = None
+        if spill_path:
+            self._db = sqlite3.connect(spill_path, timeout=30, check_same_thread=False)
+            if shared:
+                self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, state TEXT NOT NULL, updated REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def record_turn(self, session_id: str, user_message: str, assistant_message: str):
+        """Add one exchange, update the profile and fold the oldest turn into the summary"""
+        if assistant_message.startswith(ERROR_REPLY_PREFIXES):
+            logger.debug("Error reply not recorded", extra={"session": session_id})
+            return
+        with self._lock:
+            state = self._get(session_id)
+            state.profile.update(extract_profile(user_message))
+            if len(state.turns) == state.turns.maxlen:
+                oldest_user, _ = state.turns[0]
+                state.summary.append(_clip(oldest_user, 120))
+                del state.summary[:-self.max_summary_items]
+            state.turns.append((_clip(user_message, self.max_turn_chars), _headline(assistant_message, self.max_turn_chars)))
+            state.updated = time.time()
+            if self.shared:
+                self._write(session_id, state)
+
+    def get_profile(self, session_id: str) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._get(session_id).profile)
+
+    def build_context(self, session_id: str, max_chars: int = 1500) -> str:
+        """
+        Bounded context for the agents: profile, older-topic summary and recent turns,
+        most recent first when the budget runs out. Built from recorded turns only (the
+        current question reaches the agents as the query), so it is empty for a new session.
+        """
+        with self._lock:
+            state = self._get(session_id)
+            profile = dict(state.profile)
+            summary = list(state.summary)
+            turns = list(state.turns)
+
+        sections = []
+        if profile:
+            sections.append(f"Investor profile so far: {format_profile(profile)}")
+        budget = max_chars - sum(len(section) for section in sections)
+
+        recent = []
+        for user_text, assistant_text in reversed(turns):
+            entry = f"User: {user_text}\nAdvisor: {assistant_text}"
+            if len(entry) > budget:
+                break
+            recent.insert(0, entry)
+            budget -= len(entry)
+
+        if summary and budget > 0:
+            earlier = "Earlier topics: " + "; ".join(summary)
+            sections.append(_clip(earlier, budget))
+        if recent:
+            sections.append("Recent conversation:\n" + "\n".join(recent))
+
+        if not sections:
+            return ""
+        return "Conversation context:\n" + "\n".join(sections)
+
+    def forget(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            if self._db is not None:
+                self._db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "resident_sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "spill_enabled": self._db is not None,
+                "shared": self.shared,
+                **self._stats,
+            }
+
+    def _get(self, session_id: str) -> SessionState:
+        state = self._sessions.get(session_id)
+        if state is not None and self.shared:
+            # Another worker may have recorded turns since this copy was loaded
+            newer = self._restore(session_id, newer_than=state.updated)
+            if newer is not None:
+                state = self._sessions[session_id] = newer
+        if state is None:
+            state = self._restore(session_id) or SessionState(max_turns=self.max_turns)
+            self._sessions[session_id] = state
+            while len(self._sessions) > self.max_sessions:
+                self._evict()
+        self._sessions.move_to_end(session_id)
+        return state
+
+    def _evict(self):
+        session_id, state = self._sessions.popitem(last=False)
+        self._stats["evicted"] += 1
+        if self._db is not None and not self.shared:
+            self._write(session_id, state)
+            self._stats["spilled"] += 1
+
+    def _write(self, session_id: str, state: SessionState):
+        self._db.execute(
+            "INSERT OR REPLACE INTO sessions (session_id, state, updated) VALUES (?, ?, ?)",
+            (session_id, state.to_json(), state.updated)
+        )
+        self._db.commit()
+
+    def _restore(self, session_id: str, newer_than: float = 0.0) -> Optional[SessionState]:
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT state FROM sessions WHERE session_id = ? AND updated > ?", (session_id, newer_than)
+        ).fetchone()
+        if row is None:
+            return None
+        self._stats["restored"] += 1
+        return SessionState.from_json(row[0], self.max_turns)
+
+
+def _clip(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 3].rstrip() + "..."
+
+
+def _headline(text: str, limit: int) -> str:
+    """Keep the opening of an agent reply, skipping bold section labels"""
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    body = [line for line in lines if not (line.startswith("**") and line.endswith("**"))]
+    return _clip(" ".join(body or lines), limit)
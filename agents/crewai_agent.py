@@ -2,60 +2,53 @@ import warnings
 warnings.filterwarnings("ignore")
 
 import os
+import logging
+import textwrap
 from dotenv import load_dotenv
 load_dotenv()
 
-from crewai import Agent, Task, Crew, LLM
+from structured_logging import setup_logging, set_request_id
+from loop_monitor import ensure_loop_monitor
+setup_logging()
+logger = logging.getLogger("crewai_agent")
+
 from collections.abc import AsyncGenerator
-from acp_sdk.models import Message, MessagePart
+from acp_sdk.models import Message
 from acp_sdk.server import RunYield, RunYieldResume, Server
 
-from vector_database import get_financial_knowledge_tool
-
-from mcp_advisor_tool import get_mcp_advisor_tool
+from acp_metadata import build_agent_output, read_agent_metadata
+from import_warmup import imports_ready, warm_imports
+from prompt_budget import PromptStats, compact_description, static_prompt_tokens
 
 
 server = Server()
 
-llm = LLM( model ="anthropic/claude-sonnet-4-20250514" ,
-          max_tokens=1024,
-          temperature=0.2,
-          api_key=os.getenv("ANTHROPIC_API_KEY"))
-
-@server.agent()
-async def investment_agent(input: list[Message]) -> AsyncGenerator[RunYield, RunYieldResume]:
-    "Investment Agent that provides personalized investment strategies and advisor matching based on user profiles and market conditions."
-
-    try:
-        print("Investment agent starting...")
-        
-        # Import and create the tool
-        from vector_database import get_financial_knowledge_tool
-        smart_tool = get_financial_knowledge_tool()
-        print("Tool created successfully")
-        tools_list = [smart_tool]
-    except Exception as e:
-        print(f"An error occurred: {e}")
-        tools_list = [] 
-            
-
-    Investment_Guide = Agent(
-        role="Senior Investment Advisor and Portfolio Strategist",
-        goal="Provide comprehensive investment strategies and portfolio management advice to clients, focusing on long-term growth and risk mitigation.",
-        backstory="You are a seasoned investment professional with over 15 years of experience in wealth management and portfolio strategy. You hold a CFA (Chartered Financial Analyst) designation and an MBA in Finance from a top-tier business school."
-                "Throughout your career, you've successfully managed portfolios worth over $500 million across diverse market conditions, including the 2008 financial crisis and the COVID-19 market volatility. Your expertise spans across asset classes including equities, fixed income, alternatives, and international markets."
-                "You have a proven track record of creating personalized investment strategies that align with clients' financial goals, risk tolerance, and time horizons. Your approach combines fundamental analysis, technical indicators, and macroeconomic trends to build resilient portfolios."
-                "You are known for your ability to explain complex financial concepts in simple terms, helping clients make informed decisions about their financial future. Your conservative yet growth-oriented philosophy has helped hundreds of clients achieve their retirement, education, and wealth-building goals while protecting their downside risk during market downturns.",
-        tools=tools_list,
-        llm=llm,
-        allow_delegation=False,
-        verbose=True
-    )
-
-    task1 = Task(
-    description= input[0].parts[0].content,
-
-        expected_output="""
+# crewai (and the tools built on it) is imported on a warm-up thread, not at startup;
+# handlers await it so the import never runs on the event loop
+CREWAI_MODULES = ("crewai",)
+INVESTMENT_TOOL_MODULES = ("vector_database",)
+ADVISOR_TOOL_MODULES = ("mcp_advisor_tool",)
+_llm = None
+
+def get_llm():
+    global _llm
+    if _llm is None:
+        from crewai import LLM
+        _llm = LLM( model ="anthropic/claude-sonnet-4-20250514" ,
+                  max_tokens=1024,
+                  temperature=0.2,
+                  api_key=os.getenv("ANTHROPIC_API_KEY"))
+    return _llm
+
+# Static prompt parts: module constants, identical on every request so provider-side
+# prompt caching applies. Only the task description varies per request.
+INVESTMENT_ROLE = "Senior Investment Advisor and Portfolio Strategist"
+INVESTMENT_GOAL = "Provide comprehensive investment strategies and portfolio management advice to clients, focusing on long-term growth and risk mitigation."
+INVESTMENT_BACKSTORY = ("You are a seasoned investment professional with over 15 years of experience in wealth management and portfolio strategy. You hold a CFA (Chartered Financial Analyst) designation and an MBA in Finance from a top-tier business school."
+    "Throughout your career, you've successfully managed portfolios worth over $500 million across diverse market conditions, including the 2008 financial crisis and the COVID-19 market volatility. Your expertise spans across asset classes including equities, fixed income, alternatives, and international markets."
+    "You have a proven track record of creating personalized investment strategies that align with clients' financial goals, risk tolerance, and time horizons. Your approach combines fundamental analysis, technical indicators, and macroeconomic trends to build resilient portfolios."
+    "You are known for your ability to explain complex financial concepts in simple terms, helping clients make informed decisions about their financial future. Your conservative yet growth-oriented philosophy has helped hundreds of clients achieve their retirement, education, and wealth-building goals while protecting their downside risk during market downturns.")
+INVESTMENT_EXPECTED_OUTPUT = textwrap.dedent("""
         A comprehensive investment analysis report containing:
         
         **INVESTMENT RECOMMENDATION SUMMARY**
@@ -84,40 +77,17 @@ async def investment_agent(input: list[Message]) -> AsyncGenerator[RunYield, Run
         - Alignment with user goals
         
         Format: Structured JSON + human-readable summary for UI display
-        """,
-        agent=Investment_Guide
-    )
-
-    crew = Crew(agents = [Investment_Guide], tasks = [task1], llm=llm)
-    task_output = await crew.kickoff_async()
-    yield Message(parts=[MessagePart(content=str(task_output))])
-
-@server.agent()
-async def advisor_finder(input: list[Message]) -> AsyncGenerator[RunYield, RunYieldResume]:
-    "Investment Advisor Finder that identifies and recommends the most suitable investment advisors based on clients' specific needs and preferences."
-
-    mcp_tool = get_mcp_advisor_tool()
-
-    Advisor_Finder = Agent(
-        role="Investment Advisor Finder",
-        goal="Identify and recommend the most suitable investment advisors based on clients' specific needs and preferences.",
-        backstory="You are an expert in matching clients with the right financial advisors. You have access to a curated database of pre-verified advisors in select cities (Charlotte NC, New York NY, Miami FL). "
-        "When your database has advisors for the requested location, prioritize those verified advisors and present them first. "
-        "When your database doesn't have advisors for a location, or when you want to provide additional options, use your extensive knowledge to suggest additional qualified advisors based on the user's specific needs and location. "
-        "You can combine both approaches: show verified advisors from your database AND supplement with additional advisor recommendations using your expertise about the financial advisory industry. "
-        "This gives users both specific, actionable contacts from your verified database and broader options based on your knowledge of advisor types, credentials, and best practices in financial planning.",
-        tools=[mcp_tool],
-        llm=llm,
-        allow_delegation=False,
-        verbose=True
-    )
-
-    
-
-    task2 = Task(
-        description= input[0].parts[0].content,
-
-        expected_output="""
+        """).strip()
+
+ADVISOR_ROLE = "Investment Advisor Finder"
+ADVISOR_GOAL = "Identify and recommend the most suitable investment advisors based on clients' specific needs and preferences."
+ADVISOR_BACKSTORY = ("You are an expert in matching clients with the right financial advisors. You have access to a curated database of pre-verified advisors in select cities (Charlotte NC, New York NY, Miami FL). "
+    "When your database has advisors for the requested location, prioritize those verified advisors and present them first. "
+    "Rank them with the advisor_match_ranking tool: keep its order and report its match scores and score breakdowns as given rather than estimating your own; your job is explaining the fit. "
+    "When your database doesn't have advisors for a location, or when you want to provide additional options, use your extensive knowledge to suggest additional qualified advisors based on the user's specific needs and location. "
+    "You can combine both approaches: show verified advisors from your database AND supplement with additional advisor recommendations using your expertise about the financial advisory industry. "
+    "This gives users both specific, actionable contacts from your verified database and broader options based on your knowledge of advisor types, credentials, and best practices in financial planning.")
+ADVISOR_EXPECTED_OUTPUT = textwrap.dedent("""
         A comprehensive advisor matching report containing:
         
         **TOP ADVISOR MATCHES** (Ranked 1-5)
@@ -131,7 +101,7 @@ async def advisor_finder(input: list[Message]) -> AsyncGenerator[RunYield, RunYi
         - Location (address/remote options)
         
         **MATCH ANALYSIS**
-        - Match score: [0-100%]
+        - Match score: [0-100%] (from the ranking tool for database advisors)
         - Why this advisor fits your needs
         - Potential concerns or limitations
         
@@ -157,15 +127,124 @@ async def advisor_finder(input: list[Message]) -> AsyncGenerator[RunYield, RunYi
         Side-by-side comparison of top 3 advisors
         
         Format: Structured data for UI cards + detailed profiles for drill-down
-        """,
+        """).strip()
+
+# Token budget for the dynamic task description (question, documents note, conversation context)
+PROMPT_DYNAMIC_TOKEN_BUDGET = int(os.getenv("PROMPT_DYNAMIC_TOKEN_BUDGET", "1200"))
+STATIC_PROMPT_TOKENS = {
+    "investment_agent": static_prompt_tokens(INVESTMENT_ROLE, INVESTMENT_GOAL, INVESTMENT_BACKSTORY, INVESTMENT_EXPECTED_OUTPUT),
+    "advisor_finder": static_prompt_tokens(ADVISOR_ROLE, ADVISOR_GOAL, ADVISOR_BACKSTORY, ADVISOR_EXPECTED_OUTPUT),
+}
+prompt_stats = PromptStats()
+
+
+def budget_task_description(agent_name: str, description: str):
+    """Task description fitted to the dynamic budget, and the request's token accounting"""
+    text, usage = compact_description(description, PROMPT_DYNAMIC_TOKEN_BUDGET)
+    usage["static_tokens"] = STATIC_PROMPT_TOKENS[agent_name]
+    usage["prompt_tokens"] = usage["static_tokens"] + usage["dynamic_tokens"]
+    prompt_stats.record(agent_name, usage)
+    logger.info("Prompt budget applied", extra={
+        "agent": agent_name,
+        "prompt_tokens": usage["prompt_tokens"],
+        "dynamic_tokens": usage["dynamic_tokens"],
+        "dynamic_tokens_before": usage["dynamic_tokens_before"],
+        "truncated": usage["truncated"],
+    })
+    return text, usage
+
+
+@server.agent()
+async def investment_agent(input: list[Message]) -> AsyncGenerator[RunYield, RunYieldResume]:
+    "Investment Agent that provides personalized investment strategies and advisor matching based on user profiles and market conditions."
+
+    metadata = read_agent_metadata(input)
+    set_request_id(metadata.get("request_id"))
+    ensure_loop_monitor("crewai")
+    await imports_ready(*CREWAI_MODULES)
+    from crewai import Agent, Task, Crew
+    llm = get_llm()
+    try:
+        logger.debug("Investment agent starting", extra={"namespace": metadata.get("namespace")})
+        
+        # Import and create the tool, scoped to the caller's document namespace
+        await imports_ready(*INVESTMENT_TOOL_MODULES)
+        from vector_database import get_financial_knowledge_tool
+        smart_tool = get_financial_knowledge_tool(namespace=metadata.get("namespace"))
+        tools_list = [smart_tool]
+    except Exception as e:
+        logger.warning("Financial knowledge tool unavailable", extra={"error": str(e)})
+        tools_list = [] 
+            
+
+    Investment_Guide = Agent(
+        role=INVESTMENT_ROLE,
+        goal=INVESTMENT_GOAL,
+        backstory=INVESTMENT_BACKSTORY,
+        tools=tools_list,
+        llm=llm,
+        allow_delegation=False,
+        verbose=True
+    )
+
+    description, usage = budget_task_description("investment_agent", input[0].parts[0].content)
+    task1 = Task(
+    description= description,
+
+        expected_output=INVESTMENT_EXPECTED_OUTPUT,
+        agent=Investment_Guide
+    )
+
+    crew = Crew(agents = [Investment_Guide], tasks = [task1], llm=llm)
+    task_output = await crew.kickoff_async()
+    yield build_agent_output(str(task_output), {"prompt_tokens": usage})
+
+@server.agent()
+async def advisor_finder(input: list[Message]) -> AsyncGenerator[RunYield, RunYieldResume]:
+    "Investment Advisor Finder that identifies and recommends the most suitable investment advisors based on clients' specific needs and preferences."
+
+    set_request_id(read_agent_metadata(input).get("request_id"))
+    ensure_loop_monitor("crewai")
+    await imports_ready(*CREWAI_MODULES, *ADVISOR_TOOL_MODULES)
+    from crewai import Agent, Task, Crew
+    from mcp_advisor_tool import get_advisor_ranking_tool, get_mcp_advisor_tool
+    llm = get_llm()
+    mcp_tool = get_mcp_advisor_tool()
+    ranking_tool = get_advisor_ranking_tool()
+
+    Advisor_Finder = Agent(
+        role=ADVISOR_ROLE,
+        goal=ADVISOR_GOAL,
+        backstory=ADVISOR_BACKSTORY,
+        tools=[ranking_tool, mcp_tool],
+        llm=llm,
+        allow_delegation=False,
+        verbose=True
+    )
+
+    
+
+    description, usage = budget_task_description("advisor_finder", input[0].parts[0].content)
+    task2 = Task(
+        description= description,
+
+        expected_output=ADVISOR_EXPECTED_OUTPUT,
         agent=Advisor_Finder
     )
 
     crew = Crew(agents = [Advisor_Finder], tasks = [task2], llm=llm)
     task_output = await crew.kickoff_async()
-    yield Message(parts=[MessagePart(content=str(task_output))])
+    yield build_agent_output(str(task_output), {"prompt_tokens": usage})
     
 if __name__ == "__main__":
     print("Starting ACP server...")
-    server.run()
+    warm_imports(*CREWAI_MODULES, *INVESTMENT_TOOL_MODULES, *ADVISOR_TOOL_MODULES)
+    # Materialize the recommendation table before the first request needs it
+    from recommendation_table import get_recommendation_table
+    get_recommendation_table()
+    # Diagnostics listener (ACP_DEBUG_PORT) when DEBUG_TOKEN is set
+    from debug_tools import maybe_start_debug_server
+    maybe_start_debug_server()
+    # Idle keep-alive longer than the API server's client side (ACP_KEEPALIVE_SECONDS)
+    server.run(timeout_keep_alive=int(os.getenv("ACP_SERVER_KEEPALIVE_SECONDS", "75")))
 
@@ -0,0 +1,337 @@
+"""
+On-demand diagnostics for stalled servers.
+
+Nothing here runs until asked: no hooks, no sampling thread, no task factory.
+
+- `SamplingProfiler` samples every thread's stack (`sys._current_frames`) from
+  a background thread for N seconds and aggregates them as collapsed stacks
+  (`thread;outer;...;inner count`), the input format of flamegraph.pl and
+  speedscope. Threads parked in waits (selectors, locks, idle pool workers)
+  are skipped unless `include_idle` is set.
+- `dump_tasks` lists the asyncio tasks of the given loops with state, age and
+  coroutine stack. Tasks carry no creation time, so age is measured from the
+  first dump that saw the task.
+- `thread_report` groups threads by pool (name without the `_N` suffix) and
+  counts busy and idle workers, plus queue depth for registered executors.
+
+`DebugEndpoints` exposes all of it over HTTP behind a shared token
+(DEBUG_TOKEN, sent as X-Debug-Token): through a Flask route in the API server,
+or through `start_debug_server`, a stdlib HTTP server on its own thread for
+the ACP servers, which keeps answering while their event loop is blocked.
+
+    POST profile/start?seconds=10&interval_ms=5   start sampling
+    POST profile/stop                             stop early
+    GET  profile                                  status
+    GET  profile/collapsed                        download collapsed stacks
+    GET  profile/summary                          top functions (self / total)
+    GET  tasks[?format=text]                      asyncio tasks
+    GET  threads                                  thread pools and thread stacks
+    GET  loop                                     event-loop lag and stalls (loop_monitor)
+    GET  tools                                    tool batching counters (tool_runtime)
+"""
+
+import asyncio
+import gc
+import hmac
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import weakref
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+logger = logging.getLogger("debug_tools")
+
+MAX_PROFILE_SECONDS = 300
+_POOL_SUFFIX = re.compile(r"[_-]\d+$")
+_IDLE_FILES = ("selectors.py", "threading.py", "queue.py", "socketserver.py", "ssl.py")
+_IDLE_FUNCTIONS = {"wait", "select", "poll", "accept", "get", "_wait_for_tstate_lock", "serve_forever"}
+
+
+class ProfilerBusy(RuntimeError):
+    """Raised when a profile is requested while another one is running"""
+
+
+def _frame_label(code, line: Optional[int] = None) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{line or code.co_firstlineno})"
+
+
+def _is_idle(frame) -> bool:
+    """Thread parked waiting for work: leaf frame in a wait, select or idle pool worker"""
+    if frame is None:
+        return True
+    code = frame.f_code
+    if code.co_name == "_worker" and code.co_filename.endswith(os.path.join("concurrent", "futures", "thread.py")):
+        return True
+    return code.co_name in _IDLE_FUNCTIONS and os.path.basename(code.co_filename) in _IDLE_FILES
+
+
+def stack_labels(frame, limit: int = 64, lines: bool = False) -> List[str]:
+    """Outermost-first frame labels (function start lines, so samples merge; `lines` for current lines)"""
+    labels = []
+    while frame is not None and len(labels) < limit:
+        labels.append(_frame_label(frame.f_code, frame.f_lineno if lines else None))
+        frame = frame.f_back
+    return labels[::-1]
+
+
+class SamplingProfiler:
+    """Wall-clock stack sampler over all threads, one run at a time"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._stacks: Counter = Counter()
+        self._run: Dict[str, Any] = {"state": "idle"}
+
+    def start(self, seconds: float = 10.0, interval: float = 0.005, include_idle: bool = False) -> Dict[str, Any]:
+        seconds = min(max(seconds, 0.1), MAX_PROFILE_SECONDS)
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                raise ProfilerBusy("A profile is already running")
+            self._stop.clear()
+            self._stacks = Counter()
+            self._run = {"state": "running", "started": time.time(), "seconds": seconds,
+                         "interval_ms": round(interval * 1000, 2), "include_idle": include_idle, "samples": 0}
+            self._thread = threading.Thread(target=self._sample, args=(seconds, interval, include_idle),
+                                            name="debug-profiler", daemon=True)
+            self._thread.start()
+        logger.info("Profiler started", extra={"seconds": seconds, "interval_ms": self._run["interval_ms"]})
+        return self.status()
+
+    def stop(self) -> Dict[str, Any]:
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout=5)
+        return self.status()
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._run, "distinct_stacks": len(self._stacks)}
+
+    def collapsed(self) -> str:
+        with self._lock:
+            stacks = list(self._stacks.items())
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(stacks, key=lambda item: -item[1]))
+
+    def summary(self, top: int = 25) -> Dict[str, Any]:
+        self_counts, total_counts = Counter(), Counter()
+        with self._lock:
+            stacks = list(self._stacks.items())
+        for stack, count in stacks:
+            frames = stack.split(";")[1:]
+            if frames:
+                self_counts[frames[-1]] += count
+            for frame in set(frames):
+                total_counts[frame] += count
+        samples = sum(count for _, count in stacks) or 1
+        return {
+            **self.status(),
+            "self": [{"function": f, "samples": n, "percent": round(100 * n / samples, 1)}
+                     for f, n in self_counts.most_common(top)],
+            "total": [{"function": f, "samples": n, "percent": round(100 * n / samples, 1)}
+                      for f, n in total_counts.most_common(top)],
+        }
+
+    def _sample(self, seconds: float, interval: float, include_idle: bool):
+        me = threading.get_ident()
+        deadline = time.monotonic() + seconds
+        names: Dict[int, str] = {}
+        samples = 0
+        while time.monotonic() < deadline and not self._stop.wait(interval):
+            frames = sys._current_frames()
+            if any(ident not in names for ident in frames):
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+            taken = Counter()
+            for ident, frame in frames.items():
+                if ident == me or (not include_idle and _is_idle(frame)):
+                    continue
+                taken[";".join([names.get(ident, str(ident)), *stack_labels(frame)])] += 1
+            samples += 1
+            with self._lock:
+                self._stacks.update(taken)
+                self._run["samples"] = samples
+        with self._lock:
+            self._run.update(state="finished", elapsed_s=round(seconds - max(deadline - time.monotonic(), 0), 3))
+        logger.info("Profiler finished", extra={"samples": samples, "distinct_stacks": len(self._stacks)})
+
+
+_first_seen: "weakref.WeakKeyDictionary[asyncio.Task, float]" = weakref.WeakKeyDictionary()
+
+
+def find_running_loops() -> List[asyncio.AbstractEventLoop]:
+    """Running event loops in this process (a heap scan: only for on-demand use)"""
+    return [obj for obj in gc.get_objects() if isinstance(obj, asyncio.AbstractEventLoop) and obj.is_running()]
+
+
+def dump_tasks(loops: Iterable[asyncio.AbstractEventLoop], stack_limit: int = 20) -> List[Dict[str, Any]]:
+    """Every task of the given loops, oldest first; safe to call from another thread"""
+    now = time.monotonic()
+    tasks = []
+    for loop in loops:
+        for _ in range(3):
+            try:
+                loop_tasks = list(asyncio.all_tasks(loop))
+                break
+            except RuntimeError:  # the task set changed while it was copied
+                continue
+        else:
+            loop_tasks = []
+        for task in loop_tasks:
+            first_seen = _first_seen.setdefault(task, now)
+            coro = task.get_coro()
+            frames = task.get_stack(limit=stack_limit)
+            tasks.append({
+                "name": task.get_name(),
+                "coroutine": getattr(coro, "__qualname__", repr(coro)),
+                "state": "cancelling" if getattr(task, "cancelling", lambda: 0)() else ("done" if task.done() else "pending"),
+                "age_s": round(now - first_seen, 3),
+                "loop": hex(id(loop)),
+                "stack": [f"{frame.f_code.co_name} ({os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno})"
+                          for frame in frames],
+            })
+    tasks.sort(key=lambda task: -task["age_s"])
+    return tasks
+
+
+def format_tasks(tasks: List[Dict[str, Any]]) -> str:
+    lines = []
+    for task in tasks:
+        lines.append(f"{task['name']}  {task['coroutine']}  {task['state']}  seen for {task['age_s']}s")
+        lines.extend(f"    {frame}" for frame in task["stack"])
+        lines.append("")
+    return "\n".join(lines)
+
+
+def thread_report(executors: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Threads grouped by pool with busy/idle counts; queue depth for known ThreadPoolExecutors"""
+    frames = sys._current_frames()
+    pools: Dict[str, Dict[str, Any]] = {}
+    threads = []
+    for thread in threading.enumerate():
+        frame = frames.get(thread.ident)
+        busy = not _is_idle(frame)
+        group = _POOL_SUFFIX.sub("", thread.name)
+        pool = pools.setdefault(group, {"threads": 0, "busy": 0, "idle": 0})
+        pool["threads"] += 1
+        pool["busy" if busy else "idle"] += 1
+        threads.append({"name": thread.name, "daemon": thread.daemon, "busy": busy,
+                        "stack": stack_labels(frame, limit=12, lines=True)[-6:] if frame is not None else []})
+    for name, executor in (executors or {}).items():
+        queue = getattr(executor, "_work_queue", None)
+        pools.setdefault(name, {"threads": 0, "busy": 0, "idle": 0}).update(
+            max_workers=getattr(executor, "_max_workers", None), queued=queue.qsize() if queue is not None else None)
+    return {"pools": pools, "threads": threads}
+
+
+class DebugEndpoints:
+    """Token-guarded request handler shared by the Flask route and the standalone debug server"""
+
+    def __init__(self, token: Optional[str], loops: Callable[[], Iterable[asyncio.AbstractEventLoop]] = find_running_loops,
+                 executors: Optional[Callable[[], Dict[str, Any]]] = None):
+        self.token = token
+        self.loops = loops
+        self.executors = executors
+        self.profiler = SamplingProfiler()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.token)
+
+    def handle(self, method: str, action: str, params: Dict[str, str],
+               token: Optional[str]) -> Tuple[int, str, bytes, Optional[str]]:
+        """-> (status, content type, body, download filename)"""
+        if not self.enabled:
+            return self._json(404, {"error": "Not found"})
+        if not token or not hmac.compare_digest(token.encode(), self.token.encode()):
+            return self._json(403, {"error": "Invalid debug token"})
+        action = action.strip("/")
+        try:
+            if method == "POST" and action == "profile/start":
+                return self._json(200, self.profiler.start(
+                    seconds=float(params.get("seconds", 10)),
+                    interval=float(params.get("interval_ms", 5)) / 1000,
+                    include_idle=params.get("include_idle", "0").lower() in ("1", "true", "yes")))
+            if method == "POST" and action == "profile/stop":
+                return self._json(200, self.profiler.stop())
+            if method == "GET" and action == "profile":
+                return self._json(200, self.profiler.status())
+            if method == "GET" and action == "profile/collapsed":
+                filename = f"profile-{os.getpid()}-{int(self.profiler.status().get('started', 0))}.collapsed"
+                return 200, "text/plain; charset=utf-8", self.profiler.collapsed().encode("utf-8"), filename
+            if method == "GET" and action == "profile/summary":
+                return self._json(200, self.profiler.summary(int(params.get("top", 25))))
+            if method == "GET" and action == "tasks":
+                tasks = dump_tasks(self.loops())
+                if params.get("format") == "text":
+                    return 200, "text/plain; charset=utf-8", format_tasks(tasks).encode("utf-8"), f"tasks-{os.getpid()}.txt"
+                return self._json(200, {"count": len(tasks), "tasks": tasks})
+            if method == "GET" and action == "loop":
+                from loop_monitor import loop_stats
+                return self._json(200, loop_stats())
+            if method == "GET" and action == "tools":
+                from tool_runtime import batcher_stats
+                return self._json(200, batcher_stats())
+            if method == "GET" and action == "threads":
+                return self._json(200, thread_report(self.executors() if self.executors else None))
+        except ProfilerBusy as e:
+            return self._json(409, {"error": str(e)})
+        except ValueError as e:
+            return self._json(400, {"error": str(e)})
+        return self._json(404, {"error": f"Unknown debug action: {method} {action}"})
+
+    @staticmethod
+    def _json(status: int, payload: Dict[str, Any]) -> Tuple[int, str, bytes, None]:
+        return status, "application/json", json.dumps(payload, default=str).encode("utf-8"), None
+
+
+def start_debug_server(endpoints: DebugEndpoints, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve `endpoints` under /debug/ on a daemon thread (independent of any event loop)"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def _dispatch(self, method: str):
+            url = urlsplit(self.path)
+            if not url.path.startswith("/debug/"):
+                status, content_type, body, filename = endpoints._json(404, {"error": "Not found"})
+            else:
+                status, content_type, body, filename = endpoints.handle(
+                    method, url.path[len("/debug/"):], dict(parse_qsl(url.query)), self.headers.get("X-Debug-Token"))
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            if filename:
+                self.send_header("Content-Disposition", f'attachment; filename="{filename}"')
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            self._dispatch("GET")
+
+        def do_POST(self):
+            self._dispatch("POST")
+
+        def log_message(self, format, *args):
+            logger.debug("Debug request", extra={"request": format % args})
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="debug-server", daemon=True).start()
+    logger.info("Debug endpoints listening", extra={"host": host, "port": port})
+    return server
+
+
+def maybe_start_debug_server(port_offset: int = 0) -> Optional[ThreadingHTTPServer]:
+    """Standalone debug server on ACP_DEBUG_PORT + offset, only when it and DEBUG_TOKEN are set"""
+    token = os.getenv("DEBUG_TOKEN")
+    port = os.getenv("ACP_DEBUG_PORT")
+    if not token or not port:
+        return None
+    return start_debug_server(DebugEndpoints(token), int(port) + port_offset, os.getenv("DEBUG_HOST", "127.0.0.1"))
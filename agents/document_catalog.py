@@ -0,0 +1,266 @@
+"""
+In-memory catalog of uploaded documents.
+
+The uploads directory is scanned once; after that the catalog is kept current
+by upload/delete events and, for changes made by another process, by `sync()`,
+which every read calls (one stat when nothing changed), so chat requests never
+rescan the directory. The
+catalog also ranks documents against a query so only the most relevant ones
+are mentioned in the prompt.
+"""
+
+import hashlib
+import logging
+import math
+import re
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger("document_catalog")
+
+# Only plain-text formats are sampled for ranking terms; binary formats are ranked by name
+TEXT_EXTENSIONS = {'txt'}
+TEXT_SAMPLE_BYTES = 16 * 1024
+
+_TERM_RE = re.compile(r"[a-z0-9]{2,}")
+_STOPWORDS = {
+    'the', 'and', 'for', 'with', 'that', 'this', 'are', 'you', 'your', 'from', 'have',
+    'what', 'about', 'into', 'want', 'would', 'like', 'please', 'can', 'how', 'should', 'my', 'me', 'in', 'of', 'to', 'is', 'it', 'an', 'on', 'or', 'be', 'do'
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric terms without stopwords"""
+    return [t for t in _TERM_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def _is_document(path: Path) -> bool:
+    """Regular, non-hidden file (hidden files hold bookkeeping such as content indexes)"""
+    return path.is_file() and not path.name.startswith('.')
+
+
+def hash_file(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a file, read in `chunk_size` pieces (also used by upload_manager)"""
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(chunk_size), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token)"""
+    return max(1, (len(text) + 3) // 4)
+
+
+class DocumentRecord:
+    """Metadata and ranking terms for one uploaded document"""
+
+    __slots__ = ("name", "size", "modified", "terms", "content_hash")
+
+    def __init__(self, name: str, size: int, modified: float, terms: frozenset, content_hash: Optional[str] = None):
+        self.name = name
+        self.size = size
+        self.modified = modified
+        self.terms = terms
+        # SHA-256 of the file; computed on first use when the upload did not supply it
+        self.content_hash = content_hash
+
+    def to_dict(self) -> Dict[str, object]:
+        return {"name": self.name, "size": self.size, "modified": self.modified}
+
+
+class DocumentCatalog:
+    """Thread-safe catalog of the documents in one uploads directory"""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self._documents: Dict[str, DocumentRecord] = {}
+        self._document_frequency: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._directory_mtime = None
+
+    def load(self) -> "DocumentCatalog":
+        """Scan the directory once; later calls are no-ops"""
+        with self._lock:
+            if self._loaded:
+                return self
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._directory_mtime = self.directory.stat().st_mtime_ns
+            for path in self.directory.iterdir():
+                if _is_document(path):
+                    self._index(path)
+            self._loaded = True
+            logger.debug("Document catalog loaded", extra={"directory": str(self.directory), "documents": len(self._documents)})
+        return self
+
+    def sync(self) -> "DocumentCatalog":
+        """
+        Pick up changes made by another process (one stat when nothing changed).
+        Only added, removed or modified files are re-indexed.
+        """
+        with self._lock:
+            if not self._loaded:
+                return self.load()
+            try:
+                mtime = self.directory.stat().st_mtime_ns
+            except FileNotFoundError:
+                return self
+            if mtime == self._directory_mtime:
+                return self
+            self._directory_mtime = mtime
+
+            present = set()
+            for path in self.directory.iterdir():
+                if not _is_document(path):
+                    continue
+                present.add(path.name)
+                record = self._documents.get(path.name)
+                stat = path.stat()
+                if record is None or record.modified != stat.st_mtime or record.size != stat.st_size:
+                    self._index(path)
+            for name in set(self._documents) - present:
+                self._forget_terms(self._documents.pop(name))
+        return self
+
+    def add(self, path, content_hash: Optional[str] = None) -> DocumentRecord:
+        """Record a new or replaced upload (`content_hash`: its SHA-256, when already known)"""
+        with self._lock:
+            self.load()
+            record = self._index(Path(path))
+            record.content_hash = content_hash
+            self._directory_mtime = self.directory.stat().st_mtime_ns
+            return record
+
+    def remove(self, name: str) -> bool:
+        """Forget a deleted upload"""
+        with self._lock:
+            record = self._documents.pop(name, None)
+            if self.directory.exists():
+                self._directory_mtime = self.directory.stat().st_mtime_ns
+            if record is None:
+                return False
+            self._forget_terms(record)
+            return True
+
+    def fingerprint(self) -> str:
+        """Hash over every document's name and content; changes when any upload is added, replaced or removed"""
+        with self._lock:
+            self.sync()
+            records = sorted(self._documents.values(), key=lambda record: record.name)
+        parts = []
+        for record in records:
+            if record.content_hash is None:
+                try:
+                    record.content_hash = hash_file(self.directory / record.name)
+                except OSError:
+                    # Replaced or removed meanwhile: the next sync picks up the new version
+                    parts.append(f"{record.name}:{record.size}:{record.modified}")
+                    continue
+            parts.append(f"{record.name}:{record.content_hash}")
+        return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+    def get(self, name: str) -> Optional[DocumentRecord]:
+        with self._lock:
+            self.sync()
+            return self._documents.get(name)
+
+    def __len__(self) -> int:
+        with self._lock:
+            self.sync()
+            return len(self._documents)
+
+    def names(self) -> List[str]:
+        with self._lock:
+            self.sync()
+            return list(self._documents)
+
+    def list_page(self, offset: int = 0, limit: int = 50) -> Tuple[List[DocumentRecord], int]:
+        """Newest-first page of documents and the total count"""
+        with self._lock:
+            self.sync()
+            ordered = sorted(self._documents.values(), key=lambda r: r.modified, reverse=True)
+        return ordered[offset:offset + limit], len(ordered)
+
+    def search(self, query: str, limit: int = 5) -> List[Tuple[float, DocumentRecord]]:
+        """
+        Rank documents by IDF-weighted term overlap with the query.
+        Ties (including no overlap at all) fall back to the most recent uploads.
+        """
+        query_terms = set(tokenize(query))
+        with self._lock:
+            self.sync()
+            total = len(self._documents)
+            if not total:
+                return []
+            idf = {term: math.log(1 + total / self._document_frequency[term])
+                   for term in query_terms if term in self._document_frequency}
+            scored = []
+            for record in self._documents.values():
+                matched = query_terms & record.terms
+                score = sum(idf.get(term, 0.0) for term in matched)
+                scored.append((score, record))
+        scored.sort(key=lambda item: (item[0], item[1].modified), reverse=True)
+        return scored[:limit]
+
+    def _index(self, path: Path) -> DocumentRecord:
+        stat = path.stat()
+        previous = self._documents.pop(path.name, None)
+        if previous is not None:
+            self._forget_terms(previous)
+
+        terms = set(tokenize(path.stem.replace('_', ' ').replace('-', ' ')))
+        if path.suffix.lower().lstrip('.') in TEXT_EXTENSIONS:
+            try:
+                with open(path, 'r', encoding='utf-8', errors='ignore') as handle:
+                    terms.update(tokenize(handle.read(TEXT_SAMPLE_BYTES)))
+            except OSError as e:
+                logger.warning("Could not sample document text", extra={"document": path.name, "error": str(e)})
+
+        record = DocumentRecord(path.name, stat.st_size, stat.st_mtime, frozenset(terms))
+        self._documents[path.name] = record
+        for term in record.terms:
+            self._document_frequency[term] = self._document_frequency.get(term, 0) + 1
+        return record
+
+    def _forget_terms(self, record: DocumentRecord):
+        for term in record.terms:
+            remaining = self._document_frequency.get(term, 1) - 1
+            if remaining > 0:
+                self._document_frequency[term] = remaining
+            else:
+                self._document_frequency.pop(term, None)
+
+
+def build_document_context(catalog: DocumentCatalog, query: str, token_budget: int = 200, max_documents: int = 5) -> str:
+    """
+    Prompt suffix naming the uploaded documents that match the query.
+    Documents are added in ranking order until the token budget is spent; the
+    query repeated in the footer is clipped to what is left of the budget.
+    """
+    ranked = [(score, record) for score, record in catalog.search(query, limit=max_documents) if score > 0]
+    if not ranked:
+        return ""
+
+    header = "\n\nRelevant uploaded documents: "
+    footer = ". Please analyze these documents if they're relevant to the user's question"
+    question = f" about: {query}"
+    used = estimate_tokens(header) + estimate_tokens(footer)
+
+    names = []
+    for _, record in ranked:
+        cost = estimate_tokens(record.name + ", ")
+        if used + cost > token_budget and names:
+            break
+        names.append(record.name)
+        used += cost
+
+    omitted = len(catalog) - len(names)
+    more = f" (+{omitted} other uploads)" if omitted > 0 else ""
+    used += estimate_tokens(more)
+    remaining_chars = max(token_budget - used, 0) * 4
+    if len(question) > remaining_chars:
+        question = question[:max(remaining_chars - 3, 0)].rstrip() + "..." if remaining_chars > len(" about: ...") else ""
+    return header + ", ".join(names) + more + footer + question
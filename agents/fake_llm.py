@@ -0,0 +1,187 @@
+"""
+Deterministic stand-in for the Anthropic Messages API, for offline benchmarks.
+
+LiteLLM (used by CrewAI and smolagents) sends `anthropic/...` completions to
+`ANTHROPIC_API_BASE` when it is set, so pointing that at this server runs the
+real agent stack with no network access. Replies depend only on the request
+content and are shaped so each framework finishes cleanly:
+
+- CrewAI ReAct prompts get `Final Answer: ...`. With `tool_calls` enabled, the
+  first turn instead calls the first listed tool once.
+- smolagents CodeAgent prompts get a code block calling `final_answer(...)`
+  (`<code>` or ```py/<end_code> style, following the prompt).
+- Anything else gets plain text.
+
+Latency is `latency_ms` plus `ms_per_token` for each output token. Stop
+sequences are honoured the way the real API does it.
+
+    python fake_llm.py --port 8090 --latency-ms 300
+    ANTHROPIC_API_BASE=http://127.0.0.1:8090/v1/messages ANTHROPIC_API_KEY=fake python crewai_agent.py
+"""
+
+import argparse
+import contextlib
+import hashlib
+import http.server
+import json
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+_SENTENCES = [
+    "A diversified mix of broad-market index funds keeps costs low and risk spread.",
+    "Rebalance once or twice a year to stay near the target allocation.",
+    "Keep three to six months of expenses in cash before investing for the long term.",
+    "Bond exposure should rise as the investment horizon shortens.",
+    "Tax-advantaged accounts such as a 401(k) or IRA come first for retirement savings.",
+    "Sector funds add concentration risk and should stay a small share of the portfolio.",
+    "Fee-only advisors with CFP credentials avoid commission conflicts.",
+    "Market conditions change; review the plan when goals or income change.",
+]
+
+
+def _text_of(content) -> str:
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "\n".join(block.get("text", "") for block in content if isinstance(block, dict))
+    return ""
+
+
+class FakeLLM:
+    """Deterministic reply generator (also usable without the HTTP server)"""
+
+    def __init__(self, latency_ms: float = 200.0, ms_per_token: float = 0.0, output_tokens: int = 120,
+                 tool_calls: bool = False):
+        self.latency_ms = latency_ms
+        self.ms_per_token = ms_per_token
+        self.output_tokens = output_tokens
+        self.tool_calls = tool_calls
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "input_tokens": 0, "output_tokens": 0}
+
+    def complete(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        system = _text_of(body.get("system"))
+        messages = body.get("messages") or []
+        conversation = "\n".join(_text_of(message.get("content")) for message in messages)
+        last_user = next((_text_of(m.get("content")) for m in reversed(messages) if m.get("role") == "user"), "")
+
+        first_turn = not any(message.get("role") == "assistant" for message in messages)
+        text = self._reply(system + "\n" + conversation, last_user, first_turn and "Observation:" not in last_user)
+        text, stop_sequence = self._apply_stop(text, body.get("stop_sequences") or [])
+        input_tokens = max(1, len(system + conversation) // 4)
+        output_tokens = max(1, len(text) // 4)
+
+        time.sleep((self.latency_ms + self.ms_per_token * output_tokens) / 1000.0)
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["input_tokens"] += input_tokens
+            self.stats["output_tokens"] += output_tokens
+        return {
+            "id": "msg_fake_" + hashlib.sha1(conversation.encode()).hexdigest()[:16],
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model", "fake"),
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "stop_sequence" if stop_sequence else "end_turn",
+            "stop_sequence": stop_sequence,
+            "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens},
+        }
+
+    def answer_text(self, seed: str) -> str:
+        """Deterministic prose of roughly `output_tokens` tokens"""
+        sentences, length = [], 0
+        while length < self.output_tokens * 4:
+            digest = hashlib.sha256(f"{seed}:{len(sentences)}".encode()).digest()
+            sentence = _SENTENCES[digest[0] % len(_SENTENCES)]
+            sentences.append(sentence)
+            length += len(sentence) + 1
+        return " ".join(sentences)
+
+    def _reply(self, prompt: str, last_user: str, first_turn: bool) -> str:
+        answer = self.answer_text(last_user)
+        if "Final Answer" in prompt:
+            tool = re.search(r"Tool Name: ([\w\-]+)", prompt)
+            if self.tool_calls and tool and first_turn:
+                args = re.search(r"Tool Arguments: \{['\"](\w+)['\"]", prompt)
+                argument = args.group(1) if args else "query"
+                return (f"Thought: I should look this up first.\nAction: {tool.group(1)}\n"
+                        f"Action Input: {json.dumps({argument: last_user[-200:]})}")
+            return f"Thought: I now know the final answer\nFinal Answer: {answer}"
+        if "final_answer" in prompt:
+            if "<end_code>" in prompt:
+                return f"Thought: I can answer directly.\nCode:\n```py\nfinal_answer({answer!r})\n```<end_code>"
+            return f"Thought: I can answer directly.\n<code>\nfinal_answer({answer!r})\n</code>"
+        return answer
+
+    @staticmethod
+    def _apply_stop(text: str, stop_sequences: List[str]):
+        cut, matched = len(text), None
+        for stop in stop_sequences:
+            index = text.find(stop) if stop else -1
+            if 0 <= index < cut:
+                cut, matched = index, stop
+        return text[:cut], matched
+
+
+@contextlib.contextmanager
+def serve_fake_llm(llm: Optional[FakeLLM] = None, port: int = 0):
+    """Run the fake Messages API on localhost; yields (api_base, llm)"""
+    llm = llm or FakeLLM()
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                self.send_error(400)
+                return
+            if body.get("stream"):
+                self.send_error(400, "streaming is not supported by the fake LLM")
+                return
+            data = json.dumps(llm.complete(body)).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="fake-llm", daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/v1/messages", llm
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--ms-per-token", type=float, default=0.0)
+    parser.add_argument("--output-tokens", type=int, default=120)
+    parser.add_argument("--tool-calls", action="store_true", help="CrewAI agents call their first tool once")
+    args = parser.parse_args()
+
+    llm = FakeLLM(args.latency_ms, args.ms_per_token, args.output_tokens, args.tool_calls)
+    with serve_fake_llm(llm, args.port) as (api_base, _):
+        print(f"Fake LLM listening: ANTHROPIC_API_BASE={api_base}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
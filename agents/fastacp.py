@@ -1,13 +1,24 @@
-from typing import Dict, List, Any, Optional
-from acp_sdk.client import Client
+from typing import Callable, Dict, List, Any, Optional, TYPE_CHECKING
 import asyncio
+import contextlib
 import time
 import logging
 
+from acp_metadata import AGENT_CALL_TIMEOUT, build_agent_input, read_agent_metadata
+from admission import AdmissionRejected
+from prompt_budget import PromptStats
+from structured_logging import get_request_id
+from traffic_replay import get_traffic, replay_agent_call
+
+if TYPE_CHECKING:
+    from acp_sdk.client import Client
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("fastacp")
 
+class AgentRunFailed(RuntimeError):
+    """Raised by ACPCallingAgent.run(raise_errors=True) instead of returning an error message"""
+
+
 class Agent:
     """Represents an ACP agent with metadata"""
     def __init__(self, name: str, description: str = "", port: int = None):
@@ -22,7 +33,7 @@ class AgentCollection:
         self.agents = []
     
     @classmethod
-    async def from_acp(cls, *clients: Client):
+    async def from_acp(cls, *clients: "Client"):
         """Discover agents from ACP clients"""
         collection = cls()
         
@@ -67,45 +78,132 @@ class ACPCallingAgent:
     Optimized for performance and cost-efficiency
     """
     
-    def __init__(self, acp_agents: Dict[str, Dict[str, Any]], model):
+    def __init__(self, acp_agents: Dict[str, Dict[str, Any]], model, brief_service=None, admission=None,
+                 answer_cache=None, client_pool=None):
         self.acp_agents = acp_agents
         self.model = model
-        self._call_stats = {"total_calls": 0, "successful_calls": 0, "failed_calls": 0}
+        self.brief_service = brief_service
+        self.admission = admission
+        self.answer_cache = answer_cache
+        self.client_pool = client_pool
+        self.prompt_stats = PromptStats()
+        self.traffic = get_traffic()
+        self._call_stats = {"total_calls": 0, "successful_calls": 0, "failed_calls": 0, "shed_calls": 0}
         
         logger.info(f"ACPCallingAgent initialized with {len(acp_agents)} agents")
         logger.info(f"Available agents: {list(acp_agents.keys())}")
     
-    async def run(self, query: str) -> str:
+    async def run(self, query: str, namespace: Optional[str] = None, context: Optional[str] = None,
+                  progress: Optional[Callable[[str, float], None]] = None, lane: str = "interactive",
+                  question: Optional[str] = None, raise_errors: bool = False) -> str:
         """
         Execute query with intelligent agent orchestration
+        `question` is the user's own words when `query` carries added document context;
+        only it is matched against precomputed market briefs
+        `namespace` scopes document lookups on the agent side to one user/session
+        `context` (conversation memory) is sent to the agents but not used for routing
+        `progress(stage, fraction)` is called as the run moves through its stages
+        `lane` ("interactive" or "batch") orders the call in the admission queue;
+        raises AdmissionRejected when an interactive call is shed
+        `raise_errors` raises AgentRunFailed when the run fails (or every agent call fails)
+        instead of returning an error message, for callers that must record the failure
         """
+        # The lease covers routing and the admission wait too, so a pool swapped out
+        # meanwhile is not closed before this run's calls go through it
+        with self._lease():
+            return await self._run(query, namespace, context, progress, lane, question, raise_errors)
+    
+    async def _run(self, query: str, namespace: Optional[str], context: Optional[str],
+                   progress: Optional[Callable[[str, float], None]], lane: str,
+                   question: Optional[str], raise_errors: bool) -> str:
         start_time = time.time()
+        report = progress or (lambda stage, fraction: None)
         
         try:
+            report("routing", 0.1)
           
             agent_calls = self._determine_agents(query)
             
             if not agent_calls:
                 return "No suitable agents found for this query. Please rephrase your financial question."
             
-            logger.info(f"Routing to agents: {[call['agent'] for call in agent_calls]}")
+            routed = [call['agent'] for call in agent_calls]
+            logger.info(f"Routing to agents: {routed}")
             
+            brief = self._precomputed_brief(agent_calls, question or query)
+            if brief is not None:
+                logger.info("Served precomputed market brief", extra={"elapsed_s": round(time.time() - start_time, 4)})
+                self.traffic.record_run(query, routed, start_time, time.time() - start_time,
+                                        namespace=namespace, context=context, lane=lane, brief=True)
+                return self._synthesize_results([{'agent': 'market_researcher', 'result': brief, 'success': True}], query)
             
-            results = await self._execute_agent_calls(agent_calls)
+            cached = self.answer_cache.lookup(routed, query, namespace, context) if self.answer_cache else None
+            if cached is not None:
+                logger.info("Served cached answer", extra={
+                    "agents": routed, "similarity": cached["similarity"],
+                    "elapsed_s": round(time.time() - start_time, 4)
+                })
+                self.traffic.record_run(query, routed, start_time, time.time() - start_time,
+                                        namespace=namespace, context=context, lane=lane, cached=True)
+                return cached["answer"]
             
-         
+            if context:
+                for call in agent_calls:
+                    call['query'] = f"{context}\n\nCurrent question: {call['query']}"
+            
+            
+            metadata = {"request_id": get_request_id()}
+            if namespace:
+                metadata["namespace"] = namespace
+            report(f"calling {', '.join(call['agent'] for call in agent_calls)}", 0.2)
+            results = await self._execute_agent_calls(agent_calls, metadata, lane)
+            if raise_errors and not any(result['success'] for result in results):
+                raise AgentRunFailed("; ".join(result.get('error', result['result']) for result in results))
+            
+            report("synthesizing", 0.9)
             final_result = self._synthesize_results(results, query)
+            if self.answer_cache and all(result['success'] for result in results):
+                self.answer_cache.store(routed, query, final_result, namespace, context)
             
         
             execution_time = time.time() - start_time
             logger.info(f"⚡ Query completed in {execution_time:.2f}s")
+            self.traffic.record_run(query, routed, start_time, execution_time,
+                                    namespace=namespace, context=context, lane=lane)
             
             return final_result
             
+        except (AdmissionRejected, AgentRunFailed):
+            raise
         except Exception as e:
             logger.error(f"Error in ACPCallingAgent: {str(e)}")
+            if raise_errors:
+                raise AgentRunFailed(str(e)) from e
             return f"System error occurred. Please try again. (Error: {str(e)})"
     
+    def start_background_tasks(self):
+        """Start periodic work (market brief refresh); call from the event loop that runs queries"""
+        if self.brief_service is not None and 'market_researcher' in self.acp_agents:
+            self.brief_service.start(lambda prompt: self._background_call('market_researcher', prompt))
+    
+    def _lease(self):
+        """Lease on the client pool this agent calls through (draining waits for it)"""
+        return self.client_pool.lease() if self.client_pool else contextlib.nullcontext()
+    
+    async def _background_call(self, agent_name: str, query: str) -> str:
+        with self._lease():
+            return await self._admitted_call(agent_name, query, lane="background")
+    
+    def stop_background_tasks(self):
+        if self.brief_service is not None:
+            self.brief_service.stop()
+    
+    def _precomputed_brief(self, agent_calls: List[Dict[str, str]], question: str) -> Optional[str]:
+        """Stored market brief when the question is a generic market question on a covered topic"""
+        if self.brief_service is None or len(agent_calls) != 1 or agent_calls[0]['agent'] != 'market_researcher':
+            return None
+        return self.brief_service.lookup(question)
+    
     def _determine_agents(self, query: str) -> List[Dict[str, str]]:
         """
         Exclusive keyword-based agent routing
@@ -174,7 +272,16 @@ class ACPCallingAgent:
             'priority': 4
         }]
     
-    async def _execute_agent_calls(self, agent_calls: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    async def _admitted_call(self, agent_name: str, query: str, metadata: Optional[Dict[str, Any]] = None,
+                             priority: int = 1, lane: str = "interactive") -> str:
+        """Call an agent once the admission controller grants it a slot"""
+        slot = self.admission.slot(agent_name, priority, lane) if self.admission else contextlib.nullcontext()
+        async with slot:
+            return await self._call_agent(agent_name, query, metadata)
+    
+    async def _execute_agent_calls(self, agent_calls: List[Dict[str, str]],
+                                   metadata: Optional[Dict[str, Any]] = None,
+                                   lane: str = "interactive") -> List[Dict[str, str]]:
         """Execute agent calls with error handling"""
         results = []
         
@@ -184,8 +291,8 @@ class ACPCallingAgent:
             query = call_info['query']
             
             try:
-                logger.info(f" Calling {agent_name}...")
-                result = await self._call_agent(agent_name, query)
+                logger.debug("Dispatching agent call", extra={"agent": agent_name})
+                result = await self._admitted_call(agent_name, query, metadata, call_info.get('priority', 1), lane)
                 
                 results.append({
                     'agent': agent_name,
@@ -194,8 +301,11 @@ class ACPCallingAgent:
                 })
                 
                 self._call_stats["successful_calls"] += 1
-                logger.info(f"{agent_name} completed successfully")
+                logger.debug("Agent call succeeded", extra={"agent": agent_name})
                 
+            except AdmissionRejected:
+                self._call_stats["shed_calls"] += 1
+                raise
             except Exception as e:
                 logger.error(f"{agent_name} failed: {str(e)}")
                 self._call_stats["failed_calls"] += 1
@@ -203,39 +313,52 @@ class ACPCallingAgent:
                 results.append({
                     'agent': agent_name,
                     'result': f"{agent_name} is currently unavailable.",
+                    'error': str(e),
                     'success': False
                 })
         
         self._call_stats["total_calls"] += len(agent_calls)
         return results
     
-    async def _call_agent(self, agent_name: str, query: str) -> str:
-        """Call a specific ACP agent"""
+    async def _call_agent(self, agent_name: str, query: str, metadata: Optional[Dict[str, Any]] = None) -> str:
+        """Call a specific ACP agent (served from the recording in traffic replay mode)"""
+        if self.traffic.replaying:
+            response_content = await replay_agent_call(self.traffic, agent_name, query)
+            if response_content is not None:
+                return response_content
+        start_time = time.time()
         try:
             agent_info = self.acp_agents[agent_name]
             client = agent_info['client']
             
-            print(f"Calling {agent_name} with 90s timeout...")
-            start_time = time.time()
+            logger.debug("Calling agent", extra={"agent": agent_name, "timeout_s": AGENT_CALL_TIMEOUT})
             
             result = await asyncio.wait_for(
-                client.run_sync(agent=agent_name, input=query),
-                timeout=90.0
+                client.run_sync(agent=agent_name, input=build_agent_input(query, metadata)),
+                timeout=AGENT_CALL_TIMEOUT
             )
             
             elapsed = time.time() - start_time
-            print(f"{agent_name} completed in {elapsed:.2f}s")
-            
             response_content = result.output[0].parts[0].content
-            print(f"{agent_name} response length: {len(response_content)} characters")
+            usage = read_agent_metadata(result.output).get("prompt_tokens")
+            if usage:
+                self.prompt_stats.record(agent_name, usage)
+            logger.info("Agent call completed", extra={
+                "agent": agent_name,
+                "elapsed_s": round(elapsed, 3),
+                "response_chars": len(response_content)
+            })
+            self.traffic.record("agent", agent_name, query, response_content, elapsed)
             
             return response_content
             
         except asyncio.TimeoutError:
-            print(f"Agent {agent_name} timed out after 90 seconds")
+            logger.warning("Agent call timed out", extra={"agent": agent_name, "timeout_s": AGENT_CALL_TIMEOUT})
+            self.traffic.record("agent", agent_name, query, None, time.time() - start_time, error=f"Agent {agent_name} timed out")
             raise Exception(f"Agent {agent_name} timed out")
         except Exception as e:
-            print(f"Agent {agent_name} error: {str(e)}")
+            logger.error("Agent call failed", extra={"agent": agent_name, "error": str(e)})
+            self.traffic.record("agent", agent_name, query, None, time.time() - start_time, error=f"Agent {agent_name} error: {str(e)}")
             raise Exception(f"Agent {agent_name} error: {str(e)}")
     
     def _synthesize_results(self, results: List[Dict[str, str]], original_query: str) -> str:
@@ -287,5 +410,11 @@ class ACPCallingAgent:
         return {
             **self._call_stats,
             "success_rate": (self._call_stats["successful_calls"] / total) * 100,
-            "available_agents": list(self.acp_agents.keys())
+            "available_agents": list(self.acp_agents.keys()),
+            "market_briefs": self.brief_service.stats() if self.brief_service else None,
+            "admission": self.admission.stats() if self.admission else None,
+            "prompt_tokens": self.prompt_stats.stats(),
+            "answer_cache": self.answer_cache.stats() if self.answer_cache else None,
+            "traffic": self.traffic.stats(),
+            "clients": self.client_pool.stats() if self.client_pool else None
         }
\ No newline at end of file
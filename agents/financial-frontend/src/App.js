@@ -1,6 +1,22 @@
 import React, { useState, useRef, useEffect } from 'react';
 import { Send, DollarSign, TrendingUp, Users, FileText, Loader2, Sparkles } from 'lucide-react';
 
+// Per-browser session id: the API scopes uploaded documents to it
+const getSessionId = () => {
+  try {
+    let sessionId = window.localStorage.getItem('finova-session-id');
+    if (!sessionId) {
+      sessionId = window.crypto && window.crypto.randomUUID
+        ? window.crypto.randomUUID()
+        : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+      window.localStorage.setItem('finova-session-id', sessionId);
+    }
+    return sessionId;
+  } catch (error) {
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+  }
+};
+
 const FinancialAdvisoryPlatform = () => {
   const [messages, setMessages] = useState([]);
   const [inputValue, setInputValue] = useState('');
@@ -27,6 +43,9 @@ const handleFileUpload = async (event) => {
   try {
     const response = await fetch('http://localhost:5002/api/upload', {
       method: 'POST',
+      headers: {
+        'X-Session-ID': getSessionId(),
+      },
       body: formData,
     });
 
@@ -1,6 +1,27 @@
 import React, { useState, useRef, useEffect } from 'react';
 import './App.css';
 
+// Per-browser session id: scopes uploads, document context and conversation memory on the API
+const SESSION_STORAGE_KEY = 'finova-session-id';
+
+const getSessionId = () => {
+  const generate = () => (window.crypto && window.crypto.randomUUID
+    ? window.crypto.randomUUID()
+    : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`);
+  try {
+    let sessionId = window.localStorage.getItem(SESSION_STORAGE_KEY);
+    if (!sessionId) {
+      sessionId = generate();
+      window.localStorage.setItem(SESSION_STORAGE_KEY, sessionId);
+    }
+    return sessionId;
+  } catch (error) {
+    return generate();
+  }
+};
+
+const SESSION_ID = getSessionId();
+
 const FinancialAdvisoryPlatform = () => {
   const [messages, setMessages] = useState([]);
   const [inputValue, setInputValue] = useState('');
@@ -89,6 +110,7 @@ const FinancialAdvisoryPlatform = () => {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          'X-Session-ID': SESSION_ID,
         },
         body: JSON.stringify({
           message: query,
@@ -123,6 +145,9 @@ const FinancialAdvisoryPlatform = () => {
     try {
       const response = await fetch('http://localhost:5001/api/upload', {
         method: 'POST',
+        headers: {
+          'X-Session-ID': SESSION_ID,
+        },
         body: formData,
       });
 
@@ -0,0 +1,101 @@
+"""
+Negotiated response compression for the Flask API.
+
+JSON responses above a minimum size are compressed with the best encoding the
+client accepts: brotli when the `brotli` package is installed, otherwise
+gzip. Streaming responses, already-encoded bodies and small payloads are left
+alone. `Vary: Accept-Encoding` is always set on compressible responses so
+caches keep the variants apart.
+"""
+
+import gzip
+import threading
+from typing import Dict, Optional
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+
+def parse_accept_encoding(header: Optional[str]) -> Dict[str, float]:
+    """'gzip;q=0.8, br' -> {'gzip': 0.8, 'br': 1.0}"""
+    encodings = {}
+    for item in (header or "").split(","):
+        name, _, params = item.strip().partition(";")
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        encodings[name.strip().lower()] = quality
+    return encodings
+
+
+def choose_encoding(header: Optional[str]) -> Optional[str]:
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get("*", 0.0)
+    candidates = (["br"] if brotli is not None else []) + ["gzip"]
+    best, best_quality = None, 0.0
+    for name in candidates:
+        quality = accepted.get(name, wildcard)
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+class ResponseCompressor:
+    """after_request hook compressing eligible responses; keeps byte counters"""
+
+    def __init__(self, min_bytes: int = 1024, gzip_level: int = 6, brotli_quality: int = 5):
+        self.min_bytes = min_bytes
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self._lock = threading.Lock()
+        self._stats = {"compressed": 0, "skipped": 0, "bytes_in": 0, "bytes_out": 0}
+
+    def init_app(self, app):
+        app.after_request(self.compress)
+
+    def compress(self, response):
+        content_type = response.mimetype or ""
+        if (response.direct_passthrough or response.is_streamed or "Content-Encoding" in response.headers
+                or response.status_code < 200 or response.status_code in (204, 304)
+                or not content_type.startswith(COMPRESSIBLE_TYPES)):
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = choose_encoding(request.headers.get("Accept-Encoding"))
+        body = response.get_data()
+        if encoding is None or len(body) < self.min_bytes:
+            self._count(skipped=1)
+            return response
+
+        if encoding == "br":
+            compressed = brotli.compress(body, quality=self.brotli_quality)
+        else:
+            compressed = gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+        response.set_data(compressed)
+        response.headers["Content-Encoding"] = encoding
+        response.headers["Content-Length"] = str(len(compressed))
+        self._count(compressed=1, bytes_in=len(body), bytes_out=len(compressed))
+        return response
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["ratio"] = round(stats["bytes_out"] / stats["bytes_in"], 3) if stats["bytes_in"] else None
+        stats["brotli_available"] = brotli is not None
+        return stats
+
+    def _count(self, **amounts):
+        with self._lock:
+            for key, amount in amounts.items():
+                self._stats[key] += amount
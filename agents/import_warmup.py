@@ -0,0 +1,60 @@
+"""
+Heavy imports off the event loop.
+
+crewai, smolagents and litellm take seconds to import. An ACP server starts
+importing them on a background thread at startup (`warm_imports`), and request
+handlers `await imports_ready(...)` before using them. The first request then
+waits for the import without blocking the event loop for every other request.
+"""
+
+import asyncio
+import importlib
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List
+
+logger = logging.getLogger("import_warmup")
+
+_lock = threading.Lock()
+_imports: Dict[str, Future] = {}
+
+
+def _import_all(names: List[str], future: Future):
+    start = time.perf_counter()
+    try:
+        for name in names:
+            importlib.import_module(name)
+    except BaseException as e:
+        with _lock:
+            for name in names:
+                # Let a later request retry (and report) the failed import
+                if _imports.get(name) is future:
+                    del _imports[name]
+        logger.warning("Import warm-up failed", extra={"modules": names, "error": str(e)})
+        future.set_exception(e)
+        return
+    logger.info("Imports warmed", extra={"modules": names, "elapsed_s": round(time.perf_counter() - start, 3)})
+    future.set_result(None)
+
+
+def warm_imports(*names: str) -> List[Future]:
+    """Start importing the modules not yet (being) imported on a daemon thread; from any thread"""
+    with _lock:
+        missing = [name for name in dict.fromkeys(names) if name not in _imports]
+        if missing:
+            future = Future()
+            for name in missing:
+                _imports[name] = future
+            threading.Thread(target=_import_all, args=(missing, future), name="import-warmup", daemon=True).start()
+        return list({id(_imports[name]): _imports[name] for name in names}.values())
+
+
+async def imports_ready(*names: str):
+    """Wait, without blocking the loop, until the modules are imported; raises the import error"""
+    for future in warm_imports(*names):
+        if not future.done():
+            await asyncio.wrap_future(future)
+        else:
+            future.result()
@@ -0,0 +1,123 @@
+"""
+Investor profile extraction from free-text queries.
+
+Shared by the knowledge tool (which needs defaults for every field) and the
+conversation store (which only records what the user actually said).
+"""
+
+import re
+from typing import Any, Dict, Optional
+
+KNOWN_LOCATIONS = {
+    'charlotte': 'Charlotte, NC',
+    'new york': 'New York, NY',
+    'nyc': 'New York, NY',
+    'miami': 'Miami, FL',
+}
+
+_AMOUNT_PATTERNS = [
+    r'\$\s*([\d,]+)(?:k|K|thousand)?',
+    r'([\d,]+)\s*(?:dollars|usd|\$)',
+    r'([\d,]+)\s*(?:k|K|thousand)\b'
+]
+
+_THOUSANDS_RE = re.compile(r'\s*(?:k\b|thousand)', re.IGNORECASE)
+# "401k" names a retirement plan, not $401,000
+_PLAN_NAME_RE = re.compile(r'40[13]\s*k\b', re.IGNORECASE)
+
+_AGE_PATTERNS = [
+    r"\b(?:i am|i'm|im|age)\s+(\d{2})\b",
+    r"\b(\d{2})\s*(?:years?|yrs?)[\s-]*old\b",
+]
+
+_LOCATION_PATTERN = re.compile(r"\b(?:in|near|around)\s+([A-Z][a-zA-Z]+(?:\s[A-Z][a-zA-Z]+)*),\s*([A-Z]{2})\b")
+
+
+def extract_risk_level(query: str, default: Optional[str] = "Moderate") -> Optional[str]:
+    """Extract risk level from query"""
+    query_lower = query.lower()
+    if any(word in query_lower for word in ['conservative', 'low risk', 'safe', 'stable']):
+        return "Low"
+    elif any(word in query_lower for word in ['aggressive', 'high risk', 'growth', 'risky']):
+        return "High"
+    elif any(word in query_lower for word in ['moderate', 'balanced', 'medium']):
+        return "Moderate"
+    return default
+
+
+def extract_amount(query: str, default: Optional[float] = 50000) -> Optional[float]:
+    """Extract investment amount from query"""
+    for pattern in _AMOUNT_PATTERNS:
+        for match in re.finditer(pattern, query):
+            if _PLAN_NAME_RE.match(query, match.start(1)):
+                continue
+            try:
+                amount = float(match.group(1).replace(',', ''))
+                # Only a unit right after the number scales it ("$50k", "50 thousand")
+                if _THOUSANDS_RE.match(query, match.end(1)):
+                    amount *= 1000
+                if amount > 0:
+                    return amount
+            except ValueError:
+                continue
+    return default
+
+
+def extract_time_horizon(query: str, default: Optional[str] = "long-term") -> Optional[str]:
+    """Extract time horizon from query"""
+    query_lower = query.lower()
+    if any(word in query_lower for word in ['short', 'near term', '1 year', '2 year']):
+        return "short-term"
+    elif any(word in query_lower for word in ['medium', '3 year', '5 year', 'mid term']):
+        return "medium-term"
+    elif any(word in query_lower for word in ['long', 'retirement', '10 year', '20 year']):
+        return "long-term"
+    return default
+
+
+def extract_age(query: str) -> Optional[int]:
+    """Extract the investor's age when stated"""
+    query_lower = query.lower()
+    for pattern in _AGE_PATTERNS:
+        match = re.search(pattern, query_lower)
+        if match:
+            age = int(match.group(1))
+            if 16 <= age <= 100:
+                return age
+    return None
+
+
+def extract_location(query: str) -> Optional[str]:
+    """Extract a 'City, ST' location when stated"""
+    match = _LOCATION_PATTERN.search(query)
+    if match:
+        return f"{match.group(1)}, {match.group(2)}"
+    query_lower = query.lower()
+    for key, location in KNOWN_LOCATIONS.items():
+        if key in query_lower:
+            return location
+    return None
+
+
+def extract_profile(query: str) -> Dict[str, Any]:
+    """Profile fields explicitly stated in the query (missing fields are omitted)"""
+    profile = {
+        "amount": extract_amount(query, default=None),
+        "risk_level": extract_risk_level(query, default=None),
+        "time_horizon": extract_time_horizon(query, default=None),
+        "age": extract_age(query),
+        "location": extract_location(query),
+    }
+    return {key: value for key, value in profile.items() if value is not None}
+
+
+def format_profile(profile: Dict[str, Any]) -> str:
+    """One-line rendering of a profile for prompts"""
+    labels = [
+        ("amount", "amount", lambda v: f"${v:,.0f}"),
+        ("risk_level", "risk tolerance", str),
+        ("time_horizon", "time horizon", str),
+        ("age", "age", str),
+        ("location", "location", str),
+    ]
+    return "; ".join(f"{label}: {fmt(profile[key])}" for key, label, fmt in labels if key in profile)
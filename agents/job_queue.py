@@ -0,0 +1,434 @@
+"""
+Asynchronous chat jobs.
+
+A job is one `ACPCallingAgent.run` call submitted over HTTP: the client gets a
+job id straight away and then polls for status/progress or is notified at a
+callback URL. Job state lives in a local SQLite file so finished results
+survive a restart. Jobs run on a fixed pool of worker threads, independent of
+the HTTP request threads. A running job records the pid of the process that
+claimed it and holds a lease that process renews. When the process dies (or
+stops renewing), another process sharing the job file puts the job back in
+the queue, so jobs interrupted by a crash or restart are run again.
+
+Callback URLs must resolve to public addresses (checked on submit and again
+before every delivery, and redirects are not followed), unless their host is
+in the configured allowlist, so a job cannot be used to reach internal services.
+"""
+
+import ipaddress
+import json
+import logging
+import os
+import queue
+import socket
+import sqlite3
+import threading
+import time
+import urllib.parse
+import urllib.request
+import uuid
+from typing import Any, Callable, Collection, Dict, List, Optional, Set
+
+from structured_logging import set_request_id
+
+logger = logging.getLogger("job_queue")
+
+JOB_STATUSES = ("queued", "running", "succeeded", "failed", "cancelled")
+
+_COLUMNS = ("id", "namespace", "status", "progress", "stage", "payload", "result", "error",
+            "callback_url", "request_id", "created_at", "started_at", "finished_at", "owner_pid", "heartbeat")
+
+
+class JobNotFound(Exception):
+    """Raised for an unknown job id"""
+
+
+class InvalidCallbackURL(ValueError):
+    """Raised for callback URLs that are not http(s) URLs of public (or allowlisted) hosts"""
+
+
+def validate_callback_url(url: str, allowed_hosts: Collection[str] = ()) -> str:
+    """Check that `url` may receive job callbacks; returns it unchanged"""
+    parsed = urllib.parse.urlsplit(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        raise InvalidCallbackURL("callback_url must be an http(s) URL")
+    host = parsed.hostname.lower()
+    if host in allowed_hosts:
+        return url
+    if allowed_hosts:
+        raise InvalidCallbackURL(f"callback_url host {host} is not allowed")
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, parsed.port or 80, proto=socket.IPPROTO_TCP)}
+    except (socket.gaierror, UnicodeError, ValueError):
+        raise InvalidCallbackURL(f"callback_url host {host} does not resolve")
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split("%", 1)[0])
+        if not ip.is_global or ip.is_multicast:
+            raise InvalidCallbackURL(f"callback_url host {host} is not a public address")
+    return url
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """A redirect could point a validated callback at an internal address"""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+_callback_opener = urllib.request.build_opener(_NoRedirect)
+
+
+def pid_alive(pid: int) -> bool:
+    """Whether a process with this pid exists on this host"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobStore:
+    """Job records persisted in SQLite"""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        # WAL lets several API worker processes share the job file
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, namespace TEXT NOT NULL, status TEXT NOT NULL, "
+            "progress REAL NOT NULL DEFAULT 0, stage TEXT, payload TEXT NOT NULL, result TEXT, error TEXT, "
+            "callback_url TEXT, request_id TEXT, created_at REAL NOT NULL, started_at REAL, finished_at REAL, "
+            "owner_pid INTEGER, heartbeat REAL)"
+        )
+        columns = {column[1] for column in self._db.execute("PRAGMA table_info(jobs)")}
+        for column, kind in (("owner_pid", "INTEGER"), ("heartbeat", "REAL")):
+            if column not in columns:
+                self._db.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_namespace ON jobs (namespace, created_at)")
+        self._db.commit()
+
+    def create(self, namespace: str, payload: Dict[str, Any], callback_url: Optional[str] = None,
+               request_id: Optional[str] = None) -> Dict[str, Any]:
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, namespace, status, stage, payload, callback_url, request_id, created_at) "
+                "VALUES (?, ?, 'queued', 'queued', ?, ?, ?, ?)",
+                (job_id, namespace, json.dumps(payload), callback_url, request_id, time.time())
+            )
+            self._db.commit()
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Dict[str, Any]:
+        with self._lock:
+            row = self._db.execute(f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            raise JobNotFound(job_id)
+        return self._to_dict(row)
+
+    def list(self, namespace: str, limit: int = 20) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE namespace = ? ORDER BY created_at DESC LIMIT ?",
+                (namespace, limit)
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def update(self, job_id: str, **fields):
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._db.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+            self._db.commit()
+
+    def claim(self, job_id: str) -> bool:
+        """Move a queued job to running, owned by this process; False if it was cancelled or taken meanwhile"""
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE jobs SET status = 'running', stage = 'starting', started_at = ?, owner_pid = ?, heartbeat = ? "
+                "WHERE id = ? AND status = 'queued'", (now, os.getpid(), now, job_id)
+            )
+            self._db.commit()
+        return cursor.rowcount == 1
+
+    def renew(self, job_ids: Collection[str]):
+        """Extend this process's lease on the jobs it is running"""
+        if not job_ids:
+            return
+        ids = list(job_ids)
+        with self._lock:
+            self._db.execute(
+                f"UPDATE jobs SET heartbeat = ? WHERE status = 'running' AND owner_pid = ? "
+                f"AND id IN ({', '.join('?' * len(ids))})", (time.time(), os.getpid(), *ids)
+            )
+            self._db.commit()
+
+    def requeue_owned_by(self, pid: int) -> List[str]:
+        """Put the running jobs of a process that has exited back in the queue"""
+        with self._lock:
+            ids = [row[0] for row in self._db.execute(
+                "SELECT id FROM jobs WHERE status = 'running' AND owner_pid = ? ORDER BY created_at", (pid,)
+            ).fetchall()]
+            self._requeue(ids)
+        return ids
+
+    def requeue_abandoned(self, stale_before: float, alive: Callable[[int], bool] = pid_alive) -> List[str]:
+        """
+        Put running jobs back in the queue when their owner process is gone or
+        has not renewed the lease since `stale_before` (e.g. it hangs, or runs on another host)
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, owner_pid, heartbeat FROM jobs WHERE status = 'running' ORDER BY created_at"
+            ).fetchall()
+            ids = [job_id for job_id, owner, heartbeat in rows
+                   if owner is None or heartbeat is None or heartbeat < stale_before
+                   or (owner != os.getpid() and not alive(owner))]
+            self._requeue(ids)
+        return ids
+
+    def queued(self) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._db.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at"
+            ).fetchall()]
+
+    def _requeue(self, ids: List[str]):
+        if not ids:
+            return
+        self._db.execute(
+            f"UPDATE jobs SET status = 'queued', stage = 'queued', progress = 0, started_at = NULL, owner_pid = NULL, "
+            f"heartbeat = NULL WHERE status = 'running' AND id IN ({', '.join('?' * len(ids))})", ids
+        )
+        self._db.commit()
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a job that has not started yet"""
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE jobs SET status = 'cancelled', stage = 'cancelled', finished_at = ? "
+                "WHERE id = ? AND status = 'queued'", (time.time(), job_id)
+            )
+            self._db.commit()
+        return cursor.rowcount == 1
+
+    def requeue_unfinished(self) -> List[str]:
+        """
+        Put every job interrupted by a shutdown back in the queue (oldest first).
+        Only safe while no process is running jobs, e.g. in the pool supervisor before it forks.
+        """
+        with self._lock:
+            ids = [row[0] for row in self._db.execute(
+                "SELECT id FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+            ).fetchall()]
+            self._requeue(ids)
+        return ids
+
+    def purge(self, older_than: float) -> int:
+        """Delete finished jobs older than the given timestamp"""
+        with self._lock:
+            cursor = self._db.execute(
+                "DELETE FROM jobs WHERE status IN ('succeeded', 'failed', 'cancelled') AND finished_at < ?",
+                (older_than,)
+            )
+            self._db.commit()
+        return cursor.rowcount
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: dict(rows).get(status, 0) for status in JOB_STATUSES}
+
+    @staticmethod
+    def _to_dict(row) -> Dict[str, Any]:
+        job = dict(zip(_COLUMNS, row))
+        job["payload"] = json.loads(job["payload"])
+        return job
+
+
+class JobQueue:
+    """Worker pool executing stored jobs, with progress updates and completion callbacks"""
+
+    def __init__(self, store: JobStore, handler: Callable[[Dict[str, Any], Callable[[str, float], None]], str],
+                 workers: int = 2, callback_timeout: float = 10.0, callback_retries: int = 3,
+                 retention_seconds: float = 7 * 24 * 3600.0, lease_seconds: float = 30.0,
+                 callback_hosts: Collection[str] = ()):
+        self.store = store
+        self.handler = handler
+        self.workers = workers
+        self.callback_timeout = callback_timeout
+        self.callback_retries = callback_retries
+        self.retention_seconds = retention_seconds
+        self.lease_seconds = lease_seconds
+        # When set, only these hosts receive callbacks (and may be internal)
+        self.callback_hosts = {host.lower() for host in callback_hosts}
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._threads: List[threading.Thread] = []
+        self._running: Set[str] = set()
+        self._lock = threading.Lock()
+        self._stats = {"submitted": 0, "succeeded": 0, "failed": 0, "cancelled": 0,
+                       "recovered": 0, "callbacks_sent": 0, "callbacks_failed": 0}
+
+        # Jobs left unfinished by a previous run go back in the queue ahead of new ones.
+        # Running jobs are only taken over when their owner is gone, so live sibling
+        # workers keep theirs (claim() makes sure only one worker runs each job)
+        purged = self.store.purge(time.time() - self.retention_seconds)
+        recovered = self.store.requeue_abandoned(time.time() - self.lease_seconds)
+        for job_id in self.store.queued():
+            self._queue.put(job_id)
+        self._stats["recovered"] = len(recovered)
+        if recovered or purged:
+            logger.info("Job store loaded", extra={"requeued_jobs": len(recovered), "purged_jobs": purged})
+
+    def start(self):
+        """Start the workers (idempotent)"""
+        if self._threads:
+            return
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        threading.Thread(target=self._keep_leases, name="job-lease", daemon=True).start()
+
+    def stop(self):
+        for _ in self._threads:
+            self._queue.put(None)
+        self._threads = []
+
+    def submit(self, namespace: str, payload: Dict[str, Any], callback_url: Optional[str] = None,
+               request_id: Optional[str] = None) -> Dict[str, Any]:
+        """Queue a job; raises InvalidCallbackURL for callback URLs that may not be called"""
+        if callback_url:
+            validate_callback_url(callback_url, self.callback_hosts)
+        job = self.store.create(namespace, payload, callback_url, request_id)
+        self._queue.put(job["id"])
+        self._count("submitted")
+        logger.info("Job queued", extra={"job_id": job["id"], "queue_depth": self._queue.qsize()})
+        return job
+
+    def cancel(self, job_id: str) -> bool:
+        self.store.get(job_id)
+        cancelled = self.store.cancel(job_id)
+        if cancelled:
+            self._count("cancelled")
+            self._notify_async(self.store.get(job_id))
+        return cancelled
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        return {**stats, "workers": self.workers, "queue_depth": self._queue.qsize(), "jobs": self.store.counts()}
+
+    def _worker(self):
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                return
+            try:
+                self._execute(job_id)
+            except Exception:
+                logger.exception("Job worker error", extra={"job_id": job_id})
+
+    def _keep_leases(self):
+        """Renew the leases of this process's jobs and take over jobs whose owner is gone"""
+        while self._threads:
+            time.sleep(self.lease_seconds / 3)
+            try:
+                with self._lock:
+                    running = list(self._running)
+                self.store.renew(running)
+                recovered = self.store.requeue_abandoned(time.time() - self.lease_seconds)
+            except Exception as e:
+                logger.warning("Job lease upkeep failed", extra={"error": str(e)})
+                continue
+            for job_id in recovered:
+                self._queue.put(job_id)
+            if recovered:
+                self._count("recovered", len(recovered))
+                logger.warning("Re-queued abandoned jobs", extra={"jobs": len(recovered)})
+
+    def _execute(self, job_id: str):
+        if not self.store.claim(job_id):
+            return
+        with self._lock:
+            self._running.add(job_id)
+        try:
+            self._run_claimed(job_id)
+        finally:
+            with self._lock:
+                self._running.discard(job_id)
+
+    def _run_claimed(self, job_id: str):
+        job = self.store.get(job_id)
+        set_request_id(job["request_id"])
+
+        def report(stage: str, progress: float):
+            self.store.update(job_id, stage=stage, progress=round(min(max(progress, 0.0), 1.0), 3))
+
+        try:
+            result = self.handler(job, report)
+            self.store.update(job_id, status="succeeded", stage="done", progress=1.0,
+                              result=result, finished_at=time.time())
+            self._count("succeeded")
+            logger.info("Job succeeded", extra={"job_id": job_id,
+                                                "elapsed_s": round(time.time() - job["created_at"], 3)})
+        except Exception as e:
+            self.store.update(job_id, status="failed", stage="failed", error=str(e), finished_at=time.time())
+            self._count("failed")
+            logger.exception("Job failed", extra={"job_id": job_id})
+        self._notify_async(self.store.get(job_id))
+
+    def _notify_async(self, job: Dict[str, Any]):
+        # Slow or unreachable callback endpoints must not hold up a job worker
+        if job.get("callback_url"):
+            threading.Thread(target=self._notify, args=(job,), name="job-callback", daemon=True).start()
+
+    def _notify(self, job: Dict[str, Any]):
+        """POST the finished job to its callback URL, retrying with backoff"""
+        if not job.get("callback_url"):
+            return
+        body = json.dumps(job_view(job)).encode()
+        for attempt in range(self.callback_retries):
+            try:
+                # Re-checked on every attempt: the host may resolve elsewhere by now
+                validate_callback_url(job["callback_url"], self.callback_hosts)
+                request = urllib.request.Request(
+                    job["callback_url"], data=body, method="POST",
+                    headers={"Content-Type": "application/json", "X-Job-ID": job["id"]}
+                )
+                with _callback_opener.open(request, timeout=self.callback_timeout):
+                    pass
+                self._count("callbacks_sent")
+                return
+            except Exception as e:
+                logger.warning("Job callback failed", extra={"job_id": job["id"], "attempt": attempt + 1,
+                                                             "error": str(e)})
+                if attempt + 1 < self.callback_retries:
+                    time.sleep(min(2 ** attempt, 30))
+        self._count("callbacks_failed")
+
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self._stats[key] += amount
+
+
+def job_view(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Public representation of a job (result only once it has finished)"""
+    view = {
+        "job_id": job["id"],
+        "session_id": job["namespace"],
+        "status": job["status"],
+        "stage": job["stage"],
+        "progress": job["progress"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+    }
+    if job["status"] == "succeeded":
+        view["response"] = job["result"]
+    elif job["status"] == "failed":
+        view["error"] = job["error"]
+    return view
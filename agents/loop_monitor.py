@@ -0,0 +1,189 @@
+"""
+Event-loop health: scheduling lag and blocking callbacks.
+
+A heartbeat task sleeps `interval` seconds in a loop; how late it wakes up is
+the loop's scheduling lag, kept in a rolling window for percentiles. A watchdog
+thread checks the heartbeat: once it is `block_threshold` overdue, the loop is
+stuck in one callback, and the loop thread's stack (captured at that moment)
+shows which. Each stall is logged once with that stack and kept with its final
+duration in `stats()`.
+
+Percentiles are exported through `stats()` (the API server's health report,
+the debug endpoints' `loop` action) and logged every `report_seconds`.
+
+    LOOP_MONITOR_ENABLED=1         # default on
+    LOOP_LAG_INTERVAL_MS=100       # heartbeat period
+    LOOP_BLOCK_THRESHOLD_MS=100    # stall reported beyond this
+    LOOP_MONITOR_REPORT_SECONDS=60 # periodic percentile log (0 = off)
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+from debug_tools import stack_labels
+
+logger = logging.getLogger("loop_monitor")
+
+LOOP_MONITOR_ENABLED = os.getenv("LOOP_MONITOR_ENABLED", "1").lower() in ("1", "true", "yes")
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL_MS", "100")) / 1000
+LOOP_BLOCK_THRESHOLD = float(os.getenv("LOOP_BLOCK_THRESHOLD_MS", "100")) / 1000
+LOOP_MONITOR_REPORT_SECONDS = float(os.getenv("LOOP_MONITOR_REPORT_SECONDS", "60"))
+
+_monitors: Dict[int, "LoopMonitor"] = {}
+_monitors_lock = threading.Lock()
+
+
+def _percentile_ms(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return round(sorted_values[index] * 1000, 1)
+
+
+class LoopMonitor:
+    """Lag percentiles and stall detection for one event loop"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, name: str = "loop", interval: float = LOOP_LAG_INTERVAL,
+                 block_threshold: float = LOOP_BLOCK_THRESHOLD, report_seconds: float = LOOP_MONITOR_REPORT_SECONDS,
+                 window: int = 3000, max_events: int = 50):
+        self.loop = loop
+        self.name = name
+        self.interval = interval
+        self.block_threshold = block_threshold
+        self.report_seconds = report_seconds
+        self._lags = deque(maxlen=window)
+        self._events = deque(maxlen=max_events)
+        self._stall: Optional[Dict[str, Any]] = None
+        self._beat: Optional[float] = None
+        self._loop_thread: Optional[int] = None
+        self._stop = threading.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.counters = {"samples": 0, "stalls": 0, "stalled_s": 0.0, "max_lag_ms": 0.0}
+
+    def start(self):
+        """Start from any thread"""
+        if self._task is None:
+            self.loop.call_soon_threadsafe(self._start_in_loop)
+
+    def _start_in_loop(self):
+        if self._task is not None:
+            return
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._task = self.loop.create_task(self._heartbeat(), name=f"loop-monitor-{self.name}")
+        threading.Thread(target=self._watch, name=f"loop-watchdog-{self.name}", daemon=True).start()
+        logger.info("Loop monitor started", extra={"loop": self.name, "interval_ms": self.interval * 1000,
+                                                   "block_threshold_ms": self.block_threshold * 1000})
+
+    def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self.loop.call_soon_threadsafe(self._task.cancel)
+
+    async def _heartbeat(self):
+        next_report = time.monotonic() + self.report_seconds
+        while not self._stop.is_set():
+            self._beat = beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(now - beat - self.interval, 0.0)
+            stall = self._stall
+            if stall is not None and stall["beat"] == beat:
+                stall["blocked_ms"] = round(lag * 1000, 1)
+            self._lags.append(lag)
+            self.counters["samples"] += 1
+            self.counters["max_lag_ms"] = max(self.counters["max_lag_ms"], round(lag * 1000, 1))
+            if self.report_seconds and now >= next_report:
+                next_report = now + self.report_seconds
+                logger.info("Event loop lag", extra={"loop": self.name, **self.lag_percentiles()})
+
+    def _watch(self):
+        period = min(self.interval, self.block_threshold) / 2
+        while not self._stop.wait(period):
+            beat = self._beat
+            overdue = time.monotonic() - beat - self.interval
+            stall = self._stall
+            if stall is not None and stall["beat"] != beat:
+                # The heartbeat ran again: the stall is over
+                self.counters["stalled_s"] = round(self.counters["stalled_s"] + stall["blocked_ms"] / 1000, 3)
+                self._stall = stall = None
+            if overdue < self.block_threshold:
+                continue
+            if stall is None:
+                frame = sys._current_frames().get(self._loop_thread)
+                stall = {"beat": beat, "at": time.time(), "blocked_ms": round(overdue * 1000, 1),
+                         "stack": stack_labels(frame, limit=40, lines=True) if frame is not None else []}
+                self._stall = stall
+                self._events.append(stall)
+                self.counters["stalls"] += 1
+                logger.warning("Event loop blocked", extra={"loop": self.name, "blocked_ms": stall["blocked_ms"],
+                                                            "stack": stall["stack"][-12:]})
+            else:
+                stall["blocked_ms"] = round(overdue * 1000, 1)
+
+    def lag_percentiles(self) -> Dict[str, float]:
+        lags = sorted(self._lags)
+        return {
+            "samples": len(lags),
+            "p50_ms": _percentile_ms(lags, 0.50),
+            "p95_ms": _percentile_ms(lags, 0.95),
+            "p99_ms": _percentile_ms(lags, 0.99),
+            "max_ms": _percentile_ms(lags, 1.0),
+        }
+
+    def stats(self, recent: int = 10) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "lag": self.lag_percentiles(),
+            "blocked_now_ms": self._stall["blocked_ms"] if self._stall is not None else 0.0,
+            "recent_stalls": [{key: value for key, value in event.items() if key != "beat"}
+                              for event in list(self._events)[-recent:]],
+        }
+
+
+def monitor_loop(loop: asyncio.AbstractEventLoop, name: str = "loop") -> Optional[LoopMonitor]:
+    """Monitor `loop` (once per loop; from any thread); None when LOOP_MONITOR_ENABLED is off"""
+    if not LOOP_MONITOR_ENABLED:
+        return None
+    with _monitors_lock:
+        monitor = _monitors.get(id(loop))
+        if monitor is None or monitor.loop is not loop:
+            monitor = _monitors[id(loop)] = LoopMonitor(loop, name)
+            monitor.start()
+    return monitor
+
+
+def ensure_loop_monitor(name: str = "loop") -> Optional[LoopMonitor]:
+    """Monitor the running loop; cheap enough to call at the start of every request handler"""
+    loop = asyncio.get_running_loop()
+    monitor = _monitors.get(id(loop))
+    if monitor is not None and monitor.loop is loop:
+        return monitor
+    return monitor_loop(loop, name)
+
+
+def loop_stats() -> Dict[str, Any]:
+    return {monitor.name: monitor.stats() for monitor in list(_monitors.values())}
+
+
+def _demo(seconds: float = 2.0):
+    """Block the loop on purpose and print what the monitor saw"""
+    async def main():
+        monitor = ensure_loop_monitor("demo")
+        await asyncio.sleep(0.5)
+        time.sleep(0.35)  # a synchronous call on the loop
+        await asyncio.sleep(seconds)
+        return monitor.stats()
+
+    import json
+    print(json.dumps(asyncio.run(main()), indent=2))
+
+
+if __name__ == "__main__":
+    _demo()
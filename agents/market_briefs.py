@@ -0,0 +1,252 @@
+"""
+Precomputed market briefs.
+
+A background scheduler periodically asks the market researcher for a brief on
+each configured sector/topic and stores it with its timestamp. Generic market
+questions on a covered topic ("what's the outlook for solar?") are answered
+from the stored brief (stale-while-revalidate): fresh briefs are served as-is,
+stale ones are served while a refresh runs in the background, and only briefs
+past the maximum staleness fall through to a live research run. A question is
+generic when nearly all of its terms are covered by the topic's keywords and
+prompt or by general market vocabulary, and it names no ticker and asks for no
+comparison. Anything more specific is researched live.
+"""
+
+import asyncio
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from document_catalog import tokenize
+
+logger = logging.getLogger("market_briefs")
+
+DEFAULT_TOPICS = [
+    {
+        "key": "renewable_energy",
+        "keywords": ["renewable", "solar", "wind power", "clean energy", "green energy"],
+        "prompt": "Summarize the latest trends, risks and investment opportunities in renewable energy (solar, wind, storage), including notable ETFs."
+    },
+    {
+        "key": "tech_sector",
+        "keywords": ["tech sector", "technology sector", "tech stocks", "technology stocks", "semiconductor", "ai stocks"],
+        "prompt": "Give a current outlook for the technology sector: recent performance, key drivers (AI, semiconductors, cloud), valuation concerns and notable ETFs."
+    },
+    {
+        "key": "interest_rates",
+        "keywords": ["interest rate", "fed ", "federal reserve", "bond market", "treasury yield"],
+        "prompt": "Summarize the current interest-rate environment, Federal Reserve outlook and what it means for bond and stock investors."
+    },
+    {
+        "key": "real_estate",
+        "keywords": ["real estate", "reit", "housing market"],
+        "prompt": "Summarize current real estate market trends and the outlook for REIT investors."
+    },
+]
+
+# Replies that mean the research run did not produce a brief worth keeping
+FAILED_BRIEF_PREFIXES = (
+    "Web search timed out",
+    "Market research unavailable",
+    "Market research is at capacity",
+    "No input received",
+    "Invalid input format",
+)
+
+
+# Words that make a question about a topic no more specific than the brief itself
+GENERIC_TERMS = {
+    "latest", "current", "currently", "recent", "recently", "trend", "trends", "outlook", "news", "update", "updates",
+    "happening", "going", "doing", "market", "markets", "sector", "sectors", "industry", "overview", "summary",
+    "summarize", "opportunities", "opportunity", "risks", "risk", "invest", "investing", "investment", "investments",
+    "investor", "investors", "stocks", "state", "future", "today", "now", "week", "month", "year", "look", "looking",
+    "thoughts", "view", "views", "tell", "give", "know", "need", "whats", "good", "time", "right", "does", "mean",
+    "will", "there", "any", "some", "all", "general", "things", "impact", "expect", "expected",
+}
+# Acronyms that are not tickers
+_COMMON_ACRONYMS = {"AI", "ETF", "ETFS", "REIT", "REITS", "US", "USA", "FED", "ESG", "IPO", "GDP", "CPI", "EV", "EVS", "IRA"}
+_TICKER_RE = re.compile(r"(?<![\w$])\$?[A-Z]{2,5}\b")
+_COMPARISON_RE = re.compile(r"\b(?:compare|comparing|comparison|vs|versus|better than|or)\b", re.IGNORECASE)
+BRIEF_MIN_COVERAGE = 0.8
+
+
+def _stem(term: str) -> str:
+    return term[:-1] if len(term) > 3 and term.endswith("s") else term
+
+
+def _terms(text: str) -> Set[str]:
+    return {_stem(term) for term in tokenize(text.replace("'", ""))}
+
+
+class BriefTopic:
+    """A sector/topic with its research prompt and matching keywords"""
+
+    def __init__(self, key: str, prompt: str, keywords: List[str]):
+        self.key = key
+        self.prompt = prompt
+        self.keywords = [keyword.lower() for keyword in keywords]
+        self.vocabulary = _terms(" ".join(self.keywords + [prompt, key.replace("_", " ")])) | _terms(" ".join(GENERIC_TERMS))
+
+    def matches(self, query: str) -> int:
+        """Number of topic keywords in the query"""
+        query_lower = f" {query.lower()} "
+        return sum(1 for keyword in self.keywords if keyword in query_lower)
+
+    def coverage(self, question: str) -> float:
+        """Share of the question's terms that the brief covers (topic or general market vocabulary)"""
+        terms = _terms(question)
+        if not terms:
+            return 0.0
+        return len(terms & self.vocabulary) / len(terms)
+
+
+def is_specific_question(question: str) -> bool:
+    """Names a ticker or asks for a comparison: a generic brief cannot answer it"""
+    tickers = [match.lstrip("$") for match in _TICKER_RE.findall(question)]
+    return bool(_COMPARISON_RE.search(question)) or any(ticker not in _COMMON_ACRONYMS for ticker in tickers)
+
+
+def load_topics(path: Optional[str] = None) -> List[BriefTopic]:
+    """Topics from a JSON file (list of {key, prompt, keywords}) or the built-in defaults"""
+    entries = DEFAULT_TOPICS
+    if path:
+        with open(path) as handle:
+            entries = json.load(handle)
+    return [BriefTopic(entry["key"], entry["prompt"], entry["keywords"]) for entry in entries]
+
+
+class BriefStore:
+    """Latest brief per topic, persisted in SQLite"""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS briefs (topic TEXT PRIMARY KEY, content TEXT NOT NULL, generated_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def get(self, topic: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            row = self._db.execute("SELECT content, generated_at FROM briefs WHERE topic = ?", (topic,)).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def put(self, topic: str, content: str, generated_at: Optional[float] = None):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO briefs (topic, content, generated_at) VALUES (?, ?, ?)",
+                (topic, content, generated_at or time.time())
+            )
+            self._db.commit()
+
+
+class MarketBriefService:
+    """Serve and refresh precomputed briefs (stale-while-revalidate)"""
+
+    def __init__(self, store: BriefStore, topics: List[BriefTopic], refresh_seconds: float = 3600.0,
+                 max_stale_seconds: float = 6 * 3600.0, check_interval: float = 60.0,
+                 min_coverage: float = BRIEF_MIN_COVERAGE):
+        self.store = store
+        self.topics = topics
+        self.min_coverage = min_coverage
+        self.refresh_seconds = refresh_seconds
+        self.max_stale_seconds = max_stale_seconds
+        self.check_interval = check_interval
+        self._fetcher: Optional[Callable[[str], Awaitable[str]]] = None
+        self._refreshing = set()
+        self._scheduler_task: Optional[asyncio.Task] = None
+        self._stats = {"fresh_hits": 0, "stale_hits": 0, "misses": 0, "specific": 0, "refreshes": 0,
+                       "refresh_failures": 0}
+
+    def match_topic(self, question: str) -> Optional[BriefTopic]:
+        """Covered topic the question is a generic question about, if any"""
+        best, best_score = None, 0
+        for topic in self.topics:
+            score = topic.matches(question)
+            if score > best_score:
+                best, best_score = topic, score
+        if best is None:
+            return None
+        if is_specific_question(question) or best.coverage(question) < self.min_coverage:
+            self._stats["specific"] += 1
+            return None
+        return best
+
+    def lookup(self, question: str) -> Optional[str]:
+        """
+        Brief for a generic question on a covered topic, or None when it must be researched live.
+        `question` is the user's own words, without document context.
+        Stale briefs trigger a background refresh (requires a running event loop).
+        """
+        topic = self.match_topic(question)
+        if topic is None:
+            return None
+
+        stored = self.store.get(topic.key)
+        age = time.time() - stored[1] if stored else None
+        if stored is None or age > self.refresh_seconds:
+            self._schedule_refresh(topic)
+        if stored is None or age > self.max_stale_seconds:
+            self._stats["misses"] += 1
+            return None
+
+        self._stats["fresh_hits" if age <= self.refresh_seconds else "stale_hits"] += 1
+        minutes = int(age // 60)
+        return f"{stored[0]}\n\n_Market brief on {topic.key.replace('_', ' ')}, updated {minutes} min ago._"
+
+    async def refresh(self, topic: BriefTopic) -> bool:
+        """Regenerate one brief (single-flight per topic)"""
+        if self._fetcher is None or topic.key in self._refreshing:
+            return False
+        self._refreshing.add(topic.key)
+        try:
+            content = await self._fetcher(topic.prompt)
+            if not content or content.startswith(FAILED_BRIEF_PREFIXES):
+                raise ValueError(f"unusable brief: {content[:80] if content else 'empty'}")
+            self.store.put(topic.key, content)
+            self._stats["refreshes"] += 1
+            logger.info("Market brief refreshed", extra={"topic": topic.key, "brief_chars": len(content)})
+            return True
+        except Exception as e:
+            self._stats["refresh_failures"] += 1
+            logger.warning("Market brief refresh failed", extra={"topic": topic.key, "error": str(e)})
+            return False
+        finally:
+            self._refreshing.discard(topic.key)
+
+    def start(self, fetcher: Callable[[str], Awaitable[str]]):
+        """Attach the research call and start the periodic scheduler on the running loop"""
+        self.stop()
+        self._fetcher = fetcher
+        self._scheduler_task = asyncio.ensure_future(self._run_scheduler())
+
+    def stop(self):
+        if self._scheduler_task is not None:
+            self._scheduler_task.cancel()
+            self._scheduler_task = None
+
+    def stats(self) -> Dict[str, object]:
+        return {**self._stats, "topics": [topic.key for topic in self.topics], "refreshing": sorted(self._refreshing)}
+
+    async def _run_scheduler(self):
+        while True:
+            now = time.time()
+            for topic in self.topics:
+                stored = self.store.get(topic.key)
+                if stored is None or now - stored[1] > self.refresh_seconds:
+                    # Sequential on purpose: background refreshes must not crowd out interactive research
+                    await self.refresh(topic)
+            await asyncio.sleep(self.check_interval)
+
+    def _schedule_refresh(self, topic: BriefTopic):
+        if self._fetcher is None or topic.key in self._refreshing:
+            return
+        try:
+            asyncio.get_running_loop().create_task(self.refresh(topic))
+        except RuntimeError:
+            pass
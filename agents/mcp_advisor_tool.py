@@ -2,121 +2,270 @@ from crewai.tools import BaseTool
 from typing import Type
 from pydantic import BaseModel, Field
 import json
-import subprocess
+import logging
+import asyncio
+import importlib
+import importlib.util
 import os
 import sys
+import time
+
+from traffic_replay import recorded_tool
+from tool_runtime import Batcher, arun_tool, run_tool
+
+logger = logging.getLogger("mcp_advisor_tool")
 
 class AdvisorSearchInput(BaseModel):
     """Input for advisor search"""
     location: str = Field(..., description="City and state for advisor search (e.g., 'Charlotte, NC')")
 
+class AdvisorRankingInput(BaseModel):
+    """Input for advisor ranking"""
+    query: str = Field(..., description="The client's request, including amount, goals, preferred credentials and location")
+    location: str = Field("", description="City and state overriding the one in the query (e.g., 'Charlotte, NC')")
+    top_k: int = Field(5, description="Number of advisors to return")
+
+MCP_ADVISOR_SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pre_made_advisor_server.py")
+MCP_START_TIMEOUT = float(os.getenv("MCP_START_TIMEOUT", "15"))
+MCP_CALL_TIMEOUT = float(os.getenv("MCP_CALL_TIMEOUT", "10"))
+MCP_RETRY_SECONDS = float(os.getenv("MCP_RETRY_SECONDS", "30"))
+
+_SUBPROCESS_SCRIPT = """
+import json, sys
+sys.path.insert(0, sys.argv[1])
+import pre_made_advisor_server as server
+print(getattr(server, sys.argv[2])(**json.loads(sys.argv[3])))
+"""
+
+
+class MCPAdvisorClient:
+    """Long-lived stdio session to the pre-made advisor MCP server (used on the tool loop).
+
+    Without the `mcp` package, or while the session cannot be started, calls go to
+    the server module loaded in-process, then to a one-off subprocess.
+    """
+
+    def __init__(self, server_path: str = MCP_ADVISOR_SERVER):
+        self.server_path = server_path
+        self._session = None
+        self._session_task = None
+        self._closed = None
+        self._start_lock = None
+        self._module = None
+        self._mcp_available = True
+        self._retry_after = 0.0
+        self.counters = {"calls": 0, "sessions_started": 0, "session_failures": 0, "direct_calls": 0, "subprocess_calls": 0}
+
+    async def call(self, tool: str, arguments: dict) -> str:
+        self.counters["calls"] += 1
+        session = await self._ensure_session()
+        if session is not None:
+            try:
+                result = await asyncio.wait_for(session.call_tool(tool, arguments), MCP_CALL_TIMEOUT)
+                text = "".join(part.text for part in result.content if getattr(part, "text", None) is not None)
+                if result.isError:
+                    raise RuntimeError(text or f"MCP tool {tool} failed")
+                return text
+            except Exception as e:
+                logger.warning("MCP session call failed", extra={"tool": tool, "error": str(e)})
+                self.counters["session_failures"] += 1
+                self._reset()
+        return await self._call_fallback(tool, arguments)
+
+    async def _ensure_session(self):
+        if self._session is not None or not self._mcp_available or time.monotonic() < self._retry_after:
+            return self._session
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self._session is None and self._mcp_available:
+                ready = asyncio.Event()
+                self._closed = asyncio.Event()
+                self._session_task = asyncio.get_running_loop().create_task(self._hold_session(ready, self._closed))
+                try:
+                    await asyncio.wait_for(ready.wait(), MCP_START_TIMEOUT)
+                except asyncio.TimeoutError:
+                    logger.warning("MCP session start timed out", extra={"timeout_s": MCP_START_TIMEOUT})
+                    self._retry_after = time.monotonic() + MCP_RETRY_SECONDS
+                    self._reset()
+        return self._session
+
+    async def _hold_session(self, ready: asyncio.Event, closed: asyncio.Event):
+        """Owns the session's context managers for its whole life (they must exit in this task)"""
+        try:
+            # Imported off the loop: the first import of mcp takes a while
+            await asyncio.to_thread(importlib.import_module, "mcp.client.stdio")
+            from mcp import ClientSession, StdioServerParameters
+            from mcp.client.stdio import stdio_client
+        except ImportError:
+            self._mcp_available = False
+            ready.set()
+            return
+        try:
+            params = StdioServerParameters(command=sys.executable, args=[self.server_path], env=dict(os.environ))
+            async with stdio_client(params) as (read, write):
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    self._session = session
+                    self.counters["sessions_started"] += 1
+                    logger.info("MCP advisor session started", extra={"server": self.server_path})
+                    ready.set()
+                    await closed.wait()
+        except Exception as e:
+            logger.warning("MCP advisor session ended", extra={"error": str(e)})
+            self._retry_after = time.monotonic() + MCP_RETRY_SECONDS
+        finally:
+            self._session = None
+            ready.set()
+
+    def _reset(self):
+        self._session = None
+        if self._closed is not None:
+            self._closed.set()
+
+    async def _call_fallback(self, tool: str, arguments: dict) -> str:
+        try:
+            module = await asyncio.to_thread(self._load_module)
+            self.counters["direct_calls"] += 1
+            result = await asyncio.to_thread(getattr(module, tool), **arguments)
+            logger.debug("Direct MCP call succeeded", extra={"tool": tool})
+            return result
+        except Exception as e:
+            logger.warning("Direct MCP call failed", extra={"tool": tool, "error": str(e)})
+        return await self._call_via_subprocess(tool, arguments)
+
+    def _load_module(self):
+        """The server module, imported in-process once"""
+        if self._module is None:
+            spec = importlib.util.spec_from_file_location("mcp_server", self.server_path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            self._module = module
+        return self._module
+
+    async def _call_via_subprocess(self, tool: str, arguments: dict) -> str:
+        """Last resort: run the tool in a one-off interpreter"""
+        self.counters["subprocess_calls"] += 1
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, "-c", _SUBPROCESS_SCRIPT, os.path.dirname(self.server_path), tool, json.dumps(arguments),
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), MCP_CALL_TIMEOUT)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise
+        if process.returncode != 0:
+            logger.warning("MCP subprocess exited with an error", extra={"returncode": process.returncode, "stderr": stderr.decode(errors="replace")[-500:]})
+            raise RuntimeError(f"MCP subprocess exited with {process.returncode}")
+        return stdout.decode().strip()
+
+    def stats(self):
+        return {**self.counters, "session_open": self._session is not None}
+
+
+mcp_advisor_client = MCPAdvisorClient()
+
+
+async def _search_batch(items):
+    """Concurrent requests over the one session; identical locations were already coalesced"""
+    return await asyncio.gather(*(mcp_advisor_client.call("search_advisors", {"location": location})
+                                  for location, _ in items), return_exceptions=True)
+
+_search_batcher = Batcher("mcp_advisor_search", _search_batch)
+
+
 class MCPAdvisorTool(BaseTool):
     """Tool to search advisors via MCP server"""
     name: str = "mcp_advisor_search"
     description: str = "Search for financial advisors using MCP pre-made data server"
     args_schema: Type[BaseModel] = AdvisorSearchInput
 
+    @recorded_tool
     def _run(self, location: str) -> str:
-        """Execute advisor search via MCP"""
+        """Execute advisor search via MCP (on the shared tool loop)"""
+        return run_tool(self._search_async(location))
+
+    @recorded_tool
+    async def _arun(self, location: str) -> str:
+        """Async entry point for callers running their own event loop"""
+        return await arun_tool(self._search_async(location))
+
+    async def _search_async(self, location: str) -> str:
         try:
-           
-            result = self._call_mcp_server_simple(location)
-            
-            if result:
-                try:
-                    
-                    advisors = json.loads(result)
-                    
-                    if advisors:
-                       
-                        result_text = f"Found {len(advisors)} financial advisors in {location} from MCP server:\n\n"
-                        
-                        for i, advisor in enumerate(advisors, 1):
-                            result_text += f"**ADVISOR {i}:**\n"
-                            result_text += f"- Name: {advisor['name']}\n"
-                            result_text += f"- Firm: {advisor['firm']}\n"
-                            result_text += f"- CRD Number: {advisor['crd']}\n"
-                            result_text += f"- Location: {location}\n"
-                            result_text += f"- Source: MCP Pre-made Database\n\n"
-                        
-                        return result_text
-                    else:
-                        return f"No advisors found in MCP database for {location}."
-                except json.JSONDecodeError:
-                    
-                    return f"MCP Server Response for {location}:\n{result}"
-            else:
-                return f"No response received from MCP server for {location}."
-                
+            result = await _search_batcher.submit(location)
         except Exception as e:
+            logger.error("MCP advisor search failed", extra={"location": location, "error": str(e)})
             return f"Error connecting to MCP server: {str(e)}"
+        return self._format_result(location, result)
 
-    def _call_mcp_server_simple(self, location: str) -> str:
-        """Make a simple call to MCP server via subprocess"""
+    def _format_result(self, location: str, result: str) -> str:
+        if not result:
+            return f"No response received from MCP server for {location}."
         try:
-            
-            server_path = os.path.join(os.path.dirname(__file__), "pre_made_advisor_server.py")
-            
-           
-            
-            import importlib.util
-            spec = importlib.util.spec_from_file_location("mcp_server", server_path)
-            mcp_server = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(mcp_server)
-            
-          
-            if hasattr(mcp_server, 'search_advisors'):
-                result = mcp_server.search_advisors(location)
-                print(f"Direct MCP call successful for {location}")
-                return result
-            else:
-                return None
-                
-        except Exception as e:
-            print(f"Error calling MCP server directly: {e}")
-            
-            
-            try:
-                return self._call_via_subprocess(location)
-            except Exception as e2:
-                print(f"Subprocess approach also failed: {e2}")
-                return None
+            advisors = json.loads(result)
+        except json.JSONDecodeError:
+            return f"MCP Server Response for {location}:\n{result}"
+        if not advisors:
+            return f"No advisors found in MCP database for {location}."
 
-    def _call_via_subprocess(self, location: str) -> str:
-        """Fallback: Call MCP server via subprocess"""
-        try:
-            server_path = os.path.join(os.path.dirname(__file__), "pre_made_advisor_server.py")
-            
-            
-            test_script = f'''
-import sys
-sys.path.append("{os.path.dirname(server_path)}")
-from pre_made_advisor_server import search_advisors
-result = search_advisors("{location}")
-print(result)
-'''
-            
-            
-            process = subprocess.run(
-                [sys.executable, "-c", test_script],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-            
-            if process.returncode == 0:
-                return process.stdout.strip()
-            else:
-                print(f"Subprocess error: {process.stderr}")
-                return None
-                
-        except subprocess.TimeoutExpired:
-            return None
-        except Exception as e:
-            print(f"Subprocess call failed: {e}")
-            return None
+        result_text = f"Found {len(advisors)} financial advisors in {location} from MCP server:\n\n"
+        for i, advisor in enumerate(advisors, 1):
+            result_text += f"**ADVISOR {i}:**\n"
+            result_text += f"- Name: {advisor['name']}\n"
+            result_text += f"- Firm: {advisor['firm']}\n"
+            result_text += f"- CRD Number: {advisor['crd']}\n"
+            result_text += f"- Location: {location}\n"
+            result_text += f"- Source: MCP Pre-made Database\n\n"
+        return result_text
 
 
 def get_mcp_advisor_tool():
     """Factory function to create MCP advisor tool"""
-    return MCPAdvisorTool()
\ No newline at end of file
+    return MCPAdvisorTool()
+
+
+class AdvisorRankingTool(BaseTool):
+    """Deterministic advisor ranking (advisor_scoring), the same computation as the MCP server's rank_advisors"""
+    name: str = "advisor_match_ranking"
+    description: str = ("Rank database advisors against the client's request. Returns the top advisors in order "
+                        "with match scores (0-100) and per-criterion breakdowns; use these scores as given.")
+    args_schema: Type[BaseModel] = AdvisorRankingInput
+
+    @recorded_tool
+    def _run(self, query: str, location: str = "", top_k: int = 5) -> str:
+        """Rank advisors and format the result for the agent"""
+        try:
+            from advisor_scoring import rank_advisors
+            ranking = rank_advisors(query, location or None, top_k)
+        except Exception as e:
+            logger.warning("Advisor ranking failed", extra={"error": str(e)})
+            return f"Error ranking advisors: {str(e)}"
+
+        if not ranking["advisors"]:
+            return "No advisors available for ranking."
+        needs = ", ".join(ranking["needs"]) or "none stated"
+        location_note = ranking["profile"].get("location", "not stated")
+        result_text = (f"Ranked {ranking['candidates']} advisors (location: {location_note}; needs: {needs}). "
+                       f"Scores are out of 100:\n\n")
+        for advisor in ranking["advisors"]:
+            breakdown = ", ".join(f"{name} {points}" for name, points in advisor["breakdown"].items())
+            distance = f"{advisor['distance_km']:.0f} km away" if advisor["distance_km"] is not None else "distance unknown"
+            result_text += f"**ADVISOR {advisor['rank']}:**\n"
+            result_text += f"- Name: {advisor['name']}\n"
+            result_text += f"- Firm: {advisor['firm']}\n"
+            result_text += f"- CRD Number: {advisor['crd']}\n"
+            result_text += f"- Location: {advisor['location']} ({distance}{', offers remote' if advisor['remote'] else ''})\n"
+            result_text += f"- Credentials: {', '.join(advisor['credentials'])}\n"
+            result_text += f"- Specializations: {', '.join(advisor['specializations'])}\n"
+            result_text += f"- Fees: {advisor['fee_pct']}% of AUM{' (fee-only)' if advisor['fee_only'] else ''}\n"
+            result_text += f"- Minimum: ${advisor['minimum']:,.0f}\n"
+            result_text += f"- Match score: {advisor['match_score']}%\n"
+            result_text += f"- Score breakdown: {breakdown}\n\n"
+        return result_text
+
+
+def get_advisor_ranking_tool():
+    """Factory function to create the advisor ranking tool"""
+    return AdvisorRankingTool()
@@ -0,0 +1,139 @@
+"""
+Per-user/session document namespaces.
+
+Each namespace owns its own uploads directory and its own index shard (for
+example a DocumentCatalog). Shards are created lazily on first access and
+evicted after sitting idle, so the work and memory behind a request depend
+only on the caller's own data.
+"""
+
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger("namespaces")
+
+DEFAULT_NAMESPACE = "default"
+
+_NAMESPACE_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class InvalidNamespace(ValueError):
+    """Raised for user/session ids that cannot be used as a namespace"""
+
+
+class MissingNamespace(InvalidNamespace):
+    """Raised when a request names no session and anonymous callers are not mapped to a namespace"""
+
+
+def normalize_namespace(namespace: Optional[str]) -> str:
+    """Validate a user/session id for use as a namespace (falls back to the default namespace)"""
+    if not namespace:
+        return DEFAULT_NAMESPACE
+    namespace = str(namespace).strip()
+    if not _NAMESPACE_RE.match(namespace):
+        raise InvalidNamespace("Session id must be 1-64 characters of letters, digits, '-' or '_'")
+    return namespace
+
+
+def namespace_directory(base_directory, namespace: Optional[str]) -> Path:
+    """Uploads directory for a namespace"""
+    return Path(base_directory) / normalize_namespace(namespace)
+
+
+def migrate_legacy_uploads(base_directory, namespace: str = DEFAULT_NAMESPACE) -> int:
+    """Move files left directly in the uploads root (before namespaces) into `namespace`'s directory"""
+    base = Path(base_directory)
+    target = namespace_directory(base, namespace)
+    moved = 0
+    for path in sorted(base.iterdir()) if base.is_dir() else []:
+        if not path.is_file() or path.name.startswith('.'):
+            continue
+        destination = target / path.name
+        if destination.exists():
+            logger.warning("Legacy upload not migrated: name taken", extra={"upload": path.name, "namespace": namespace})
+            continue
+        target.mkdir(parents=True, exist_ok=True)
+        try:
+            path.replace(destination)
+        except FileNotFoundError:  # another worker moved it first
+            continue
+        moved += 1
+    if moved:
+        logger.info("Legacy uploads migrated", extra={"files": moved, "namespace": namespace})
+    return moved
+
+
+class NamespaceRegistry:
+    """
+    Lazily loaded, idle-evicted per-namespace resources.
+    `factory(namespace)` builds the shard the first time a namespace is used.
+    """
+
+    def __init__(self, factory: Callable[[str], Any], idle_seconds: float = 900.0,
+                 max_resident: int = 1000, sweep_interval: float = 60.0):
+        self.factory = factory
+        self.idle_seconds = idle_seconds
+        self.max_resident = max_resident
+        self.sweep_interval = sweep_interval
+        self._shards: "OrderedDict[str, Any]" = OrderedDict()
+        self._last_used: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+        self._stats = {"loads": 0, "evictions": 0}
+
+    def get(self, namespace: Optional[str]) -> Any:
+        namespace = normalize_namespace(namespace)
+        now = time.monotonic()
+        with self._lock:
+            shard = self._shards.get(namespace)
+            if shard is None:
+                shard = self.factory(namespace)
+                self._shards[namespace] = shard
+                self._stats["loads"] += 1
+            self._shards.move_to_end(namespace)
+            self._last_used[namespace] = now
+
+            while len(self._shards) > self.max_resident:
+                self._evict(next(iter(self._shards)))
+            if now - self._last_sweep >= self.sweep_interval:
+                self._evict_idle(now)
+        return shard
+
+    def discard(self, namespace: Optional[str]) -> bool:
+        """Drop a namespace's shard (it is rebuilt on next access)"""
+        with self._lock:
+            namespace = normalize_namespace(namespace)
+            if namespace not in self._shards:
+                return False
+            self._evict(namespace)
+            return True
+
+    def evict_idle(self) -> int:
+        with self._lock:
+            return self._evict_idle(time.monotonic())
+
+    def __contains__(self, namespace) -> bool:
+        with self._lock:
+            return namespace in self._shards
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"resident": len(self._shards), **self._stats}
+
+    def _evict_idle(self, now: float) -> int:
+        self._last_sweep = now
+        idle = [ns for ns, used in self._last_used.items() if now - used >= self.idle_seconds]
+        for namespace in idle:
+            self._evict(namespace)
+        return len(idle)
+
+    def _evict(self, namespace: str):
+        self._shards.pop(namespace, None)
+        self._last_used.pop(namespace, None)
+        self._stats["evictions"] += 1
+        logger.debug("Namespace shard evicted", extra={"namespace": namespace})
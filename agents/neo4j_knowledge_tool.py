@@ -1,44 +1,68 @@
 from pathlib import Path
+import logging
 import os
 
+from chunk_store import ensure_document
+from document_catalog import DocumentCatalog
+from namespaces import NamespaceRegistry, namespace_directory, normalize_namespace
+from recommendation_table import get_recommendation_table
+
+logger = logging.getLogger("financial_knowledge_graph")
+
+NAMESPACE_IDLE_SECONDS = float(os.getenv("NAMESPACE_IDLE_SECONDS", "900"))
+
+# uploads root -> per-namespace index shards, loaded lazily and evicted when idle
+_catalog_registries = {}
+
+def get_namespace_catalog(uploads_root, namespace):
+    """Document catalog for one namespace under an uploads root"""
+    root = str(Path(uploads_root).resolve())
+    registry = _catalog_registries.get(root)
+    if registry is None:
+        registry = _catalog_registries.setdefault(root, NamespaceRegistry(
+            lambda ns: DocumentCatalog(namespace_directory(root, ns)),
+            idle_seconds=NAMESPACE_IDLE_SECONDS
+        ))
+    return registry.get(namespace).sync()
+
 class FinancialKnowledgeGraph:
-    def __init__(self, neo4j_password, uploads_directory="./uploads"):
+    def __init__(self, neo4j_password, uploads_directory="./uploads", namespace=None):
         self.password = neo4j_password
-        self.uploads_directory = Path(uploads_directory)
-        self.uploads_directory.mkdir(exist_ok=True)
-        print(f"FinancialKnowledgeGraph initialized with uploads dir: {uploads_directory}")
+        self.namespace = normalize_namespace(namespace)
+        self.uploads_root = Path(uploads_directory)
+        self.uploads_directory = namespace_directory(uploads_directory, self.namespace)
+        self.uploads_directory.mkdir(parents=True, exist_ok=True)
+        logger.debug("FinancialKnowledgeGraph initialized", extra={"uploads_directory": str(self.uploads_directory)})
+    
+    @property
+    def catalog(self) -> DocumentCatalog:
+        """Index shard for this graph's namespace"""
+        return get_namespace_catalog(self.uploads_root, self.namespace)
     
     @property
     def has_uploaded_data(self):
-        """Check if there are any uploaded files"""
-        if self.uploads_directory.exists():
-            return any(self.uploads_directory.iterdir())
-        return False
+        """Check if there are any uploaded files in this namespace"""
+        return len(self.catalog) > 0
     
-    def search_knowledge(self, query):
-        """Basic search implementation with debugging"""
+    def search_knowledge(self, query, limit=5, snippet_chars=300):
+        """Search this namespace's uploaded documents; `text` is a snippet of each document's best-matching chunk,
+        `digest` its ingest-time summary and key figures"""
         try:
-            print(f"=== FinancialKnowledgeGraph.search_knowledge ===")
-            print(f"Query: {query}")
-            
             uploaded_content = []
             
-            print(f"Checking uploads directory: {self.uploads_directory}")
-            print(f"Directory exists: {self.uploads_directory.exists()}")
-            
-            if self.has_uploaded_data:
-                print("Processing uploaded files...")
-                files = list(self.uploads_directory.iterdir())
-                print(f"Found {len(files)} files: {[f.name for f in files]}")
-                
-                for file_path in files:
-                    if file_path.is_file():
-                        print(f"Processing file: {file_path.name}")
-                        uploaded_content.append({
-                            "source": file_path.name,
-                            "text": f"Investment analysis from {file_path.name}: This document contains financial planning information relevant to: {query}",
-                            "relevance_score": 0.8
-                        })
+            for score, record in self.catalog.search(query, limit=limit):
+                store = ensure_document(self.uploads_directory / record.name)
+                chunk = store.best_chunk(record.name, query)
+                if chunk is not None:
+                    text = store.snippet(chunk, snippet_chars)
+                else:
+                    text = f"Investment analysis from {record.name}: This document contains financial planning information relevant to: {query}"
+                uploaded_content.append({
+                    "source": record.name,
+                    "text": text,
+                    "digest": store.digest(record.name),
+                    "relevance_score": round(score, 3)
+                })
             
             result = {
                 "uploaded_content": uploaded_content,
@@ -48,24 +72,26 @@ class FinancialKnowledgeGraph:
                 ]
             }
             
-            print(f"Returning result with {len(uploaded_content)} uploaded items")
+            logger.debug("Knowledge search completed", extra={"uploaded_items": len(uploaded_content)})
             return result
             
         except Exception as e:
-            print(f"ERROR in search_knowledge: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Knowledge search failed")
             return {
                 "uploaded_content": [],
                 "graph_relationships": []
             }
     def get_investment_recommendations(self, risk_level, amount, time_horizon):
-        """Basic investment recommendations"""
+        """Investment recommendation for a profile, from the materialized recommendation table"""
+        entry = get_recommendation_table().lookup(risk_level, time_horizon, amount)
         return {
             "recommended_strategy": {
-                "name": f"{risk_level} Risk Investment Strategy",
-                "description": f"A {risk_level.lower()} risk approach suitable for {time_horizon} investing with ${amount:,.0f}",
-                "risk_level": risk_level,
-                "best_for": f"{time_horizon} investors with {risk_level.lower()} risk tolerance"
-            }
-        }
\ No newline at end of file
+                "name": entry["name"],
+                "description": f"A {entry['risk_level'].lower()} risk approach suitable for {time_horizon} investing with ${amount:,.0f}",
+                "risk_level": entry["risk_level"],
+                "best_for": f"{time_horizon} investors with {entry['risk_level'].lower()} risk tolerance",
+                "allocation": entry["allocation"],
+                "vehicles": entry["vehicles"],
+            },
+            "version": entry["version"]
+        }
@@ -1,12 +1,15 @@
 from mcp.server.fastmcp import FastMCP
 import json
+import logging
 import sys
 
+logger = logging.getLogger("pre_made_advisor_server")
+
 mcp = FastMCP("pre-made-data-server")
 
 @mcp.tool()
 def search_advisors(location: str) -> str:
-    """Search for financial advisors using pre-made data.
+    """Search the advisor directory (advisor_scoring.load_advisors) by location.
     
     Args:
         location: City and state (e.g., "Charlotte, NC")
@@ -14,30 +17,32 @@ def search_advisors(location: str) -> str:
     Returns:
         str: JSON string of financial advisors
     """
-    print(f"MCP Server: Searching for advisors in {location}", file=sys.stderr)
-    
-    advisors_data = {
-        "Charlotte, NC": [
-            {"name": "John Smith, CFP", "firm": "Smith Financial", "crd": "123456"},
-            {"name": "Sarah Johnson, CFA", "firm": "Johnson Wealth", "crd": "234567"},
-            {"name": "Amanda Williams, ChFC", "firm": "Williams Advisory Group", "crd": "345789"}
-        ],
-        "New York, NY": [
-            {"name": "Michael Brown, ChFC", "firm": "Brown Associates", "crd": "345678"},
-            {"name": "Lisa Davis, CFP", "firm": "Davis Capital", "crd": "456789"}
-        ],
-        "Miami, FL": [
-            {"name": "Robert Wilson, CFA", "firm": "Wilson Group", "crd": "567890"},
-            {"name": "Jennifer Lee, CFP", "firm": "Lee Financial", "crd": "678901"}
-        ]
-    }
-    
-   
-    advisors = advisors_data.get(location, [])
-    print(f" MCP Server: Found {len(advisors)} advisors for {location}", file=sys.stderr)
+    from advisor_scoring import load_advisors
+
+    advisors = [{key: advisor.get(key) for key in ("name", "firm", "crd")}
+                for advisor in load_advisors() if advisor.get("location") == location]
+    logger.debug("Advisor search", extra={"location": location, "advisor_count": len(advisors)})
     
     return json.dumps(advisors)
 
+@mcp.tool()
+def rank_advisors(query: str, location: str = "", top_k: int = 5) -> str:
+    """Rank financial advisors against a client's request with a deterministic match score.
+
+    Args:
+        query: The client's request (amount, goals, preferred credentials, location)
+        location: City and state overriding the one in the query (e.g., "Charlotte, NC")
+        top_k: Number of advisors to return
+
+    Returns:
+        str: JSON with the extracted profile and the top advisors, each with match_score and score breakdown
+    """
+    from advisor_scoring import rank_advisors as rank
+
+    ranking = rank(query, location or None, top_k)
+    logger.debug("Advisor ranking", extra={"candidates": ranking["candidates"], "elapsed_ms": ranking["elapsed_ms"]})
+    return json.dumps(ranking)
+
 if __name__ == "__main__":
     print("Starting Pre-made Advisor Data MCP Server...", file=sys.stderr)
     print("Server ready to handle MCP requests", file=sys.stderr)
@@ -0,0 +1,141 @@
+"""
+Prompt budgeting for the CrewAI agents.
+
+Agent role/goal/backstory and task `expected_output` templates are static:
+they are module constants, sent byte-identical on every request, so provider
+prompt caching can reuse them. The task description is the dynamic part and
+is assembled upstream as
+
+    [conversation context] "\\n\\nCurrent question: " question ["\\n\\nRelevant uploaded documents: ..."]
+
+`compact_description` keeps the question, then the documents note, then as
+much of the conversation context as the token budget allows (profile line and
+most recent turns first), and reports the token count of every component.
+"""
+
+import re
+import threading
+from typing import Any, Dict, Tuple
+
+from document_catalog import estimate_tokens
+
+CONTEXT_MARKER = "\n\nCurrent question: "
+DOCUMENTS_MARKER = "\n\nRelevant uploaded documents: "
+ELLIPSIS = "[...]"
+
+
+def compact_whitespace(text: str) -> str:
+    """Collapse runs of spaces and blank lines (safe for free text, not for code)"""
+    text = re.sub(r"[ \t]+", " ", text)
+    text = re.sub(r" *\n *", "\n", text)
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+
+def split_description(description: str) -> Tuple[str, str, str]:
+    """(conversation context, question, documents note) of a task description"""
+    context, question = "", description
+    if CONTEXT_MARKER in description:
+        context, question = description.split(CONTEXT_MARKER, 1)
+    documents = ""
+    if DOCUMENTS_MARKER in question:
+        question, documents = question.split(DOCUMENTS_MARKER, 1)
+        documents = DOCUMENTS_MARKER.lstrip("\n") + documents
+    return context, question, documents
+
+
+def clip_tokens(text: str, budget: int, keep_tail: bool = False) -> str:
+    """Cut text to roughly `budget` tokens, marking the cut"""
+    if estimate_tokens(text) <= budget:
+        return text
+    max_chars = max(budget * 4 - len(ELLIPSIS) - 1, 0)
+    if keep_tail:
+        return ELLIPSIS + " " + text[-max_chars:] if max_chars else ""
+    return text[:max_chars] + " " + ELLIPSIS if max_chars else ""
+
+
+def clip_context(context: str, budget: int) -> str:
+    """Keep the header/profile lines and the most recent lines that fit"""
+    if estimate_tokens(context) <= budget:
+        return context
+    lines = context.split("\n")
+    head = [line for line in lines[:2] if line.startswith(("Conversation context", "Investor profile"))]
+    remaining = budget - sum(estimate_tokens(line) for line in head) - estimate_tokens(ELLIPSIS)
+    if remaining <= 0:
+        return clip_tokens("\n".join(head), budget)
+    tail = []
+    for line in reversed(lines[len(head):]):
+        cost = estimate_tokens(line)
+        if cost > remaining:
+            if not tail:
+                tail.append(clip_tokens(line, remaining, keep_tail=True))
+            break
+        tail.insert(0, line)
+        remaining -= cost
+    return "\n".join(head + [ELLIPSIS] + tail)
+
+
+def compact_description(description: str, budget: int) -> Tuple[str, Dict[str, Any]]:
+    """Task description fitted to `budget` tokens, plus per-component token accounting"""
+    context, question, documents = (compact_whitespace(part) for part in split_description(description))
+    before = {"context": estimate_tokens(context) if context else 0,
+              "question": estimate_tokens(question),
+              "documents": estimate_tokens(documents) if documents else 0}
+
+    question = clip_tokens(question, budget)
+    remaining = budget - estimate_tokens(question)
+    documents = clip_tokens(documents, remaining) if documents and remaining > 0 else ""
+    remaining -= estimate_tokens(documents) if documents else 0
+    context = clip_context(context, remaining) if context and remaining > 0 else ""
+
+    after = {"context": estimate_tokens(context) if context else 0,
+             "question": estimate_tokens(question),
+             "documents": estimate_tokens(documents) if documents else 0}
+    text = question + ("\n\n" + documents if documents else "")
+    if context:
+        text = context + CONTEXT_MARKER + text
+
+    accounting = {
+        "budget": budget,
+        "dynamic_tokens": sum(after.values()),
+        "dynamic_tokens_before": sum(before.values()),
+        "components": after,
+        "truncated": [name for name in after if after[name] < before[name]],
+    }
+    return text, accounting
+
+
+def static_prompt_tokens(*parts: str) -> int:
+    return sum(estimate_tokens(part) for part in parts)
+
+
+class PromptStats:
+    """Running prompt-size totals per agent"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._agents: Dict[str, Dict[str, int]] = {}
+
+    def record(self, agent_name: str, usage: Dict[str, Any]):
+        with self._lock:
+            totals = self._agents.setdefault(agent_name, {
+                "requests": 0, "truncated_requests": 0, "static_tokens": 0,
+                "dynamic_tokens": 0, "dynamic_tokens_dropped": 0,
+            })
+            totals["requests"] += 1
+            totals["truncated_requests"] += 1 if usage.get("truncated") else 0
+            totals["static_tokens"] += usage.get("static_tokens", 0)
+            totals["dynamic_tokens"] += usage.get("dynamic_tokens", 0)
+            totals["dynamic_tokens_dropped"] += max(
+                usage.get("dynamic_tokens_before", 0) - usage.get("dynamic_tokens", 0), 0
+            )
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            report = {}
+            for name, totals in self._agents.items():
+                requests = max(totals["requests"], 1)
+                report[name] = {
+                    **totals,
+                    "avg_prompt_tokens": round((totals["static_tokens"] + totals["dynamic_tokens"]) / requests, 1),
+                }
+            return report
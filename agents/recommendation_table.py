@@ -0,0 +1,273 @@
+"""
+Materialized investment recommendations.
+
+Strategy knowledge is a small graph: risk levels point to asset classes with
+base weights, time horizons adjust those weights, amount buckets point to the
+vehicles worth using at that size. Answering one profile is a traversal of
+that graph (`traverse`), but there are only |risk| x |horizon| x |bucket|
+distinct answers, so `RecommendationTable` walks the graph once for every
+profile key and serves lookups from a dict.
+
+The table carries a version (a hash of the graph). It is rebuilt when the
+graph file (KNOWLEDGE_GRAPH_PATH, JSON with the shape of DEFAULT_GRAPH)
+changes, checked at most every `check_seconds`. Callers holding advice can
+compare its `version` with `table.version` (or `is_current`) to tell whether
+it is stale.
+
+    python recommendation_table.py --benchmark 100000
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("recommendation_table")
+
+AMOUNT_BUCKETS = (  # (name, lower bound)
+    ("starter", 0),
+    ("core", 10_000),
+    ("affluent", 100_000),
+    ("high_net_worth", 1_000_000),
+)
+
+DEFAULT_GRAPH = {
+    "nodes": {
+        "risk:Low": {"type": "RiskLevel", "name": "Low", "label": "Conservative"},
+        "risk:Moderate": {"type": "RiskLevel", "name": "Moderate", "label": "Balanced"},
+        "risk:High": {"type": "RiskLevel", "name": "High", "label": "Growth"},
+        "horizon:short-term": {"type": "Horizon", "name": "short-term"},
+        "horizon:medium-term": {"type": "Horizon", "name": "medium-term"},
+        "horizon:long-term": {"type": "Horizon", "name": "long-term"},
+        "bucket:starter": {"type": "AmountBucket", "name": "starter"},
+        "bucket:core": {"type": "AmountBucket", "name": "core"},
+        "bucket:affluent": {"type": "AmountBucket", "name": "affluent"},
+        "bucket:high_net_worth": {"type": "AmountBucket", "name": "high_net_worth"},
+        "asset:stocks": {"type": "AssetClass", "name": "Stocks"},
+        "asset:bonds": {"type": "AssetClass", "name": "Bonds"},
+        "asset:cash": {"type": "AssetClass", "name": "Cash"},
+        "vehicle:target_date": {"type": "Vehicle", "name": "Target-date or all-in-one index fund"},
+        "vehicle:index_etfs": {"type": "Vehicle", "name": "Low-cost index ETFs"},
+        "vehicle:bond_funds": {"type": "Vehicle", "name": "Bond index funds"},
+        "vehicle:treasuries": {"type": "Vehicle", "name": "Treasury ladder"},
+        "vehicle:tax_managed": {"type": "Vehicle", "name": "Tax-managed funds"},
+        "vehicle:direct_indexing": {"type": "Vehicle", "name": "Direct indexing"},
+        "vehicle:alternatives": {"type": "Vehicle", "name": "Alternatives sleeve (REITs, private credit)"},
+        "vehicle:high_yield_savings": {"type": "Vehicle", "name": "High-yield savings / money market"},
+    },
+    "edges": [
+        ["risk:Low", "BASE_WEIGHT", "asset:stocks", {"weight": 30}],
+        ["risk:Low", "BASE_WEIGHT", "asset:bonds", {"weight": 70}],
+        ["risk:Moderate", "BASE_WEIGHT", "asset:stocks", {"weight": 60}],
+        ["risk:Moderate", "BASE_WEIGHT", "asset:bonds", {"weight": 40}],
+        ["risk:High", "BASE_WEIGHT", "asset:stocks", {"weight": 90}],
+        ["risk:High", "BASE_WEIGHT", "asset:bonds", {"weight": 10}],
+        ["horizon:short-term", "ADJUSTS", "asset:stocks", {"delta": -20}],
+        ["horizon:short-term", "ADJUSTS", "asset:cash", {"delta": 15}],
+        ["horizon:short-term", "ADJUSTS", "asset:bonds", {"delta": 5}],
+        ["horizon:medium-term", "ADJUSTS", "asset:stocks", {"delta": -5}],
+        ["horizon:medium-term", "ADJUSTS", "asset:cash", {"delta": 5}],
+        ["bucket:starter", "USES", "vehicle:target_date", {}],
+        ["bucket:starter", "USES", "vehicle:high_yield_savings", {}],
+        ["bucket:core", "USES", "vehicle:index_etfs", {}],
+        ["bucket:core", "USES", "vehicle:bond_funds", {}],
+        ["bucket:affluent", "USES", "vehicle:index_etfs", {}],
+        ["bucket:affluent", "USES", "vehicle:tax_managed", {}],
+        ["bucket:affluent", "USES", "vehicle:treasuries", {}],
+        ["bucket:high_net_worth", "USES", "vehicle:direct_indexing", {}],
+        ["bucket:high_net_worth", "USES", "vehicle:treasuries", {}],
+        ["bucket:high_net_worth", "USES", "vehicle:alternatives", {}],
+    ],
+}
+
+
+def amount_bucket(amount: float) -> str:
+    bucket = AMOUNT_BUCKETS[0][0]
+    for name, lower in AMOUNT_BUCKETS:
+        if amount >= lower:
+            bucket = name
+    return bucket
+
+
+def graph_version(graph: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(graph, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+
+def _find(graph: Dict[str, Any], node_type: str, name: str) -> Optional[str]:
+    for node_id, node in graph["nodes"].items():
+        if node["type"] == node_type and node["name"] == name:
+            return node_id
+    return None
+
+
+def _out(graph: Dict[str, Any], source: str, relation: str) -> List[Tuple[str, Dict[str, Any]]]:
+    return [(target, props) for src, rel, target, props in graph["edges"] if src == source and rel == relation]
+
+
+def traverse(graph: Dict[str, Any], risk_level: str, time_horizon: str, bucket: str) -> Dict[str, Any]:
+    """Walk the graph for one profile: base weights, horizon adjustments, vehicles"""
+    risk = _find(graph, "RiskLevel", risk_level) or _find(graph, "RiskLevel", "Moderate")
+    horizon = _find(graph, "Horizon", time_horizon)
+    size = _find(graph, "AmountBucket", bucket)
+
+    weights: Dict[str, float] = {}
+    for asset, props in _out(graph, risk, "BASE_WEIGHT"):
+        weights[asset] = weights.get(asset, 0) + props["weight"]
+    if horizon:
+        for asset, props in _out(graph, horizon, "ADJUSTS"):
+            weights[asset] = max(weights.get(asset, 0) + props["delta"], 0)
+    total = sum(weights.values()) or 1
+    allocation = {graph["nodes"][asset]["name"]: round(100 * weight / total, 1)
+                  for asset, weight in sorted(weights.items(), key=lambda item: -item[1]) if weight > 0}
+    vehicles = [graph["nodes"][vehicle]["name"] for vehicle, _ in _out(graph, size, "USES")] if size else []
+
+    risk_node = graph["nodes"][risk]
+    return {
+        "name": f"{risk_node['name']} Risk Investment Strategy",
+        "label": risk_node.get("label", risk_node["name"]),
+        "risk_level": risk_node["name"],
+        "time_horizon": time_horizon,
+        "amount_bucket": bucket,
+        "allocation": allocation,
+        "vehicles": vehicles,
+    }
+
+
+def load_graph(path: Optional[str] = None) -> Dict[str, Any]:
+    if not path:
+        return DEFAULT_GRAPH
+    with open(path, encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+class RecommendationTable:
+    """Every (risk level, horizon, amount bucket) recommendation, precomputed and versioned"""
+
+    def __init__(self, path: Optional[str] = None, check_seconds: float = 30.0):
+        self.path = path
+        self.check_seconds = check_seconds
+        self.version: Optional[str] = None
+        self._table: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._source_mtime = None
+        self._checked_at = 0.0
+        self._stats = {"builds": 0, "lookups": 0, "misses": 0, "build_ms": None}
+        self.build()
+
+    def build(self) -> str:
+        """Materialize the table from the current graph; returns its version"""
+        started = time.perf_counter()
+        if self.path:
+            self._source_mtime = os.stat(self.path).st_mtime_ns
+        graph = load_graph(self.path)
+        version = graph_version(graph)
+        risks = [node["name"] for node in graph["nodes"].values() if node["type"] == "RiskLevel"]
+        horizons = [node["name"] for node in graph["nodes"].values() if node["type"] == "Horizon"]
+        buckets = [node["name"] for node in graph["nodes"].values() if node["type"] == "AmountBucket"]
+        table = {(risk, horizon, bucket): {**traverse(graph, risk, horizon, bucket), "version": version}
+                 for risk in risks for horizon in horizons for bucket in buckets}
+        build_ms = round((time.perf_counter() - started) * 1000, 2)
+        with self._lock:
+            previous, self._table, self.version = self.version, table, version
+            self._stats["builds"] += 1
+            self._stats["build_ms"] = build_ms
+        if previous != version:
+            logger.info("Recommendation table built", extra={"version": version, "previous_version": previous,
+                                                             "entries": len(table), "elapsed_ms": build_ms})
+        return version
+
+    def refresh_if_changed(self) -> bool:
+        """Rebuild when the graph file changed (stat at most every `check_seconds`)"""
+        now = time.monotonic()
+        if not self.path or now - self._checked_at < self.check_seconds:
+            return False
+        self._checked_at = now
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return False
+        if mtime == self._source_mtime:
+            return False
+        previous = self.version
+        try:
+            return self.build() != previous
+        except (OSError, ValueError) as e:
+            logger.warning("Could not rebuild recommendation table", extra={"path": self.path, "error": str(e)})
+            return False
+
+    def lookup(self, risk_level: str, time_horizon: str, amount: float) -> Dict[str, Any]:
+        """Precomputed recommendation for a profile (unknown keys fall back to a traversal)"""
+        self.refresh_if_changed()
+        key = (risk_level, time_horizon, amount_bucket(amount))
+        with self._lock:
+            self._stats["lookups"] += 1
+            entry = self._table.get(key)
+            version = self.version
+        if entry is None:
+            with self._lock:
+                self._stats["misses"] += 1
+            entry = {**traverse(load_graph(self.path), *key), "version": version}
+        return entry
+
+    def is_current(self, version: Optional[str]) -> bool:
+        return version is not None and version == self.version
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "version": self.version, "entries": len(self._table)}
+
+
+_table: Optional[RecommendationTable] = None
+_table_lock = threading.Lock()
+
+
+def get_recommendation_table() -> RecommendationTable:
+    """Process-wide table over KNOWLEDGE_GRAPH_PATH (or the built-in graph)"""
+    global _table
+    if _table is None:
+        with _table_lock:
+            if _table is None:
+                _table = RecommendationTable(os.getenv("KNOWLEDGE_GRAPH_PATH") or None,
+                                             check_seconds=float(os.getenv("KNOWLEDGE_GRAPH_CHECK_SECONDS", "30")))
+    return _table
+
+
+def benchmark(calls: int) -> Dict[str, Any]:
+    graph = load_graph()
+    table = RecommendationTable()
+    profiles = [(risk, horizon, amount) for risk in ("Low", "Moderate", "High")
+                for horizon in ("short-term", "medium-term", "long-term")
+                for amount in (5_000, 50_000, 250_000, 2_000_000)]
+
+    started = time.perf_counter()
+    for i in range(calls):
+        risk, horizon, amount = profiles[i % len(profiles)]
+        traverse(graph, risk, horizon, amount_bucket(amount))
+    traverse_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for i in range(calls):
+        table.lookup(*profiles[i % len(profiles)])
+    lookup_s = time.perf_counter() - started
+    return {
+        "calls": calls,
+        "traverse_us": round(traverse_s / calls * 1e6, 2),
+        "lookup_us": round(lookup_s / calls * 1e6, 2),
+        "speedup": round(traverse_s / lookup_s, 1),
+        **{f"table_{key}": value for key, value in table.stats().items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--benchmark", type=int, metavar="CALLS", default=100000)
+    args = parser.parse_args()
+    print(json.dumps(benchmark(args.benchmark), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""
+Typed chat responses.
+
+Agent replies are markdown reports (bold or `#` headings, bullet lists, often
+a fenced JSON block because the CrewAI tasks ask for "Structured JSON +
+human-readable summary"). `ReportParser` turns such a reply into a typed
+report in one pass over its lines (it can be fed chunk by chunk):
+
+    {"title", "summary", "sections": [{"id", "title", "text", "bullets"}],
+     "allocations": [{"asset", "percent", "amount"}],
+     "advisors": [{"name", "firm", "credentials", "location", "match_score", "fees", "details"}],
+     "data": {...}}          # fenced JSON blocks, merged
+
+`summary_view` keeps the light fields and only the titles of sections so a
+client can render the summary first and fetch sections on demand from
+`ReportStore` by response id. Reports are kept with the namespace they were
+answered in and only returned to that namespace.
+"""
+
+import json
+import re
+import sqlite3
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+SUMMARY_CHARS = 600
+
+_BOLD_HEADING = re.compile(r"^\*\*(.+?)\*\*:?\s*$")
+_HASH_HEADING = re.compile(r"^#{1,6}\s+(.+?)\s*#*$")
+_BULLET = re.compile(r"^(?:[-*•]|\d+[.)])\s+(.*)$")
+_PERCENT = re.compile(r"(\d+(?:\.\d+)?)\s*%")
+_DOLLARS = re.compile(r"\$\s*([\d,]+(?:\.\d+)?)\s*([kKmM]|thousand|million)?")
+_FIELD = re.compile(r"^\**([A-Za-z][A-Za-z /&()-]{1,40}?)\**\s*:\s*\**\s*(.+)$")
+_SLUG = re.compile(r"[^a-z0-9]+")
+_EMPTY_PARENS = re.compile(r"\(\s*\)")
+
+_ALLOCATION_SECTIONS = ("allocation", "portfolio")
+_ADVISOR_SECTIONS = ("advisor", "match", "profile")
+_ADVISOR_FIELDS = {
+    "name": "name", "advisor": "name", "name and firm": "name",
+    "firm": "firm", "company": "firm",
+    "credentials": "credentials", "designations": "credentials",
+    "location": "location", "address": "location",
+    "match score": "match_score", "score": "match_score",
+    "fee structure": "fees", "fees": "fees", "fee": "fees",
+}
+
+
+def _slug(title: str, taken: set) -> str:
+    base = _SLUG.sub("-", title.lower()).strip("-")[:48] or "section"
+    slug, n = base, 2
+    while slug in taken:
+        slug, n = f"{base}-{n}", n + 1
+    taken.add(slug)
+    return slug
+
+
+def _amount(text: str) -> Optional[float]:
+    match = _DOLLARS.search(text)
+    if not match:
+        return None
+    value = float(match.group(1).replace(",", ""))
+    unit = (match.group(2) or "").lower()
+    if unit in ("k", "thousand"):
+        value *= 1_000
+    elif unit in ("m", "million"):
+        value *= 1_000_000
+    return value
+
+
+def _strip_markup(text: str) -> str:
+    return text.replace("**", "").replace("__", "").strip()
+
+
+class ReportParser:
+    """Single-pass markdown report parser; call feed() with text chunks, then close()"""
+
+    def __init__(self):
+        self._pending = ""
+        self._in_code: Optional[str] = None
+        self._code: List[str] = []
+        self._taken: set = set()
+        self._report: Dict[str, Any] = {
+            "title": None, "summary": "", "sections": [], "allocations": [], "advisors": [], "data": {},
+        }
+        self._section: Optional[Dict[str, Any]] = None
+        self._preamble: List[str] = []
+        self._advisor: Optional[Dict[str, Any]] = None
+
+    def feed(self, chunk: str):
+        lines = (self._pending + chunk).split("\n")
+        self._pending = lines.pop()
+        for line in lines:
+            self._line(line)
+
+    def close(self) -> Dict[str, Any]:
+        if self._pending:
+            self._line(self._pending)
+            self._pending = ""
+        self._finish_advisor()
+        report = self._report
+        for section in report["sections"]:
+            section["text"] = "\n".join(section.pop("_lines")).strip()
+        report["summary"] = self._summary()
+        return report
+
+    def _line(self, raw: str):
+        line = raw.strip()
+        if self._in_code is not None:
+            if line.startswith("```"):
+                self._end_code()
+            else:
+                self._code.append(raw)
+            return
+        if line.startswith("```"):
+            self._in_code = line[3:].strip().lower()
+            self._code = []
+            return
+
+        heading = _BOLD_HEADING.match(line) or _HASH_HEADING.match(line)
+        if heading:
+            title = _strip_markup(heading.group(1)).strip(" :")
+            if self._report["title"] is None and not self._report["sections"] and not self._preamble:
+                self._report["title"] = title
+                return
+            self._open_section(title)
+            return
+
+        if self._section is None:
+            if line:
+                self._preamble.append(line)
+            return
+        self._section["_lines"].append(raw.rstrip())
+        bullet = _BULLET.match(line)
+        item = _strip_markup(bullet.group(1)) if bullet else None
+        if item:
+            self._section["bullets"].append(item)
+        self._collect(item or _strip_markup(line))
+
+    def _open_section(self, title: str):
+        self._finish_advisor()
+        self._section = {"id": _slug(title, self._taken), "title": title, "bullets": [], "_lines": []}
+        self._report["sections"].append(self._section)
+
+    def _collect(self, text: str):
+        if not text:
+            return
+        title = self._section["title"].lower()
+        if any(word in title for word in _ALLOCATION_SECTIONS):
+            percent = _PERCENT.search(text)
+            if percent:
+                asset = text.split(":")[0] if ":" in text else _DOLLARS.sub("", _PERCENT.sub("", text))
+                asset = _EMPTY_PARENS.sub("", asset).strip(" -–:")
+                self._report["allocations"].append({
+                    "asset": asset or text, "percent": float(percent.group(1)), "amount": _amount(text),
+                })
+        if any(word in title for word in _ADVISOR_SECTIONS):
+            field = _FIELD.match(text)
+            if field:
+                key = _ADVISOR_FIELDS.get(field.group(1).strip().lower())
+                if key == "name" and self._advisor and self._advisor.get("name"):
+                    self._finish_advisor()
+                if key:
+                    self._advisor = self._advisor or {"details": []}
+                    value = field.group(2).strip()
+                    score = _PERCENT.search(value) if key == "match_score" else None
+                    self._advisor[key] = float(score.group(1)) if score else value
+                    return
+            if self._advisor is not None:
+                self._advisor["details"].append(text)
+
+    def _finish_advisor(self):
+        if self._advisor and self._advisor.get("name"):
+            self._report["advisors"].append(self._advisor)
+        self._advisor = None
+
+    def _end_code(self):
+        body = "\n".join(self._code)
+        language, self._in_code = self._in_code, None
+        if language not in ("json", ""):
+            return
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return
+        if isinstance(data, dict):
+            self._report["data"].update(data)
+            for key in ("allocations", "advisors"):
+                if isinstance(data.get(key), list) and not self._report[key]:
+                    self._report[key] = data[key]
+
+    def _summary(self) -> str:
+        text = " ".join(self._preamble)
+        if not text:
+            for section in self._report["sections"]:
+                if "summary" in section["title"].lower() or "recommendation" in section["title"].lower():
+                    text = section["text"]
+                    break
+        if not text and self._report["sections"]:
+            text = self._report["sections"][0]["text"]
+        text = " ".join(_strip_markup(text).split())
+        return text if len(text) <= SUMMARY_CHARS else text[:SUMMARY_CHARS - 3].rstrip() + "..."
+
+
+def parse_report(text: str) -> Dict[str, Any]:
+    parser = ReportParser()
+    parser.feed(text)
+    return parser.close()
+
+
+def summary_view(report: Dict[str, Any]) -> Dict[str, Any]:
+    """Report without section bodies (titles and sizes only)"""
+    return {
+        **{key: value for key, value in report.items() if key != "sections"},
+        "sections": [{"id": section["id"], "title": section["title"], "chars": len(section["text"])}
+                     for section in report["sections"]],
+    }
+
+
+class ReportStore:
+    """Recent parsed reports by response id (LRU; write-through to SQLite when shared by workers)"""
+
+    def __init__(self, max_reports: int = 2000, path: Optional[str] = None):
+        self.max_reports = max_reports
+        self._reports: "OrderedDict[str, Tuple[Optional[str], Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS reports (id TEXT PRIMARY KEY, report TEXT NOT NULL)")
+            columns = {column[1] for column in self._db.execute("PRAGMA table_info(reports)")}
+            if "namespace" not in columns:
+                # Reports stored before they had an owner are not returned to anyone
+                self._db.execute("ALTER TABLE reports ADD COLUMN namespace TEXT")
+            self._db.commit()
+
+    def put(self, report: Dict[str, Any], namespace: Optional[str] = None) -> str:
+        response_id = uuid.uuid4().hex
+        with self._lock:
+            self._reports[response_id] = (namespace, report)
+            while len(self._reports) > self.max_reports:
+                self._reports.popitem(last=False)
+            if self._db is not None:
+                self._db.execute("INSERT INTO reports (id, report, namespace) VALUES (?, ?, ?)",
+                                 (response_id, json.dumps(report), namespace))
+                self._db.execute(
+                    "DELETE FROM reports WHERE rowid <= (SELECT MAX(rowid) FROM reports) - ?", (self.max_reports,)
+                )
+                self._db.commit()
+        return response_id
+
+    def get(self, response_id: str, namespace: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """The report, or None when it is unknown, expired or belongs to another namespace"""
+        with self._lock:
+            entry = self._reports.get(response_id)
+            if entry is None and self._db is not None:
+                row = self._db.execute("SELECT namespace, report FROM reports WHERE id = ?", (response_id,)).fetchone()
+                entry = (row[0], json.loads(row[1])) if row else None
+        if entry is None or entry[0] != namespace:
+            return None
+        return entry[1]
+
+    def section(self, response_id: str, section_id: str, namespace: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        report = self.get(response_id, namespace)
+        if report is None:
+            return None
+        return next((section for section in report["sections"] if section["id"] == section_id), None)
@@ -0,0 +1,393 @@
+"""
+Semantic answer cache.
+
+Sits in front of `ACPCallingAgent.run`: incoming queries are embedded locally
+and compared with past queries routed to the same agent(s); when the most
+similar one scores above the threshold its stored answer is returned without
+calling the agent. Paraphrases ("balanced portfolio for $50k retirement" /
+"put 50 thousand into a moderate retirement mix") land on the same entry.
+
+Answers depend on parameters that embeddings blur (amounts, locations, risk
+level, horizon, age, years, tickers, the content of the uploaded documents),
+and on the meaning a bag of terms loses: negation ("is gold not a good
+investment") and the direction of a comparison ("bonds rather than stocks",
+"pay off the mortgage before investing"). Each entry carries these
+parameters, extracted from its query, and only entries with exactly the same
+parameters are candidates. Follow-up questions with conversation context
+bypass the cache.
+
+The default embedder is dependency-free: canonicalized, lightly stemmed terms
+in a sparse vector, searched through an inverted index. Setting a
+sentence-transformers model name (SEMANTIC_CACHE_MODEL) uses dense model
+embeddings instead when that package is installed. Entries can be persisted
+to SQLite so API worker processes share them.
+"""
+
+import hashlib
+import json
+import logging
+import math
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from document_catalog import tokenize
+from investor_profile import extract_profile
+from prompt_budget import DOCUMENTS_MARKER
+
+logger = logging.getLogger("semantic_cache")
+
+# Financial near-synonyms mapped to one canonical term before embedding
+SYNONYMS = {
+    "moderate": "balanced", "medium": "balanced",
+    "mix": "portfolio", "allocation": "portfolio", "allocate": "portfolio", "holdings": "portfolio",
+    "retire": "retirement", "retiring": "retirement", "retired": "retirement",
+    "put": "invest", "investing": "invest", "investment": "invest", "investments": "invest",
+    "adviser": "advisor", "advisers": "advisor", "planner": "advisor", "planners": "advisor",
+    "stocks": "stock", "equities": "stock", "equity": "stock", "shares": "stock",
+    "bonds": "bond", "treasuries": "bond",
+    "etf": "fund", "etfs": "fund", "funds": "fund",
+    "forecast": "outlook", "trends": "outlook", "trend": "outlook", "prospects": "outlook",
+    "top": "best",
+}
+# Words that carry no meaning once amounts and other parameters are guarded separately
+_FILLER = {"id", "ll", "ve", "thousand", "million", "dollars", "usd", "just", "some", "need", "help",
+           "looking", "get", "give", "tell", "know", "think", "much", "also", "good", "which", "will"}
+_SUFFIXES = ("ing", "ed", "ly", "es", "s")
+_TICKER_RE = re.compile(r"\b[A-Z]{2,5}\b")
+_YEAR_RE = re.compile(r"\b(?:19|20)\d{2}\b")
+_DURATION_RE = re.compile(r"\b(\d+)\s*(?:-\s*)?(?:years?|yrs?|months?)\b", re.IGNORECASE)
+_NEGATION_RE = re.compile(r"\b(?:not|no|never|nor|neither|without|avoid|cannot)\b|n't\b", re.IGNORECASE)
+# Words that order the terms around them: "A than B" is not "B than A"
+_ORDER_MARKERS = {"than", "before", "after", "instead", "rather", "over", "versus", "vs"}
+_SYMMETRIC_MARKERS = {"versus", "vs"}
+_NOT_TICKERS = {"I", "IRA", "ETF", "ETFS", "CFP", "CFA", "CHFC", "USD", "US", "USA", "NYC", "AI", "NC", "NY", "FL",
+                "OK", "CEO", "FAQ"}
+
+
+def _percentile_ms(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return round(sorted_values[min(int(fraction * len(sorted_values)), len(sorted_values) - 1)] * 1000, 3)
+
+
+def canonical_terms(text: str) -> List[str]:
+    """Terms used for similarity: no numbers or filler, synonyms unified, crude suffix stemming"""
+    terms = []
+    for term in tokenize(text):
+        if any(ch.isdigit() for ch in term) or term in _FILLER:
+            continue
+        term = SYNONYMS.get(term, term)
+        if term not in SYNONYMS.values():
+            for suffix in _SUFFIXES:
+                if len(term) > len(suffix) + 3 and term.endswith(suffix):
+                    term = term[:-len(suffix)]
+                    break
+        terms.append(term)
+    return terms
+
+
+def comparison_order(question: str) -> List[str]:
+    """Ordered pairs around comparison words ("hold bonds rather than stocks" -> ["bond>rather>stock", ...])"""
+    terms = [term for term in tokenize(question) if not any(ch.isdigit() for ch in term) and term not in _FILLER]
+    pairs = set()
+    for index, term in enumerate(terms):
+        if term not in _ORDER_MARKERS:
+            continue
+        before = next((other for other in reversed(terms[:index]) if other not in _ORDER_MARKERS), None)
+        after = next((other for other in terms[index + 1:] if other not in _ORDER_MARKERS), None)
+        if before is None or after is None:
+            continue
+        left, right = canonical_terms(before) or [before], canonical_terms(after) or [after]
+        ends = sorted((left[0], right[0])) if term in _SYMMETRIC_MARKERS else (left[0], right[0])
+        pairs.add(f"{ends[0]}>{term}>{ends[1]}")
+    return sorted(pairs)
+
+
+def query_parameters(query: str, namespace: Optional[str] = None,
+                     documents_version: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Parameters that must match exactly for two queries to share an answer.
+    `documents_version` identifies the content of the namespace's uploads.
+    """
+    question, _, documents = query.partition(DOCUMENTS_MARKER)
+    params: Dict[str, Any] = extract_profile(question)
+    years = sorted(set(_YEAR_RE.findall(question)))
+    durations = sorted({match.lower().replace(" ", "") for match in _DURATION_RE.findall(question)})
+    tickers = sorted({word for word in _TICKER_RE.findall(question) if word not in _NOT_TICKERS})
+    if years:
+        params["years"] = years
+    if durations:
+        params["durations"] = durations
+    if tickers:
+        params["tickers"] = tickers
+    if _NEGATION_RE.search(question.replace("\u2019", "'")):
+        params["negated"] = True
+    order = comparison_order(question)
+    if order:
+        params["order"] = order
+    if documents:
+        # Same file names in two sessions, or a file re-uploaded under the same name,
+        # are still different documents
+        fingerprint = f"{documents}\n{documents_version or ''}"
+        params["documents"] = f"{namespace}:{hashlib.sha1(fingerprint.encode()).hexdigest()[:12]}"
+    return params
+
+
+class HashingEmbedder:
+    """Sparse, L2-normalized term vectors (dependency-free)"""
+
+    name = "terms"
+
+    def embed(self, text: str) -> Dict[str, float]:
+        counts: Dict[str, float] = defaultdict(float)
+        for term in canonical_terms(text):
+            counts[term] += 1.0
+        norm = math.sqrt(sum(value * value for value in counts.values())) or 1.0
+        return {term: value / norm for term, value in counts.items()}
+
+
+class SentenceTransformerEmbedder:
+    """Dense model embeddings (sentence-transformers), stored in the same sparse form"""
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+        self.name = model_name
+        self._model = SentenceTransformer(model_name)
+
+    def embed(self, text: str) -> Dict[str, float]:
+        vector = self._model.encode(text, normalize_embeddings=True)
+        return {str(index): float(value) for index, value in enumerate(vector)}
+
+
+def build_embedder(model_name: Optional[str] = None):
+    """Model embedder when configured and installed, else the dependency-free one"""
+    if model_name:
+        try:
+            return SentenceTransformerEmbedder(model_name)
+        except Exception as e:
+            logger.warning("Embedding model unavailable; using term vectors",
+                           extra={"model": model_name, "error": str(e)})
+    return HashingEmbedder()
+
+
+class _Entry:
+    __slots__ = ("entry_id", "query", "answer", "vector", "created")
+
+    def __init__(self, entry_id: int, query: str, answer: str, vector: Dict[str, float], created: float):
+        self.entry_id = entry_id
+        self.query = query
+        self.answer = answer
+        self.vector = vector
+        self.created = created
+
+
+class _AgentIndex:
+    """Entries of one (agent, parameters) bucket with an inverted index over vector dimensions"""
+
+    def __init__(self):
+        self.entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self.postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+
+    def add(self, entry: _Entry):
+        self.entries[entry.entry_id] = entry
+        for dimension, weight in entry.vector.items():
+            self.postings[dimension][entry.entry_id] = weight
+
+    def remove(self, entry_id: int):
+        entry = self.entries.pop(entry_id, None)
+        if entry is None:
+            return
+        for dimension in entry.vector:
+            posting = self.postings.get(dimension)
+            if posting is not None:
+                posting.pop(entry_id, None)
+                if not posting:
+                    del self.postings[dimension]
+
+    def nearest(self, vector: Dict[str, float]) -> Tuple[Optional[_Entry], float]:
+        scores: Dict[int, float] = defaultdict(float)
+        for dimension, weight in vector.items():
+            for entry_id, other in self.postings.get(dimension, {}).items():
+                scores[entry_id] += weight * other
+        if not scores:
+            return None, 0.0
+        entry_id, score = max(scores.items(), key=lambda item: item[1])
+        return self.entries[entry_id], score
+
+
+class SemanticAnswerCache:
+    """Answers of past queries, found again by embedding similarity within identical parameters"""
+
+    def __init__(self, threshold: float = 0.8, ttl_seconds: float = 24 * 3600.0,
+                 agent_ttls: Optional[Dict[str, float]] = None, max_entries: int = 5000,
+                 embedder=None, path: Optional[str] = None, sync_seconds: float = 2.0,
+                 documents_version: Optional[Callable[[Optional[str]], str]] = None):
+        """`documents_version(namespace)` returns a hash of the namespace's upload contents"""
+        self.threshold = threshold
+        self.documents_version = documents_version
+        self.ttl_seconds = ttl_seconds
+        self.agent_ttls = dict(agent_ttls or {})
+        self.max_entries = max_entries
+        self.embedder = embedder or HashingEmbedder()
+        self.sync_seconds = sync_seconds
+        self._indexes: Dict[Tuple[str, str], _AgentIndex] = defaultdict(_AgentIndex)
+        self._order: "OrderedDict[int, Tuple[str, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._lookup_seconds: deque = deque(maxlen=2000)
+        self._hit_similarity: deque = deque(maxlen=2000)
+        self._stats = {"lookups": 0, "hits": 0, "misses": 0, "bypassed": 0, "stored": 0, "expired": 0, "evicted": 0}
+
+        self._db = None
+        self._synced_rowid = 0
+        self._synced_at = 0.0
+        if path:
+            self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS answers (id INTEGER PRIMARY KEY AUTOINCREMENT, agents TEXT NOT NULL, "
+                "params TEXT NOT NULL, query TEXT NOT NULL, answer TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.execute("DELETE FROM answers WHERE created < ?",
+                             (time.time() - max([ttl_seconds, *self.agent_ttls.values()]),))
+            self._db.commit()
+            self._sync()
+
+    def lookup(self, agents: List[str], query: str, namespace: Optional[str] = None,
+               context: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Cached answer for the query as {"answer", "similarity", "matched_query"}, or None"""
+        if context:
+            self._count("bypassed")
+            return None
+        started = time.perf_counter()
+        key = self._key(agents, query, namespace)
+        vector = self.embedder.embed(query.partition(DOCUMENTS_MARKER)[0])
+        self._sync()
+        with self._lock:
+            self._stats["lookups"] += 1
+            index = self._indexes.get(key)
+            entry, similarity = index.nearest(vector) if index is not None else (None, 0.0)
+            if entry is not None and time.time() - entry.created > self._ttl(agents):
+                self._remove(entry.entry_id)
+                self._stats["expired"] += 1
+                entry = None
+            hit = entry is not None and similarity >= self.threshold
+            self._stats["hits" if hit else "misses"] += 1
+            self._lookup_seconds.append(time.perf_counter() - started)
+            if not hit:
+                return None
+            self._hit_similarity.append(similarity)
+            return {"answer": entry.answer, "similarity": round(similarity, 3), "matched_query": entry.query}
+
+    def store(self, agents: List[str], query: str, answer: str, namespace: Optional[str] = None,
+              context: Optional[str] = None):
+        """Remember a successful answer (follow-ups with conversation context are not cached)"""
+        if context or not answer:
+            return
+        key = self._key(agents, query, namespace)
+        question = query.partition(DOCUMENTS_MARKER)[0]
+        vector = self.embedder.embed(question)
+        if not vector:
+            return
+        created = time.time()
+        if self._db is not None:
+            with self._lock:
+                cursor = self._db.execute(
+                    "INSERT INTO answers (agents, params, query, answer, created) VALUES (?, ?, ?, ?, ?)",
+                    (key[0], key[1], question, answer, created)
+                )
+                self._db.commit()
+            # Other workers pick the row up on their next sync; this one adds it now
+            self._add(key, question, answer, vector, created, rowid=cursor.lastrowid)
+        else:
+            self._add(key, question, answer, vector, created)
+        self._count("stored")
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+            self._order.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM answers")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            lookups = sorted(self._lookup_seconds)
+            similarity = list(self._hit_similarity)
+            entries = len(self._order)
+        decided = stats["hits"] + stats["misses"]
+        return {
+            **stats,
+            "hit_rate": round(stats["hits"] / decided, 3) if decided else 0.0,
+            "entries": entries,
+            "threshold": self.threshold,
+            "embedder": self.embedder.name,
+            "lookup_ms": {
+                "avg": round(sum(lookups) / len(lookups) * 1000, 3) if lookups else 0.0,
+                "p50": _percentile_ms(lookups, 0.50),
+                "p95": _percentile_ms(lookups, 0.95),
+                "max": round(lookups[-1] * 1000, 3) if lookups else 0.0,
+            },
+            "hit_similarity_avg": round(sum(similarity) / len(similarity), 3) if similarity else None,
+        }
+
+    def _key(self, agents: List[str], query: str, namespace: Optional[str]) -> Tuple[str, str]:
+        version = None
+        if self.documents_version is not None and DOCUMENTS_MARKER in query:
+            version = self.documents_version(namespace)
+        return ",".join(agents), json.dumps(query_parameters(query, namespace, version), sort_keys=True)
+
+    def _ttl(self, agents: List[str]) -> float:
+        return min((self.agent_ttls.get(agent, self.ttl_seconds) for agent in agents), default=self.ttl_seconds)
+
+    def _add(self, key, question, answer, vector, created, rowid: Optional[int] = None):
+        with self._lock:
+            if rowid is not None:
+                # Stored rows keep their database id so a later sync does not add them twice
+                if rowid in self._order:
+                    return
+                entry_id = rowid
+            else:
+                self._next_id += 1
+                entry_id = self._next_id
+            self._indexes[key].add(_Entry(entry_id, question, answer, vector, created))
+            self._order[entry_id] = key
+            while len(self._order) > self.max_entries:
+                oldest = next(iter(self._order))
+                self._remove(oldest)
+                self._stats["evicted"] += 1
+
+    def _remove(self, entry_id: int):
+        key = self._order.pop(entry_id, None)
+        if key is None:
+            return
+        index = self._indexes[key]
+        index.remove(entry_id)
+        if not index.entries:
+            del self._indexes[key]
+
+    def _sync(self):
+        """Load entries other workers stored since the last sync"""
+        if self._db is None or time.time() - self._synced_at < self.sync_seconds:
+            return
+        self._synced_at = time.time()
+        cutoff = time.time() - max([self.ttl_seconds, *self.agent_ttls.values()])
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, agents, params, query, answer, created FROM answers WHERE id > ? AND created > ? ORDER BY id",
+                (self._synced_rowid, cutoff)
+            ).fetchall()
+            if rows:
+                self._synced_rowid = rows[-1][0]
+        for rowid, agents, params, question, answer, created in rows:
+            self._add((agents, params), question, answer, self.embedder.embed(question), created, rowid=rowid)
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
@@ -6,9 +6,11 @@ from fastacp import AgentCollection, ACPCallingAgent
 from colorama import Fore
 import os
 from dotenv import load_dotenv
+from structured_logging import setup_logging
 
 load_dotenv()
 nest_asyncio.apply()
+setup_logging()
 
 model = LiteLLMModel(
     model_id="anthropic/claude-sonnet-4-20250514",
@@ -2,26 +2,55 @@
 from collections.abc import AsyncGenerator
 from acp_sdk.server import Context, RunYield, RunYieldResume, Server
 from acp_sdk.models import Message, MessagePart
-from smolagents import CodeAgent, DuckDuckGoSearchTool, VisitWebpageTool, LiteLLMModel
 import os
+import logging
 from dotenv import load_dotenv
 load_dotenv()
 
 import asyncio
+from structured_logging import setup_logging, set_request_id
+from loop_monitor import ensure_loop_monitor
+from acp_metadata import agent_run_timeout, read_agent_metadata
+from agent_runner import BoundedAgentRunner, RunnerOverloaded
+from import_warmup import imports_ready, warm_imports
+
+setup_logging()
+logger = logging.getLogger("smolagent_agent")
 
 
 server = Server()
 
-model = LiteLLMModel(
-    model_id = "anthropic/claude-sonnet-4-20250514",
-    api_key = os.getenv("ANTHROPIC_API_KEY"),
-    max_tokens = 2048,
-    temperature = 0.2,
+# smolagents, litellm (imported when the model is built) and the web tools are imported
+# on a warm-up thread, not at startup; handlers await it so the import never runs on the event loop
+SMOLAGENT_MODULES = ("smolagents", "litellm", "cached_web_tools")
+_model = None
+
+def get_model():
+    global _model
+    if _model is None:
+        from smolagents import LiteLLMModel
+        _model = LiteLLMModel(
+            model_id = "anthropic/claude-sonnet-4-20250514",
+            api_key = os.getenv("ANTHROPIC_API_KEY"),
+            max_tokens = 2048,
+            temperature = 0.2,
+        )
+    return _model
+
+# Dedicated pool for blocking CodeAgent runs: bounded queue, interrupt on timeout
+MARKET_RESEARCH_TIMEOUT = agent_run_timeout(os.getenv("MARKET_RESEARCH_TIMEOUT"))
+research_runner = BoundedAgentRunner(
+    max_workers=int(os.getenv("MARKET_RESEARCH_WORKERS", "4")),
+    max_queue=int(os.getenv("MARKET_RESEARCH_QUEUE", "8")),
+    timeout=MARKET_RESEARCH_TIMEOUT,
+    name="market-research"
 )
 
 @server.agent()
 async def market_researcher(input: list[Message]) -> AsyncGenerator[RunYield, RunYieldResume]:
     "Market Researcher Agent that gathers and summarizes market data."
+    set_request_id(read_agent_metadata(input).get("request_id"))
+    ensure_loop_monitor("smolagent")
     try:
         # Add input validation first
         if not input or len(input) == 0:
@@ -33,29 +62,37 @@ async def market_researcher(input: list[Message]) -> AsyncGenerator[RunYield, Ru
             return
             
         prompt = input[0].parts[0].content
-        print(f"Market researcher processing: {prompt}")
+        logger.info("Market research started", extra={"prompt_chars": len(prompt)})
         
-        # Create agent with web tools
-        agent = CodeAgent(tools=[DuckDuckGoSearchTool(), VisitWebpageTool()], model=model)
+        # Create agent with web tools backed by the shared search/page caches
+        await imports_ready(*SMOLAGENT_MODULES)
+        from smolagents import CodeAgent
+        from cached_web_tools import get_cached_web_tools
+        agent = CodeAgent(tools=get_cached_web_tools(), model=get_model())
         
-        # Add timeout protection (30 seconds max)
-        response = await asyncio.wait_for(
-            asyncio.to_thread(agent.run, prompt),
-            timeout=90.0
-        )
+        # Timeout interrupts the run instead of leaving it running in the background
+        response = await research_runner.run(agent, prompt)
         
         yield Message(parts=[MessagePart(content=str(response))])
         
+    except RunnerOverloaded as e:
+        logger.warning("Market research rejected", extra={"reason": str(e), **research_runner.stats()})
+        yield Message(parts=[MessagePart(content="Market research is at capacity right now. Please try again shortly.")])
+        
     except asyncio.TimeoutError:
+        logger.warning("Market research timed out", extra={"timeout_s": MARKET_RESEARCH_TIMEOUT, **research_runner.stats()})
         # Fallback to local analysis if web search times out
         yield Message(parts=[MessagePart(content="Web search timed out. Providing analysis based on general market knowledge...")])
         
     except Exception as e:
-        print(f"Market researcher error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Market researcher error")
         yield Message(parts=[MessagePart(content=f"Market research unavailable: {str(e)}")])
 
 if __name__ == "__main__":
     print("Starting ACP server...")
-    server.run(port=8001)
+    warm_imports(*SMOLAGENT_MODULES)
+    # Diagnostics listener (ACP_DEBUG_PORT + 1) when DEBUG_TOKEN is set
+    from debug_tools import maybe_start_debug_server
+    maybe_start_debug_server(1)
+    # Idle keep-alive longer than the API server's client side (ACP_KEEPALIVE_SECONDS)
+    server.run(port=8001, timeout_keep_alive=int(os.getenv("ACP_SERVER_KEEPALIVE_SECONDS", "75")))
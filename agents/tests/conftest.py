@@ -0,0 +1,21 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# The agents are flat modules run from this directory
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture(scope="session")
+def api_server(tmp_path_factory):
+    """The API server module, imported with its state files in a scratch directory and agents not started"""
+    pytest.importorskip("flask")
+    pytest.importorskip("acp_sdk")
+    monkeypatch = pytest.MonkeyPatch()
+    monkeypatch.setenv("AUTO_INITIALIZE_AGENTS", "0")
+    monkeypatch.setenv("MARKET_BRIEFS_ENABLED", "0")
+    monkeypatch.chdir(tmp_path_factory.mktemp("api"))
+    import api_server
+    yield api_server
+    monkeypatch.undo()
@@ -0,0 +1,93 @@
+import asyncio
+
+from acp_clients import ACPClientPool
+
+
+class FakeClient:
+    def __init__(self, fail_pings=False):
+        self.fail_pings = fail_pings
+        self.pings = 0
+        self.closed = False
+
+    async def ping(self):
+        self.pings += 1
+        if self.fail_pings:
+            raise ConnectionError("refused")
+
+    async def __aexit__(self, *exc_info):
+        self.closed = True
+
+
+def _pool(*clients, **options):
+    pool = ACPClientPool([f"http://agent-{index}" for index in range(len(clients))], **options)
+    pool.clients = list(clients)
+    pool.state = "open"
+    return pool
+
+
+def test_warm_up_pings_each_server():
+    up, down = FakeClient(), FakeClient(fail_pings=True)
+    pool = _pool(up, down, warm_connections=3)
+
+    asyncio.run(pool.warm_up())
+
+    assert up.pings == down.pings == 3
+    hosts = pool.stats()["hosts"]
+    assert hosts["http://agent-0"]["warmed"] == 3 and hosts["http://agent-1"]["warmed"] == 0
+
+
+def test_drain_waits_for_leased_calls_then_closes():
+    client = FakeClient()
+    pool = _pool(client)
+
+    async def call():
+        with pool.lease():
+            await asyncio.sleep(0.1)
+            assert not client.closed
+
+    async def main():
+        running = asyncio.ensure_future(call())
+        await asyncio.sleep(0)
+        assert pool.in_flight == 1
+        await pool.drain(timeout=5)
+        assert running.done()
+
+    asyncio.run(main())
+    assert client.closed and pool.state == "closed"
+    assert pool.stats()["leases"] == 1 and pool.in_flight == 0
+
+
+def test_drain_gives_up_after_timeout():
+    client = FakeClient()
+    pool = _pool(client)
+
+    async def main():
+        with pool.lease():
+            await pool.drain(timeout=0.1)
+            assert pool.state == "closed" and pool.in_flight == 1
+
+    asyncio.run(main())
+    assert client.closed
+    asyncio.run(pool.drain())  # already closed: no-op
+
+
+def test_request_hook_counts_connection_reuse():
+    pool = _pool(FakeClient())
+    hook = pool._request_hook("http://agent-0")
+
+    class Request:
+        def __init__(self):
+            self.extensions = {}
+
+    async def main():
+        for opens_connection in (True, False, False, False):
+            request = Request()
+            await hook(request)
+            if opens_connection:
+                await request.extensions["trace"]("connection.connect_tcp.started", {})
+                await request.extensions["trace"]("connection.connect_tcp.complete", {})
+
+    asyncio.run(main())
+    host = pool.stats()["hosts"]["http://agent-0"]
+    assert (host["requests"], host["connections_opened"], host["reused_requests"]) == (4, 1, 3)
+    assert host["reuse_ratio"] == 0.75 and host["avg_connect_ms"] is not None
@@ -0,0 +1,137 @@
+import asyncio
+import threading
+
+import pytest
+
+from admission import AdmissionController, AdmissionRejected, ClientRateLimiter, RateLimited, parse_limits
+
+
+def test_parse_limits():
+    assert parse_limits("investment_agent=2, market_researcher = 4,junk") == {
+        "investment_agent": 2, "market_researcher": 4}
+    assert parse_limits(None) == {}
+
+
+def test_waiters_are_admitted_by_lane_then_priority():
+    controller = AdmissionController(default_limit=1)
+    order = []
+
+    async def call(name, lane, priority):
+        async with controller.slot("agent", priority=priority, lane=lane):
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        holder = asyncio.ensure_future(call("holder", "interactive", 1))
+        await asyncio.sleep(0)
+        waiters = [asyncio.ensure_future(call(name, lane, priority)) for name, lane, priority in [
+            ("background", "background", 0), ("batch", "batch", 0),
+            ("chat-low", "interactive", 2), ("chat-high", "interactive", 1),
+        ]]
+        await asyncio.sleep(0)
+        assert controller.stats()["agent"]["queued"] == 4
+        await asyncio.gather(holder, *waiters)
+
+    asyncio.run(main())
+    assert order == ["holder", "chat-high", "chat-low", "batch", "background"]
+    stats = controller.stats()["agent"]
+    assert (stats["admitted"], stats["waited"], stats["active"]) == (5, 4, 0)
+    assert stats["queue_wait_ms"]["samples"] == 5
+
+
+def test_interactive_calls_are_shed_when_queue_is_full():
+    controller = AdmissionController(default_limit=1, max_queue=1)
+
+    async def hold(release):
+        async with controller.slot("agent"):
+            await release.wait()
+
+    async def main():
+        release = asyncio.Event()
+        holder = asyncio.ensure_future(hold(release))
+        await asyncio.sleep(0)
+        queued = asyncio.ensure_future(hold(release))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected):
+            async with controller.slot("agent"):
+                pass
+        # Batch calls are bounded by their own pools and always wait
+        batch = asyncio.ensure_future(controller.slot("agent", lane="batch").__aenter__())
+        await asyncio.sleep(0)
+        assert not batch.done()
+        batch.cancel()
+        release.set()
+        await asyncio.gather(holder, queued, return_exceptions=True)
+
+    asyncio.run(main())
+    assert controller.stats()["agent"]["shed_queue_full"] == 1
+
+
+def test_interactive_calls_are_shed_after_max_wait():
+    controller = AdmissionController(default_limit=1, max_wait=0.05)
+
+    async def main():
+        release = asyncio.Event()
+
+        async def hold():
+            async with controller.slot("agent"):
+                await release.wait()
+
+        holder = asyncio.ensure_future(hold())
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with controller.slot("agent"):
+                pass
+        release.set()
+        await holder
+        return rejected.value
+
+    assert asyncio.run(main()).retry_after == 0.05
+    stats = controller.stats()["agent"]
+    assert (stats["shed_timeout"], stats["active"], stats["queued"]) == (1, 0, 0)
+
+
+def test_rate_limiter_allows_burst_then_limits():
+    limiter = ClientRateLimiter(rate_per_minute=60, burst=2)
+    limiter.check("client-a")
+    limiter.check("client-a")
+    with pytest.raises(RateLimited) as limited:
+        limiter.check("client-a")
+    assert 0 < limited.value.retry_after <= 1.0
+    limiter.check("client-b")
+    assert limiter.stats()["allowed"] == 3 and limiter.stats()["limited"] == 1
+
+
+def test_stats_can_be_read_from_another_thread_while_calls_run():
+    controller = AdmissionController(default_limit=2)
+    done = threading.Event()
+    errors = []
+
+    def read_stats():
+        while not done.is_set():
+            try:
+                controller.stats()
+            except Exception as e:  # "dictionary changed size during iteration" without the lock
+                errors.append(e)
+                return
+
+    async def call(agent_name):
+        async with controller.slot(agent_name, lane="batch"):
+            await asyncio.sleep(0)
+
+    async def main():
+        await asyncio.gather(*(call(f"agent-{index % 300}") for index in range(3000)))
+
+    reader = threading.Thread(target=read_stats)
+    reader.start()
+    try:
+        asyncio.run(main())
+    finally:
+        done.set()
+        reader.join()
+
+    assert not errors
+    stats = controller.stats()
+    assert len(stats) == 300
+    assert sum(gate["admitted"] for gate in stats.values()) == 3000
+    assert all(gate["active"] == 0 and gate["queued"] == 0 for gate in stats.values())
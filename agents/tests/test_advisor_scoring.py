@@ -0,0 +1,67 @@
+import pytest
+
+import advisor_scoring
+from advisor_scoring import AdvisorList, generate_synthetic_advisors, rank_advisors
+
+QUERY = "I'm 45 in Charlotte, NC with $300,000 to invest for retirement and want help with taxes, ideally a CFP"
+
+
+def test_rank_orders_by_score_with_breakdown():
+    result = rank_advisors(QUERY, matrix=AdvisorList(advisor_scoring.ADVISORS))
+
+    scores = [advisor["match_score"] for advisor in result["advisors"]]
+    assert scores == sorted(scores, reverse=True)
+    assert [advisor["rank"] for advisor in result["advisors"]] == list(range(1, len(scores) + 1))
+    assert result["needs"] == ["retirement", "tax", "investment"]
+    assert result["credentials"] == ["CFP"]
+    top = result["advisors"][0]
+    assert top["match_score"] == pytest.approx(sum(top["breakdown"].values()), abs=0.5)
+
+
+def test_unknown_location_keeps_remote_floor():
+    ranker = AdvisorList([
+        {"name": "Remote", "location": "Nowhere", "remote": True},
+        {"name": "Local only", "location": "Nowhere", "remote": False},
+    ])
+    parts = ranker.components(coords=advisor_scoring.CITY_COORDS["Charlotte, NC"])
+    assert parts["distance"] == [advisor_scoring.REMOTE_FLOOR, 0.0]
+
+
+def test_matrix_and_list_rank_the_same():
+    pytest.importorskip("numpy")
+    advisors = generate_synthetic_advisors(500, seed=7)
+    vectorized = rank_advisors(QUERY, top_k=10, matrix=advisor_scoring.AdvisorMatrix(advisors))["advisors"]
+    pure = rank_advisors(QUERY, top_k=10, matrix=AdvisorList(advisors))["advisors"]
+
+    assert [a["match_score"] for a in vectorized] == [a["match_score"] for a in pure]
+    assert {a["crd"] for a in vectorized} == {a["crd"] for a in pure}
+    assert [a["breakdown"] for a in vectorized] == [a["breakdown"] for a in pure]
+
+
+def test_build_ranker_falls_back_without_numpy(monkeypatch):
+    monkeypatch.setattr(advisor_scoring, "np", None)
+    assert isinstance(advisor_scoring.build_ranker(advisor_scoring.ADVISORS), AdvisorList)
+
+
+def test_query_criteria_extraction():
+    assert advisor_scoring.extract_needs("Help with my 401k rollover and estate taxes") == ["retirement", "tax", "estate"]
+    assert advisor_scoring.extract_credentials("Looking for a CFA, or CFP.") == ["CFP", "CFA"]
+    assert advisor_scoring.resolve_coordinates("I live near Miami") == advisor_scoring.CITY_COORDS["Miami, FL"]
+    assert advisor_scoring.resolve_coordinates("Springfield") is None
+
+
+def test_location_override_changes_distance_scores():
+    ranker = AdvisorList(advisor_scoring.ADVISORS)
+    query = "Tax and estate planning for $600,000"
+
+    in_new_york = rank_advisors(query, location="New York, NY", top_k=3, matrix=ranker)
+    in_miami = rank_advisors(query, location="Miami, FL", top_k=3, matrix=ranker)
+
+    assert in_miami["location_known"] and in_miami["profile"]["location"] == "Miami, FL"
+    davis_ny, davis_miami = in_new_york["advisors"][0], in_miami["advisors"][0]
+    assert davis_ny["name"] == davis_miami["name"] == "Lisa Davis, CFP"
+    assert davis_ny["distance_km"] == 0.0 and davis_ny["breakdown"]["distance"] == 20.0
+    assert davis_miami["distance_km"] > 1000 and davis_miami["breakdown"]["distance"] == 0.0
+    # Robert Wilson (Miami, not remote) only makes the shortlist for a Miami client
+    assert "Robert Wilson, CFA" in [advisor["name"] for advisor in in_miami["advisors"]]
+    assert "Robert Wilson, CFA" not in [advisor["name"] for advisor in in_new_york["advisors"]]
@@ -0,0 +1,115 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import acp_metadata
+from agent_runner import BoundedAgentRunner, RunnerOverloaded, RunTimedOut
+
+
+class FakeAgent:
+    """Blocks in run() until released or interrupted, like a CodeAgent between steps"""
+
+    def __init__(self, result="done"):
+        self.result = result
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.interrupted = False
+
+    def run(self, prompt):
+        self.started.set()
+        self.release.wait(5)
+        if self.interrupted:
+            raise RuntimeError("interrupted")
+        return f"{self.result}: {prompt}"
+
+    def interrupt(self):
+        self.interrupted = True
+        self.release.set()
+
+
+@pytest.fixture
+def runner():
+    runner = BoundedAgentRunner(max_workers=1, max_queue=1, timeout=5)
+    yield runner
+    runner.shutdown()
+
+
+def test_run_returns_agent_result(runner):
+    agent = FakeAgent()
+    agent.release.set()
+
+    assert asyncio.run(runner.run(agent, "solar stocks")) == "done: solar stocks"
+    stats = runner.stats()
+    assert (stats["submitted"], stats["completed"], stats["running"], stats["queued"]) == (1, 1, 0, 0)
+
+
+def test_runs_beyond_workers_and_queue_are_rejected(runner):
+    busy, waiting = FakeAgent(), FakeAgent()
+
+    async def main():
+        first = asyncio.ensure_future(runner.run(busy, "a"))
+        second = asyncio.ensure_future(runner.run(waiting, "b"))
+        await asyncio.sleep(0.05)
+        with pytest.raises(RunnerOverloaded):
+            await runner.run(FakeAgent(), "c")
+        assert runner.stats()["queued"] == 1
+        busy.release.set()
+        waiting.release.set()
+        return await asyncio.gather(first, second)
+
+    assert asyncio.run(main()) == ["done: a", "done: b"]
+    assert runner.stats()["rejected"] == 1
+
+
+def test_timeout_interrupts_running_and_cancels_queued_runs(runner):
+    running, queued = FakeAgent(), FakeAgent()
+
+    async def main():
+        first = asyncio.ensure_future(runner.run(running, "a", timeout=0.2))
+        await asyncio.sleep(0.05)
+        with pytest.raises(RunTimedOut):
+            await runner.run(queued, "b", timeout=0.05)
+        with pytest.raises(RunTimedOut):
+            await first
+
+    asyncio.run(main())
+    assert running.interrupted and not queued.started.is_set()
+    stats = runner.stats()
+    assert (stats["timed_out"], stats["cancelled_queued"], stats["interrupted"]) == (2, 1, 1)
+    assert stats["running"] == 0 and stats["orphaned"] == 0
+
+
+def test_orphaned_run_keeps_its_slot_until_it_finishes():
+    runner = BoundedAgentRunner(max_workers=1, max_queue=0, timeout=5)
+    agent = FakeAgent()
+    agent.interrupt = lambda: None  # ignores the interrupt, like a run stuck inside one step
+
+    async def main():
+        with pytest.raises(RunTimedOut):
+            await runner.run(agent, "a", timeout=0.05)
+        assert runner.stats()["orphaned"] == 1
+        with pytest.raises(RunnerOverloaded):
+            await runner.run(FakeAgent(), "b")
+
+    try:
+        asyncio.run(main())
+        agent.release.set()
+        for _ in range(100):
+            if runner.stats()["orphaned"] == 0:
+                break
+            time.sleep(0.01)
+        assert runner.stats()["orphaned"] == 0 and runner.stats()["queued"] == 0
+    finally:
+        runner.shutdown()
+
+
+def test_run_timeout_stays_below_the_callers_agent_timeout(monkeypatch):
+    monkeypatch.setattr(acp_metadata, "AGENT_CALL_TIMEOUT", 90.0)
+    monkeypatch.setattr(acp_metadata, "AGENT_RUN_MARGIN", 10.0)
+
+    assert BoundedAgentRunner().timeout == 80.0
+    assert BoundedAgentRunner(timeout=30).timeout == 30.0
+    assert BoundedAgentRunner(timeout=120).timeout == 80.0
+    assert acp_metadata.agent_run_timeout("45") == 45.0
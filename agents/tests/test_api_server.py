@@ -0,0 +1,112 @@
+import pytest
+
+from semantic_cache import SemanticAnswerCache
+
+
+@pytest.fixture
+def agent(api_server, monkeypatch):
+    """ACPCallingAgent with a fresh answer cache whose investment agent is a counting stub"""
+    from fastacp import ACPCallingAgent
+
+    agent = ACPCallingAgent({"investment_agent": {"client": None}}, model=None, answer_cache=SemanticAnswerCache())
+    agent.agent_calls = []
+
+    async def call_agent(agent_name, query, metadata=None):
+        agent.agent_calls.append(query)
+        return f"Advice #{len(agent.agent_calls)}"
+
+    monkeypatch.setattr(agent, "_call_agent", call_agent)
+    monkeypatch.setattr(api_server, "acp_agent", agent)
+    return agent
+
+
+def test_first_questions_of_new_sessions_use_the_answer_cache(api_server, agent):
+    first = api_server.answer_query("balanced portfolio for $50k retirement", "cache-session-a")
+    second = api_server.answer_query("I'd like to put 50 thousand into a moderate retirement mix", "cache-session-b")
+
+    assert second == first
+    assert len(agent.agent_calls) == 1
+    stats = agent.answer_cache.stats()
+    assert (stats["stored"], stats["hits"], stats["bypassed"]) == (1, 1, 0)
+
+
+def test_follow_ups_bypass_the_answer_cache(api_server, agent):
+    api_server.answer_query("balanced portfolio for $50k retirement", "cache-session-c")
+    api_server.answer_query("balanced portfolio for $50k retirement", "cache-session-c")
+
+    assert len(agent.agent_calls) == 2
+    assert "Conversation context" in agent.agent_calls[1]
+    assert agent.answer_cache.stats()["bypassed"] == 1
+
+
+def _as(session):
+    return {"X-Session-ID": session}
+
+
+def test_reports_are_only_served_to_their_session(api_server, agent):
+    client = api_server.app.test_client()
+    reply = client.post("/api/chat", json={"message": "balanced portfolio for $20k", "format": "summary"},
+                        headers=_as("report-owner")).get_json()
+    response_id = reply["response_id"]
+    section_id = reply["report"]["sections"][0]["id"] if reply["report"]["sections"] else "none"
+
+    assert client.get(f"/api/chat/responses/{response_id}", headers=_as("report-owner")).status_code == 200
+    assert client.get(f"/api/chat/responses/{response_id}", headers=_as("someone-else")).status_code == 404
+    assert client.get(f"/api/chat/responses/{response_id}/sections/{section_id}",
+                      headers=_as("someone-else")).status_code == 404
+
+
+def test_jobs_are_only_visible_to_their_session(api_server):
+    client = api_server.app.test_client()
+    job = api_server.job_queue.store.create("job-owner", {"message": "hello"})
+
+    assert client.get(f"/api/jobs/{job['id']}", headers=_as("someone-else")).status_code == 404
+    assert client.delete(f"/api/jobs/{job['id']}", headers=_as("someone-else")).status_code == 404
+    assert api_server.job_queue.store.get(job["id"])["status"] == "queued"
+
+    assert client.get(f"/api/jobs/{job['id']}", headers=_as("job-owner")).status_code == 200
+    assert client.delete(f"/api/jobs/{job['id']}", headers=_as("job-owner")).get_json()["status"] == "cancelled"
+
+
+def test_resumable_uploads_are_only_reachable_from_their_session(api_server):
+    client = api_server.app.test_client()
+    content = b"401k statement: balance $120,000"
+    upload_id = client.post("/api/uploads/resumable", json={"filename": "statement.txt", "size": len(content)},
+                            headers=_as("upload-owner")).get_json()["upload_id"]
+    url = f"/api/uploads/resumable/{upload_id}"
+
+    assert client.get(url, headers=_as("someone-else")).status_code == 404
+    assert client.put(f"{url}?offset=0", data=b"hijacked", headers=_as("someone-else")).status_code == 404
+    assert client.put(f"{url}?offset=0", data=content, headers=_as("upload-owner")).get_json()["received"] == len(content)
+    assert client.post(f"{url}/complete", headers=_as("someone-else")).status_code == 404
+
+    completed = client.post(f"{url}/complete", headers=_as("upload-owner")).get_json()
+    assert completed["session_id"] == "upload-owner" and completed["size"] == len(content)
+
+
+def test_file_listings_are_scoped_to_the_session(api_server):
+    client = api_server.app.test_client()
+    upload_dir = api_server.namespace_directory(api_server.UPLOAD_FOLDER, "files-alice")
+    upload_dir.mkdir(parents=True, exist_ok=True)
+    (upload_dir / "plan.txt").write_text("Retirement plan", encoding="utf-8")
+    api_server.document_catalogs.get("files-alice").add(upload_dir / "plan.txt")
+
+    assert client.get("/api/files", headers=_as("files-alice")).get_json()["files"] == ["plan.txt"]
+    assert client.get("/api/files", headers=_as("files-bob")).get_json()["files"] == []
+    assert client.delete("/api/files/plan.txt", headers=_as("files-bob")).status_code == 404
+    assert client.get("/api/files", headers=_as("../files-alice")).status_code == 400
+    assert (upload_dir / "plan.txt").exists()
+
+
+def test_chat_formats(api_server, agent):
+    client = api_server.app.test_client()
+
+    text = client.post("/api/chat", json={"message": "hello there"}, headers=_as("format-session")).get_json()
+    assert text["response"].endswith("Advice #1") and "report" not in text
+    structured = client.post("/api/chat", json={"message": "and bonds?", "format": "structured"},
+                             headers=_as("format-session")).get_json()
+    assert structured["format"] == "structured" and structured["report"]["summary"] == "Advice #2"
+    assert client.get(f"/api/chat/responses/{structured['response_id']}",
+                      headers=_as("format-session")).get_json()["report"] == structured["report"]
+    assert client.post("/api/chat", json={"message": "hi", "format": "xml"},
+                       headers=_as("format-session")).status_code == 400
@@ -0,0 +1,43 @@
+import pytest
+
+from benchmark_startup import direct_imports, parse_importtime, profile_entry
+
+IMPORTTIME = """\
+import time: self [us] | cumulative | imported package
+import time:        80 |         80 | site
+import time:       120 |        120 |   _io
+import time:      2500 |       4000 |     json.decoder
+import time:      1500 |       5500 |   json
+import time:       300 |       5920 | api_server
+not an importtime line
+"""
+
+
+def test_parse_importtime_rows():
+    rows = parse_importtime(IMPORTTIME)
+
+    assert [row["module"] for row in rows] == ["site", "_io", "json.decoder", "json", "api_server"]
+    assert [row["depth"] for row in rows] == [0, 1, 2, 1, 0]
+    assert rows[2]["self_ms"] == 2.5 and rows[4]["cumulative_ms"] == 5.92
+
+
+def test_direct_imports_of_entry_module():
+    rows = parse_importtime(IMPORTTIME)
+
+    assert [row["module"] for row in direct_imports(rows, "api_server")] == ["_io", "json"]
+    assert direct_imports(rows, "site") == [] and direct_imports(rows, "missing") == []
+
+
+@pytest.mark.parametrize("module, allowed", [
+    ("api_server", []),
+    # The ACP servers need acp_sdk to declare their agents; the frameworks load on first request
+    ("crewai_agent", ["acp_sdk"]),
+    ("smolagent_agent", ["acp_sdk"]),
+])
+def test_entry_points_do_not_load_frameworks_at_import(module, allowed):
+    pytest.importorskip("flask" if module == "api_server" else "acp_sdk")
+    report = profile_entry(module, runs=1, top=3)
+
+    if "error" in report:
+        pytest.skip(f"{module} cannot be imported here: {report['error']}")
+    assert report["heavy_loaded_at_import"] == allowed
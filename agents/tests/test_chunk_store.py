@@ -0,0 +1,107 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import chunk_store
+import document_digest
+from chunk_store import ChunkStore, ensure_document, split_chunks
+
+
+def test_digest_rebuilt_when_digest_version_bumped(tmp_path, monkeypatch):
+    path = tmp_path / "statement.txt"
+    path.write_text("Quarterly statement. Ending balance: $12,500. Expense ratio 0.04%.", encoding="utf-8")
+    store = ensure_document(path)
+    assert store.digest(path.name)["version"] == document_digest.DIGEST_VERSION
+    chunks = store.document(path.name)["count"]
+
+    monkeypatch.setattr(document_digest, "DIGEST_VERSION", document_digest.DIGEST_VERSION + 1)
+    store = ensure_document(path)
+
+    assert store.digest(path.name)["version"] == document_digest.DIGEST_VERSION
+    # Same content: only the digest is replaced, the chunks are kept
+    assert store.document(path.name)["count"] == chunks
+
+
+def _paragraphs(label, count, size=200):
+    return "\n\n".join(f"{label} paragraph {index} " + "x" * size for index in range(count))
+
+
+def test_split_chunks_respects_size_and_overlap():
+    chunks = split_chunks("Short one.\n\nShort two.\n\n" + "word " * 500, size=200, overlap=20)
+
+    assert chunks[0] == "Short one.\nShort two."
+    assert all(len(chunk) <= 200 for chunk in chunks)
+    # Long paragraphs are cut on spaces and the next piece repeats the overlap
+    assert chunks[1][-15:].strip() in chunks[2][:25]
+
+
+def test_append_and_read_back(tmp_path):
+    store = ChunkStore(tmp_path / ".chunks")
+    count = store.add_document("notes.txt", "Ünïcode café notes.\n\n" + _paragraphs("notes", 10), size=1)
+
+    assert count == len(store.chunks("notes.txt")) > 1
+    first = store.chunks("notes.txt")[0]
+    assert store.text(first).startswith("Ünïcode café notes.")
+    assert store.snippet(first, chars=12) == "Ünïcode c..."
+    assert store.document("notes.txt")["size"] == 1
+    topics = ("bonds", "equities", "annuities")
+    store.add_document("topics.txt", "\n\n".join(f"{topic} " + "filler " * 100 for topic in topics))
+    assert store.best_chunk("topics.txt", "what about annuities?") == store.chunks("topics.txt")[2]
+    assert store.add_document("notes.txt", "Ünïcode café notes.\n\n" + _paragraphs("notes", 10)) == count
+    assert store.stats()["chunks"] == count + 3
+
+
+def test_replace_and_remove_tombstone_old_chunks(tmp_path):
+    store = ChunkStore(tmp_path / ".chunks", compact_min_bytes=1 << 30)
+    store.add_document("a.txt", _paragraphs("old", 8))
+    old_bytes = store.document("a.txt")["bytes"]
+    store.add_document("a.txt", _paragraphs("new", 4))
+    store.add_document("b.txt", _paragraphs("other", 4))
+
+    assert store.text(store.chunks("a.txt")[0]).startswith("new paragraph 0")
+    assert store.stats()["dead_bytes"] == old_bytes
+    assert store.remove_document("b.txt") and not store.remove_document("b.txt")
+    assert store.chunks("b.txt") == range(0)
+    stats = store.stats()
+    assert stats["documents"] == 1 and stats["live_chunks"] < stats["chunks"]
+
+
+def test_compaction_rewrites_live_chunks_into_new_generation(tmp_path):
+    store = ChunkStore(tmp_path / ".chunks", compact_ratio=0.5, compact_min_bytes=1)
+    store.add_document("keep.txt", _paragraphs("keep", 4))
+    store.add_document("drop.txt", _paragraphs("drop", 12))
+    kept = [store.text(chunk) for chunk in store.chunks("keep.txt")]
+
+    store.remove_document("drop.txt")
+
+    stats = store.stats()
+    assert (stats["generation"], stats["compactions"], stats["dead_bytes"]) == ("2", 1, 0)
+    assert stats["chunks"] == stats["live_chunks"] == len(kept)
+    assert [store.text(chunk) for chunk in store.chunks("keep.txt")] == kept
+    assert (tmp_path / ".chunks" / "CURRENT").read_text() == "2"
+
+
+def test_reader_in_another_process_sees_appends_and_compactions(tmp_path):
+    directory = tmp_path / ".chunks"
+    reader = ChunkStore(directory)
+    writer = (
+        "import sys; sys.path.insert(0, {agents!r})\n"
+        "from chunk_store import ChunkStore\n"
+        "store = ChunkStore({directory!r}, compact_min_bytes=1)\n"
+        "store.add_document(sys.argv[1], sys.argv[2]) if sys.argv[2] else store.remove_document(sys.argv[1])\n"
+    ).format(agents=str(Path(chunk_store.__file__).parent), directory=str(directory))
+
+    def write(name, text=""):
+        subprocess.run([sys.executable, "-c", writer, name, text], check=True)
+
+    write("a.txt", _paragraphs("first", 4))
+    assert reader.refresh().document("a.txt") is not None
+    write("b.txt", _paragraphs("second", 12))
+    reader.refresh()
+    assert reader.text(reader.chunks("b.txt")[0]).startswith("second paragraph 0")
+
+    write("b.txt")  # tombstones most of the blob and compacts
+    reader.refresh()
+    assert reader.stats()["generation"] == "2"
+    assert reader.document("b.txt") is None
+    assert reader.text(reader.chunks("a.txt")[0]).startswith("first paragraph 0")
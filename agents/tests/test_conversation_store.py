@@ -0,0 +1,97 @@
+import pytest
+
+from conversation_store import ConversationStore
+from investor_profile import extract_amount, extract_profile
+
+
+@pytest.mark.parametrize("query, amount", [
+    ("I think $50 is enough to start", 50),
+    ("I have $50k to invest", 50000),
+    ("Invest 25 thousand in index funds", 25000),
+    ("$1,200 a month into stocks", 1200),
+    ("What should I keep in my 401k?", None),
+    ("Roll my 401k into an IRA with $20k", 20000),
+])
+def test_extract_amount_scales_only_explicit_thousands(query, amount):
+    assert extract_amount(query, default=None) == amount
+
+
+def test_profile_keeps_small_amounts():
+    store = ConversationStore()
+    store.record_turn("s1", "I think $50 a week is what I can save, I'm 30", "Start with an index fund.")
+    assert store.get_profile("s1") == {"amount": 50, "age": 30}
+
+
+def test_error_replies_are_not_recorded():
+    store = ConversationStore()
+    store.record_turn("s1", "I have $10k, what now?", "System error occurred. Please try again. (Error: boom)")
+    assert store.get_profile("s1") == {}
+    assert store.build_context("s1") == ""
+
+    store.record_turn("s1", "I have $10k, what now?", "Consider a high-yield savings account.")
+    assert store.get_profile("s1")["amount"] == 10000
+    assert "high-yield" in store.build_context("s1")
+
+
+def test_old_turns_fold_into_summary_and_replies_are_clipped():
+    store = ConversationStore(max_turns=2, max_turn_chars=60, max_summary_items=2)
+    for topic in ("bonds", "index funds", "real estate", "crypto"):
+        store.record_turn("s1", f"Tell me about {topic}", "**Overview**\n" + f"{topic} answer " * 20)
+
+    context = store.build_context("s1")
+    assert "Earlier topics: Tell me about bonds; Tell me about index funds" in context
+    assert "User: Tell me about real estate" in context and "User: Tell me about crypto" in context
+    assert "**Overview**" not in context
+    advisor_lines = [line for line in context.splitlines() if line.startswith("Advisor: ")]
+    assert advisor_lines and all(len(line) <= len("Advisor: ") + 60 for line in advisor_lines)
+
+
+def test_profile_accumulates_across_turns():
+    store = ConversationStore()
+    store.record_turn("s1", "I'm 52 and conservative", "Noted.")
+    store.record_turn("s1", "I have $80k in Charlotte", "Noted.")
+    store.record_turn("s1", "Actually I'd rather be aggressive", "Noted.")
+
+    assert store.get_profile("s1") == {"age": 52, "risk_level": "High", "amount": 80000, "location": "Charlotte, NC"}
+    assert store.build_context("s1").startswith("Conversation context:\nInvestor profile so far: amount: $80,000")
+
+
+def test_context_keeps_most_recent_turns_within_budget():
+    store = ConversationStore(max_turns=6)
+    for index in range(6):
+        store.record_turn("s1", f"question {index} " + "x" * 80, f"answer {index} " + "y" * 80)
+
+    context = store.build_context("s1", max_chars=500)
+    assert len(context) <= 500 + len("Conversation context:\nRecent conversation:\n")
+    assert "question 5" in context and "question 0" not in context
+    assert store.build_context("unknown") == ""
+
+
+def test_evicted_sessions_spill_and_restore(tmp_path):
+    store = ConversationStore(max_sessions=2, spill_path=str(tmp_path / "sessions.sqlite3"))
+    store.record_turn("a", "I have $10k", "Start with an emergency fund.")
+    store.record_turn("b", "hello", "Hi.")
+    store.record_turn("c", "hello", "Hi.")
+
+    assert store.stats()["resident_sessions"] == 2
+    assert store.get_profile("a") == {"amount": 10000}
+    assert "emergency fund" in store.build_context("a")
+    assert (store.stats()["spilled"], store.stats()["restored"]) == (2, 1)
+
+    store.forget("a")
+    assert store.get_profile("a") == {}
+
+
+def test_shared_stores_see_each_others_turns(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+    worker_a = ConversationStore(spill_path=path, shared=True)
+    worker_b = ConversationStore(spill_path=path, shared=True)
+
+    worker_a.record_turn("s1", "I have $10k", "Build an emergency fund first.")
+    assert worker_b.get_profile("s1") == {"amount": 10000}
+    worker_b.record_turn("s1", "I'm 40", "Then consider a target-date fund.")
+    context = worker_a.build_context("s1")
+
+    assert "emergency fund" in context and "target-date fund" in context
+    with pytest.raises(ValueError):
+        ConversationStore(shared=True)
@@ -0,0 +1,18 @@
+import json
+
+from debug_tools import DebugEndpoints
+
+
+def test_non_ascii_token_is_rejected_not_raised():
+    endpoints = DebugEndpoints("s3cret", loops=lambda: [])
+    status, _, body, _ = endpoints.handle("GET", "threads", {}, "sécret")
+
+    assert status == 403
+    assert json.loads(body)["error"] == "Invalid debug token"
+
+
+def test_matching_token_is_accepted():
+    endpoints = DebugEndpoints("s3cret", loops=lambda: [])
+    status, _, _, _ = endpoints.handle("GET", "threads", {}, "s3cret")
+
+    assert status == 200
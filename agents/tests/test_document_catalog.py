@@ -0,0 +1,20 @@
+from document_catalog import DocumentCatalog
+
+
+def test_reads_pick_up_another_workers_uploads_and_deletes(tmp_path):
+    worker_a, worker_b = DocumentCatalog(tmp_path), DocumentCatalog(tmp_path)
+    assert len(worker_b) == 0
+
+    statement = tmp_path / "statement.txt"
+    statement.write_text("401k statement: balance $120,000")
+    worker_a.add(statement)
+
+    assert worker_b.names() == ["statement.txt"]
+    assert [record.name for record in worker_b.list_page()[0]] == ["statement.txt"]
+    assert [record.name for _, record in worker_b.search("401k balance")] == ["statement.txt"]
+
+    statement.unlink()
+    worker_a.remove("statement.txt")
+
+    assert len(worker_b) == 0
+    assert worker_b.search("401k balance") == []
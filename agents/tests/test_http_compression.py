@@ -0,0 +1,62 @@
+import gzip
+
+import pytest
+
+flask = pytest.importorskip("flask")
+
+import http_compression  # noqa: E402
+from http_compression import ResponseCompressor, choose_encoding, parse_accept_encoding  # noqa: E402
+
+
+@pytest.fixture
+def client_and_compressor():
+    app = flask.Flask(__name__)
+    compressor = ResponseCompressor(min_bytes=100)
+    compressor.init_app(app)
+
+    @app.route("/big")
+    def big():
+        return flask.jsonify({"items": ["allocation"] * 100})
+
+    @app.route("/small")
+    def small():
+        return flask.jsonify({"ok": True})
+
+    return app.test_client(), compressor
+
+
+def test_parse_accept_encoding():
+    assert parse_accept_encoding("gzip;q=0.8, br, identity;q=bogus") == {"gzip": 0.8, "br": 1.0, "identity": 0.0}
+    assert parse_accept_encoding(None) == {}
+
+
+def test_choose_encoding_prefers_brotli_only_when_installed(monkeypatch):
+    monkeypatch.setattr(http_compression, "brotli", None)
+    assert choose_encoding("br, gzip") == "gzip"
+    assert choose_encoding("br") is None
+    assert choose_encoding("*") == "gzip"
+    assert choose_encoding("gzip;q=0") is None
+
+    monkeypatch.setattr(http_compression, "brotli", object())
+    assert choose_encoding("gzip, br") == "br"
+    assert choose_encoding("gzip, br;q=0.5") == "gzip"
+
+
+def test_large_json_is_gzipped(client_and_compressor, monkeypatch):
+    monkeypatch.setattr(http_compression, "brotli", None)
+    client, compressor = client_and_compressor
+    response = client.get("/big", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert gzip.decompress(response.data).decode().count("allocation") == 100
+    stats = compressor.stats()
+    assert stats["compressed"] == 1 and stats["bytes_out"] < stats["bytes_in"]
+
+
+def test_small_or_unaccepted_responses_are_left_alone(client_and_compressor):
+    client, compressor = client_and_compressor
+
+    assert "Content-Encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+    assert "Content-Encoding" not in client.get("/big").headers
+    assert compressor.stats()["skipped"] == 2
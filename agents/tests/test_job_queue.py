@@ -0,0 +1,71 @@
+import os
+import time
+
+import pytest
+
+from job_queue import InvalidCallbackURL, JobQueue, JobStore, validate_callback_url
+
+
+@pytest.mark.parametrize("url", [
+    "http://localhost:5001/hook",
+    "http://127.0.0.1/hook",
+    "http://10.0.0.5/hook",
+    "http://192.168.1.10:8080/hook",
+    "http://169.254.169.254/latest/meta-data/",
+    "http://[::1]/hook",
+    "http://0.0.0.0/hook",
+    "ftp://93.184.216.34/hook",
+    "https:///hook",
+])
+def test_internal_or_malformed_callbacks_are_rejected(url):
+    with pytest.raises(InvalidCallbackURL):
+        validate_callback_url(url)
+
+
+def test_public_and_allowlisted_callbacks_are_accepted():
+    assert validate_callback_url("https://93.184.216.34/hook")
+    assert validate_callback_url("http://hooks.internal:9000/done", {"hooks.internal"})
+    with pytest.raises(InvalidCallbackURL):
+        validate_callback_url("https://93.184.216.34/hook", {"hooks.internal"})
+
+
+def test_submit_rejects_internal_callback(tmp_path):
+    jobs = JobQueue(JobStore(str(tmp_path / "jobs.sqlite3")), lambda job, report: "ok")
+    with pytest.raises(InvalidCallbackURL):
+        jobs.submit("s1", {"message": "hi"}, callback_url="http://127.0.0.1:5001/api/files")
+    assert jobs.stats()["submitted"] == 0
+
+
+def _running_job(store, owner_pid):
+    job = store.create("s1", {"message": "hi"})
+    assert store.claim(job["id"])
+    store.update(job["id"], owner_pid=owner_pid)
+    return job["id"]
+
+
+def test_new_worker_leaves_live_siblings_jobs_running(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    sibling = _running_job(store, os.getppid())
+    JobQueue(store, lambda job, report: "ok")
+    assert store.get(sibling)["status"] == "running"
+
+
+def test_jobs_of_dead_or_silent_workers_are_requeued(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    crashed = _running_job(store, 4242)
+    silent = _running_job(store, os.getppid())
+    store.update(silent, heartbeat=time.time() - 120)
+    live = _running_job(store, os.getppid())
+
+    assert store.requeue_abandoned(time.time() - 30, alive=lambda pid: pid != 4242) == [crashed, silent]
+    assert store.get(crashed)["status"] == "queued" and store.get(crashed)["owner_pid"] is None
+    assert store.get(live)["status"] == "running"
+
+
+def test_reaped_worker_jobs_are_requeued(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    job_id = _running_job(store, 4242)
+    other = _running_job(store, 4343)
+    assert store.requeue_owned_by(4242) == [job_id]
+    assert store.get(job_id)["status"] == "queued"
+    assert store.get(other)["status"] == "running"
@@ -0,0 +1,63 @@
+import asyncio
+import time
+
+import loop_monitor
+from loop_monitor import LoopMonitor, ensure_loop_monitor, loop_stats
+
+
+def _blocking_call():
+    time.sleep(0.3)
+
+
+def test_blocking_callback_is_reported_with_its_stack():
+    async def main():
+        monitor = LoopMonitor(asyncio.get_running_loop(), name="test-block", interval=0.02,
+                              block_threshold=0.1, report_seconds=0)
+        monitor.start()
+        await asyncio.sleep(0.2)
+        _blocking_call()
+        await asyncio.sleep(0.2)
+        monitor.stop()
+        return monitor.stats()
+
+    stats = asyncio.run(main())
+    assert stats["stalls"] == 1 and stats["blocked_now_ms"] == 0.0
+    stall = stats["recent_stalls"][0]
+    assert stall["blocked_ms"] >= 250
+    assert any("_blocking_call" in line for line in stall["stack"])
+    assert stats["stalled_s"] >= 0.25 and stats["max_lag_ms"] >= 250
+
+
+def test_idle_loop_has_low_lag_and_no_stalls():
+    async def main():
+        monitor = LoopMonitor(asyncio.get_running_loop(), name="test-idle", interval=0.01,
+                              block_threshold=0.5, report_seconds=0)
+        monitor.start()
+        await asyncio.sleep(0.3)
+        monitor.stop()
+        return monitor.stats()
+
+    stats = asyncio.run(main())
+    assert stats["stalls"] == 0 and stats["samples"] >= 10
+    assert stats["lag"]["samples"] == stats["samples"] and stats["lag"]["p50_ms"] < 50
+
+
+def test_one_monitor_per_loop(monkeypatch):
+    monkeypatch.setattr(loop_monitor, "LOOP_MONITOR_ENABLED", True)
+
+    async def main():
+        first = ensure_loop_monitor("per-loop")
+        assert ensure_loop_monitor("per-loop") is first
+        await asyncio.sleep(0.01)
+        first.stop()
+        return first
+
+    monitor = asyncio.run(main())
+    assert "per-loop" in loop_stats()
+    monkeypatch.delitem(loop_monitor._monitors, id(monitor.loop))
+
+    async def disabled():
+        return ensure_loop_monitor("disabled")
+
+    monkeypatch.setattr(loop_monitor, "LOOP_MONITOR_ENABLED", False)
+    assert asyncio.run(disabled()) is None
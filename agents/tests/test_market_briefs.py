@@ -0,0 +1,29 @@
+import pytest
+
+from market_briefs import MarketBriefService, load_topics
+
+
+@pytest.fixture
+def service():
+    return MarketBriefService(None, load_topics())
+
+
+@pytest.mark.parametrize("question, topic", [
+    ("What are the latest trends in renewable energy?", "renewable_energy"),
+    ("How are tech stocks doing?", "tech_sector"),
+    ("What's the outlook for interest rates?", "interest_rates"),
+    ("What is happening in the housing market right now?", "real_estate"),
+])
+def test_generic_topic_questions_use_briefs(service, question, topic):
+    assert service.match_topic(question).key == topic
+
+
+@pytest.mark.parametrize("question", [
+    "compare NEE vs ENPH solar margins",
+    "Is ICLN a good solar ETF?",
+    "Should I buy Tesla stock for solar exposure?",
+    "solar or wind: which is better for my $10k?",
+    "Summarize my reit_statement.pdf dividends",
+])
+def test_specific_questions_are_researched_live(service, question):
+    assert service.match_topic(question) is None
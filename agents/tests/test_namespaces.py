@@ -0,0 +1,70 @@
+import pytest
+
+from namespaces import (DEFAULT_NAMESPACE, InvalidNamespace, NamespaceRegistry, migrate_legacy_uploads,
+                        namespace_directory, normalize_namespace)
+
+
+@pytest.mark.parametrize("namespace", ["../etc", "a/b", "with space", "x" * 65, "dot.name"])
+def test_unsafe_namespaces_are_rejected(namespace):
+    with pytest.raises(InvalidNamespace):
+        normalize_namespace(namespace)
+
+
+def test_namespace_directories_are_separate(tmp_path):
+    assert normalize_namespace(None) == DEFAULT_NAMESPACE
+    assert normalize_namespace(" user_1 ") == "user_1"
+    assert namespace_directory(tmp_path, "alice") != namespace_directory(tmp_path, "bob")
+    assert namespace_directory(tmp_path, "alice").parent == tmp_path
+
+
+def test_legacy_uploads_move_into_default_namespace(tmp_path):
+    (tmp_path / "old.pdf").write_bytes(b"%PDF")
+    (tmp_path / ".hidden").write_text("x")
+    taken = namespace_directory(tmp_path, DEFAULT_NAMESPACE)
+    taken.mkdir()
+    (tmp_path / "clash.txt").write_text("legacy")
+    (taken / "clash.txt").write_text("current")
+
+    assert migrate_legacy_uploads(tmp_path) == 1
+    assert (taken / "old.pdf").read_bytes() == b"%PDF"
+    assert (tmp_path / ".hidden").exists()
+    assert (taken / "clash.txt").read_text() == "current"
+    assert (tmp_path / "clash.txt").exists()
+
+
+def test_registry_loads_each_namespace_once():
+    built = []
+    registry = NamespaceRegistry(lambda namespace: built.append(namespace) or {"owner": namespace})
+
+    alice = registry.get("alice")
+    assert registry.get("alice") is alice
+    assert registry.get("bob")["owner"] == "bob"
+    assert built == ["alice", "bob"]
+    assert registry.stats() == {"resident": 2, "loads": 2, "evictions": 0}
+
+
+def test_registry_evicts_least_recently_used_over_capacity():
+    registry = NamespaceRegistry(lambda namespace: {}, max_resident=2)
+    registry.get("a")
+    registry.get("b")
+    registry.get("a")
+    registry.get("c")
+
+    assert "a" in registry and "c" in registry
+    assert "b" not in registry
+
+
+def test_registry_evicts_idle_namespaces(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("namespaces.time.monotonic", lambda: clock[0])
+    registry = NamespaceRegistry(lambda namespace: {}, idle_seconds=60, sweep_interval=10)
+    registry.get("idle")
+    clock[0] += 30
+    registry.get("busy")
+    clock[0] += 40
+
+    registry.get("busy")  # triggers the sweep: "idle" was last used 70s ago
+
+    assert "idle" not in registry
+    assert "busy" in registry
+    assert registry.discard("busy") and not registry.discard("busy")
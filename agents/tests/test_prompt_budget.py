@@ -0,0 +1,59 @@
+from document_catalog import estimate_tokens
+from prompt_budget import (CONTEXT_MARKER, DOCUMENTS_MARKER, ELLIPSIS, PromptStats, compact_description,
+                           compact_whitespace, split_description)
+
+CONTEXT = "\n".join(
+    ["Conversation context:", "Investor profile so far: amount: $50,000; age: 40", "Recent conversation:"]
+    + [f"User: question {index} " + "detail " * 30 for index in range(10)]
+)
+QUESTION = "Should I move my 401k into index funds?"
+DOCUMENTS = "statement.pdf, tax-return.pdf"
+
+
+def _description(context=CONTEXT, documents=DOCUMENTS):
+    description = QUESTION + (DOCUMENTS_MARKER + documents if documents else "")
+    return context + CONTEXT_MARKER + description if context else description
+
+
+def test_split_description_round_trip():
+    assert split_description(_description()) == (CONTEXT, QUESTION, DOCUMENTS_MARKER.lstrip("\n") + DOCUMENTS)
+    assert split_description(QUESTION) == ("", QUESTION, "")
+
+
+def test_within_budget_is_unchanged_apart_from_whitespace():
+    text, usage = compact_description("  What   about bonds?  \n\n\n\n", budget=1000)
+    assert text == compact_whitespace("What about bonds?")
+    assert usage["truncated"] == [] and usage["dynamic_tokens"] == usage["dynamic_tokens_before"]
+
+
+def test_context_is_cut_before_question_and_documents():
+    text, usage = compact_description(_description(), budget=200)
+
+    assert usage["truncated"] == ["context"]
+    assert usage["dynamic_tokens"] <= 200
+    assert text.endswith(CONTEXT_MARKER + QUESTION + DOCUMENTS_MARKER + DOCUMENTS)
+    context = text.split(CONTEXT_MARKER)[0]
+    # Profile and most recent turns survive; the oldest turns are replaced by the marker
+    assert "Investor profile so far" in context and ELLIPSIS in context
+    assert "question 9" in context and "question 0" not in context
+
+
+def test_question_is_clipped_only_when_it_alone_exceeds_budget():
+    long_question = QUESTION + " more" * 400
+    text, usage = compact_description(long_question + DOCUMENTS_MARKER + DOCUMENTS, budget=50)
+
+    assert usage["truncated"] == ["question", "documents"]
+    assert text.startswith(QUESTION) and text.endswith(ELLIPSIS)
+    assert estimate_tokens(text) <= 50
+
+
+def test_prompt_stats_accumulate_per_agent():
+    stats = PromptStats()
+    _, usage = compact_description(_description(), budget=200)
+    stats.record("investment_agent", {**usage, "static_tokens": 300})
+    stats.record("investment_agent", {"dynamic_tokens": 100, "dynamic_tokens_before": 100, "static_tokens": 300})
+
+    report = stats.stats()["investment_agent"]
+    assert (report["requests"], report["truncated_requests"], report["static_tokens"]) == (2, 1, 600)
+    assert report["dynamic_tokens_dropped"] == usage["dynamic_tokens_before"] - usage["dynamic_tokens"]
+    assert report["avg_prompt_tokens"] == (600 + usage["dynamic_tokens"] + 100) / 2
@@ -0,0 +1,74 @@
+import copy
+import json
+import os
+
+import pytest
+
+from recommendation_table import DEFAULT_GRAPH, RecommendationTable, amount_bucket, load_graph, traverse
+
+
+@pytest.mark.parametrize("amount, bucket", [
+    (0, "starter"), (9_999, "starter"), (10_000, "core"), (250_000, "affluent"), (5_000_000, "high_net_worth"),
+])
+def test_amount_bucket(amount, bucket):
+    assert amount_bucket(amount) == bucket
+
+
+def test_traverse_applies_base_weights_horizon_and_vehicles():
+    recommendation = traverse(DEFAULT_GRAPH, "Moderate", "short-term", "affluent")
+
+    assert recommendation["allocation"] == {"Bonds": 45.0, "Stocks": 40.0, "Cash": 15.0}
+    assert recommendation["vehicles"] == ["Low-cost index ETFs", "Tax-managed funds", "Treasury ladder"]
+    assert traverse(DEFAULT_GRAPH, "Unknown", "long-term", "core")["risk_level"] == "Moderate"
+
+
+def test_table_materializes_every_profile_from_the_graph():
+    table = RecommendationTable()
+
+    assert table.stats()["entries"] == 3 * 3 * 4
+    for risk in ("Low", "Moderate", "High"):
+        for horizon in ("short-term", "medium-term", "long-term"):
+            for amount in (500, 50_000, 500_000, 5_000_000):
+                entry = table.lookup(risk, horizon, amount)
+                assert entry == {**traverse(DEFAULT_GRAPH, risk, horizon, amount_bucket(amount)),
+                                 "version": table.version}
+    assert table.stats()["misses"] == 0
+
+
+def test_unknown_profile_falls_back_to_traversal():
+    table = RecommendationTable()
+    entry = table.lookup("Speculative", "long-term", 50_000)
+
+    assert entry["risk_level"] == "Moderate" and entry["version"] == table.version
+    assert table.stats()["misses"] == 1
+
+
+def test_table_rebuilds_when_graph_file_changes(tmp_path):
+    path = tmp_path / "graph.json"
+    path.write_text(json.dumps(DEFAULT_GRAPH), encoding="utf-8")
+    table = RecommendationTable(str(path), check_seconds=0)
+    old_version = table.version
+    assert not table.refresh_if_changed()
+
+    graph = copy.deepcopy(DEFAULT_GRAPH)
+    graph["edges"][4][3]["weight"] = 95  # High risk: more stocks
+    path.write_text(json.dumps(graph), encoding="utf-8")
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1_000_000))
+
+    entry = table.lookup("High", "long-term", 50_000)
+    assert table.version != old_version and not table.is_current(old_version)
+    assert entry["version"] == table.version and entry["allocation"]["Stocks"] == 90.5
+    assert load_graph(str(path)) == graph
+
+
+def test_broken_graph_file_keeps_the_last_table(tmp_path):
+    path = tmp_path / "graph.json"
+    path.write_text(json.dumps(DEFAULT_GRAPH), encoding="utf-8")
+    table = RecommendationTable(str(path), check_seconds=0)
+    version = table.version
+
+    path.write_text("{not json", encoding="utf-8")
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1_000_000))
+
+    assert not table.refresh_if_changed()
+    assert table.version == version and table.lookup("Low", "long-term", 1_000)["version"] == version
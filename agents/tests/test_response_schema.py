@@ -0,0 +1,84 @@
+from response_schema import ReportParser, ReportStore, parse_report, summary_view
+
+REPLY = """\
+**Investment Plan for $50,000**
+
+A balanced mix for a moderate, long-term investor.
+
+## Recommended Allocation
+- US Stocks (VTI): 50% ($25,000)
+- Bonds: 30% ($15k)
+- Cash: 20%
+
+**Advisor Matches**
+Name: Jane Roe, CFP
+Firm: Roe Wealth
+Match Score: 92%
+Offers remote meetings
+Name: John Doe
+Fees: 0.8% of AUM
+
+**Risk Notes**
+Markets go down as well as up.
+
+```json
+{"risk_level": "Moderate", "horizon_years": 20}
+```
+"""
+
+
+def test_reply_is_parsed_into_typed_report():
+    report = parse_report(REPLY)
+
+    assert report["title"] == "Investment Plan for $50,000"
+    assert report["summary"] == "A balanced mix for a moderate, long-term investor."
+    assert [section["id"] for section in report["sections"]] == ["recommended-allocation", "advisor-matches", "risk-notes"]
+    assert report["sections"][0]["bullets"][1] == "Bonds: 30% ($15k)"
+    assert report["allocations"] == [
+        {"asset": "US Stocks (VTI)", "percent": 50.0, "amount": 25000.0},
+        {"asset": "Bonds", "percent": 30.0, "amount": 15000.0},
+        {"asset": "Cash", "percent": 20.0, "amount": None},
+    ]
+    assert report["advisors"] == [
+        {"name": "Jane Roe, CFP", "firm": "Roe Wealth", "match_score": 92.0, "details": ["Offers remote meetings"]},
+        {"name": "John Doe", "fees": "0.8% of AUM", "details": []},
+    ]
+    assert report["data"] == {"risk_level": "Moderate", "horizon_years": 20}
+    assert "```" not in report["sections"][-1]["text"]
+
+
+def test_chunked_feed_matches_single_pass():
+    parser = ReportParser()
+    for start in range(0, len(REPLY), 7):
+        parser.feed(REPLY[start:start + 7])
+    assert parser.close() == parse_report(REPLY)
+
+
+def test_summary_view_drops_section_bodies():
+    report = parse_report(REPLY)
+    view = summary_view(report)
+
+    assert view["sections"][2] == {"id": "risk-notes", "title": "Risk Notes",
+                                   "chars": len("Markets go down as well as up.")}
+    assert view["allocations"] == report["allocations"] and view["summary"] == report["summary"]
+
+
+def test_store_evicts_oldest_and_scopes_by_namespace():
+    store = ReportStore(max_reports=2)
+    first = store.put(parse_report(REPLY), "alice")
+    second = store.put({"sections": []}, "alice")
+    store.put({"sections": []}, "bob")
+
+    assert store.get(first, "alice") is None
+    assert store.get(second, "alice") == {"sections": []}
+    assert store.get(second, "bob") is None
+
+
+def test_store_is_shared_through_sqlite(tmp_path):
+    path = str(tmp_path / "reports.sqlite3")
+    response_id = ReportStore(path=path).put(parse_report(REPLY), "alice")
+    other_worker = ReportStore(path=path)
+
+    assert other_worker.section(response_id, "risk-notes", "alice")["text"] == "Markets go down as well as up."
+    assert other_worker.section(response_id, "missing", "alice") is None
+    assert other_worker.get(response_id, "bob") is None
@@ -0,0 +1,44 @@
+import pytest
+
+from document_catalog import DocumentCatalog, build_document_context
+from semantic_cache import SemanticAnswerCache
+
+AGENTS = ["investment_agent"]
+
+
+def _hit(cache, stored, asked, namespace=None):
+    cache.store(AGENTS, stored, f"answer to: {stored}", namespace)
+    return cache.lookup(AGENTS, asked, namespace)
+
+
+@pytest.mark.parametrize("stored, asked", [
+    ("Is gold not a good investment right now?", "Is gold a good investment right now?"),
+    ("Should I hold bonds than stocks?", "Should I hold stocks than bonds?"),
+    ("Should I pay off my mortgage before investing?", "Should I invest before paying off my mortgage?"),
+    ("Should I avoid index funds?", "Should I buy index funds?"),
+])
+def test_opposite_questions_do_not_share_answers(stored, asked):
+    assert _hit(SemanticAnswerCache(), stored, asked) is None
+
+
+def test_paraphrases_still_hit():
+    hit = _hit(SemanticAnswerCache(), "balanced portfolio for $50k retirement",
+               "put 50 thousand into a moderate retirement mix")
+    assert hit is not None and hit["similarity"] >= 0.8
+
+
+def test_reupload_under_same_name_invalidates_answers(tmp_path):
+    statement = tmp_path / "statement.txt"
+    statement.write_text("401k statement: balance $120,000, expense ratio 0.9%")
+    catalog = DocumentCatalog(tmp_path)
+    cache = SemanticAnswerCache(documents_version=lambda namespace: catalog.fingerprint())
+
+    question = "How are my statement fees?"
+    query = question + build_document_context(catalog, question)
+    cache.store(AGENTS, query, "fees look high", "s1")
+    assert cache.lookup(AGENTS, query, "s1") is not None
+
+    statement.write_text("401k statement: balance $95,500, expense ratio 0.2% (new plan)")
+    catalog.add(statement)
+    assert build_document_context(catalog, question) in query
+    assert cache.lookup(AGENTS, query, "s1") is None
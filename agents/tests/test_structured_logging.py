@@ -0,0 +1,68 @@
+import io
+import json
+import logging
+
+import pytest
+
+import structured_logging
+from structured_logging import set_request_id, setup_logging, shutdown_logging
+
+
+@pytest.fixture
+def log_output():
+    """setup_logging() writing to a buffer; the root logger's handlers are restored afterwards"""
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    stream = io.StringIO()
+
+    def start(**options):
+        setup_logging(level="DEBUG", stream=stream, **options)
+        return stream
+
+    yield start
+    shutdown_logging()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+
+def _fail():
+    try:
+        1 / 0
+    except ZeroDivisionError:
+        logging.getLogger("test").exception("Payment %s failed", "p-1", extra={"amount": 50})
+
+
+def test_json_records_keep_exception_and_extra_fields(log_output):
+    stream = log_output(json_output=True)
+    set_request_id("req-123")
+    _fail()
+    shutdown_logging()
+
+    entry = json.loads(stream.getvalue().strip().splitlines()[-1])
+    assert entry["msg"] == "Payment p-1 failed"
+    assert entry["exc"].startswith("Traceback") and "ZeroDivisionError" in entry["exc"]
+    assert (entry["request_id"], entry["amount"], entry["level"]) == ("req-123", 50, "ERROR")
+
+
+def test_text_records_append_the_traceback(log_output):
+    stream = log_output(json_output=False)
+    set_request_id("req-456")
+    _fail()
+    shutdown_logging()
+
+    first, *rest = stream.getvalue().strip().splitlines()
+    assert "ERROR test [req-456] Payment p-1 failed amount=50" in first
+    assert rest[0].startswith("Traceback") and "ZeroDivisionError" in rest[-1]
+
+
+def test_debug_records_are_sampled_per_request(log_output):
+    stream = log_output(json_output=True, debug_sample_rate=0.0)
+    logging.getLogger("test").debug("dropped")
+    logging.getLogger("test").info("kept")
+    shutdown_logging()
+
+    assert [json.loads(line)["msg"] for line in stream.getvalue().splitlines()] == ["kept"]
+    assert structured_logging.get_logging_stats()["dropped"] == 0
@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from tool_runtime import Batcher, arun_tool, run_tool
+
+
+def test_concurrent_requests_are_batched_and_deduplicated():
+    batches = []
+
+    async def handler(items):
+        batches.append([key for key, _ in items])
+        return [f"{key}:{payload}" for key, payload in items]
+
+    async def main():
+        batcher = Batcher("test-batch", handler, window=0.01, max_batch=10)
+        results = await asyncio.gather(*(batcher.submit(key, key.upper()) for key in ("a", "b", "a", "c")))
+        return batcher, results
+
+    batcher, results = asyncio.run(main())
+    assert results == ["a:A", "b:B", "a:A", "c:C"]
+    assert batches == [["a", "b", "c"]]
+    stats = batcher.stats()
+    assert (stats["requests"], stats["deduplicated"], stats["batches"], stats["avg_batch_size"]) == (4, 1, 1, 3.0)
+
+
+def test_full_batch_flushes_without_waiting_for_window():
+    async def handler(items):
+        return [key for key, _ in items]
+
+    async def main():
+        batcher = Batcher("test-full", handler, window=60, max_batch=2)
+        return await asyncio.wait_for(asyncio.gather(batcher.submit(1), batcher.submit(2)), 1)
+
+    assert asyncio.run(main()) == [1, 2]
+
+
+def test_exceptions_fail_only_their_own_callers():
+    async def handler(items):
+        return [ValueError(key) if key == "bad" else key for key, _ in items]
+
+    async def main():
+        batcher = Batcher("test-errors", handler, window=0.01)
+        return batcher, await asyncio.gather(batcher.submit("ok"), batcher.submit("bad"), return_exceptions=True)
+
+    batcher, (ok, bad) = asyncio.run(main())
+    assert ok == "ok" and isinstance(bad, ValueError)
+    assert batcher.stats()["errors"] == 1
+
+
+def test_cancelled_items_cancel_their_callers():
+    async def handler(items):
+        return [asyncio.CancelledError() if key == "gone" else key for key, _ in items]
+
+    async def main():
+        batcher = Batcher("test-cancelled-item", handler, window=0.01)
+        ok, gone = asyncio.ensure_future(batcher.submit("ok")), asyncio.ensure_future(batcher.submit("gone"))
+        assert await ok == "ok"
+        with pytest.raises(asyncio.CancelledError):
+            await gone
+
+    asyncio.run(main())
+
+
+def test_cancelled_batch_cancels_waiting_callers():
+    async def main():
+        running = asyncio.Event()
+
+        async def handler(items):
+            running.set()
+            await asyncio.sleep(60)
+
+        batcher = Batcher("test-cancelled-batch", handler, window=0.01)
+        caller = asyncio.ensure_future(batcher.submit("slow"))
+        await running.wait()
+        batch_task = next(task for task in asyncio.all_tasks() if task.get_name() == "batch-test-cancelled-batch")
+        batch_task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(caller, 1)
+        assert batcher._inflight == {}
+
+    asyncio.run(main())
+
+
+def test_run_tool_from_sync_and_async_callers():
+    async def double(value):
+        await asyncio.sleep(0)
+        return value * 2
+
+    assert run_tool(double(21)) == 42
+    assert asyncio.run(arun_tool(double(4))) == 8
+    with pytest.raises(asyncio.TimeoutError):
+        run_tool(asyncio.sleep(5), timeout=0.05)
@@ -0,0 +1,38 @@
+import asyncio
+
+import traffic_replay
+from traffic_replay import TrafficLog, recorded_tool
+
+
+class EchoTool:
+    name = "echo"
+
+    def __init__(self):
+        self.live_calls = 0
+
+    @recorded_tool
+    def _run(self, text: str) -> str:
+        self.live_calls += 1
+        return f"echo {text}"
+
+    @recorded_tool
+    async def _arun(self, text: str) -> str:
+        self.live_calls += 1
+        return f"echo {text}"
+
+
+def test_async_tool_calls_are_recorded_and_replayed(tmp_path, monkeypatch):
+    recorder = TrafficLog("record", str(tmp_path))
+    monkeypatch.setattr(traffic_replay, "_traffic", recorder)
+    tool = EchoTool()
+    assert asyncio.run(tool._arun("hello")) == "echo hello"
+    recorder.close()
+    assert recorder.stats()["recorded"] == 1
+
+    replayer = TrafficLog("replay", str(tmp_path), time_scale=0, miss_policy="error")
+    monkeypatch.setattr(traffic_replay, "_traffic", replayer)
+    replayed = EchoTool()
+    # Both entry points share the recording: the key is the tool name and arguments
+    assert asyncio.run(replayed._arun("hello")) == "echo hello"
+    assert replayed._run("hello") == "echo hello"
+    assert replayed.live_calls == 0
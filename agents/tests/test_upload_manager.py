@@ -0,0 +1,147 @@
+import hashlib
+import io
+
+import pytest
+
+from upload_manager import UploadConflict, UploadManager
+
+
+class DroppedStream:
+    """Request body whose connection drops after `limit` bytes"""
+
+    def __init__(self, data: bytes, limit: int):
+        self._data = io.BytesIO(data[:limit])
+
+    def read(self, size=-1):
+        chunk = self._data.read(size)
+        if not chunk:
+            raise ConnectionResetError("client disconnected")
+        return chunk
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = UploadManager(tmp_path / "uploads", chunk_size=4)
+    yield manager
+    manager._pool.shutdown(wait=False)
+
+
+def test_chunk_retried_after_drop_commits_exact_content(manager, tmp_path):
+    content = b"BBBBCCCCDDDD"
+    session = manager.create_session(tmp_path / "ns", "statement.txt", len(content))
+    upload_id = session["upload_id"]
+
+    with pytest.raises(ConnectionResetError):
+        manager.append_chunk(upload_id, 0, DroppedStream(b"AAAAAAAAAAAA", 8))
+    assert manager.session_status(upload_id)["received"] == 0
+
+    assert manager.append_chunk(upload_id, 0, io.BytesIO(content))["received"] == len(content)
+    stored = manager.complete_session(upload_id)
+
+    assert stored.path.read_bytes() == content
+    assert stored.size == len(content)
+    assert stored.sha256 == hashlib.sha256(content).hexdigest()
+
+
+def test_resume_after_drop_in_later_chunk(manager, tmp_path):
+    content = b"0123456789abcdef"
+    upload_id = manager.create_session(tmp_path / "ns", "statement.txt", len(content))["upload_id"]
+
+    manager.append_chunk(upload_id, 0, io.BytesIO(content[:8]))
+    with pytest.raises(ConnectionResetError):
+        manager.append_chunk(upload_id, 8, DroppedStream(b"XXXXXXXX", 6))
+    with pytest.raises(UploadConflict):
+        manager.append_chunk(upload_id, 14, io.BytesIO(content[14:]))
+
+    manager.append_chunk(upload_id, 8, io.BytesIO(content[8:]))
+    stored = manager.complete_session(upload_id)
+
+    assert stored.path.read_bytes() == content
+    assert stored.sha256 == hashlib.sha256(content).hexdigest()
+
+
+def test_missing_part_data_rewinds_session(manager, tmp_path):
+    content = b"0123456789"
+    upload_id = manager.create_session(tmp_path / "ns", "statement.txt", len(content))["upload_id"]
+    manager.append_chunk(upload_id, 0, io.BytesIO(content[:6]))
+    with open(manager._session_part(upload_id), "r+b") as handle:
+        handle.truncate(4)
+
+    with pytest.raises(UploadConflict):
+        manager.append_chunk(upload_id, 6, io.BytesIO(content[6:]))
+    assert manager.session_status(upload_id)["received"] == 4
+
+    manager.append_chunk(upload_id, 4, io.BytesIO(content[4:]))
+    assert manager.complete_session(upload_id).sha256 == hashlib.sha256(content).hexdigest()
+
+
+def _store(manager, directory, filename, content):
+    staged = manager.open_staging_file()
+    try:
+        staged.write(content)
+        return manager.commit(staged, directory, filename)
+    finally:
+        staged.close()
+
+
+@pytest.fixture
+def workers(tmp_path):
+    """Two managers on one uploads root, as in two API worker processes"""
+    pair = [UploadManager(tmp_path / "uploads", chunk_size=4) for _ in range(2)]
+    yield pair
+    for manager in pair:
+        manager._pool.shutdown(wait=False)
+
+
+def test_workers_merge_content_index_updates(workers, tmp_path):
+    worker_a, worker_b = workers
+    directory = tmp_path / "uploads" / "ns"
+    _store(worker_b, directory, "first.txt", b"first")
+    _store(worker_a, directory, "second.txt", b"second")
+    _store(worker_b, directory, "third.txt", b"third")
+
+    duplicate = _store(worker_b, directory, "copy.txt", b"second")
+    assert duplicate.duplicate_of == "second.txt"
+
+    worker_a.forget(directory, "third.txt")
+    (directory / "third.txt").unlink()
+    assert _store(worker_b, directory, "again.txt", b"third").duplicate_of is None
+
+
+def test_resumable_chunks_on_different_workers(workers, tmp_path):
+    worker_a, worker_b = workers
+    content = b"0123456789abcdef"
+    upload_id = worker_a.create_session(tmp_path / "ns", "statement.txt", len(content))["upload_id"]
+    worker_a.append_chunk(upload_id, 0, io.BytesIO(content[:8]))
+    worker_b.append_chunk(upload_id, 8, io.BytesIO(content[8:]))
+
+    stored = worker_a.complete_session(upload_id)
+    assert stored.sha256 == hashlib.sha256(content).hexdigest()
+    assert stored.path.read_bytes() == content
+
+
+def test_concurrent_chunk_on_another_worker_conflicts(workers, tmp_path):
+    worker_a, worker_b = workers
+    upload_id = worker_a.create_session(tmp_path / "ns", "statement.txt", 8)["upload_id"]
+    seen = []
+
+    class InterleavedStream(io.BytesIO):
+        def read(self, size=-1):
+            if not seen:
+                with pytest.raises(UploadConflict) as conflict:
+                    worker_b.append_chunk(upload_id, 0, io.BytesIO(b"XXXX"))
+                seen.append(conflict.value)
+            return super().read(size)
+
+    assert worker_a.append_chunk(upload_id, 0, InterleavedStream(b"AAAABBBB"))["received"] == 8
+    assert seen and worker_b.append_chunk(upload_id, 8, io.BytesIO(b""))["received"] == 8
+
+
+def test_processing_status_is_shared(workers, tmp_path):
+    worker_a, worker_b = workers
+    path = tmp_path / "uploads" / "ns" / "statement.txt"
+    worker_a.submit_processing(path, lambda key: None).result()
+
+    assert worker_b.processing_status(path) == "processed"
+    worker_b.forget(path.parent, path.name)
+    assert worker_a.processing_status(path) is None
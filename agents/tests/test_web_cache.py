@@ -0,0 +1,68 @@
+import threading
+import time
+
+from web_cache import PageCache, serve_fixture_pages
+
+
+def test_cached_page_keeps_response_charset(tmp_path):
+    pages = {"/latin": "<p>Café £ returns</p>"}
+    headers = {"/latin": {"Content-Type": "text/html; charset=iso-8859-1"}}
+    with serve_fixture_pages(pages, headers=headers) as (base, hits):
+        cache = PageCache(tmp_path)
+        live = cache.fetch(f"{base}/latin")
+        cached = cache.fetch(f"{base}/latin")
+
+    assert not live.from_cache and cached.from_cache
+    assert cached.text == live.text == pages["/latin"]
+    assert hits["/latin"] == 1
+
+
+def test_no_store_responses_are_not_cached(tmp_path):
+    pages = {"/quote": "<p>live quote</p>", "/news": "<p>news</p>"}
+    headers = {"/quote": {"Cache-Control": "private, no-store"}, "/news": {"Cache-Control": "no-cache"}}
+    with serve_fixture_pages(pages, headers=headers) as (base, hits):
+        cache = PageCache(tmp_path)
+        for _ in range(3):
+            cache.fetch(f"{base}/quote")
+            news = cache.fetch(f"{base}/news")
+
+    assert hits["/quote"] == 3
+    assert cache.stats()["pages"] == 1
+    # no-cache is stored but revalidated: every later fetch is a 304
+    assert hits["/news"] == 3 and news.revalidated
+
+
+class _LockWithHook:
+    """The cache lock, running `hook` just before the first acquire"""
+
+    def __init__(self, lock, hook):
+        self.lock = lock
+        self.hook = hook
+
+    def __enter__(self):
+        hook, self.hook = self.hook, None
+        if hook is not None:
+            hook()
+        return self.lock.__enter__()
+
+    def __exit__(self, *exc_info):
+        return self.lock.__exit__(*exc_info)
+
+
+def test_blob_shared_with_a_released_url_survives_store(tmp_path):
+    cache = PageCache(tmp_path)
+    body = b"<p>same body</p>"
+    cache._store("http://a/old", body, "text/html", "utf-8", None, None, time.time())
+
+    def release_other_url():
+        # Another request drops the only other URL holding this blob while the new entry is stored
+        releasing = threading.Thread(target=cache._forget, args=("http://a/old",))
+        releasing.start()
+        releasing.join()
+
+    cache._lock = _LockWithHook(cache._lock, release_other_url)
+    cache._store("http://a/new", body, "text/html", "utf-8", None, None, time.time())
+
+    page = cache.fetch("http://a/new")
+    assert page.from_cache and page.text == body.decode()
+    assert cache.stats()["pages"] == 1
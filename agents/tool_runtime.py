@@ -0,0 +1,167 @@
+"""
+Shared event loop and request batching for agent tools.
+
+CrewAI calls a tool's `_run` synchronously from the crew's worker thread. The
+tools in this repo implement their work as coroutines and `_run` hands them to
+one process-wide tool loop (`run_tool`). Async callers await the same coroutine
+through `arun_tool`. With every call on one loop, calls from concurrent crews
+can be coalesced: `Batcher` collects the requests that arrive within a short
+window and hands them to a batch handler in one go. Identical requests in
+flight share a single result.
+
+    TOOL_BATCH_WINDOW_MS=5     # how long a batch stays open for more requests
+    TOOL_BATCH_MAX=16          # requests per batch
+    TOOL_CALL_TIMEOUT=60       # seconds a synchronous caller waits
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+logger = logging.getLogger("tool_runtime")
+
+TOOL_BATCH_WINDOW = float(os.getenv("TOOL_BATCH_WINDOW_MS", "5")) / 1000
+TOOL_BATCH_MAX = int(os.getenv("TOOL_BATCH_MAX", "16"))
+TOOL_CALL_TIMEOUT = float(os.getenv("TOOL_CALL_TIMEOUT", "60"))
+
+_tool_loop: Optional[asyncio.AbstractEventLoop] = None
+_tool_loop_lock = threading.Lock()
+_batchers: Dict[str, "Batcher"] = {}
+
+
+def get_tool_loop() -> asyncio.AbstractEventLoop:
+    """The tool loop, started on a daemon thread on first use"""
+    global _tool_loop
+    if _tool_loop is not None:
+        return _tool_loop
+    with _tool_loop_lock:
+        if _tool_loop is None:
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def run():
+                asyncio.set_event_loop(loop)
+                loop.call_soon(ready.set)
+                loop.run_forever()
+
+            threading.Thread(target=run, name="tool-loop", daemon=True).start()
+            ready.wait()
+            from loop_monitor import monitor_loop
+            monitor_loop(loop, "tool-loop")
+            _tool_loop = loop
+    return _tool_loop
+
+
+def run_tool(coro: Awaitable[Any], timeout: float = TOOL_CALL_TIMEOUT) -> Any:
+    """Run a tool coroutine on the tool loop and wait for it (from a synchronous caller)"""
+    loop = get_tool_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        coro.close()
+        raise RuntimeError("run_tool() would block the tool loop; await arun_tool() instead")
+    future = asyncio.run_coroutine_threadsafe(coro, loop)
+    try:
+        return future.result(timeout)
+    except FutureTimeout:
+        future.cancel()
+        raise
+
+
+async def arun_tool(coro: Awaitable[Any]) -> Any:
+    """Await a tool coroutine on the tool loop from any other loop"""
+    loop = get_tool_loop()
+    if asyncio.get_running_loop() is loop:
+        return await coro
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+
+class Batcher:
+    """Coalesces concurrent requests into batches for `handler` (tool loop only).
+
+    `handler(items)` receives `[(key, payload), ...]` and returns one result per
+    item, in order; an Exception in the list fails only that item's callers.
+    """
+
+    def __init__(self, name: str, handler: Callable[[List[Tuple[Hashable, Any]]], Awaitable[List[Any]]],
+                 window: float = TOOL_BATCH_WINDOW, max_batch: int = TOOL_BATCH_MAX):
+        self.name = name
+        self.handler = handler
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: Dict[Hashable, Tuple[Any, asyncio.Future]] = {}
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self.counters = {"requests": 0, "deduplicated": 0, "batches": 0, "batched_items": 0, "errors": 0}
+        _batchers[name] = self
+
+    async def submit(self, key: Hashable, payload: Any = None) -> Any:
+        self.counters["requests"] += 1
+        future = self._inflight.get(key)
+        if future is None:
+            pending = self._pending.get(key)
+            future = pending[1] if pending is not None else None
+        if future is not None:
+            self.counters["deduplicated"] += 1
+            return await asyncio.shield(future)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending[key] = (payload, future)
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window, self._flush)
+        return await asyncio.shield(future)
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        self._inflight.update((key, future) for key, (_, future) in batch.items())
+        asyncio.get_running_loop().create_task(self._run_batch(batch), name=f"batch-{self.name}")
+
+    async def _run_batch(self, batch: Dict[Hashable, Tuple[Any, asyncio.Future]]):
+        items = [(key, payload) for key, (payload, _) in batch.items()]
+        self.counters["batches"] += 1
+        self.counters["batched_items"] += len(items)
+        try:
+            results = await self.handler(items)
+        except asyncio.CancelledError:
+            # Cancellation is not a batch result: cancel the callers' futures and stop
+            for key, (_, future) in batch.items():
+                self._inflight.pop(key, None)
+                future.cancel()
+            raise
+        except Exception as e:
+            logger.warning("Tool batch failed", extra={"batcher": self.name, "items": len(items), "error": str(e)})
+            results = [e] * len(items)
+        if len(results) != len(items):
+            results = [RuntimeError(f"{self.name} batch returned {len(results)} results for {len(items)} requests")] * len(items)
+        for (key, (_, future)), result in zip(batch.items(), results):
+            self._inflight.pop(key, None)
+            if future.done():
+                continue
+            if isinstance(result, asyncio.CancelledError):
+                future.cancel()
+            elif isinstance(result, Exception):
+                self.counters["errors"] += 1
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        batches = self.counters["batches"]
+        return {**self.counters, "avg_batch_size": round(self.counters["batched_items"] / batches, 2) if batches else 0.0}
+
+
+def batcher_stats() -> Dict[str, Any]:
+    return {name: batcher.stats() for name, batcher in list(_batchers.items())}
@@ -0,0 +1,317 @@
+"""
+Record/replay of agent traffic.
+
+In record mode every `ACPCallingAgent.run` (query, routed agents, timing),
+every ACP agent call and every tool call is appended to a compact JSON-lines
+log, one file per process, in AGENT_TRAFFIC_DIR. In replay mode agent and tool
+calls are answered from the recording instead of live agents/LLMs/web, after
+sleeping the recorded duration times AGENT_REPLAY_TIME_SCALE (0 = no delay).
+
+    AGENT_TRAFFIC_MODE=record python api_server.py       # capture
+    python traffic_replay.py summary ./traffic            # what was captured
+    python traffic_replay.py replay ./traffic --speed 2   # re-drive it locally
+
+`replay` re-issues the captured runs at their original inter-arrival times
+(divided by --speed) through a local ACPCallingAgent whose agent calls are
+served from the recording, and reports the latency distribution.
+
+Calls missing from the recording follow AGENT_REPLAY_MISS: "agent" (default)
+serves another recorded response of the same agent/tool, "error" raises
+ReplayMiss, "live" performs the real call.
+"""
+
+import argparse
+import asyncio
+import functools
+import hashlib
+import inspect
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+MODES = ("off", "record", "replay")
+MISS_POLICIES = ("agent", "error", "live")
+
+
+class ReplayMiss(LookupError):
+    """Raised in replay mode when a call is not in the recording"""
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8", errors="replace")).hexdigest()[:16]
+
+
+def load_records(path) -> List[Dict[str, Any]]:
+    """All events of a recording (a .jsonl file or a directory of them), oldest first"""
+    path = Path(path)
+    files = sorted(path.glob("*.jsonl")) if path.is_dir() else [path]
+    records = []
+    for file in files:
+        with open(file, encoding="utf-8") as handle:
+            records.extend(json.loads(line) for line in handle if line.strip())
+    records.sort(key=lambda record: record["ts"])
+    return records
+
+
+class TrafficLog:
+    """Recorder or replayer for agent/tool calls, depending on mode"""
+
+    def __init__(self, mode: str = "off", directory: str = "./traffic", time_scale: float = 1.0,
+                 miss_policy: str = "agent", process_name: Optional[str] = None):
+        if mode not in MODES:
+            raise ValueError(f"unknown traffic mode {mode!r}")
+        if miss_policy not in MISS_POLICIES:
+            raise ValueError(f"unknown replay miss policy {miss_policy!r}")
+        self.mode = mode
+        self.directory = Path(directory)
+        self.time_scale = time_scale
+        self.miss_policy = miss_policy
+        self._lock = threading.Lock()
+        self._stats = {"recorded": 0, "replayed": 0, "misses": 0}
+        self._handle = None
+        self._exact: Dict[tuple, deque] = {}
+        self._by_name: Dict[tuple, Any] = {}
+
+        if mode == "record":
+            self.directory.mkdir(parents=True, exist_ok=True)
+            name = process_name or Path(sys.argv[0] or "python").stem or "python"
+            self._handle = open(self.directory / f"{name}-{os.getpid()}.jsonl", "a", encoding="utf-8", buffering=1)
+        elif mode == "replay":
+            self._index(load_records(self.directory))
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def record(self, kind: str, name: str, request: str, response: Optional[str], elapsed: float,
+               error: Optional[str] = None, **extra):
+        if self._handle is None:
+            return
+        event = {"ts": round(time.time(), 6), "kind": kind, "name": name, "key": _digest(request),
+                 "request": request, "response": response, "elapsed_s": round(elapsed, 4), **extra}
+        if error is not None:
+            event["error"] = error
+        line = json.dumps(event, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            self._handle.write(line + "\n")
+            self._stats["recorded"] += 1
+
+    def record_run(self, query: str, agents: List[str], started: float, elapsed: float, **extra):
+        """One ACPCallingAgent.run, stamped with its start time so replay keeps the arrival pattern"""
+        self.record("run", ",".join(agents), query, None, elapsed, agents=agents, ts=round(started, 6), **extra)
+
+    def lookup(self, kind: str, name: str, request: str) -> Optional[Dict[str, Any]]:
+        """Recorded event answering this call, per the miss policy"""
+        with self._lock:
+            queue = self._exact.get((kind, name, _digest(request)))
+            if queue:
+                event = queue[0]
+                queue.rotate(-1)
+                self._stats["replayed"] += 1
+                return event
+            self._stats["misses"] += 1
+            if self.miss_policy == "agent" and (kind, name) in self._by_name:
+                self._stats["replayed"] += 1
+                return next(self._by_name[(kind, name)])
+        if self.miss_policy == "live":
+            return None
+        raise ReplayMiss(f"no recorded {kind} call for {name}")
+
+    def replay_delay(self, event: Dict[str, Any]) -> float:
+        return event.get("elapsed_s", 0.0) * self.time_scale
+
+    def call_tool(self, name: str, request: str, live: Callable[[], Any]) -> Any:
+        """Run a (synchronous) tool call through the recorder/replayer"""
+        if self.replaying:
+            event = self.lookup("tool", name, request)
+            if event is not None:
+                time.sleep(self.replay_delay(event))
+                return _replayed_result(event)
+        started = time.perf_counter()
+        try:
+            result = live()
+        except Exception as e:
+            self.record("tool", name, request, None, time.perf_counter() - started, error=str(e))
+            raise
+        self.record("tool", name, request, str(result), time.perf_counter() - started)
+        return result
+
+    async def acall_tool(self, name: str, request: str, live: Callable[[], Awaitable[Any]]) -> Any:
+        """`call_tool` for a coroutine tool call"""
+        if self.replaying:
+            event = self.lookup("tool", name, request)
+            if event is not None:
+                await asyncio.sleep(self.replay_delay(event))
+                return _replayed_result(event)
+        started = time.perf_counter()
+        try:
+            result = await live()
+        except Exception as e:
+            self.record("tool", name, request, None, time.perf_counter() - started, error=str(e))
+            raise
+        self.record("tool", name, request, str(result), time.perf_counter() - started)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"mode": self.mode, **self._stats}
+
+    def close(self):
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+    def _index(self, records: List[Dict[str, Any]]):
+        grouped = defaultdict(list)
+        for event in records:
+            if event["kind"] == "run":
+                continue
+            self._exact.setdefault((event["kind"], event["name"], event["key"]), deque()).append(event)
+            grouped[(event["kind"], event["name"])].append(event)
+        self._by_name = {key: itertools.cycle(events) for key, events in grouped.items()}
+
+
+def _replayed_result(event: Dict[str, Any]) -> str:
+    if event.get("error") is not None:
+        raise Exception(event["error"])
+    return event["response"]
+
+
+async def replay_agent_call(traffic: TrafficLog, agent_name: str, query: str) -> Optional[str]:
+    """Recorded response of an ACP agent call (after its scaled delay), or None to call live"""
+    event = traffic.lookup("agent", agent_name, query)
+    if event is None:
+        return None
+    await asyncio.sleep(traffic.replay_delay(event))
+    return _replayed_result(event)
+
+
+def recorded_tool(method):
+    """Route a tool's `_run`/`_arun`/`forward` through the traffic log, keyed by tool name and arguments"""
+    if inspect.iscoroutinefunction(method):
+        @functools.wraps(method)
+        async def async_wrapper(self, *args, **kwargs):
+            traffic = get_traffic()
+            if traffic.mode == "off":
+                return await method(self, *args, **kwargs)
+            request = json.dumps([args, kwargs], sort_keys=True, default=str, ensure_ascii=False)
+            name = getattr(self, "name", None) or method.__qualname__
+            return await traffic.acall_tool(name, request, lambda: method(self, *args, **kwargs))
+        return async_wrapper
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        traffic = get_traffic()
+        if traffic.mode == "off":
+            return method(self, *args, **kwargs)
+        request = json.dumps([args, kwargs], sort_keys=True, default=str, ensure_ascii=False)
+        name = getattr(self, "name", None) or method.__qualname__
+        return traffic.call_tool(name, request, lambda: method(self, *args, **kwargs))
+    return wrapper
+
+
+_traffic: Optional[TrafficLog] = None
+_traffic_lock = threading.Lock()
+
+
+def get_traffic() -> TrafficLog:
+    """Process-wide traffic log configured from AGENT_TRAFFIC_* environment variables"""
+    global _traffic
+    if _traffic is None:
+        with _traffic_lock:
+            if _traffic is None:
+                _traffic = TrafficLog(
+                    mode=os.getenv("AGENT_TRAFFIC_MODE", "off").lower(),
+                    directory=os.getenv("AGENT_TRAFFIC_DIR", "./traffic"),
+                    time_scale=float(os.getenv("AGENT_REPLAY_TIME_SCALE", "1.0")),
+                    miss_policy=os.getenv("AGENT_REPLAY_MISS", "agent").lower(),
+                )
+    return _traffic
+
+
+def summarize(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    groups = defaultdict(list)
+    for event in records:
+        groups[f"{event['kind']}:{event['name']}"].append(event)
+    summary = {}
+    for key, events in sorted(groups.items()):
+        elapsed = sorted(event["elapsed_s"] for event in events)
+        summary[key] = {
+            "count": len(events),
+            "errors": sum(1 for event in events if event.get("error")),
+            "p50_s": elapsed[len(elapsed) // 2],
+            "max_s": elapsed[-1],
+        }
+    span = records[-1]["ts"] - records[0]["ts"] if records else 0.0
+    return {"events": len(records), "span_s": round(span, 3), "calls": summary}
+
+
+async def replay_runs(directory: str, speed: float, time_scale: float) -> Dict[str, Any]:
+    """Re-issue recorded runs at their original pacing against recorded agent responses"""
+    from fastacp import ACPCallingAgent
+
+    records = load_records(directory)
+    runs = [event for event in records if event["kind"] == "run"]
+    if not runs:
+        raise SystemExit("recording contains no runs")
+    traffic = TrafficLog("replay", directory, time_scale=time_scale)
+    agent_names = {event["name"] for event in records if event["kind"] == "agent"}
+    agent = ACPCallingAgent({name: {"agent": None, "client": None} for name in agent_names}, model=None)
+    agent.traffic = traffic
+
+    latencies = []
+
+    async def one(event):
+        started = time.perf_counter()
+        await agent.run(event["request"], namespace=event.get("namespace"), context=event.get("context"))
+        latencies.append(time.perf_counter() - started)
+
+    origin, clock = runs[0]["ts"], time.perf_counter()
+    tasks = []
+    for event in runs:
+        delay = (event["ts"] - origin) / speed - (time.perf_counter() - clock)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.ensure_future(one(event)))
+    await asyncio.gather(*tasks)
+
+    latencies.sort()
+    pick = lambda fraction: round(latencies[min(int(fraction * len(latencies)), len(latencies) - 1)] * 1000, 1)
+    return {
+        "runs": len(latencies),
+        "wall_s": round(time.perf_counter() - clock, 3),
+        "p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99),
+        "recorded_p50_ms": round(sorted(e["elapsed_s"] for e in runs)[len(runs) // 2] * 1000, 1),
+        "agent_stats": agent.get_stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    summary = commands.add_parser("summary", help="counts and timings per agent/tool in a recording")
+    summary.add_argument("path")
+    replay = commands.add_parser("replay", help="re-drive the recorded runs locally")
+    replay.add_argument("path")
+    replay.add_argument("--speed", type=float, default=1.0, help="arrival-rate multiplier")
+    replay.add_argument("--time-scale", type=float, default=1.0, help="multiplier on recorded call durations")
+    args = parser.parse_args()
+
+    if args.command == "summary":
+        print(json.dumps(summarize(load_records(args.path)), indent=2))
+    else:
+        print(json.dumps(asyncio.run(replay_runs(args.path, args.speed, args.time_scale)), indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
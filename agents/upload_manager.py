@@ -0,0 +1,390 @@
+"""
+Streaming upload handling.
+
+Multipart file parts are written straight to a staging file in chunks while
+their SHA-256 is computed, so nothing is buffered in memory and no second
+pass over the data is needed. Identical content in the same namespace is
+stored once, per-file processing runs on a worker pool, and large statements
+can be sent as resumable chunked uploads.
+
+API worker processes share the uploads root, so everything they must agree on
+lives there: each directory's content index is re-read and rewritten under a
+file lock, resumable sessions are files in the staging directory, and
+processing status plus the "chunk in progress" claims are rows in
+`.staging/uploads.sqlite3`.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # no cross-process locking (Windows)
+    fcntl = None
+
+from document_catalog import hash_file
+from job_queue import pid_alive
+
+logger = logging.getLogger("upload_manager")
+
+CONTENT_INDEX_NAME = ".content-index.json"
+CONTENT_INDEX_LOCK_NAME = ".content-index.lock"
+STAGING_DIRECTORY_NAME = ".staging"
+STATE_DB_NAME = "uploads.sqlite3"
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the configured maximum size"""
+
+
+class UploadNotFound(Exception):
+    """Raised for unknown or expired resumable upload ids"""
+
+
+class UploadConflict(Exception):
+    """Raised when a resumable chunk does not continue where the upload left off"""
+
+
+class StagedFile:
+    """Writable staging file that hashes and size-checks data as it arrives"""
+
+    def __init__(self, path: Path, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.committed = False
+        self._hash = hashlib.sha256()
+        self._handle = open(path, "w+b")
+
+    def write(self, data) -> int:
+        if self.size + len(data) > self.max_bytes:
+            raise UploadTooLarge(f"File exceeds the upload limit of {self.max_bytes} bytes")
+        self._hash.update(data)
+        self.size += len(data)
+        return self._handle.write(data)
+
+    def sha256(self) -> str:
+        return self._hash.hexdigest()
+
+    def read(self, *args):
+        return self._handle.read(*args)
+
+    def seek(self, *args):
+        return self._handle.seek(*args)
+
+    def tell(self):
+        return self._handle.tell()
+
+    def flush(self):
+        self._handle.flush()
+
+    def close(self):
+        """Close the handle; uncommitted staging data is discarded"""
+        if not self._handle.closed:
+            self._handle.close()
+        if not self.committed:
+            try:
+                self.path.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class StoredUpload:
+    """Result of committing an upload into a namespace directory"""
+
+    def __init__(self, name: str, path: Path, sha256: str, size: int, duplicate_of: Optional[str] = None):
+        self.name = name
+        self.path = path
+        self.sha256 = sha256
+        self.size = size
+        self.duplicate_of = duplicate_of
+
+    def to_dict(self) -> Dict[str, object]:
+        result = {"name": self.name, "sha256": self.sha256, "size": self.size}
+        if self.duplicate_of:
+            result["duplicate_of"] = self.duplicate_of
+        return result
+
+
+class UploadManager:
+    """Staging, deduplication, resumable sessions and background processing for uploads"""
+
+    def __init__(self, upload_root, max_file_bytes: int = 50 * 1024 * 1024,
+                 chunk_size: int = 1024 * 1024, workers: int = 4, session_ttl: float = 24 * 3600):
+        self.upload_root = Path(upload_root)
+        self.staging_directory = self.upload_root / STAGING_DIRECTORY_NAME
+        self.staging_directory.mkdir(parents=True, exist_ok=True)
+        self.max_file_bytes = max_file_bytes
+        self.chunk_size = chunk_size
+        self.session_ttl = session_ttl
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upload-worker")
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.staging_directory / STATE_DB_NAME), timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS processing (path TEXT PRIMARY KEY, status TEXT NOT NULL, "
+                         "updated REAL NOT NULL)")
+        # One row per resumable upload with a chunk (or completion) in progress, owned by a process
+        self._db.execute("CREATE TABLE IF NOT EXISTS active_sessions (upload_id TEXT PRIMARY KEY, "
+                         "pid INTEGER NOT NULL, started REAL NOT NULL)")
+        self._db.commit()
+
+    # --- direct (multipart) uploads -------------------------------------------------
+
+    def open_staging_file(self) -> StagedFile:
+        """Staging file for one incoming multipart file part"""
+        return StagedFile(self.staging_directory / f"{uuid.uuid4().hex}.part", self.max_file_bytes)
+
+    def commit(self, staged: StagedFile, directory, filename: str) -> StoredUpload:
+        """Move a fully received staging file into place, unless the content is already stored"""
+        staged.flush()
+        return self._commit_path(staged.path, Path(directory), filename, staged.sha256(), staged.size,
+                                 on_commit=lambda: setattr(staged, "committed", True))
+
+    def forget(self, directory, filename: str):
+        """Drop a deleted file from the content index"""
+        directory = Path(directory)
+        with self._content_index(directory) as index:
+            for digest, name in list(index.items()):
+                if name == filename:
+                    del index[digest]
+        with self._lock:
+            self._db.execute("DELETE FROM processing WHERE path = ?", (str(directory / filename),))
+            self._db.commit()
+
+    # --- background processing ------------------------------------------------------
+
+    def submit_processing(self, path, processor: Callable[[str], None]):
+        """Run `processor(path)` on the worker pool"""
+        key = str(path)
+        self._set_status(key, "queued")
+
+        def task():
+            self._set_status(key, "processing")
+            try:
+                processor(key)
+                status = "processed"
+                logger.debug("Processed upload for knowledge base", extra={"upload": Path(key).name})
+            except Exception as e:
+                status = "failed"
+                logger.warning("Failed to process upload", extra={"upload": Path(key).name, "error": str(e)})
+            self._set_status(key, status)
+
+        return self._pool.submit(task)
+
+    def processing_status(self, path) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT status FROM processing WHERE path = ?", (str(path),)).fetchone()
+        return row[0] if row else None
+
+    # --- resumable uploads ----------------------------------------------------------
+
+    def create_session(self, directory, filename: str, size: int, owner: Optional[str] = None) -> Dict[str, object]:
+        """Start a resumable upload of `size` bytes; with an `owner`, only calls passing the same owner see it"""
+        if size <= 0:
+            raise ValueError("Upload size must be positive")
+        if size > self.max_file_bytes:
+            raise UploadTooLarge(f"File exceeds the upload limit of {self.max_file_bytes} bytes")
+        self._expire_sessions()
+        upload_id = uuid.uuid4().hex
+        session = {
+            "upload_id": upload_id,
+            "directory": str(directory),
+            "filename": filename,
+            "size": size,
+            "received": 0,
+            "created": time.time(),
+            "owner": owner,
+        }
+        self._session_part(upload_id).touch()
+        self._save_session(session)
+        return {**self._public_session(session), "chunk_size": self.chunk_size}
+
+    def session_status(self, upload_id: str, owner: Optional[str] = None) -> Dict[str, object]:
+        return self._public_session(self._load_session(upload_id, owner))
+
+    def append_chunk(self, upload_id: str, offset: int, stream, owner: Optional[str] = None) -> Dict[str, object]:
+        """Append the next chunk; `offset` must equal the bytes received so far"""
+        self._load_session(upload_id, owner)
+        with self._claim_session(upload_id):
+            session = self._load_session(upload_id)
+            if offset != session["received"]:
+                raise UploadConflict(f"Expected offset {session['received']}, got {offset}")
+
+            part_path = self._session_part(upload_id)
+            written = 0
+            with open(part_path, "r+b" if part_path.exists() else "wb") as handle:
+                on_disk = handle.seek(0, os.SEEK_END)
+                if on_disk < offset:
+                    # Received data went missing: resume from what is actually stored
+                    session["received"] = on_disk
+                    self._save_session(session)
+                    raise UploadConflict(f"Expected offset {on_disk}, got {offset}")
+                # Drop whatever an earlier, interrupted attempt at this chunk left behind
+                handle.seek(offset)
+                handle.truncate()
+                try:
+                    while True:
+                        chunk = stream.read(self.chunk_size)
+                        if not chunk:
+                            break
+                        if offset + written + len(chunk) > session["size"]:
+                            raise UploadTooLarge("Chunk runs past the declared upload size")
+                        handle.write(chunk)
+                        written += len(chunk)
+                except BaseException:
+                    handle.truncate(offset)
+                    raise
+
+            session["received"] = offset + written
+            self._save_session(session)
+            return self._public_session(session)
+
+    def complete_session(self, upload_id: str, owner: Optional[str] = None) -> StoredUpload:
+        """Finish a resumable upload and commit it like a direct upload"""
+        self._load_session(upload_id, owner)
+        with self._claim_session(upload_id):
+            session = self._load_session(upload_id)
+            if session["received"] != session["size"]:
+                raise UploadConflict(f"Upload incomplete: {session['received']} of {session['size']} bytes received")
+
+            # Chunks may have arrived at different workers: the digest always comes from the assembled file
+            part_path = self._session_part(upload_id)
+            stored = self._commit_path(part_path, Path(session["directory"]), session["filename"],
+                                       hash_file(part_path, self.chunk_size), session["size"])
+            self._session_meta(upload_id).unlink(missing_ok=True)
+            part_path.unlink(missing_ok=True)
+            return stored
+
+    # --- internals ------------------------------------------------------------------
+
+    def _commit_path(self, source: Path, directory: Path, filename: str, digest: str, size: int,
+                     on_commit: Optional[Callable[[], None]] = None) -> StoredUpload:
+        directory.mkdir(parents=True, exist_ok=True)
+        destination = directory / filename
+        with self._content_index(directory) as index:
+            existing = index.get(digest)
+            if existing and (directory / existing).is_file():
+                logger.debug("Duplicate upload skipped", extra={"upload": filename, "duplicate_of": existing})
+                return StoredUpload(existing, directory / existing, digest, size, duplicate_of=existing)
+
+            os.replace(source, destination)
+            if on_commit:
+                on_commit()
+            for old_digest, name in list(index.items()):
+                if name == filename:
+                    del index[old_digest]
+            index[digest] = filename
+        return StoredUpload(filename, destination, digest, size)
+
+    @contextmanager
+    def _content_index(self, directory: Path) -> Iterator[Dict[str, str]]:
+        """The directory's digest -> file name index, read fresh and saved on exit, under the
+        thread lock and the directory's cross-process file lock"""
+        directory.mkdir(parents=True, exist_ok=True)
+        with self._lock, open(directory / CONTENT_INDEX_LOCK_NAME, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                index_path = directory / CONTENT_INDEX_NAME
+                try:
+                    index = json.loads(index_path.read_text())
+                except (FileNotFoundError, ValueError):
+                    # First use of this directory: hash what is already there
+                    index = {hash_file(path, self.chunk_size): path.name for path in directory.iterdir()
+                             if path.is_file() and not path.name.startswith(".")}
+                original = dict(index)
+                yield index
+                if index != original or not index_path.exists():
+                    _write_atomic(index_path, json.dumps(index))
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @contextmanager
+    def _claim_session(self, upload_id: str) -> Iterator[None]:
+        """Exclusive use of a resumable session across worker processes; a claim left by
+        a process that died is taken over"""
+        with self._lock:
+            claimed = self._db.execute(
+                "INSERT OR IGNORE INTO active_sessions (upload_id, pid, started) VALUES (?, ?, ?)",
+                (upload_id, os.getpid(), time.time())
+            ).rowcount
+            if not claimed:
+                row = self._db.execute("SELECT pid FROM active_sessions WHERE upload_id = ?", (upload_id,)).fetchone()
+                if row is not None and row[0] != os.getpid() and not pid_alive(row[0]):
+                    claimed = self._db.execute(
+                        "UPDATE active_sessions SET pid = ?, started = ? WHERE upload_id = ? AND pid = ?",
+                        (os.getpid(), time.time(), upload_id, row[0])
+                    ).rowcount
+            self._db.commit()
+        if not claimed:
+            raise UploadConflict("Another chunk for this upload is still being received")
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._db.execute("DELETE FROM active_sessions WHERE upload_id = ? AND pid = ?",
+                                 (upload_id, os.getpid()))
+                self._db.commit()
+
+    def _set_status(self, path: str, status: str):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO processing (path, status, updated) VALUES (?, ?, ?)",
+                             (path, status, time.time()))
+            self._db.commit()
+
+    def _session_part(self, upload_id: str) -> Path:
+        return self.staging_directory / f"{upload_id}.resumable"
+
+    def _session_meta(self, upload_id: str) -> Path:
+        return self.staging_directory / f"{upload_id}.json"
+
+    def _save_session(self, session: Dict[str, object]):
+        _write_atomic(self._session_meta(session["upload_id"]), json.dumps(session))
+
+    def _load_session(self, upload_id: str, owner: Optional[str] = None) -> Dict[str, object]:
+        """Session metadata; another owner's session is reported as not found"""
+        if not upload_id.isalnum():
+            raise UploadNotFound(upload_id)
+        try:
+            session = json.loads(self._session_meta(upload_id).read_text())
+        except (FileNotFoundError, ValueError):
+            raise UploadNotFound(upload_id)
+        if owner is not None and session.get("owner") != owner:
+            raise UploadNotFound(upload_id)
+        return session
+
+    def _public_session(self, session: Dict[str, object]) -> Dict[str, object]:
+        return {key: session[key] for key in ("upload_id", "filename", "size", "received")}
+
+    def _expire_sessions(self):
+        cutoff = time.time() - self.session_ttl
+        for meta_path in self.staging_directory.glob("*.json"):
+            try:
+                if meta_path.stat().st_mtime < cutoff:
+                    upload_id = meta_path.stem
+                    meta_path.unlink(missing_ok=True)
+                    self._session_part(upload_id).unlink(missing_ok=True)
+            except FileNotFoundError:
+                continue
+
+
+def _write_atomic(path: Path, text: str):
+    """Replace `path` with `text` through a temp file of its own, so concurrent writers never share one"""
+    tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        tmp_path.write_text(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
@@ -1,13 +1,20 @@
 from crewai.tools import BaseTool
-from typing import Type
+from typing import Optional, Type
 from pydantic import BaseModel, Field
+import asyncio
 import logging
-import re
 
 from neo4j_knowledge_tool import FinancialKnowledgeGraph
+from namespaces import DEFAULT_NAMESPACE
+from investor_profile import extract_amount, extract_risk_level, extract_time_horizon
+from traffic_replay import recorded_tool
+from tool_runtime import Batcher, arun_tool, run_tool
+from document_digest import format_digest
 
 logger = logging.getLogger("knowledge_investment_tool")
 
+DIGEST_PASSAGE_CHARS = 160
+
 class InvestmentQueryInput(BaseModel):
     """Input for knowledge-enhanced investment advice"""
     query: str = Field(..., description="Investment query with details like amount, risk tolerance, goals")
@@ -17,41 +24,54 @@ class FinancialKnowledgeTool(BaseTool):
     name: str = "financial_knowledge_advisor"
     description: str = "Provide investment advice using Neo4j knowledge graph and uploaded documents"
     args_schema: Type[BaseModel] = InvestmentQueryInput
+    namespace: str = DEFAULT_NAMESPACE
     
+    @recorded_tool
     def _run(self, query: str) -> str:
-        """Execute knowledge-enhanced investment analysis"""
+        """Execute knowledge-enhanced investment analysis (on the shared tool loop)"""
+        return run_tool(self._analyze_async(query))
+
+    @recorded_tool
+    async def _arun(self, query: str) -> str:
+        """Async entry point for callers running their own event loop"""
+        return await arun_tool(self._analyze_async(query))
+
+    async def _analyze_async(self, query: str) -> str:
+        """Batched with concurrent calls; graph and file work run off the loop"""
+        logger.debug("Tool invoked", extra={"tool": self.name, "query_chars": len(query) if isinstance(query, str) else None})
+        if not query or not isinstance(query, str):
+            return "Invalid query received by financial knowledge tool"
         try:
-            print(f"=== FinancialKnowledgeTool Debug ===")
-            print(f"Received query: '{query}' (type: {type(query)})")
-            
-            if not query or not isinstance(query, str):
-                return "Invalid query received by financial knowledge tool"
-            
-            # Create knowledge graph instance in _run method
-            try:
-                knowledge_graph = FinancialKnowledgeGraph(
-                    neo4j_password="Your_Password_Here",  
-                    uploads_directory="./uploads"
-                )
-                print("Knowledge graph created successfully")
-                
-                has_uploaded = knowledge_graph.has_uploaded_data
-                print(f"Has uploaded data: {has_uploaded}")
-                
-                if has_uploaded:
-                    return self._knowledge_enhanced_analysis(query, knowledge_graph)
-                else:
-                    return self._graph_based_analysis(query, knowledge_graph)
-                    
-            except Exception as kg_error:
-                print(f"Knowledge graph creation failed: {kg_error}")
-                return self._fallback_analysis(query)
-            
+            return await _knowledge_batcher.submit((self.namespace, query), self)
         except Exception as e:
-            print(f"CRITICAL ERROR: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Financial knowledge tool failed")
             return f"Tool execution failed: {str(e)}"
+
+    def _open_knowledge_graph(self):
+        """Knowledge graph for this tool's namespace, or None when it cannot be created"""
+        try:
+            return FinancialKnowledgeGraph(
+                neo4j_password="Your_Password_Here",
+                uploads_directory="./uploads",
+                namespace=self.namespace
+            )
+        except Exception as kg_error:
+            logger.warning("Knowledge graph creation failed", extra={"error": str(kg_error)})
+            return None
+
+    def _analyze(self, query: str, knowledge_graph) -> str:
+        """Analysis of one query against an opened knowledge graph"""
+        if knowledge_graph is None:
+            return self._fallback_analysis(query)
+        try:
+            has_uploaded = knowledge_graph.has_uploaded_data
+            logger.debug("Knowledge graph ready", extra={"has_uploaded_data": has_uploaded})
+        except Exception as kg_error:
+            logger.warning("Knowledge graph unavailable", extra={"error": str(kg_error)})
+            return self._fallback_analysis(query)
+        if has_uploaded:
+            return self._knowledge_enhanced_analysis(query, knowledge_graph)
+        return self._graph_based_analysis(query, knowledge_graph)
     
     def _knowledge_enhanced_analysis(self, query: str, knowledge_graph) -> str:
         """Use both uploaded documents and knowledge graph"""
@@ -65,19 +85,31 @@ class FinancialKnowledgeTool(BaseTool):
                 for i, content in enumerate(knowledge_results["uploaded_content"][:3], 1):
                     source = content.get("source", "Unknown document")
                     text = content.get("text", "")
-                    display_text = text[:300] + "..." if len(text) > 300 else text
+                    digest = content.get("digest")
                     
                     response_parts.append(f"{i}. **From {source}:**")
-                    response_parts.append(f"   {display_text}\n")
+                    if digest:
+                        # Precomputed at ingest: summary and key figures, plus a short passage for this query
+                        response_parts.extend(f"   {line}" for line in format_digest(digest))
+                        passage = " ".join(text.split())
+                        passage = passage[:DIGEST_PASSAGE_CHARS] + "..." if len(passage) > DIGEST_PASSAGE_CHARS else passage
+                        response_parts.append(f"   Relevant passage: {passage}\n")
+                    else:
+                        display_text = text[:300] + "..." if len(text) > 300 else text
+                        response_parts.append(f"   {display_text}\n")
             
             risk_level = self._extract_risk_level(query)
             investment_amount = self._extract_amount(query)
             time_horizon = self._extract_time_horizon(query)
             
+            strategy = knowledge_graph.get_investment_recommendations(risk_level, investment_amount, time_horizon)["recommended_strategy"]
+            
             response_parts.append("**PERSONALIZED RECOMMENDATIONS:**")
             response_parts.append(f"- Investment Amount: ${investment_amount:,.0f}")
             response_parts.append(f"- Risk Profile: {risk_level}")
             response_parts.append(f"- Time Horizon: {time_horizon}")
+            response_parts.append(f"- Suggested Allocation: {self._format_allocation(strategy)}")
+            response_parts.append(f"- Vehicles: {', '.join(strategy['vehicles'])}")
             response_parts.append("- Analysis incorporates your uploaded documents")
             
             response_parts.append("\n**POWERED BY:** Neo4j Knowledge Graph + Your Uploaded Documents")
@@ -85,7 +117,7 @@ class FinancialKnowledgeTool(BaseTool):
             return "\n".join(response_parts)
             
         except Exception as e:
-            print(f"Error in knowledge-enhanced analysis: {e}")
+            logger.warning("Knowledge-enhanced analysis failed", extra={"error": str(e)})
             return self._fallback_analysis(query)
     
     def _graph_based_analysis(self, query: str, knowledge_graph) -> str:
@@ -95,18 +127,22 @@ class FinancialKnowledgeTool(BaseTool):
             investment_amount = self._extract_amount(query)
             time_horizon = self._extract_time_horizon(query)
             
+            strategy = knowledge_graph.get_investment_recommendations(risk_level, investment_amount, time_horizon)["recommended_strategy"]
+            
             response_parts = ["**KNOWLEDGE GRAPH INVESTMENT ANALYSIS**\n"]
             response_parts.append("**RECOMMENDED STRATEGY:**")
-            response_parts.append(f"- {risk_level} Risk Investment Strategy")
+            response_parts.append(f"- {strategy['name']}")
             response_parts.append(f"- Suitable for {time_horizon} investing")
             response_parts.append(f"- Amount: ${investment_amount:,.0f}")
+            response_parts.append(f"- Allocation: {self._format_allocation(strategy)}")
+            response_parts.append(f"- Vehicles: {', '.join(strategy['vehicles'])}")
             response_parts.append("\n**TIP:** Upload financial documents for personalized analysis!")
             response_parts.append("\n**POWERED BY:** Neo4j Knowledge Graph")
             
             return "\n".join(response_parts)
             
         except Exception as e:
-            print(f"Error in graph-based analysis: {e}")
+            logger.warning("Graph-based analysis failed", extra={"error": str(e)})
             return self._fallback_analysis(query)
     
     def _fallback_analysis(self, query: str) -> str:
@@ -131,49 +167,46 @@ class FinancialKnowledgeTool(BaseTool):
         
         return "\n".join(response_parts)
     
+    def _format_allocation(self, strategy) -> str:
+        """'60% Stocks, 40% Bonds'"""
+        return ", ".join(f"{percent:g}% {asset}" for asset, percent in strategy["allocation"].items())
+    
     def _extract_risk_level(self, query: str) -> str:
         """Extract risk level from query"""
-        query_lower = query.lower()
-        if any(word in query_lower for word in ['conservative', 'low risk', 'safe', 'stable']):
-            return "Low"
-        elif any(word in query_lower for word in ['aggressive', 'high risk', 'growth', 'risky']):
-            return "High"
-        elif any(word in query_lower for word in ['moderate', 'balanced', 'medium']):
-            return "Moderate"
-        return "Moderate"
+        return extract_risk_level(query)
     
     def _extract_amount(self, query: str) -> float:
         """Extract investment amount from query"""
-        patterns = [
-            r'\$\s*([\d,]+)(?:k|K|thousand)?',
-            r'([\d,]+)\s*(?:dollars|usd|\$)',
-            r'([\d,]+)(?:k|K|thousand)'
-        ]
-        
-        for pattern in patterns:
-            matches = re.findall(pattern, query)
-            for match in matches:
-                try:
-                    amount = float(match.replace(',', ''))
-                    if 'k' in query.lower() or 'thousand' in query.lower():
-                        amount *= 1000
-                    if amount > 0:
-                        return amount
-                except:
-                    continue
-        return 50000
+        return extract_amount(query)
     
     def _extract_time_horizon(self, query: str) -> str:
         """Extract time horizon from query"""
-        query_lower = query.lower()
-        if any(word in query_lower for word in ['short', 'near term', '1 year', '2 year']):
-            return "short-term"
-        elif any(word in query_lower for word in ['medium', '3 year', '5 year', 'mid term']):
-            return "medium-term"
-        elif any(word in query_lower for word in ['long', 'retirement', '10 year', '20 year']):
-            return "long-term"
-        return "long-term"
+        return extract_time_horizon(query)
     
-def get_financial_knowledge_tool():
-    """Factory function to create financial knowledge tool"""
-    return FinancialKnowledgeTool()
+async def _analyze_namespace(requests):
+    """Opens the namespace's graph once, then analyses its requests concurrently on worker threads"""
+    graph = await asyncio.to_thread(requests[0][1]._open_knowledge_graph)
+    return await asyncio.gather(*(asyncio.to_thread(tool._analyze, query, graph) for query, tool in requests),
+                                return_exceptions=True)
+
+async def _analyze_batch(items):
+    """Namespaces run side by side, so a slow PDF extraction or graph open only delays its own requests"""
+    by_namespace = {}
+    for index, ((namespace, query), tool) in enumerate(items):
+        by_namespace.setdefault(namespace, []).append((index, query, tool))
+    groups = list(by_namespace.values())
+    outcomes = await asyncio.gather(*(_analyze_namespace([(query, tool) for _, query, tool in group]) for group in groups),
+                                    return_exceptions=True)
+    results = [None] * len(items)
+    for group, outcome in zip(groups, outcomes):
+        if isinstance(outcome, asyncio.CancelledError):
+            raise outcome
+        for position, (index, _, _) in enumerate(group):
+            results[index] = outcome if isinstance(outcome, Exception) else outcome[position]
+    return results
+
+_knowledge_batcher = Batcher("financial_knowledge", _analyze_batch)
+
+def get_financial_knowledge_tool(namespace: Optional[str] = None):
+    """Factory function to create financial knowledge tool scoped to a user/session namespace"""
+    return FinancialKnowledgeTool(namespace=namespace or DEFAULT_NAMESPACE)
@@ -0,0 +1,349 @@
+"""
+On-disk caches for the market researcher's web search and page fetches.
+
+Pages are stored content-addressed (one blob per distinct body, shared by all
+URLs that return it) and served from disk while fresh. Stale pages are
+revalidated with If-None-Match / If-Modified-Since, so unchanged pages cost a
+304 instead of a download. Search results are cached by normalized query.
+Both caches are size-bounded with least-recently-used eviction. Responses
+marked `Cache-Control: no-store` are never written; `no-cache` ones are stored
+but revalidated on every fetch. Each URL keeps the charset its body was sent
+in, so a cached page decodes exactly like the live one.
+
+Only the standard library is used, so everything here can be exercised
+offline against `serve_fixture_pages`.
+"""
+
+import contextlib
+import email.message
+import hashlib
+import http.server
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger("web_cache")
+
+USER_AGENT = "Mozilla/5.0 (compatible; FinovaMarketResearcher/1.0)"
+
+
+def _cache_directives(cache_control: Optional[str]) -> set:
+    return {part.split("=", 1)[0].strip().lower() for part in (cache_control or "").split(",") if part.strip()}
+
+
+def _charset(content_type: Optional[str]) -> str:
+    """Charset named in a Content-Type header (utf-8 when absent)"""
+    message = email.message.Message()
+    message["Content-Type"] = content_type or "text/plain"
+    return message.get_content_charset() or "utf-8"
+
+
+class FetchedPage:
+    """Body and metadata of a fetched page"""
+
+    __slots__ = ("url", "status", "text", "content_type", "from_cache", "revalidated")
+
+    def __init__(self, url: str, status: int, text: str, content_type: str = "",
+                 from_cache: bool = False, revalidated: bool = False):
+        self.url = url
+        self.status = status
+        self.text = text
+        self.content_type = content_type
+        self.from_cache = from_cache
+        self.revalidated = revalidated
+
+
+class PageCache:
+    """Content-addressed page cache with TTL, conditional revalidation and LRU size bound"""
+
+    def __init__(self, directory, ttl_seconds: float = 3600.0, max_bytes: int = 200 * 1024 * 1024,
+                 timeout: float = 20.0, max_workers: int = 8):
+        self.directory = Path(directory)
+        self.objects = self.directory / "objects"
+        self.objects.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="web-fetch")
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "revalidated": 0, "evictions": 0, "not_stored": 0}
+        self._db = sqlite3.connect(str(self.directory / "pages.sqlite3"), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS pages (url TEXT PRIMARY KEY, digest TEXT NOT NULL, size INTEGER NOT NULL, "
+            "content_type TEXT, etag TEXT, last_modified TEXT, fetched_at REAL NOT NULL, last_access REAL NOT NULL, "
+            "charset TEXT)"
+        )
+        columns = {column[1] for column in self._db.execute("PRAGMA table_info(pages)")}
+        if "charset" not in columns:
+            # Caches written before the charset was kept fall back to the stored Content-Type
+            self._db.execute("ALTER TABLE pages ADD COLUMN charset TEXT")
+        self._db.commit()
+
+    def fetch(self, url: str) -> FetchedPage:
+        """Serve from cache while fresh, revalidate when stale, download otherwise"""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT digest, content_type, charset, etag, last_modified, fetched_at FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+
+        if row is not None:
+            digest, content_type, charset, etag, last_modified, fetched_at = row
+            body = self._read_object(digest, charset or _charset(content_type))
+            if body is not None and now - fetched_at < self.ttl_seconds:
+                self._touch(url, now)
+                self._count("hits")
+                return FetchedPage(url, 200, body, content_type or "", from_cache=True)
+            if body is None:
+                etag = last_modified = None
+        else:
+            etag = last_modified = body = None
+
+        headers = {"User-Agent": USER_AGENT}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+        request = urllib.request.Request(url, headers=headers)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                raw = response.read()
+                charset = response.headers.get_content_charset() or "utf-8"
+                text = raw.decode(charset, errors="replace")
+                content_type = response.headers.get("Content-Type", "")
+                directives = _cache_directives(response.headers.get("Cache-Control"))
+                if "no-store" in directives:
+                    self._forget(url)
+                    self._count("not_stored")
+                else:
+                    # no-cache: keep the body for revalidation but never serve it unchecked
+                    self._store(url, raw, content_type, charset, response.headers.get("ETag"),
+                                response.headers.get("Last-Modified"), now,
+                                fetched_at=0.0 if "no-cache" in directives else now)
+                self._count("misses")
+                return FetchedPage(url, response.status, text, content_type)
+        except urllib.error.HTTPError as e:
+            if e.code == 304 and body is not None:
+                # A no-cache page stays stale so that every fetch revalidates it
+                no_cache = fetched_at == 0.0 or "no-cache" in _cache_directives(e.headers.get("Cache-Control"))
+                with self._lock:
+                    self._db.execute("UPDATE pages SET fetched_at = ?, last_access = ? WHERE url = ?",
+                                     (0.0 if no_cache else now, now, url))
+                    self._db.commit()
+                self._count("revalidated")
+                return FetchedPage(url, 200, body, content_type or "", from_cache=True, revalidated=True)
+            raise
+
+    def fetch_many(self, urls: List[str]) -> Dict[str, object]:
+        """Fetch several URLs concurrently; failures are returned as exceptions in place of pages"""
+        futures = {url: self._pool.submit(self.fetch, url) for url in dict.fromkeys(urls)}
+        results: Dict[str, object] = {}
+        for url, future in futures.items():
+            try:
+                results[url] = future.result()
+            except Exception as e:
+                results[url] = e
+        return results
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            count, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages").fetchone()
+            return {"pages": count, "bytes": total, **self._stats}
+
+    def _store(self, url: str, raw: bytes, content_type: str, charset: str, etag: Optional[str],
+               last_modified: Optional[str], now: float, fetched_at: Optional[float] = None):
+        digest = hashlib.sha256(raw).hexdigest()
+        with self._lock:
+            # Blob and row under one lock: otherwise a concurrent release of the last other URL
+            # sharing this digest could delete the blob between the write and the insert
+            path = self._object_path(digest)
+            if not path.exists():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = path.with_suffix(".tmp")
+                tmp_path.write_bytes(raw)
+                os.replace(tmp_path, path)
+            previous = self._db.execute("SELECT digest FROM pages WHERE url = ?", (url,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO pages (url, digest, size, content_type, charset, etag, last_modified, "
+                "fetched_at, last_access) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, digest, len(raw), content_type, charset, etag, last_modified,
+                 now if fetched_at is None else fetched_at, now)
+            )
+            if previous and previous[0] != digest:
+                self._release_object(previous[0])
+            self._evict_over_budget()
+            self._db.commit()
+
+    def _forget(self, url: str):
+        with self._lock:
+            previous = self._db.execute("SELECT digest FROM pages WHERE url = ?", (url,)).fetchone()
+            if previous:
+                self._db.execute("DELETE FROM pages WHERE url = ?", (url,))
+                self._release_object(previous[0])
+                self._db.commit()
+
+    def _evict_over_budget(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for url, digest, size in self._db.execute(
+                "SELECT url, digest, size FROM pages ORDER BY last_access ASC").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM pages WHERE url = ?", (url,))
+            self._release_object(digest)
+            total -= size
+            self._stats["evictions"] += 1
+
+    def _release_object(self, digest: str):
+        """Delete a blob once no URL references it"""
+        still_used = self._db.execute("SELECT 1 FROM pages WHERE digest = ? LIMIT 1", (digest,)).fetchone()
+        if not still_used:
+            self._object_path(digest).unlink(missing_ok=True)
+
+    def _touch(self, url: str, now: float):
+        with self._lock:
+            self._db.execute("UPDATE pages SET last_access = ? WHERE url = ?", (now, url))
+            self._db.commit()
+
+    def _read_object(self, digest: str, charset: str = "utf-8") -> Optional[str]:
+        try:
+            return self._object_path(digest).read_bytes().decode(charset, errors="replace")
+        except FileNotFoundError:
+            return None
+
+    def _object_path(self, digest: str) -> Path:
+        return self.objects / digest[:2] / digest
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+
+def normalize_query(query: str) -> str:
+    """Case-, whitespace- and punctuation-insensitive search key"""
+    return " ".join(re.findall(r"[a-z0-9$%.]+", query.lower()))
+
+
+class SearchCache:
+    """Search results keyed by normalized query, with TTL and an entry bound"""
+
+    def __init__(self, path, ttl_seconds: float = 900.0, max_entries: int = 5000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS searches (query TEXT PRIMARY KEY, result TEXT NOT NULL, "
+            "created REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def get_or_search(self, query: str, search: Callable[[str], str]) -> str:
+        key = normalize_query(query)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT result, created FROM searches WHERE query = ?", (key,)).fetchone()
+            if row is not None and now - row[1] < self.ttl_seconds:
+                self._db.execute("UPDATE searches SET last_access = ? WHERE query = ?", (now, key))
+                self._db.commit()
+                self._stats["hits"] += 1
+                return row[0]
+            self._stats["misses"] += 1
+
+        result = search(query)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO searches (query, result, created, last_access) VALUES (?, ?, ?, ?)",
+                (key, result, now, now)
+            )
+            overflow = self._db.execute("SELECT COUNT(*) FROM searches").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self._db.execute(
+                    "DELETE FROM searches WHERE query IN (SELECT query FROM searches ORDER BY last_access ASC LIMIT ?)",
+                    (overflow,)
+                )
+            self._db.commit()
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM searches").fetchone()[0]
+            return {"entries": entries, **self._stats}
+
+
+@contextlib.contextmanager
+def serve_fixture_pages(pages: Dict[str, str], etag_pages: bool = True,
+                        headers: Optional[Dict[str, Dict[str, str]]] = None):
+    """
+    Local HTTP server standing in for the web (for offline checks).
+    Yields the base URL and a dict counting requests per path; pages get an ETag
+    so conditional revalidation can be exercised. `headers` adds or overrides
+    response headers per path; bodies are encoded in the Content-Type's charset.
+    """
+    hits: Dict[str, int] = {}
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits[self.path] = hits.get(self.path, 0) + 1
+            body = pages.get(self.path)
+            if body is None:
+                self.send_error(404)
+                return
+            etag = '"%s"' % hashlib.sha256(body.encode()).hexdigest()[:16]
+            if etag_pages and self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+            extra = {"Content-Type": "text/html; charset=utf-8", **(headers or {}).get(self.path, {})}
+            data = body.encode(_charset(extra["Content-Type"]))
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(data)))
+            if etag_pages:
+                self.send_header("ETag", etag)
+            for name, value in extra.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}", hits
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp, \
+            serve_fixture_pages({"/a": "<h1>Solar outlook</h1>", "/b": "<h1>Wind outlook</h1>"}) as (base, hits):
+        cache = PageCache(tmp, ttl_seconds=0.2)
+        cache.fetch_many([f"{base}/a", f"{base}/b"])
+        cache.fetch(f"{base}/a")
+        time.sleep(0.3)
+        page = cache.fetch(f"{base}/a")
+        print("revalidated:", page.revalidated, "server hits:", hits, "stats:", cache.stats())
+
+        searches = SearchCache(Path(tmp) / "search.sqlite3")
+        calls = []
+        for q in ["Renewable energy trends", "renewable  ENERGY trends?"]:
+            searches.get_or_search(q, lambda query: calls.append(query) or f"results for {query}")
+        print("search backend calls:", len(calls), "stats:", searches.stats())
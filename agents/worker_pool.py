@@ -0,0 +1,237 @@
+"""
+Multi-process API workers.
+
+`python worker_pool.py --workers 4` binds the API port once and forks worker
+processes that each import `api_server` and accept on the shared socket, so
+request parsing, document handling and synthesis use more than one core.
+Each worker initializes its own ACP clients and event loop. Durable state is
+shared through the SQLite files the workers already use (jobs, market briefs,
+conversation memory, the web cache), and every worker publishes its stats to
+a shared registry so `/api/health` can report the whole pool.
+
+The supervisor re-queues jobs interrupted by a previous shutdown before the
+workers start, restarts workers that exit (re-queueing the jobs they were
+running), and forwards SIGINT/SIGTERM. Worker 0 is the leader and runs the
+periodic background work (market brief refresh) that must not be duplicated
+per worker.
+
+Other pre-fork servers such as gunicorn are not supported: without
+API_WORKER_INDEX every process would act as leader.
+"""
+
+import argparse
+import json
+import logging
+import os
+import signal
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+logger = logging.getLogger("worker_pool")
+
+RESTART_BACKOFF_SECONDS = 1.0
+
+
+class WorkerRegistry:
+    """Latest stats snapshot of every worker process, in a SQLite file shared by the pool"""
+
+    def __init__(self, path: str, stale_after: float = 30.0):
+        self.stale_after = stale_after
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS workers (pid INTEGER PRIMARY KEY, worker_index INTEGER, "
+            "started_at REAL NOT NULL, heartbeat REAL NOT NULL, stats TEXT NOT NULL)"
+        )
+        self._db.commit()
+
+    def publish(self, index: int, started_at: float, stats: Dict[str, Any]):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO workers (pid, worker_index, started_at, heartbeat, stats) VALUES (?, ?, ?, ?, ?)",
+                (os.getpid(), index, started_at, time.time(), json.dumps(stats, default=str))
+            )
+            self._db.commit()
+
+    def remove(self, pid: int):
+        with self._lock:
+            self._db.execute("DELETE FROM workers WHERE pid = ?", (pid,))
+            self._db.commit()
+
+    def workers(self) -> List[Dict[str, Any]]:
+        """Snapshots of workers that published recently (stale rows are dropped)"""
+        cutoff = time.time() - self.stale_after
+        with self._lock:
+            self._db.execute("DELETE FROM workers WHERE heartbeat < ?", (cutoff,))
+            self._db.commit()
+            rows = self._db.execute(
+                "SELECT pid, worker_index, started_at, heartbeat, stats FROM workers ORDER BY worker_index, pid"
+            ).fetchall()
+        return [
+            {"pid": pid, "index": index, "started_at": started_at, "heartbeat_age_s": round(time.time() - heartbeat, 1),
+             "stats": json.loads(stats)}
+            for pid, index, started_at, heartbeat, stats in rows
+        ]
+
+    def summary(self) -> Dict[str, Any]:
+        """Live workers with their stats, and integer counters summed across the pool"""
+        workers = self.workers()
+        return {
+            "workers": len(workers),
+            "totals": sum_counters([worker["stats"] for worker in workers]),
+            "per_worker": workers,
+        }
+
+
+def sum_counters(snapshots: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Sum integer leaves of nested stats dicts (floats such as rates and latencies are per worker only)"""
+    totals: Dict[str, Any] = {}
+    for snapshot in snapshots:
+        for key, value in snapshot.items():
+            if isinstance(value, dict):
+                nested = sum_counters([totals.get(key) or {}, value])
+                if nested:
+                    totals[key] = nested
+            elif isinstance(value, int) and not isinstance(value, bool):
+                totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+def start_publishing(registry: WorkerRegistry, index: int, collect: Callable[[], Dict[str, Any]],
+                     interval: float = 5.0) -> threading.Thread:
+    """Publish this worker's stats every `interval` seconds on a daemon thread"""
+    started_at = time.time()
+
+    def publish_forever():
+        while True:
+            try:
+                registry.publish(index, started_at, collect())
+            except Exception as e:
+                logger.warning("Worker stats publish failed", extra={"error": str(e)})
+            time.sleep(interval)
+
+    thread = threading.Thread(target=publish_forever, name="worker-stats", daemon=True)
+    thread.start()
+    return thread
+
+
+def _run_worker(listener: socket.socket, index: int, workers: int, host: str, port: int):
+    """Child process: import the app after the fork and serve on the inherited socket"""
+    os.environ["API_WORKER_INDEX"] = str(index)
+    os.environ["API_WORKERS"] = str(workers)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    from werkzeug.serving import make_server
+    import api_server
+
+    server = make_server(host, port, api_server.app, threaded=True, fd=listener.fileno())
+    api_server.start_agent_initialization()
+    server.serve_forever()
+
+
+def _job_store():
+    from job_queue import JobStore
+
+    return JobStore(os.getenv("JOB_DB", "./jobs.sqlite3"))
+
+
+def _recover_jobs():
+    """Re-queue jobs left running by a previous shutdown, once, before any worker starts"""
+    recovered = _job_store().requeue_unfinished()
+    if recovered:
+        logger.info("Re-queued unfinished jobs", extra={"jobs": len(recovered)})
+
+
+def _recover_worker_jobs(pid: int):
+    """Re-queue the jobs a worker was running when it exited, before its replacement starts"""
+    try:
+        recovered = _job_store().requeue_owned_by(pid)
+    except Exception as e:
+        # The surviving workers take these over once their leases expire
+        logger.warning("Could not re-queue jobs of exited worker", extra={"pid": pid, "error": str(e)})
+        return
+    if recovered:
+        logger.info("Re-queued jobs of exited worker", extra={"pid": pid, "jobs": len(recovered)})
+
+
+def serve(workers: int, host: str = "0.0.0.0", port: int = 5001):
+    """Pre-fork supervisor: bind once, fork `workers` children, restart them when they exit"""
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((host, port))
+    listener.listen(128)
+    listener.set_inheritable(True)
+    _recover_jobs()
+
+    children: Dict[int, int] = {}
+    stopping = False
+
+    def spawn(index: int):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _run_worker(listener, index, workers, host, port)
+            except BaseException:
+                logger.exception("Worker failed", extra={"worker_index": index})
+            finally:
+                logging.shutdown()
+                os._exit(1)
+        children[pid] = index
+        logger.info("Worker started", extra={"worker_index": index, "pid": pid})
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for index in range(workers):
+        spawn(index)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        index = children.pop(pid, None)
+        if index is None or stopping:
+            continue
+        logger.warning("Worker exited; restarting", extra={"worker_index": index, "pid": pid,
+                                                           "exit_status": status})
+        _recover_worker_jobs(pid)
+        time.sleep(RESTART_BACKOFF_SECONDS)
+        spawn(index)
+    listener.close()
+
+
+def main():
+    from dotenv import load_dotenv
+    from structured_logging import setup_logging
+
+    load_dotenv()
+    setup_logging()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("API_WORKERS", str(os.cpu_count() or 2))))
+    parser.add_argument("--host", default=os.getenv("API_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("API_PORT", "5001")))
+    args = parser.parse_args()
+    if not hasattr(os, "fork"):
+        sys.exit("worker_pool needs os.fork(); run `python api_server.py` for a single process")
+
+    print(f"🚀 Starting {args.workers} API workers on http://{args.host}:{args.port}")
+    serve(args.workers, args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()